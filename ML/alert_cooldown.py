@@ -0,0 +1,208 @@
+"""
+Alert Cooldown for Artemis Health Monitoring System
+===================================================
+
+Supresión de alertas repetidas por oficial.
+
+Durante un episodio sostenido (p. ej. HR de 160 durante varios minutos)
+cada lectura produce la misma alerta. `AlertCooldown` guarda, por
+(user_id, alert_type), cuándo se emitió la última y con qué severidad:
+
+- Una alerta repetida dentro de `cooldown_seconds` se suprime y se cuenta.
+- Si la severidad sube respecto a la última emitida (escalamiento), se
+  emite aunque esté en cooldown.
+- La siguiente alerta emitida para esa clave lleva cuántas se suprimieron
+  desde la anterior (`AlertPayload.suppressed_count`).
+
+El estado vive en un mapa acotado (`max_tracked` claves). Cada entrada se
+conserva hasta dos cooldowns después de su emisión: si el episodio sigue,
+la primera alerta tras el cooldown lleva la cuenta de las suprimidas; si
+terminó, la entrada caduca y la cuenta se descarta. Así la memoria no crece
+con el número de oficiales.
+
+El tiempo de cada alerta es el timestamp de su lectura cuando se conoce
+(`admit(..., now=...)`), en segundos epoch; si no, el reloj del servidor.
+Así un lote de lecturas atrasadas (un backlog, un reproceso) se suprime
+según el tiempo entre lecturas y no según lo rápido que se procesan. Una
+lectura con timestamp anterior a la última alerta emitida se decide contra
+esa emisión pero no reemplaza su estado.
+
+Si la alerta emitida no llega a guardarse (la transacción que la crea se
+revierte), `revoke()` deshace su emisión y restaura el estado anterior de la
+clave, para que la lectura reintentada no quede suprimida.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def timestamp_seconds(value: Any) -> Optional[float]:
+    """
+    Segundos epoch de un timestamp de lectura (str ISO 8601, datetime,
+    datetime64 o número); None si no hay o no se puede interpretar.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if hasattr(value, 'dtype') and value.dtype.kind == 'M':
+        # datetime64 no tiene zona: se interpreta como UTC
+        if value != value:
+            return None
+        return int(value.astype('datetime64[us]').astype('int64')) / 1e6
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return None
+
+
+class _CooldownEntry:
+    """Estado de una clave (user_id, alert_type)"""
+
+    __slots__ = ('emitted_at', 'severity', 'suppressed', 'previous')
+
+    def __init__(self, emitted_at: float, severity: int,
+                 previous: Optional['_CooldownEntry'] = None):
+        self.emitted_at = emitted_at
+        self.severity = severity
+        self.suppressed = 0
+        # Estado que reemplazó esta emisión (lo restaura `revoke`)
+        self.previous = previous
+
+
+class AlertCooldown:
+    """
+    Mapa TTL acotado de la última alerta emitida por (user_id, alert_type).
+
+    Seguro entre hilos: la decisión de emitir o suprimir y la actualización
+    del estado se hacen bajo un mismo lock.
+    """
+
+    def __init__(self,
+                 cooldown_seconds: float,
+                 max_tracked: int = 100000,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            cooldown_seconds: Tiempo durante el cual se suprime una alerta
+                              repetida del mismo tipo para el mismo oficial
+            max_tracked: Claves guardadas como máximo (se descartan las de
+                         emisión más antigua)
+            clock: Segundos epoch para las alertas sin timestamp (inyectable
+                   para tests); debe estar en la misma escala que `now`
+        """
+        if cooldown_seconds <= 0:
+            raise ValueError("cooldown_seconds debe ser mayor que 0")
+        if max_tracked < 1:
+            raise ValueError("max_tracked debe ser al menos 1")
+
+        self.cooldown_seconds = cooldown_seconds
+        self.max_tracked = max_tracked
+        self._retention = 2 * cooldown_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Ordenado por momento de emisión (la más antigua al principio)
+        self._entries: 'OrderedDict[Hashable, _CooldownEntry]' = OrderedDict()
+        self._suppressed_total = 0
+
+    def admit(self, user_id: int, alert_type: str, severity: int,
+              now: Optional[float] = None) -> Optional[int]:
+        """
+        Decide si una alerta se emite.
+
+        Args:
+            user_id: ID del oficial
+            alert_type: Tipo de alerta
+            severity: Código de severidad (índice en SEVERITY_LEVELS)
+            now: Timestamp de la lectura en segundos epoch (por defecto,
+                 el reloj)
+
+        Returns:
+            None si la alerta se suprime; si se emite, el número de alertas
+            suprimidas para esa clave desde la emisión anterior
+        """
+        key = (user_id, alert_type)
+        if now is None:
+            now = self._clock()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry.emitted_at:
+                # Lectura atrasada: no reemplaza a la emisión más reciente
+                if (entry.emitted_at - now < self.cooldown_seconds
+                        and severity <= entry.severity):
+                    entry.suppressed += 1
+                    self._suppressed_total += 1
+                    return None
+                return 0
+            if entry is not None and now - entry.emitted_at >= self._retention:
+                entry = None
+            if (entry is not None
+                    and now - entry.emitted_at < self.cooldown_seconds
+                    and severity <= entry.severity):
+                entry.suppressed += 1
+                self._suppressed_total += 1
+                return None
+
+            suppressed = entry.suppressed if entry is not None else 0
+            if entry is not None:
+                # Solo se puede deshacer la última emisión
+                entry.previous = None
+            self._entries[key] = _CooldownEntry(now, severity, entry)
+            self._entries.move_to_end(key)
+            self._evict(now)
+            return suppressed
+
+    def revoke(self, user_id: int, alert_type: str, emitted_at: float) -> bool:
+        """
+        Deshace la emisión de una alerta que no se llegó a guardar.
+
+        Args:
+            user_id: ID del oficial
+            alert_type: Tipo de alerta
+            emitted_at: Timestamp con el que se admitió (segundos epoch)
+
+        Returns:
+            True si se restauró el estado anterior; False si la alerta no
+            es la última emitida para esa clave (nada que deshacer)
+        """
+        key = (user_id, alert_type)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.emitted_at != emitted_at:
+                return False
+            if entry.previous is not None:
+                self._entries[key] = entry.previous
+            else:
+                del self._entries[key]
+            return True
+
+    def _evict(self, now: float):
+        """Descarta claves caducadas o por encima del límite"""
+        entries = self._entries
+        oldest = now - self._retention
+        while entries:
+            key, entry = next(iter(entries.items()))
+            if len(entries) <= self.max_tracked and entry.emitted_at > oldest:
+                break
+            del entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Claves guardadas y alertas suprimidas en total"""
+        with self._lock:
+            return {
+                'tracked': len(self._entries),
+                'suppressed_total': self._suppressed_total,
+            }
+
+    def clear(self):
+        """Olvida todo el estado (las próximas alertas se emiten)"""
+        with self._lock:
+            self._entries.clear()
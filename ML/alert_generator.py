@@ -12,10 +12,162 @@ Responsabilidades:
 - Crear mensajes descriptivos para supervisores
 
 El backend usa este módulo para decidir cuándo y cómo alertar.
+
+Las reglas de clasificación están en una tabla ordenada (`ALERT_RULES`) que
+se compila con los umbrales vigentes: la misma tabla sirve para clasificar
+una lectura (`generate_alert`) o un lote completo con NumPy
+(`classify_batch`). Los mensajes no se formatean al generar la alerta: el
+payload lleva la plantilla de su tipo y se renderiza solo si se lee.
 """
 
-from datetime import datetime
-from typing import Dict, Any, Optional
+import logging
+import operator
+from typing import Dict, Any, Mapping, Optional, Tuple
+
+from alert_cooldown import AlertCooldown, timestamp_seconds
+from ml_results import (
+    ALERT_TYPE_CODES, SEVERITY_CODES, AlertPayload, AlertTemplate, PredictionResult
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Reglas de clasificación en orden de prioridad: gana la primera que se
+# cumple. Cada condición es (columna, comparador, umbral); el umbral es una
+# clave de `AlertGenerator.thresholds` o una constante. Las columnas son
+# las de `HealthMonitorML.predict_columns()`.
+ALERT_RULES = (
+    # ===== CASOS CRÍTICOS (EMERGENCIA MÉDICA) =====
+    ('HR_CRITICAL_LOW', 'CRITICAL', (('heart_rate', operator.lt, 'hr_critical_low'),)),
+    ('HR_CRITICAL_HIGH', 'CRITICAL', (('heart_rate', operator.gt, 'hr_critical_high'),)),
+    ('HR_ZERO', 'CRITICAL', (('heart_rate', operator.eq, 0),)),
+    # ===== CASOS DE ALTO RIESGO =====
+    ('STRESS_CRITICAL', 'HIGH', (('stress_score', operator.ge, 'stress_critical'),)),
+    ('STRESS_HIGH_RISK', 'HIGH', (('stress_score', operator.ge, 'stress_high'),)),
+    ('HR_ABNORMALLY_HIGH', 'HIGH', (('heart_rate', operator.gt, 'hr_warning_high'),)),
+    ('HR_ABNORMALLY_LOW', 'HIGH', (('heart_rate', operator.lt, 'hr_warning_low'),)),
+    # ===== CASOS MODERADOS =====
+    ('STRESS_ELEVATED', 'MEDIUM', (('stress_score', operator.ge, 'stress_medium'),)),
+    ('HR_SUSTAINED_ELEVATED', 'MEDIUM', (('hr_elevated_sustained', operator.eq, 1),)),
+    ('HR_RAPID_FLUCTUATION', 'MEDIUM', (('hr_rapid_changes', operator.ge, 3),)),
+    ('ANOMALY_DETECTED', 'MEDIUM', (('is_anomaly', operator.eq, True),
+                                    ('alert_probability', operator.gt, 'anomaly_threshold'))),
+    ('ML_PREDICTION_ALERT', 'MEDIUM', (('alert_probability', operator.gt, 0.7),)),
+)
+
+# Texto de cada tipo de alerta: (mensaje, acción requerida). Los umbrales se
+# sustituyen una vez por plantilla (ver `AlertGenerator._template`); los
+# valores de la lectura, al leer `AlertPayload.message`.
+ALERT_MESSAGES = {
+    'HR_CRITICAL_LOW': (
+        'EMERGENCIA: Frecuencia cardíaca críticamente baja ({hr:.0f} bpm). '
+        'Posible bradicardia severa. Requiere atención médica inmediata.',
+        'Contactar al oficial de inmediato. Evaluar estado de consciencia. '
+        'Preparar asistencia médica de emergencia.'
+    ),
+    'HR_CRITICAL_HIGH': (
+        'EMERGENCIA: Frecuencia cardíaca críticamente alta ({hr:.0f} bpm). '
+        'Posible taquicardia severa o crisis cardiovascular.',
+        'Contactar al oficial de inmediato. Verificar si está en emergencia. '
+        'Alertar servicios médicos si es necesario.'
+    ),
+    'HR_ZERO': (
+        'ALERTA CRÍTICA: Sin señal de frecuencia cardíaca (0 bpm). '
+        'Dispositivo desconectado o situación de emergencia.',
+        'Contactar al oficial INMEDIATAMENTE. Verificar estado del dispositivo. '
+        'Confirmar bienestar del oficial.'
+    ),
+    'STRESS_CRITICAL': (
+        'ESTRÉS CRÍTICO: Nivel de estrés muy alto detectado ({stress_score:.1f}/100). '
+        'El oficial está bajo estrés severo que puede afectar su desempeño y salud.',
+        'Monitorear de cerca al oficial. Considerar rotación de tareas o descanso. '
+        'Evaluar factores estresantes en el entorno.'
+    ),
+    'STRESS_HIGH_RISK': (
+        'ALTO RIESGO DE ESTRÉS: Score de estrés elevado ({stress_score:.1f}/100). '
+        'Nivel: {stress_level}. Requiere atención preventiva.',
+        'Verificar estado del oficial. Considerar intervención preventiva. '
+        'Revisar carga de trabajo actual.'
+    ),
+    'HR_ABNORMALLY_HIGH': (
+        'FRECUENCIA CARDÍACA ANORMALMENTE ALTA: {hr:.0f} bpm. '
+        'Por encima del umbral de advertencia ({hr_warning_high} bpm).',
+        'Verificar si el oficial está en actividad física intensa. '
+        'Si está en reposo, evaluar posible estrés o problema de salud.'
+    ),
+    'HR_ABNORMALLY_LOW': (
+        'FRECUENCIA CARDÍACA ANORMALMENTE BAJA: {hr:.0f} bpm. '
+        'Por debajo del umbral de advertencia ({hr_warning_low} bpm).',
+        'Verificar estado del oficial. Confirmar que el sensor funciona correctamente. '
+        'Evaluar si hay síntomas asociados (mareo, fatiga).'
+    ),
+    'STRESS_ELEVATED': (
+        'ESTRÉS ELEVADO: Nivel de estrés moderado-alto ({stress_score:.1f}/100). '
+        'Nivel: {stress_level}.',
+        'Monitorear evolución del estrés. Si persiste, considerar medidas preventivas. '
+        'Mantener comunicación con el oficial.'
+    ),
+    'HR_SUSTAINED_ELEVATED': (
+        'FRECUENCIA CARDÍACA ELEVADA SOSTENIDA: {hr:.0f} bpm mantenida por período prolongado. '
+        'Puede indicar estrés continuo.',
+        'Verificar duración del episodio. Evaluar si es por actividad física o estrés. '
+        'Considerar descanso si es prolongado.'
+    ),
+    'HR_RAPID_FLUCTUATION': (
+        'FLUCTUACIONES RÁPIDAS EN HR: {rapid_changes} cambios bruscos detectados. '
+        'Puede indicar estrés agudo o situación de alta demanda.',
+        'Observar contexto del oficial. Verificar si está en situación de alto estrés. '
+        'Confirmar estabilidad emocional.'
+    ),
+    'ANOMALY_DETECTED': (
+        'ANOMALÍA DETECTADA: Patrón cardíaco inusual identificado por ML. '
+        'Probabilidad de alerta: {alert_probability:.1%}.',
+        'Revisar patrón de HR del oficial. Comparar con su historial normal. '
+        'Verificar bienestar general.'
+    ),
+    'ML_PREDICTION_ALERT': (
+        'ALERTA PREDICTIVA: El modelo ML ha detectado un patrón que requiere atención. '
+        'Probabilidad: {alert_probability:.1%}. HR: {hr:.0f} bpm, Estrés: {stress_score:.1f}/100.',
+        'Revisar contexto completo del oficial. Evaluar métricas adicionales. '
+        'Mantener observación.'
+    ),
+}
+
+
+class _Placeholder:
+    """Campo de la lectura que se deja intacto al sustituir los umbrales"""
+    
+    __slots__ = ('name',)
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def __format__(self, spec: str) -> str:
+        return '{%s:%s}' % (self.name, spec) if spec else '{%s}' % self.name
+
+
+class _ThresholdsOnly(dict):
+    """format_map que resuelve solo los umbrales y conserva el resto"""
+    
+    def __missing__(self, key: str) -> _Placeholder:
+        return _Placeholder(key)
+
+
+def compile_rules(thresholds: Mapping[str, float]) -> tuple:
+    """
+    Resuelve los umbrales de ALERT_RULES.
+
+    Returns:
+        Tupla de (alert_type, severity, condiciones) con cada condición como
+        (columna, comparador, valor numérico)
+    """
+    return tuple(
+        (alert_type, severity, tuple(
+            (column, compare, thresholds[limit] if isinstance(limit, str) else limit)
+            for column, compare, limit in conditions
+        ))
+        for alert_type, severity, conditions in ALERT_RULES
+    )
 
 
 class AlertGenerator:
@@ -26,8 +178,16 @@ class AlertGenerator:
     listos para ser guardados en la base de datos por el backend.
     """
     
-    def __init__(self):
-        """Inicializa el generador con umbrales configurados"""
+    def __init__(self, cooldown_seconds: float = 0, max_tracked: int = 100000):
+        """
+        Inicializa el generador con umbrales configurados.
+        
+        Args:
+            cooldown_seconds: Si es mayor que 0, suprime alertas repetidas del
+                              mismo tipo para el mismo oficial durante ese
+                              tiempo (ver `alert_cooldown.py`)
+            max_tracked: Claves (user_id, alert_type) guardadas como máximo
+        """
         self.thresholds = {
             # Umbrales de frecuencia cardíaca (SRS FR-006)
             'hr_critical_low': 40,      # < 40 bpm = emergencia
@@ -44,22 +204,31 @@ class AlertGenerator:
             'anomaly_threshold': 0.8,   # Probabilidad de alerta > 80%
         }
         
-        print("AlertGenerator inicializado con umbrales configurados")
+        # Tabla de reglas y plantillas de mensaje con los umbrales resueltos
+        self._rules = compile_rules(self.thresholds)
+        self._templates = {}
+        
+        # Supresión de alertas repetidas (desactivada con cooldown 0)
+        self.cooldown = None
+        if cooldown_seconds > 0:
+            self.configure_cooldown(cooldown_seconds, max_tracked)
+        
+        logger.debug("AlertGenerator inicializado con umbrales configurados")
     
     def generate_alert(self, 
-                      prediction_result: Dict[str, Any], 
+                      prediction_result: PredictionResult, 
                       user_id: int,
-                      timestamp: Optional[str] = None) -> Optional[Dict[str, Any]]:
+                      timestamp: Optional[str] = None) -> Optional[AlertPayload]:
         """
         Genera un payload de alerta si es necesario.
         
         Args:
-            prediction_result: Resultado de ml_predictor.predict()
+            prediction_result: PredictionResult de ml_predictor.predict()
             user_id: ID del oficial/usuario
             timestamp: Timestamp del evento (opcional, usa now() si None)
         
         Returns:
-            Dict con payload de alerta o None si no requiere alerta
+            AlertPayload (acceso tipo diccionario) o None si no requiere alerta
             
         Example:
             >>> alert_gen = AlertGenerator()
@@ -70,222 +239,200 @@ class AlertGenerator:
             ...     Alert.objects.create(**alert)
         """
         # Si el modelo ML dice que no requiere alerta, retornar None
-        if not prediction_result.get('requires_alert', False):
+        if not prediction_result.requires_alert:
             return None
         
-        # Extraer datos de la predicción
-        hr = prediction_result['metadata']['heart_rate']
-        stress_score = prediction_result['stress_score']
-        stress_level = prediction_result['stress_level']
-        is_anomaly = prediction_result['is_anomaly']
-        alert_probability = prediction_result['alert_probability']
-        
-        # Clasificar tipo y severidad de alerta
-        alert_type, severity, message, action_required = self._classify_alert(
-            hr=hr,
-            stress_score=stress_score,
-            stress_level=stress_level,
-            is_anomaly=is_anomaly,
-            alert_probability=alert_probability,
-            metadata=prediction_result['metadata']
+        # Clasificar tipo y severidad de alerta (sin materializar metadata)
+        alert_type, severity = self._classify_alert(
+            hr=prediction_result.heart_rate,
+            stress_score=prediction_result.stress_score,
+            is_anomaly=prediction_result.is_anomaly,
+            alert_probability=prediction_result.alert_probability,
+            hr_elevated_sustained=prediction_result.hr_elevated_sustained,
+            hr_rapid_changes=prediction_result.hr_rapid_changes
         )
         
         # Si no se pudo clasificar, retornar None
         if alert_type is None:
             return None
         
-        # Construir payload de alerta
-        alert_payload = {
-            # Identificación
-            'user_id': user_id,
-            'timestamp': timestamp or datetime.now().isoformat(),
-            
-            # Clasificación
-            'alert_type': alert_type,
-            'severity': severity,
-            
-            # Mensaje
-            'message': message,
-            'action_required': action_required,
-            
-            # Datos biométricos
-            'heart_rate': float(hr),
-            'stress_score': float(stress_score),
-            'stress_level': stress_level,
-            
-            # Flags
-            'requires_immediate_action': severity in ['CRITICAL', 'HIGH'],
-            'is_anomaly': bool(is_anomaly),
-            'alert_probability': float(alert_probability),
-            
-            # Metadatos ML
-            'metadata': {
-                'hr_zone': prediction_result['hr_zone'],
-                'hr_variability': prediction_result['metadata'].get('hr_variability', 0),
-                'hr_elevated_sustained': prediction_result['metadata'].get('hr_elevated_sustained', 0),
-                'hr_rapid_changes': prediction_result['metadata'].get('hr_rapid_changes', 0),
-                'anomaly_score': prediction_result['metadata'].get('anomaly_score', 0),
-                'ml_features': prediction_result['metadata']['features']
-            }
-        }
+        # Alerta repetida en cooldown: se suprime
+        suppressed_count = self.admit(user_id, alert_type, severity, timestamp)
+        if suppressed_count is None:
+            return None
+        
+        return self.build_alert(
+            prediction_result, user_id, alert_type, severity, timestamp,
+            suppressed_count=suppressed_count
+        )
+    
+    def admit(self, user_id: int, alert_type: str, severity: str,
+              timestamp=None) -> Optional[int]:
+        """
+        Aplica el cooldown a una alerta ya clasificada.
+        
+        Args:
+            timestamp: Timestamp de la lectura (str ISO 8601, datetime,
+                       datetime64 o segundos epoch); sin él se usa el reloj
+        
+        Returns:
+            None si la alerta se suprime; si no, cuántas alertas iguales se
+            suprimieron desde la última emitida (0 sin cooldown)
+        """
+        cooldown = self.cooldown
+        if cooldown is None:
+            return 0
+        return cooldown.admit(user_id, alert_type, SEVERITY_CODES[severity],
+                              now=timestamp_seconds(timestamp))
+    
+    def revoke(self, alert: AlertPayload) -> bool:
+        """
+        Deshace el cooldown de una alerta emitida que no se guardó, para
+        que una alerta igual no quede suprimida (ver `AlertCooldown.revoke`).
+
+        Returns:
+            True si se deshizo su emisión
+        """
+        cooldown = self.cooldown
+        emitted_at = timestamp_seconds(alert.timestamp)
+        if cooldown is None or emitted_at is None:
+            return False
+        return cooldown.revoke(alert.user_id, alert.alert_type, emitted_at)
+    
+    def configure_cooldown(self, cooldown_seconds: float, max_tracked: int = 100000):
+        """
+        Activa (o cambia) la supresión de alertas repetidas.
         
-        return alert_payload
+        Args:
+            cooldown_seconds: Tiempo de supresión por (user_id, alert_type);
+                              0 la desactiva
+            max_tracked: Claves guardadas como máximo
+        """
+        if cooldown_seconds > 0:
+            self.cooldown = AlertCooldown(cooldown_seconds, max_tracked)
+        else:
+            self.cooldown = None
+        logger.info("Cooldown de alertas: %s s", cooldown_seconds)
     
     def _classify_alert(self, 
                        hr: float, 
                        stress_score: float,
-                       stress_level: str,
                        is_anomaly: bool,
                        alert_probability: float,
-                       metadata: Dict) -> tuple:
+                       hr_elevated_sustained: int = 0,
+                       hr_rapid_changes: int = 0) -> tuple:
         """
         Clasifica el tipo y severidad de la alerta.
         
         Returns:
-            tuple: (alert_type, severity, message, action_required)
+            tuple: (alert_type, severity), o (None, None) si ninguna regla aplica
         """
+        values = {
+            'heart_rate': hr,
+            'stress_score': stress_score,
+            'is_anomaly': is_anomaly,
+            'alert_probability': alert_probability,
+            'hr_elevated_sustained': hr_elevated_sustained,
+            'hr_rapid_changes': hr_rapid_changes,
+        }
         
-        # ===== CASOS CRÍTICOS (EMERGENCIA MÉDICA) =====
-        
-        # CASO 1: HR críticamente baja (bradicardia severa)
-        if hr < self.thresholds['hr_critical_low']:
-            return (
-                'HR_CRITICAL_LOW',
-                'CRITICAL',
-                f'EMERGENCIA: Frecuencia cardíaca críticamente baja ({hr:.0f} bpm). '
-                f'Posible bradicardia severa. Requiere atención médica inmediata.',
-                'Contactar al oficial de inmediato. Evaluar estado de consciencia. '
-                'Preparar asistencia médica de emergencia.'
-            )
-        
-        # CASO 2: HR críticamente alta (taquicardia severa)
-        if hr > self.thresholds['hr_critical_high']:
-            return (
-                'HR_CRITICAL_HIGH',
-                'CRITICAL',
-                f'EMERGENCIA: Frecuencia cardíaca críticamente alta ({hr:.0f} bpm). '
-                f'Posible taquicardia severa o crisis cardiovascular.',
-                'Contactar al oficial de inmediato. Verificar si está en emergencia. '
-                'Alertar servicios médicos si es necesario.'
-            )
-        
-        # CASO 3: HR = 0 (sensor desconectado o problema crítico)
-        if hr == 0:
-            return (
-                'HR_ZERO',
-                'CRITICAL',
-                'ALERTA CRÍTICA: Sin señal de frecuencia cardíaca (0 bpm). '
-                'Dispositivo desconectado o situación de emergencia.',
-                'Contactar al oficial INMEDIATAMENTE. Verificar estado del dispositivo. '
-                'Confirmar bienestar del oficial.'
-            )
-        
-        # ===== CASOS DE ALTO RIESGO =====
-        
-        # CASO 4: Estrés crítico (muy alto)
-        if stress_score >= self.thresholds['stress_critical']:
-            return (
-                'STRESS_CRITICAL',
-                'HIGH',
-                f'ESTRÉS CRÍTICO: Nivel de estrés muy alto detectado ({stress_score:.1f}/100). '
-                f'El oficial está bajo estrés severo que puede afectar su desempeño y salud.',
-                'Monitorear de cerca al oficial. Considerar rotación de tareas o descanso. '
-                'Evaluar factores estresantes en el entorno.'
-            )
-        
-        # CASO 5: Alto riesgo de estrés
-        if stress_score >= self.thresholds['stress_high']:
-            return (
-                'STRESS_HIGH_RISK',
-                'HIGH',
-                f'ALTO RIESGO DE ESTRÉS: Score de estrés elevado ({stress_score:.1f}/100). '
-                f'Nivel: {stress_level}. Requiere atención preventiva.',
-                'Verificar estado del oficial. Considerar intervención preventiva. '
-                'Revisar carga de trabajo actual.'
-            )
-        
-        # CASO 6: HR anormalmente alta (pero no crítica)
-        if hr > self.thresholds['hr_warning_high']:
-            return (
-                'HR_ABNORMALLY_HIGH',
-                'HIGH',
-                f'FRECUENCIA CARDÍACA ANORMALMENTE ALTA: {hr:.0f} bpm. '
-                f'Por encima del umbral de advertencia ({self.thresholds["hr_warning_high"]} bpm).',
-                'Verificar si el oficial está en actividad física intensa. '
-                'Si está en reposo, evaluar posible estrés o problema de salud.'
-            )
-        
-        # CASO 7: HR anormalmente baja (pero no crítica)
-        if hr < self.thresholds['hr_warning_low']:
-            return (
-                'HR_ABNORMALLY_LOW',
-                'HIGH',
-                f'FRECUENCIA CARDÍACA ANORMALMENTE BAJA: {hr:.0f} bpm. '
-                f'Por debajo del umbral de advertencia ({self.thresholds["hr_warning_low"]} bpm).',
-                'Verificar estado del oficial. Confirmar que el sensor funciona correctamente. '
-                'Evaluar si hay síntomas asociados (mareo, fatiga).'
-            )
-        
-        # ===== CASOS MODERADOS =====
-        
-        # CASO 8: Estrés moderado-alto
-        if stress_score >= self.thresholds['stress_medium']:
-            return (
-                'STRESS_ELEVATED',
-                'MEDIUM',
-                f'ESTRÉS ELEVADO: Nivel de estrés moderado-alto ({stress_score:.1f}/100). '
-                f'Nivel: {stress_level}.',
-                'Monitorear evolución del estrés. Si persiste, considerar medidas preventivas. '
-                'Mantener comunicación con el oficial.'
-            )
-        
-        # CASO 9: HR elevada sostenida
-        if metadata.get('hr_elevated_sustained', 0) == 1:
-            return (
-                'HR_SUSTAINED_ELEVATED',
-                'MEDIUM',
-                f'FRECUENCIA CARDÍACA ELEVADA SOSTENIDA: {hr:.0f} bpm mantenida por período prolongado. '
-                f'Puede indicar estrés continuo.',
-                'Verificar duración del episodio. Evaluar si es por actividad física o estrés. '
-                'Considerar descanso si es prolongado.'
-            )
-        
-        # CASO 10: Cambios rápidos en HR (estrés agudo)
-        rapid_changes = metadata.get('hr_rapid_changes', 0)
-        if rapid_changes >= 3:
-            return (
-                'HR_RAPID_FLUCTUATION',
-                'MEDIUM',
-                f'FLUCTUACIONES RÁPIDAS EN HR: {rapid_changes} cambios bruscos detectados. '
-                f'Puede indicar estrés agudo o situación de alta demanda.',
-                'Observar contexto del oficial. Verificar si está en situación de alto estrés. '
-                'Confirmar estabilidad emocional.'
-            )
-        
-        # CASO 11: Anomalía detectada por ML
-        if is_anomaly and alert_probability > self.thresholds['anomaly_threshold']:
-            return (
-                'ANOMALY_DETECTED',
-                'MEDIUM',
-                f'ANOMALÍA DETECTADA: Patrón cardíaco inusual identificado por ML. '
-                f'Probabilidad de alerta: {alert_probability:.1%}.',
-                'Revisar patrón de HR del oficial. Comparar con su historial normal. '
-                'Verificar bienestar general.'
-            )
-        
-        # CASO 12: Alerta general por modelo ML
-        if alert_probability > 0.7:
-            return (
-                'ML_PREDICTION_ALERT',
-                'MEDIUM',
-                f'ALERTA PREDICTIVA: El modelo ML ha detectado un patrón que requiere atención. '
-                f'Probabilidad: {alert_probability:.1%}. HR: {hr:.0f} bpm, Estrés: {stress_score:.1f}/100.',
-                'Revisar contexto completo del oficial. Evaluar métricas adicionales. '
-                'Mantener observación.'
-            )
+        for alert_type, severity, conditions in self._rules:
+            for column, compare, limit in conditions:
+                if not compare(values[column], limit):
+                    break
+            else:
+                return alert_type, severity
         
         # Si llegamos aquí, no hay clasificación específica
-        return None, None, None, None
+        return None, None
+    
+    def classify_batch(self, columns: Mapping[str, Any], mask=None) -> Tuple[Any, Any]:
+        """
+        Clasifica un lote completo con la tabla de reglas compilada.
+        
+        Evalúa cada regla una vez sobre todas las filas y elige la primera
+        que se cumple con `np.select`; no construye mensajes (ver
+        `build_alert` para las filas que se guardan).
+        
+        Args:
+            columns: Arrays (n,) de `HealthMonitorML.predict_columns()`
+                     (heart_rate, stress_score, alert_probability, is_anomaly,
+                     hr_elevated_sustained, hr_rapid_changes)
+            mask: Array bool opcional (n,) con las filas a clasificar (por
+                  defecto, `columns['requires_alert']`)
+        
+        Returns:
+            tuple: (alert_type_code, severity_code) como arrays int8; códigos
+            de ALERT_TYPES (0 = sin alerta) y SEVERITY_LEVELS (-1 = sin alerta)
+        """
+        import numpy as np
+        
+        rules = self._rules
+        if mask is None:
+            mask = columns['requires_alert']
+        mask = np.asarray(mask, dtype=bool)
+        
+        matches = []
+        for _, _, conditions in rules:
+            matched = mask
+            for column, compare, limit in conditions:
+                matched = matched & compare(np.asarray(columns[column]), limit)
+            matches.append(matched)
+        
+        # Índice de la regla ganadora (0 = ninguna) y tablas de códigos
+        rule_index = np.select(matches, np.arange(1, len(rules) + 1), 0)
+        type_codes = np.array(
+            [0] + [ALERT_TYPE_CODES[alert_type] for alert_type, _, _ in rules],
+            dtype=np.int8
+        )
+        severity_codes = np.array(
+            [-1] + [SEVERITY_CODES[severity] for _, severity, _ in rules],
+            dtype=np.int8
+        )
+        
+        return type_codes[rule_index], severity_codes[rule_index]
+    
+    def build_alert(self,
+                    prediction_result: PredictionResult,
+                    user_id: int,
+                    alert_type: str,
+                    severity: str,
+                    timestamp: Optional[str] = None,
+                    suppressed_count: int = 0) -> AlertPayload:
+        """
+        Construye el payload de una alerta ya clasificada (p. ej. por
+        `classify_batch`) y admitida por `admit()`. El mensaje no se
+        formatea aquí sino al leerlo.
+        """
+        template = self._templates.get((alert_type, severity))
+        if template is None:
+            template = self._template(alert_type, severity)
+        
+        # El payload referencia la predicción, no la copia
+        return AlertPayload(
+            prediction=prediction_result,
+            user_id=user_id,
+            alert_type=alert_type,
+            severity=severity,
+            template=template,
+            timestamp=timestamp,
+            suppressed_count=suppressed_count
+        )
+    
+    def _template(self, alert_type: str, severity: str) -> AlertTemplate:
+        """
+        Crea (y cachea) la plantilla de un tipo de alerta con los umbrales
+        vigentes ya sustituidos.
+        """
+        message_format, action_required = ALERT_MESSAGES[alert_type]
+        template = AlertTemplate(
+            template_id=alert_type,
+            severity=severity,
+            message_format=message_format.format_map(_ThresholdsOnly(self.thresholds)),
+            action_required=action_required
+        )
+        self._templates[(alert_type, severity)] = template
+        return template
     
     def get_alert_summary(self, alerts: list) -> Dict[str, Any]:
         """
@@ -346,14 +493,17 @@ class AlertGenerator:
     
     def update_thresholds(self, new_thresholds: Dict[str, float]):
         """
-        Actualiza los umbrales del generador de alertas.
-        Útil para ajustar sensibilidad del sistema.
+        Actualiza los umbrales del generador de alertas y recompila la
+        tabla de reglas. Útil para ajustar sensibilidad del sistema.
         
         Args:
             new_thresholds: Dict con nuevos valores de umbrales
         """
         self.thresholds.update(new_thresholds)
-        print(f"Umbrales actualizados: {new_thresholds}")
+        self._rules = compile_rules(self.thresholds)
+        # Las alertas ya emitidas conservan su plantilla (y sus umbrales)
+        self._templates = {}
+        logger.info("Umbrales actualizados: %s", new_thresholds)
 
 
 # Ejemplo de uso y testing
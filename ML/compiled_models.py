@@ -0,0 +1,409 @@
+"""
+Compiled Models for Artemis Health Monitoring System
+=====================================================
+
+Versión "compilada" de los modelos sklearn, evaluada solo con NumPy.
+
+`compile_models()` lee los .pkl entrenados (requiere sklearn) y vuelca
+scalers, Random Forest e Isolation Forest a arrays planos en
+`model_compiled.npz`. En producción `HealthMonitorML` carga ese archivo con
+`load_compiled_models()` y nunca importa sklearn: cargar un .npz toma
+milisegundos, mientras que deserializar los .pkl obliga a importar sklearn
+y scipy (más de un segundo en frío).
+
+El .npz guarda el SHA-256 de cada .pkl de origen. Al cargar,
+`stale_sources()` los compara con los .pkl presentes (unos 3 ms); si alguno
+cambió desde la última compilación `HealthMonitorML` descarta el .npz y
+usa sklearn, con un aviso en el log.
+
+Los evaluadores replican exactamente la aritmética de sklearn:
+- Árboles: X se convierte a float32 y se compara `x <= threshold` (float64).
+- Random Forest: promedio de la probabilidad normalizada de cada hoja.
+- Isolation Forest: `2 ** (-profundidad_media / c(max_samples)) - offset_`.
+
+Regenerar después de reentrenar:
+    python compiled_models.py            # escribe model_compiled.npz
+    python compiled_models.py --check    # compara contra sklearn
+"""
+
+import hashlib
+import pickle
+import warnings
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+COMPILED_FILENAME = 'model_compiled.npz'
+FORMAT_VERSION = 1
+
+SOURCE_FILES = (
+    'model_isolation_forest.pkl',
+    'model_random_forest.pkl',
+    'model_scaler.pkl',
+    'model_scaler_rf.pkl',
+)
+
+
+def _sum_trees(per_tree: np.ndarray) -> np.ndarray:
+    """
+    Suma (n_trees, n) a lo largo de los árboles, árbol a árbol.
+
+    sklearn acumula una salida por árbol en orden; `ndarray.sum` usa suma
+    por pares cuando n == 1 y secuencial cuando n > 1, así que una lectura
+    sola y la misma lectura dentro de un lote podrían diferir en el último
+    bit. `cumsum` es siempre secuencial.
+    """
+    return np.cumsum(per_tree, axis=0)[-1]
+
+
+class CompiledStandardScaler:
+    """Equivalente a `StandardScaler.transform` con media y escala fijas."""
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+
+class _CompiledTreeEnsemble:
+    """
+    Conjunto de árboles binarios empaquetado en arrays (n_trees, max_nodes).
+
+    Las hojas apuntan a sí mismas (left == right == nodo), así que basta con
+    iterar `max_depth` veces para que todas las filas lleguen a su hoja.
+    """
+
+    def __init__(self, left: np.ndarray, right: np.ndarray,
+                 feature: np.ndarray, threshold: np.ndarray, max_depth: int):
+        n_trees, max_nodes = left.shape
+        offsets = (np.arange(n_trees, dtype=np.intp) * max_nodes)[:, None]
+        # Índices absolutos en los arrays aplanados
+        self._left = (left + offsets).ravel()
+        self._right = (right + offsets).ravel()
+        self._feature = feature.ravel()
+        self._threshold = threshold.ravel()
+        self._offsets = offsets
+        self._max_depth = int(max_depth)
+        self.n_trees = n_trees
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Índice (aplanado) de la hoja de cada fila en cada árbol: (n_trees, n)."""
+        X32 = np.asarray(X, dtype=np.float32)
+        n_samples = X32.shape[0]
+        rows = np.arange(n_samples, dtype=np.intp)[None, :]
+        nodes = np.broadcast_to(self._offsets, (self.n_trees, n_samples))
+        for _ in range(self._max_depth):
+            go_left = X32[rows, self._feature[nodes]] <= self._threshold[nodes]
+            nodes = np.where(go_left, self._left[nodes], self._right[nodes])
+        return nodes
+
+
+class CompiledRandomForest(_CompiledTreeEnsemble):
+    """Equivalente a `RandomForestClassifier` binario (clases 0/1)."""
+
+    def __init__(self, proba: np.ndarray, **tree_arrays):
+        super().__init__(**tree_arrays)
+        # proba: (n_trees, max_nodes, 2) probabilidad normalizada por hoja
+        self._proba0 = proba[:, :, 0].ravel()
+        self._proba1 = proba[:, :, 1].ravel()
+        self.classes_ = np.array([0, 1])
+
+    def _accumulate(self, X: np.ndarray):
+        leaves = self.apply(X)
+        p0 = _sum_trees(self._proba0[leaves]) / self.n_trees
+        p1 = _sum_trees(self._proba1[leaves]) / self.n_trees
+        return p0, p1
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        p0, p1 = self._accumulate(X)
+        return np.column_stack((p0, p1))
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        p0, p1 = self._accumulate(X)
+        return (p1 > p0).astype(np.int64)
+
+
+class CompiledIsolationForest(_CompiledTreeEnsemble):
+    """Equivalente a `IsolationForest.decision_function` / `predict`."""
+
+    def __init__(self, path_length: np.ndarray, offset: float,
+                 denominator: float, **tree_arrays):
+        super().__init__(**tree_arrays)
+        # path_length: profundidad de la hoja + c(n_samples_hoja) - 1
+        self._path_length = path_length.ravel()
+        self.offset_ = float(offset)
+        self._denominator = float(denominator)
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        depths = _sum_trees(self._path_length[self.apply(X)])
+        if self._denominator == 0:
+            # Igual que sklearn: con una sola muestra de entrenamiento el score es 2 ** -1
+            return -np.full_like(depths, 0.5)
+        return -(2 ** (-depths / self._denominator))
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        decision = self.decision_function(X)
+        return np.where(decision < 0, -1, 1)
+
+
+def load_compiled_models(path: Path) -> Dict[str, Any]:
+    """
+    Carga `model_compiled.npz` y construye los evaluadores NumPy.
+
+    Returns:
+        Dict con 'scaler', 'scaler_rf', 'random_forest', 'isolation_forest'
+    """
+    with np.load(path, allow_pickle=False) as data:
+        if int(data['format_version']) != FORMAT_VERSION:
+            raise ValueError(
+                f"Versión de {path.name} no soportada: {int(data['format_version'])}"
+            )
+
+        def trees(prefix):
+            return {
+                'left': data[f'{prefix}_left'],
+                'right': data[f'{prefix}_right'],
+                'feature': data[f'{prefix}_feature'],
+                'threshold': data[f'{prefix}_threshold'],
+                'max_depth': int(data[f'{prefix}_max_depth']),
+            }
+
+        return {
+            'scaler': CompiledStandardScaler(data['scaler_mean'], data['scaler_scale']),
+            'scaler_rf': CompiledStandardScaler(data['scaler_rf_mean'], data['scaler_rf_scale']),
+            'random_forest': CompiledRandomForest(proba=data['rf_proba'], **trees('rf')),
+            'isolation_forest': CompiledIsolationForest(
+                path_length=data['if_path_length'],
+                offset=float(data['if_offset']),
+                denominator=float(data['if_denominator']),
+                **trees('if')
+            ),
+        }
+
+
+def stale_sources(path: Path, model_dir: Optional[Path] = None) -> List[str]:
+    """
+    .pkl de origen cuyo contenido ya no coincide con la huella guardada en `path`.
+
+    Un .pkl ausente no cuenta como desactualizado (el .npz puede
+    desplegarse solo); una huella ausente sí.
+
+    Returns:
+        Nombres de los .pkl desactualizados (vacía si el .npz está al día)
+    """
+    model_dir = Path(model_dir) if model_dir else path.parent
+    stale = []
+    with np.load(path, allow_pickle=False) as data:
+        for name in SOURCE_FILES:
+            source = model_dir / name
+            if not source.exists():
+                continue
+            key = f'source_{Path(name).stem}'
+            if key not in data.files or str(data[key]) != _file_digest(source):
+                stale.append(name)
+    return stale
+
+
+def _pack_trees(estimators, features_per_tree=None) -> Dict[str, np.ndarray]:
+    """Empaqueta los `tree_` de sklearn en arrays (n_trees, max_nodes)."""
+    n_trees = len(estimators)
+    max_nodes = max(est.tree_.node_count for est in estimators)
+
+    left = np.zeros((n_trees, max_nodes), dtype=np.intp)
+    right = np.zeros((n_trees, max_nodes), dtype=np.intp)
+    feature = np.zeros((n_trees, max_nodes), dtype=np.intp)
+    threshold = np.zeros((n_trees, max_nodes), dtype=np.float64)
+    max_depth = 0
+
+    for t, est in enumerate(estimators):
+        tree = est.tree_
+        n = tree.node_count
+        nodes = np.arange(n)
+        is_leaf = tree.children_left == -1
+
+        left[t, :n] = np.where(is_leaf, nodes, tree.children_left)
+        right[t, :n] = np.where(is_leaf, nodes, tree.children_right)
+        # En hojas la feature es irrelevante (-2 en sklearn); usar 0
+        tree_features = np.where(is_leaf, 0, tree.feature)
+        if features_per_tree is not None:
+            tree_features = np.asarray(features_per_tree[t])[tree_features]
+        feature[t, :n] = tree_features
+        threshold[t, :n] = tree.threshold
+        max_depth = max(max_depth, tree.max_depth)
+
+    return {
+        'left': left,
+        'right': right,
+        'feature': feature,
+        'threshold': threshold,
+        'max_depth': np.array(max_depth),
+    }
+
+
+def _file_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _load_pickle(path: Path):
+    # Los .pkl pueden venir de otra versión de sklearn; silenciar solo aquí
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+def compile_models(model_dir: Optional[str] = None,
+                   output: Optional[str] = None) -> Path:
+    """
+    Convierte los modelos .pkl de `model_dir` en `model_compiled.npz`.
+
+    Requiere sklearn (solo en este paso, no en producción).
+
+    Returns:
+        Ruta del archivo generado
+    """
+    from sklearn.ensemble._iforest import _average_path_length
+
+    model_dir = Path(model_dir) if model_dir else Path(__file__).parent
+    output = Path(output) if output else model_dir / COMPILED_FILENAME
+
+    iforest = _load_pickle(model_dir / 'model_isolation_forest.pkl')
+    forest = _load_pickle(model_dir / 'model_random_forest.pkl')
+    scaler = _load_pickle(model_dir / 'model_scaler.pkl')
+    scaler_rf = _load_pickle(model_dir / 'model_scaler_rf.pkl')
+
+    if list(forest.classes_) != [0, 1]:
+        raise ValueError(f"Random Forest debe ser binario (0/1), clases: {forest.classes_}")
+
+    arrays = {
+        'format_version': np.array(FORMAT_VERSION),
+        'scaler_mean': scaler.mean_,
+        'scaler_scale': scaler.scale_,
+        'scaler_rf_mean': scaler_rf.mean_,
+        'scaler_rf_scale': scaler_rf.scale_,
+    }
+
+    # Random Forest: probabilidad por nodo (como DecisionTree.predict_proba)
+    rf_trees = _pack_trees(forest.estimators_)
+    n_trees, max_nodes = rf_trees['left'].shape
+    rf_proba = np.zeros((n_trees, max_nodes, 2), dtype=np.float64)
+    for t, est in enumerate(forest.estimators_):
+        value = est.tree_.value[:, 0, :2].copy()
+        normalizer = value.sum(axis=1)
+        # sklearn >= 1.4 ya guarda fracciones y las devuelve tal cual;
+        # renormalizarlas cambiaría el último bit. Versiones previas
+        # guardaban conteos.
+        if not np.allclose(normalizer[normalizer > 0], 1.0):
+            normalizer[normalizer == 0.0] = 1.0
+            value /= normalizer[:, None]
+        rf_proba[t, :est.tree_.node_count] = value
+    arrays.update({f'rf_{key}': val for key, val in rf_trees.items()})
+    arrays['rf_proba'] = rf_proba
+
+    # Isolation Forest: longitud de camino por nodo ya combinada
+    if_trees = _pack_trees(iforest.estimators_, iforest.estimators_features_)
+    n_trees, max_nodes = if_trees['left'].shape
+    path_length = np.zeros((n_trees, max_nodes), dtype=np.float64)
+    for t, est in enumerate(iforest.estimators_):
+        n = est.tree_.node_count
+        path_length[t, :n] = (
+            iforest._decision_path_lengths[t]
+            + iforest._average_path_length_per_tree[t]
+            - 1.0
+        )
+    arrays.update({f'if_{key}': val for key, val in if_trees.items()})
+    arrays['if_path_length'] = path_length
+    arrays['if_offset'] = np.array(iforest.offset_)
+    arrays['if_denominator'] = np.array(
+        len(iforest.estimators_) * _average_path_length([iforest._max_samples])[0]
+    )
+
+    # Huella de los .pkl de origen, para detectar archivos desactualizados
+    for name in SOURCE_FILES:
+        arrays[f'source_{Path(name).stem}'] = np.array(_file_digest(model_dir / name))
+
+    np.savez_compressed(output, **arrays)
+    return output
+
+
+def check_compiled_models(model_dir: Optional[str] = None,
+                          n_samples: int = 5000,
+                          seed: int = 0) -> Dict[str, Any]:
+    """
+    Compara los modelos compilados contra sklearn sobre datos aleatorios.
+
+    Returns:
+        Dict con diferencias máximas y desacuerdos de clasificación
+    """
+    model_dir = Path(model_dir) if model_dir else Path(__file__).parent
+    compiled = load_compiled_models(model_dir / COMPILED_FILENAME)
+
+    stale = stale_sources(model_dir / COMPILED_FILENAME, model_dir)
+
+    scaler = _load_pickle(model_dir / 'model_scaler.pkl')
+    scaler_rf = _load_pickle(model_dir / 'model_scaler_rf.pkl')
+    forest = _load_pickle(model_dir / 'model_random_forest.pkl')
+    iforest = _load_pickle(model_dir / 'model_isolation_forest.pkl')
+    # Con n_jobs != 1 sklearn suma los árboles en orden de finalización de
+    # los hilos y el último bit no es determinista; comparar en orden
+    forest.n_jobs = 1
+
+    rng = np.random.default_rng(seed)
+    n_features = len(scaler.mean_)
+    X = scaler.mean_ + rng.standard_normal((n_samples, n_features)) * scaler.scale_ * 2
+
+    X_s = scaler.transform(X) if not hasattr(scaler, 'feature_names_in_') else \
+        scaler.transform(_as_frame(X, scaler.feature_names_in_))
+    X_rf = scaler_rf.transform(X) if not hasattr(scaler_rf, 'feature_names_in_') else \
+        scaler_rf.transform(_as_frame(X, scaler_rf.feature_names_in_))
+
+    c_s = compiled['scaler'].transform(X)
+    c_rf = compiled['scaler_rf'].transform(X)
+
+    return {
+        'stale_sources': stale,
+        'scaler_max_abs_diff': float(np.max(np.abs(c_s - X_s))),
+        'scaler_rf_max_abs_diff': float(np.max(np.abs(c_rf - X_rf))),
+        'rf_proba_max_abs_diff': float(np.max(np.abs(
+            compiled['random_forest'].predict_proba(X_rf) - forest.predict_proba(X_rf)))),
+        'rf_predict_mismatches': int(np.sum(
+            compiled['random_forest'].predict(X_rf) != forest.predict(X_rf))),
+        'if_decision_max_abs_diff': float(np.max(np.abs(
+            compiled['isolation_forest'].decision_function(X_s)
+            - iforest.decision_function(X_s)))),
+        'if_predict_mismatches': int(np.sum(
+            compiled['isolation_forest'].predict(X_s) != iforest.predict(X_s))),
+    }
+
+
+def _as_frame(X: np.ndarray, columns):
+    import pandas as pd
+    return pd.DataFrame(X, columns=columns)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Compila los modelos .pkl a NumPy (.npz)')
+    parser.add_argument('--model-dir', default=None, help='Directorio de los .pkl')
+    parser.add_argument('--check', action='store_true',
+                        help='No compilar; comparar el .npz existente contra sklearn')
+    args = parser.parse_args()
+
+    if args.check:
+        report = check_compiled_models(args.model_dir)
+        print(json.dumps(report, indent=2))
+        ok = (not report['stale_sources']
+              and report['rf_predict_mismatches'] == 0
+              and report['if_predict_mismatches'] == 0)
+        raise SystemExit(0 if ok else 1)
+
+    path = compile_models(args.model_dir)
+    print(f"Modelos compilados en: {path}")
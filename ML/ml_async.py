@@ -0,0 +1,333 @@
+"""
+Async ML Health Monitoring Service for Artemis
+===============================================
+
+Fachada asyncio sobre `MLHealthMonitoringService` para vistas async de Django.
+
+La inferencia es trabajo de CPU (NumPy); llamarla directamente desde una
+corrutina bloquearía el event loop y con él todas las conexiones abiertas
+del worker. Esta fachada la delega a un pool de hilos acotado:
+
+- Límite de concurrencia configurable (`max_concurrency`): como mucho esa
+  cantidad de inferencias corre a la vez; el resto espera sin bloquear el loop.
+- Cancelación: si la corrutina que espera se cancela antes de que su trabajo
+  empiece, el trabajo no se ejecuta; si ya empezó, termina en segundo plano
+  (sin liberar su cupo hasta entonces) y su resultado se descarta.
+- Agrupación opcional (`coalesce=True`): las llamadas concurrentes a
+  `analyze_biometric_data()` se juntan durante `batch_window_ms` (o hasta
+  `max_batch_size`) y se evalúan en un solo `analyze_columns()` vectorizado.
+  Cada llamada recibe el mismo resultado que daría la versión síncrona.
+
+Uso desde una vista async:
+    from ml_async import async_ml_service
+
+    result = await async_ml_service.analyze_biometric_data(
+        heart_rate=140,
+        user_id=123,
+        recent_hrs=[...]
+    )
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from ml_service import MLHealthMonitoringService, ml_service
+
+logger = logging.getLogger(__name__)
+
+
+class _LoopState:
+    """Estado ligado a un event loop (los primitivos asyncio no se comparten)"""
+
+    __slots__ = ('loop', 'semaphore', 'pending', 'flush_handle', 'tasks')
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_concurrency: int):
+        self.loop = loop
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.pending = []
+        self.flush_handle = None
+        self.tasks = set()
+
+
+class _PendingReading:
+    """Lectura esperando a ser agrupada en un lote"""
+
+    __slots__ = ('heart_rate', 'user_id', 'recent_hrs', 'timestamp', 'future')
+
+    def __init__(self, heart_rate, user_id, recent_hrs, timestamp, future):
+        self.heart_rate = heart_rate
+        self.user_id = user_id
+        self.recent_hrs = recent_hrs
+        self.timestamp = timestamp
+        self.future = future
+
+
+class AsyncMLHealthMonitoringService:
+    """
+    API de corrutinas sobre el servicio ML síncrono.
+
+    Comparte el singleton `ml_service` (modelos y estadísticas) salvo que se
+    pase otro servicio.
+    """
+
+    def __init__(self,
+                 service: Optional[MLHealthMonitoringService] = None,
+                 max_concurrency: Optional[int] = None,
+                 coalesce: bool = False,
+                 max_batch_size: int = 256,
+                 batch_window_ms: float = 2.0):
+        """
+        Args:
+            service: Servicio síncrono a usar (por defecto, `ml_service`)
+            max_concurrency: Inferencias simultáneas como máximo (por
+                             defecto, min(4, núcleos)); también es el
+                             tamaño del pool de hilos
+            coalesce: Agrupar llamadas concurrentes en lotes vectorizados
+            max_batch_size: Tamaño con el que un lote se evalúa sin esperar
+            batch_window_ms: Cuánto espera la primera lectura de un lote a
+                             que lleguen otras
+        """
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency debe ser al menos 1")
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size debe ser al menos 1")
+
+        self.service = service or ml_service
+        self.max_concurrency = max_concurrency or min(4, os.cpu_count() or 1)
+        self.coalesce = coalesce
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window_ms / 1000.0
+
+        # El pool se crea en el primer uso para que importar sea barato
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._loop_states = weakref.WeakKeyDictionary()
+
+    # ------------------------------------------------------------------
+    # Infraestructura
+    # ------------------------------------------------------------------
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Pool de hilos de inferencia (se crea en el primer acceso)"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_concurrency,
+                        thread_name_prefix='artemis-ml'
+                    )
+        return self._executor
+
+    def _loop_state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._loop_states.get(loop)
+        if state is None:
+            state = _LoopState(loop, self.max_concurrency)
+            self._loop_states[loop] = state
+        return state
+
+    async def _run(self, func, *args, **kwargs):
+        """
+        Ejecuta `func` en el pool respetando el límite de concurrencia.
+
+        El cupo se libera cuando el trabajo termina en el hilo, no cuando
+        la corrutina deja de esperar: una llamada cancelada a mitad de
+        inferencia sigue contando hasta que acaba.
+        """
+        state = self._loop_state()
+        await state.semaphore.acquire()
+        try:
+            job = self.executor.submit(func, *args, **kwargs)
+        except BaseException:
+            state.semaphore.release()
+            raise
+
+        def release(_job, state=state):
+            try:
+                state.loop.call_soon_threadsafe(state.semaphore.release)
+            except RuntimeError:
+                # El loop ya se cerró; no queda nadie esperando el cupo
+                pass
+
+        job.add_done_callback(release)
+        return await asyncio.wrap_future(job)
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    async def warm_up(self) -> 'AsyncMLHealthMonitoringService':
+        """Carga los modelos en el pool sin bloquear el loop"""
+        await self._run(self.service.warm_up)
+        return self
+
+    async def analyze_biometric_data(self,
+                                     heart_rate: float,
+                                     user_id: int,
+                                     recent_hrs: Optional[List[float]] = None,
+                                     timestamp: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Versión async de `MLHealthMonitoringService.analyze_biometric_data()`.
+
+        Devuelve el mismo dict y lanza los mismos ValueError.
+        """
+        if not self.coalesce:
+            return await self._run(
+                self.service.analyze_biometric_data,
+                heart_rate=heart_rate,
+                user_id=user_id,
+                recent_hrs=recent_hrs,
+                timestamp=timestamp
+            )
+
+        # Validar antes de encolar para que un dato inválido falle solo
+        self.service.validate_reading(heart_rate, user_id)
+
+        state = self._loop_state()
+        future = state.loop.create_future()
+        state.pending.append(
+            _PendingReading(heart_rate, user_id, recent_hrs, timestamp, future)
+        )
+
+        if len(state.pending) >= self.max_batch_size:
+            self._flush(state)
+        elif state.flush_handle is None:
+            state.flush_handle = state.loop.call_later(
+                self.batch_window, self._flush, state
+            )
+
+        return await future
+
+    async def analyze_columns(self, user_ids, heart_rates, windows=None,
+                              timestamps=None, lengths=None,
+                              with_predictions: bool = False,
+                              with_alerts: bool = True) -> Dict[str, Any]:
+        """Versión async de `MLHealthMonitoringService.analyze_columns()`"""
+        return await self._run(
+            self.service.analyze_columns,
+            user_ids, heart_rates, windows, timestamps, lengths,
+            with_predictions=with_predictions,
+            with_alerts=with_alerts
+        )
+
+    async def batch_analyze(self,
+                            data_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Versión async de `MLHealthMonitoringService.batch_analyze()`"""
+        return await self._run(self.service.batch_analyze, data_list)
+
+    def revoke_alerts(self, alerts):
+        """Ver `MLHealthMonitoringService.revoke_alerts()` (no bloquea)"""
+        self.service.revoke_alerts(alerts)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Estadísticas del servicio síncrono subyacente"""
+        return self.service.get_statistics()
+
+    def shutdown(self, wait: bool = True):
+        """
+        Cierra el pool de hilos. Los trabajos que aún no empezaron se cancelan.
+
+        Un uso posterior crea un pool nuevo.
+        """
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    # ------------------------------------------------------------------
+    # Agrupación de llamadas concurrentes
+    # ------------------------------------------------------------------
+
+    def _flush(self, state: _LoopState):
+        """Saca las lecturas pendientes y lanza su evaluación como lote"""
+        if state.flush_handle is not None:
+            state.flush_handle.cancel()
+            state.flush_handle = None
+
+        batch, state.pending = state.pending, []
+        # Las llamadas canceladas mientras esperaban no se evalúan
+        batch = [item for item in batch if not item.future.done()]
+        if not batch:
+            return
+
+        task = state.loop.create_task(self._score_batch(batch))
+        state.tasks.add(task)
+        task.add_done_callback(state.tasks.discard)
+
+    async def _score_batch(self, batch: List[_PendingReading]):
+        try:
+            outcomes = await self._run(self._analyze_batch, batch)
+        except asyncio.CancelledError:
+            for item in batch:
+                item.future.cancel()
+            raise
+        except Exception as e:
+            logger.exception("Error evaluando lote de %d lecturas", len(batch))
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        for item, outcome in zip(batch, outcomes):
+            if item.future.done():
+                continue
+            if isinstance(outcome, Exception):
+                item.future.set_exception(outcome)
+            else:
+                item.future.set_result(outcome)
+
+    def _analyze_batch(self, batch: List[_PendingReading]) -> list:
+        """
+        Evalúa un lote con `analyze_columns()` (corre en el pool).
+
+        Returns:
+            Lista alineada con `batch` con el dict de resultado de cada
+            lectura o el ValueError que habría lanzado la versión síncrona
+        """
+        import numpy as np
+
+        n = len(batch)
+        heart_rates = np.array([item.heart_rate for item in batch], dtype=np.float64)
+        user_ids = np.array([item.user_id for item in batch], dtype=np.int64)
+
+        # Solo cuentan los últimos 10 valores de cada historial
+        histories = [list(item.recent_hrs or ())[-10:] for item in batch]
+        lengths = np.array([len(history) for history in histories], dtype=np.intp)
+        windows = np.zeros((n, max(int(lengths.max()), 1)), dtype=np.float64)
+        for row, history in enumerate(histories):
+            windows[row, :len(history)] = history
+
+        result = self.service.analyze_columns(
+            user_ids, heart_rates, windows,
+            timestamps=[item.timestamp for item in batch],
+            lengths=lengths,
+            with_predictions=True
+        )
+
+        alerts = dict(zip(result['alert_rows'].tolist(), result['alerts']))
+        outcomes = []
+        for row, item in enumerate(batch):
+            prediction = result['predictions'][row]
+            if prediction is None:
+                outcomes.append(ValueError(
+                    f"heart_rate fuera de rango médico válido: {item.heart_rate}"
+                ))
+                continue
+            outcomes.append(self.service.build_result(
+                prediction,
+                alerts.get(row),
+                bool(result['should_notify'][row]),
+                item.timestamp
+            ))
+
+        return outcomes
+
+
+# Instancia por defecto (comparte modelos y estadísticas con ml_service)
+async_ml_service = AsyncMLHealthMonitoringService()
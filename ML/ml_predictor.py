@@ -23,7 +23,7 @@ Uso desde Django:
     predictor = HealthMonitorML()
     result = predictor.predict(heart_rate=120)
     
-    # result contiene:
+    # result es un PredictionResult que se lee como dict:
     # {
     #     'requires_alert': True/False,
     #     'stress_score': 0-100,
@@ -36,13 +36,30 @@ Uso desde Django:
     # }
 """
 
+import logging
 import pickle
 import numpy as np
-import pandas as pd
 from pathlib import Path
 from typing import Dict, Any, Optional
 import warnings
-warnings.filterwarnings('ignore')
+
+from compiled_models import (
+    COMPILED_FILENAME, CompiledStandardScaler, load_compiled_models, stale_sources
+)
+from ml_results import PredictionResult, SEVERITY_CODES, SEVERITY_LEVELS
+
+logger = logging.getLogger(__name__)
+
+# Número de lecturas de historial que usan las rolling features
+HR_WINDOW = 10
+
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray,
+                 default: float) -> np.ndarray:
+    """numerator / denominator donde denominator > 0, `default` en el resto"""
+    return np.divide(numerator, denominator,
+                     out=np.full(numerator.shape, default),
+                     where=denominator > 0)
 
 
 class HealthMonitorML:
@@ -53,13 +70,16 @@ class HealthMonitorML:
     para predecir riesgos y clasificar alertas basándose solo en HR.
     """
     
-    def __init__(self, model_dir: Optional[str] = None):
+    def __init__(self, model_dir: Optional[str] = None,
+                 use_compiled: bool = True):
         """
         Inicializa el predictor cargando todos los modelos.
         
         Args:
             model_dir: Directorio donde están los archivos .pkl
                       Si es None, usa el directorio actual
+            use_compiled: Si True y existe model_compiled.npz, usa los
+                         modelos compilados a NumPy (no importa sklearn)
         """
         if model_dir is None:
             model_dir = Path(__file__).parent
@@ -67,33 +87,43 @@ class HealthMonitorML:
             model_dir = Path(model_dir)
         
         self.model_dir = model_dir
-        self._load_models()
+        self._load_models(use_compiled)
         self._validate_models()
         
-        print(f"HealthMonitorML inicializado correctamente")
-        print(f"Modelos cargados desde: {self.model_dir}")
+        logger.info("HealthMonitorML inicializado desde %s (%s)",
+                    self.model_dir, self.backend)
     
-    def _load_models(self):
-        """Carga todos los modelos y configuraciones desde archivos .pkl"""
+    def _load_models(self, use_compiled: bool = True):
+        """Carga modelos y configuración (.npz compilado o .pkl de sklearn)"""
         try:
-            # Cargar modelos ML
-            with open(self.model_dir / 'model_isolation_forest.pkl', 'rb') as f:
-                self.isolation_forest = pickle.load(f)
-            
-            with open(self.model_dir / 'model_random_forest.pkl', 'rb') as f:
-                self.random_forest = pickle.load(f)
-            
-            # Cargar scalers
-            with open(self.model_dir / 'model_scaler.pkl', 'rb') as f:
-                self.scaler = pickle.load(f)
-            
-            with open(self.model_dir / 'model_scaler_rf.pkl', 'rb') as f:
-                self.scaler_rf = pickle.load(f)
-            
-            # Cargar configuración
+            # Cargar configuración (dict plano, no requiere sklearn)
             with open(self.model_dir / 'model_config.pkl', 'rb') as f:
                 self.config = pickle.load(f)
             
+            compiled_path = self.model_dir / COMPILED_FILENAME
+            stale = []
+            if use_compiled and compiled_path.exists():
+                stale = stale_sources(compiled_path)
+                if stale:
+                    # Los .pkl cambiaron (reentrenamiento) sin recompilar:
+                    # el .npz serviría el modelo anterior
+                    logger.warning(
+                        "%s desactualizado respecto a %s; usando sklearn. "
+                        "Ejecuta `python compiled_models.py` para regenerarlo.",
+                        COMPILED_FILENAME, ', '.join(stale)
+                    )
+            if use_compiled and compiled_path.exists() and not stale:
+                # Camino rápido: árboles y scalers como arrays NumPy
+                models = load_compiled_models(compiled_path)
+                self.isolation_forest = models['isolation_forest']
+                self.random_forest = models['random_forest']
+                self.scaler = models['scaler']
+                self.scaler_rf = models['scaler_rf']
+                self.backend = 'compiled'
+            else:
+                self._load_sklearn_models()
+                self.backend = 'sklearn'
+            
             # Extraer configuraciones importantes
             self.feature_columns = self.config['feature_columns']
             self.alert_labels = self.config['alert_labels']
@@ -108,6 +138,30 @@ class HealthMonitorML:
         except Exception as e:
             raise RuntimeError(f"Error cargando modelos: {str(e)}") from e
     
+    def _load_sklearn_models(self):
+        """Carga los modelos sklearn desde los .pkl (importa sklearn)"""
+        # Los .pkl pueden haberse generado con otra versión de sklearn;
+        # silenciar esas advertencias solo durante la carga
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            
+            with open(self.model_dir / 'model_isolation_forest.pkl', 'rb') as f:
+                self.isolation_forest = pickle.load(f)
+            
+            with open(self.model_dir / 'model_random_forest.pkl', 'rb') as f:
+                self.random_forest = pickle.load(f)
+            
+            with open(self.model_dir / 'model_scaler.pkl', 'rb') as f:
+                scaler = pickle.load(f)
+            
+            with open(self.model_dir / 'model_scaler_rf.pkl', 'rb') as f:
+                scaler_rf = pickle.load(f)
+        
+        # Un StandardScaler es solo media/escala; evaluarlo con NumPy evita
+        # el aviso de "feature names" de sklearn al pasarle arrays
+        self.scaler = CompiledStandardScaler(scaler.mean_, scaler.scale_)
+        self.scaler_rf = CompiledStandardScaler(scaler_rf.mean_, scaler_rf.scale_)
+    
     def _validate_models(self):
         """Valida que los modelos cargados sean correctos"""
         required_attrs = [
@@ -119,51 +173,72 @@ class HealthMonitorML:
             if not hasattr(self, attr):
                 raise ValueError(f"Falta el atributo requerido: {attr}")
     
-    def _calculate_features(self, heart_rate: float, 
-                          recent_hrs: Optional[list] = None) -> pd.DataFrame:
+    def _window_matrix(self, heart_rates: np.ndarray,
+                       windows: Optional[np.ndarray],
+                       lengths: Optional[np.ndarray]) -> tuple:
         """
-        Calcula todas las features necesarias a partir de HR.
+        Alinea a la derecha los últimos `HR_WINDOW` valores de cada ventana.
         
         Args:
-            heart_rate: Valor actual de frecuencia cardíaca (bpm)
-            recent_hrs: Lista opcional de HRs recientes para calcular
-                       rolling features. Si es None, usa valores estimados.
+            heart_rates: Array (n,) con el HR actual de cada fila
+            windows: Array (n, w) con el historial de cada fila, en orden
+                     cronológico y alineado a la izquierda (padding al final)
+            lengths: Array (n,) con cuántos valores de cada fila son válidos
         
         Returns:
-            DataFrame con todas las features calculadas
+            tuple (values, present): matriz (n, HR_WINDOW) con los valores
+            y máscara de las posiciones que vienen del historial (el resto
+            se rellena con el HR actual)
+        """
+        n = heart_rates.shape[0]
+        if windows is None or windows.shape[1] == 0:
+            values = np.repeat(heart_rates[:, None], HR_WINDOW, axis=1)
+            return values, np.zeros((n, HR_WINDOW), dtype=bool)
+        
+        # Posición en la ventana original de cada columna de la matriz
+        idx = lengths[:, None] + np.arange(-HR_WINDOW, 0)
+        present = idx >= 0
+        gathered = windows[np.arange(n)[:, None], np.maximum(idx, 0)]
+        values = np.where(present, gathered, heart_rates[:, None])
+        return values, present
+    
+    def _calculate_features(self, heart_rates: np.ndarray,
+                            hr_window: np.ndarray) -> np.ndarray:
         """
-        # Si no hay historial, usar HR actual para estimaciones
-        if recent_hrs is None or len(recent_hrs) == 0:
-            recent_hrs = [heart_rate] * 10
+        Calcula todas las features necesarias a partir de HR.
+        
+        Sin historial se usa el HR actual para estimar las rolling
+        features; con menos de 10 valores se completa a la izquierda con
+        el HR actual.
         
-        # Asegurar que tenemos suficientes valores
-        if len(recent_hrs) < 10:
-            recent_hrs = [heart_rate] * (10 - len(recent_hrs)) + list(recent_hrs)
+        Args:
+            heart_rates: Array (n,) con el HR actual de cada fila (bpm)
+            hr_window: Matriz (n, 10) de `_window_matrix`
         
-        # Convertir a array numpy
-        hr_array = np.array(recent_hrs[-10:])
+        Returns:
+            Array (n, n_features) con las features en el orden de
+            `self.feature_columns`
+        """
+        last_5 = hr_window[:, -5:]
         
         # Calcular features básicas
-        hr_mean_5 = np.mean(hr_array[-5:])
-        hr_std_5 = np.std(hr_array[-5:])
-        hr_mean_10 = np.mean(hr_array)
-        hr_diff_abs = abs(hr_array[-1] - hr_array[-2]) if len(hr_array) > 1 else 0
-        hr_median = np.median(hr_array)
+        hr_mean_5 = last_5.mean(axis=1)
+        hr_std_5 = last_5.std(axis=1)
+        hr_mean_10 = hr_window.mean(axis=1)
+        hr_diff_abs = np.abs(hr_window[:, -1] - hr_window[:, -2])
+        hr_median = np.median(hr_window, axis=1)
         
         # Calcular features de estrés
         # 1. Variabilidad de HR (HRV)
-        hr_variability = hr_std_5 / hr_mean_5 if hr_mean_5 > 0 else 0
+        hr_variability = _safe_divide(hr_std_5, hr_mean_5, 0.0)
         
         # 2. Cambios rápidos (ventana de 5)
-        hr_sudden_changes = sum(
-            1 for i in range(len(hr_array)-1) 
-            if abs(hr_array[i+1] - hr_array[i]) > 20
-        )
-        hr_rapid_changes = min(hr_sudden_changes, 5)  # Max 5 en ventana
+        hr_sudden_changes = (np.abs(np.diff(hr_window, axis=1)) > 20).sum(axis=1)
+        hr_rapid_changes = np.minimum(hr_sudden_changes, 5)  # Max 5 en ventana
         
         # 3. Score de estrés (0-100)
         # Normalizar componentes
-        hr_norm = (heart_rate - 40) / (200 - 40)  # Rango típico 40-200
+        hr_norm = (heart_rates - 40) / (200 - 40)  # Rango típico 40-200
         hr_norm = np.clip(hr_norm, 0, 1)
         
         # HRV invertido (baja variabilidad = alto estrés)
@@ -180,48 +255,55 @@ class HealthMonitorML:
         ) * 100
         
         features = {
-            'heart_rate': heart_rate,
+            'heart_rate': heart_rates,
             'hr_rolling_mean_5': hr_mean_5,
             'hr_rolling_std_5': hr_std_5,
             'hr_rolling_mean_10': hr_mean_10,
             'hr_diff_abs': hr_diff_abs,
-            'hr_ratio_to_median': heart_rate / hr_median if hr_median > 0 else 1.0,
+            'hr_ratio_to_median': _safe_divide(heart_rates, hr_median, 1.0),
             'hr_variability': hr_variability,
             'hr_rapid_changes': hr_rapid_changes,
             'stress_score': stress_score
         }
         
-        return pd.DataFrame([features])
+        return np.column_stack(
+            [features[col] for col in self.feature_columns]
+        ).astype(np.float64, copy=False)
     
-    def _calculate_stress_score(self, heart_rate: float, 
-                                recent_hrs: Optional[list] = None) -> Dict[str, Any]:
+    def _calculate_stress_score(self, heart_rates: np.ndarray,
+                                hr_window: np.ndarray,
+                                present: np.ndarray,
+                                lengths: np.ndarray) -> Dict[str, np.ndarray]:
         """
-        Calcula el score de estrés y nivel basado en HR.
+        Calcula el score de estrés y sus indicadores basados en HR.
+        
+        Con menos de 5 valores de historial se usa solo el HR actual; si
+        no, los últimos 10 valores del historial (sin relleno).
         
         Returns:
-            Dict con stress_score (0-100), stress_level, high_stress_risk
+            Dict de arrays (n,): stress_score (0-100), high_stress_risk,
+            hr_variability, hr_elevated_sustained, hr_rapid_changes
         """
-        if recent_hrs is None or len(recent_hrs) < 5:
-            recent_hrs = [heart_rate] * 10
-        
-        hr_array = np.array(recent_hrs[-10:])
+        short = lengths < 5
+        hr_window = np.where(short[:, None], heart_rates[:, None], hr_window)
+        present = present | short[:, None]
+        last_5 = hr_window[:, -5:]
         
         # Calcular indicadores de estrés
-        hr_mean_5 = np.mean(hr_array[-5:])
-        hr_std_5 = np.std(hr_array[-5:])
+        hr_mean_5 = last_5.mean(axis=1)
+        hr_std_5 = last_5.std(axis=1)
         
         # HRV (variabilidad)
-        hr_variability = hr_std_5 / hr_mean_5 if hr_mean_5 > 0 else 0
+        hr_variability = _safe_divide(hr_std_5, hr_mean_5, 0.0)
         
-        # Cambios rápidos
-        sudden_changes = sum(
-            1 for i in range(len(hr_array)-1) 
-            if abs(hr_array[i+1] - hr_array[i]) > 20
-        )
+        # Cambios rápidos (solo entre posiciones que existen en el historial)
+        sudden_changes = (
+            (np.abs(np.diff(hr_window, axis=1)) > 20) & present[:, :-1]
+        ).sum(axis=1)
         
         # === USAR LA MISMA FÓRMULA QUE _calculate_features ===
         # HR normalizada (0-1) basada en rangos normales (60-100 bpm)
-        hr_norm = np.clip((heart_rate - 60) / 40, 0, 2.5)
+        hr_norm = np.clip((heart_rates - 60) / 40, 0, 2.5)
         
         # HRV normalizada e invertida (menor HRV = más estrés)
         hrv_norm = 1 - np.clip(hr_variability * 10, 0, 1)
@@ -238,52 +320,59 @@ class HealthMonitorML:
         
         stress_score = np.clip(stress_score, 0, 100)
         
-        # Clasificar nivel de estrés
+        return {
+            'stress_score': stress_score,
+            'high_stress_risk': (stress_score > 70).astype(np.int8),
+            'hr_variability': hr_variability,
+            'hr_elevated_sustained': (
+                (heart_rates > 100) & (hr_mean_5 > 100)
+            ).astype(np.int8),
+            'hr_rapid_changes': sudden_changes
+        }
+    
+    @staticmethod
+    def _get_stress_level(stress_score: float) -> str:
+        """Clasifica el score de estrés en nivel"""
         if stress_score >= 85:
-            stress_level = 'Muy Alto'
+            return 'Muy Alto'
         elif stress_score >= 70:
-            stress_level = 'Alto'
+            return 'Alto'
         elif stress_score >= 50:
-            stress_level = 'Moderado'
+            return 'Moderado'
         elif stress_score >= 30:
-            stress_level = 'Bajo'
+            return 'Bajo'
         else:
-            stress_level = 'Muy Bajo'
-        
-        return {
-            'stress_score': float(stress_score),
-            'stress_level': stress_level,
-            'high_stress_risk': int(stress_score > 70),
-            'hr_variability': float(hr_variability),
-            'hr_elevated_sustained': int(heart_rate > 100 and hr_mean_5 > 100),
-            'hr_rapid_changes': sudden_changes
-        }
+            return 'Muy Bajo'
     
-    def _classify_severity(self, heart_rate: float, 
-                          alert_probability: float,
-                          stress_score: float) -> str:
+    def _classify_severity(self, heart_rates: np.ndarray,
+                           alert_probability: np.ndarray,
+                           stress_score: np.ndarray) -> np.ndarray:
         """
         Clasifica la severidad de la alerta.
         
         Returns:
-            'CRITICAL', 'HIGH', 'MEDIUM', o 'LOW'
+            Array (n,) con el índice en SEVERITY_LEVELS
+            ('LOW', 'MEDIUM', 'HIGH', 'CRITICAL')
         """
+        hr_thresholds = self.hr_thresholds
+        
         # Casos críticos
-        if (heart_rate < self.hr_thresholds['critical_low'] or 
-            heart_rate > self.hr_thresholds['critical_high']):
-            return 'CRITICAL'
+        critical = ((heart_rates < hr_thresholds['critical_low']) |
+                    (heart_rates > hr_thresholds['critical_high']))
         
         # Casos altos
-        if (alert_probability > 0.8 or stress_score > 85 or
-            heart_rate < self.hr_thresholds['warning_low'] or 
-            heart_rate > self.hr_thresholds['warning_high']):
-            return 'HIGH'
+        high = ((alert_probability > 0.8) | (stress_score > 85) |
+                (heart_rates < hr_thresholds['warning_low']) |
+                (heart_rates > hr_thresholds['warning_high']))
         
         # Casos medios
-        if alert_probability > 0.5 or stress_score > 50:
-            return 'MEDIUM'
+        medium = (alert_probability > 0.5) | (stress_score > 50)
         
-        return 'LOW'
+        return np.select(
+            [critical, high, medium],
+            [SEVERITY_CODES['CRITICAL'], SEVERITY_CODES['HIGH'], SEVERITY_CODES['MEDIUM']],
+            SEVERITY_CODES['LOW']
+        ).astype(np.int8)
     
     def _get_hr_zone(self, heart_rate: float) -> str:
         """Clasifica HR en zonas cardíacas"""
@@ -298,9 +387,137 @@ class HealthMonitorML:
         else:
             return 'Zone 5 (Muy Alta)'
     
+    def predict_columns(self, heart_rates,
+                        windows=None,
+                        lengths=None) -> Dict[str, np.ndarray]:
+        """
+        Predicción vectorizada para n lecturas (formato columnar).
+        
+        Calcula features, estrés y ambos modelos sobre todas las filas a
+        la vez; no construye un objeto por fila.
+        
+        Args:
+            heart_rates: Array (n,) de HR actuales (bpm)
+            windows: Array opcional (n, w) con el historial de cada fila en
+                     orden cronológico (el último valor válido es el más
+                     reciente), alineado a la izquierda
+            lengths: Array opcional (n,) con el número de valores válidos
+                     de cada fila de `windows` (por defecto, w)
+        
+        Returns:
+            Dict de arrays (n,): valid, heart_rate, requires_alert,
+            stress_score, severity_code, alert_probability, is_anomaly,
+            anomaly_score, high_stress_risk, hr_variability,
+            hr_elevated_sustained, hr_rapid_changes; y `features` (n, f).
+            Las filas con HR fuera de rango (20-300 bpm) tienen valid=False,
+            severity_code=-1 y NaN en las salidas de los modelos.
+        """
+        heart_rates = np.asarray(heart_rates, dtype=np.float64).reshape(-1)
+        n = heart_rates.shape[0]
+        
+        if windows is None:
+            lengths = np.zeros(n, dtype=np.intp)
+        else:
+            windows = np.asarray(windows, dtype=np.float64)
+            if windows.ndim != 2 or windows.shape[0] != n:
+                raise ValueError(
+                    f"windows debe tener forma ({n}, w), recibido: {windows.shape}"
+                )
+            if lengths is None:
+                lengths = np.full(n, windows.shape[1], dtype=np.intp)
+            else:
+                lengths = np.asarray(lengths, dtype=np.intp).reshape(-1)
+                if lengths.shape[0] != n:
+                    raise ValueError("lengths debe tener un valor por fila")
+                if np.any((lengths < 0) | (lengths > windows.shape[1])):
+                    raise ValueError(
+                        f"lengths debe estar entre 0 y {windows.shape[1]}"
+                    )
+        
+        # Mismo rango médico válido que predict()
+        valid = (heart_rates >= 20) & (heart_rates <= 300)
+        
+        hr_window, present = self._window_matrix(heart_rates, windows, lengths)
+        features = self._calculate_features(heart_rates, hr_window)
+        stress_info = self._calculate_stress_score(
+            heart_rates, hr_window, present, lengths
+        )
+        
+        anomaly_score = np.full(n, np.nan)
+        alert_probability = np.full(n, np.nan)
+        requires_alert = np.zeros(n, dtype=bool)
+        
+        if valid.any():
+            X = features if valid.all() else features[valid]
+            
+            # 1. Detección de anomalías (Isolation Forest)
+            # predict() == -1 equivale a decision_function() < 0; evaluar una vez
+            anomaly_score[valid] = self.isolation_forest.decision_function(
+                self.scaler.transform(X)
+            )
+            
+            # 2. Predicción de alerta (Random Forest)
+            # predict() es el argmax de predict_proba() (empate -> clase 0)
+            proba = self.random_forest.predict_proba(self.scaler_rf.transform(X))
+            alert_probability[valid] = proba[:, 1]
+            requires_alert[valid] = proba[:, 1] > proba[:, 0]
+        
+        # 3. Clasificar severidad
+        severity_code = self._classify_severity(
+            heart_rates, alert_probability, stress_info['stress_score']
+        )
+        severity_code[~valid] = -1
+        
+        return {
+            'valid': valid,
+            'heart_rate': heart_rates,
+            'requires_alert': requires_alert,
+            'stress_score': stress_info['stress_score'],
+            'severity_code': severity_code,
+            'alert_probability': alert_probability,
+            'is_anomaly': anomaly_score < 0,
+            'anomaly_score': anomaly_score,
+            'high_stress_risk': stress_info['high_stress_risk'],
+            'hr_variability': stress_info['hr_variability'],
+            'hr_elevated_sustained': stress_info['hr_elevated_sustained'],
+            'hr_rapid_changes': stress_info['hr_rapid_changes'],
+            'features': features
+        }
+    
+    def prediction_from_columns(self, columns: Dict[str, np.ndarray],
+                                row: int,
+                                user_id: Optional[int] = None) -> PredictionResult:
+        """
+        Construye el PredictionResult de una fila de `predict_columns()`.
+        
+        Pensado para materializar solo las filas que lo necesitan (por
+        ejemplo, las que generan alerta).
+        """
+        heart_rate = float(columns['heart_rate'][row])
+        stress_score = float(columns['stress_score'][row])
+        
+        return PredictionResult(
+            requires_alert=bool(columns['requires_alert'][row]),
+            stress_score=stress_score,
+            stress_level=self._get_stress_level(stress_score),
+            severity=SEVERITY_LEVELS[columns['severity_code'][row]],
+            alert_probability=float(columns['alert_probability'][row]),
+            is_anomaly=bool(columns['is_anomaly'][row]),
+            hr_zone=self._get_hr_zone(heart_rate),
+            heart_rate=heart_rate,
+            anomaly_score=float(columns['anomaly_score'][row]),
+            high_stress_risk=int(columns['high_stress_risk'][row]),
+            hr_variability=float(columns['hr_variability'][row]),
+            hr_elevated_sustained=int(columns['hr_elevated_sustained'][row]),
+            hr_rapid_changes=int(columns['hr_rapid_changes'][row]),
+            feature_values=columns['features'][row],
+            feature_columns=self.feature_columns,
+            user_id=user_id
+        )
+    
     def predict(self, heart_rate: float, 
                 recent_hrs: Optional[list] = None,
-                user_id: Optional[int] = None) -> Dict[str, Any]:
+                user_id: Optional[int] = None) -> PredictionResult:
         """
         Realiza predicción completa para un valor de HR.
         
@@ -311,7 +528,7 @@ class HealthMonitorML:
             user_id: ID del usuario (opcional, solo para metadatos)
         
         Returns:
-            Diccionario con toda la información de predicción:
+            PredictionResult (acceso tipo diccionario) con la predicción:
             {
                 'requires_alert': bool,
                 'stress_score': float (0-100),
@@ -337,54 +554,13 @@ class HealthMonitorML:
         if heart_rate > 300 or heart_rate < 20:
             raise ValueError(f"heart_rate fuera de rango médico válido: {heart_rate}")
         
-        # Calcular features
-        features_df = self._calculate_features(heart_rate, recent_hrs)
-        
-        # Calcular stress
-        stress_info = self._calculate_stress_score(heart_rate, recent_hrs)
-        
-        # 1. Detección de anomalías (Isolation Forest)
-        X_scaled = self.scaler.transform(features_df[self.feature_columns])
-        anomaly_score = self.isolation_forest.decision_function(X_scaled)[0]
-        is_anomaly = self.isolation_forest.predict(X_scaled)[0] == -1
-        
-        # 2. Predicción de alerta (Random Forest)
-        X_rf_scaled = self.scaler_rf.transform(features_df[self.feature_columns])
-        alert_probability = self.random_forest.predict_proba(X_rf_scaled)[0][1]
-        requires_alert = self.random_forest.predict(X_rf_scaled)[0] == 1
-        
-        # 3. Clasificar severidad
-        severity = self._classify_severity(
-            heart_rate, 
-            alert_probability,
-            stress_info['stress_score']
-        )
-        
-        # 4. Zona cardíaca
-        hr_zone = self._get_hr_zone(heart_rate)
-        
-        # Construir resultado
-        result = {
-            'requires_alert': bool(requires_alert),
-            'stress_score': stress_info['stress_score'],
-            'stress_level': stress_info['stress_level'],
-            'severity': severity,
-            'alert_probability': float(alert_probability),
-            'is_anomaly': bool(is_anomaly),
-            'hr_zone': hr_zone,
-            'metadata': {
-                'heart_rate': float(heart_rate),
-                'anomaly_score': float(anomaly_score),
-                'high_stress_risk': stress_info['high_stress_risk'],
-                'hr_variability': stress_info['hr_variability'],
-                'hr_elevated_sustained': stress_info['hr_elevated_sustained'],
-                'hr_rapid_changes': stress_info['hr_rapid_changes'],
-                'user_id': user_id,
-                'features': features_df[self.feature_columns].to_dict('records')[0]
-            }
-        }
+        # Misma ruta que el lote, con una sola fila
+        windows = None
+        if recent_hrs is not None and len(recent_hrs) > 0:
+            windows = np.asarray(recent_hrs, dtype=np.float64).reshape(1, -1)
         
-        return result
+        columns = self.predict_columns([heart_rate], windows)
+        return self.prediction_from_columns(columns, 0, user_id=user_id)
     
     def batch_predict(self, heart_rates: list, 
                      user_ids: Optional[list] = None) -> list:
@@ -426,6 +602,7 @@ class HealthMonitorML:
         """
         return {
             'model_directory': str(self.model_dir),
+            'backend': self.backend,
             'feature_columns': self.feature_columns,
             'num_features': len(self.feature_columns),
             'hr_thresholds': self.hr_thresholds,
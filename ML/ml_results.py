@@ -0,0 +1,319 @@
+"""
+Result Objects for Artemis Health Monitoring System
+====================================================
+
+Representaciones compactas de los resultados del pipeline ML.
+
+`PredictionResult` y `AlertPayload` guardan solo los números crudos de
+cada lectura (en `__slots__`) y construyen los diccionarios anidados
+(`metadata`, `features`, `ml_features`) y el texto de las alertas de forma
+perezosa, únicamente cuando alguien los lee para serializar o persistir.
+
+Ambas clases se comportan como un `Mapping` de solo lectura con las mismas
+claves que los diccionarios que devolvían antes `predict()` y
+`generate_alert()`, así que el código existente que hace
+`result['stress_score']` o `alert.get('severity')` sigue funcionando.
+"""
+
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence
+
+# Códigos compactos para la API columnar (`analyze_columns`): cada
+# severidad/tipo de alerta se representa por su índice en estas tuplas
+SEVERITY_LEVELS = ('LOW', 'MEDIUM', 'HIGH', 'CRITICAL')
+SEVERITY_CODES = {name: code for code, name in enumerate(SEVERITY_LEVELS)}
+
+# El código 0 significa "sin alerta"
+ALERT_TYPES = (
+    None,
+    'HR_CRITICAL_LOW', 'HR_CRITICAL_HIGH', 'HR_ZERO',
+    'STRESS_CRITICAL', 'STRESS_HIGH_RISK',
+    'HR_ABNORMALLY_HIGH', 'HR_ABNORMALLY_LOW',
+    'STRESS_ELEVATED', 'HR_SUSTAINED_ELEVATED', 'HR_RAPID_FLUCTUATION',
+    'ANOMALY_DETECTED', 'ML_PREDICTION_ALERT',
+)
+ALERT_TYPE_CODES = {name: code for code, name in enumerate(ALERT_TYPES)}
+
+
+class _LazyRecord(Mapping):
+    """
+    Base para registros de solo lectura con acceso tipo diccionario.
+
+    Las subclases declaran `_keys` (claves públicas en orden) y exponen
+    cada clave como atributo o propiedad.
+    """
+
+    __slots__ = ()
+    _keys: tuple = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Materializa el registro como diccionario plano (para JSON/DB)."""
+        return {key: getattr(self, key) for key in self._keys}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class PredictionResult(_LazyRecord):
+    """
+    Resultado de `HealthMonitorML.predict()`.
+
+    Guarda los valores escalares de la predicción y el vector de features
+    tal como salió del cálculo; `metadata` y `features` se construyen la
+    primera vez que se leen y quedan cacheados.
+    """
+
+    __slots__ = (
+        'requires_alert', 'stress_score', 'stress_level', 'severity',
+        'alert_probability', 'is_anomaly', 'hr_zone',
+        'heart_rate', 'anomaly_score', 'high_stress_risk', 'hr_variability',
+        'hr_elevated_sustained', 'hr_rapid_changes', 'user_id',
+        '_feature_values', '_feature_columns', '_metadata',
+    )
+
+    _keys = (
+        'requires_alert', 'stress_score', 'stress_level', 'severity',
+        'alert_probability', 'is_anomaly', 'hr_zone', 'metadata',
+    )
+
+    def __init__(self,
+                 requires_alert: bool,
+                 stress_score: float,
+                 stress_level: str,
+                 severity: str,
+                 alert_probability: float,
+                 is_anomaly: bool,
+                 hr_zone: str,
+                 heart_rate: float,
+                 anomaly_score: float,
+                 high_stress_risk: int,
+                 hr_variability: float,
+                 hr_elevated_sustained: int,
+                 hr_rapid_changes: int,
+                 feature_values: 'np.ndarray',
+                 feature_columns: Sequence[str],
+                 user_id: Optional[int] = None):
+        self.requires_alert = requires_alert
+        self.stress_score = stress_score
+        self.stress_level = stress_level
+        self.severity = severity
+        self.alert_probability = alert_probability
+        self.is_anomaly = is_anomaly
+        self.hr_zone = hr_zone
+        self.heart_rate = heart_rate
+        self.anomaly_score = anomaly_score
+        self.high_stress_risk = high_stress_risk
+        self.hr_variability = hr_variability
+        self.hr_elevated_sustained = hr_elevated_sustained
+        self.hr_rapid_changes = hr_rapid_changes
+        self.user_id = user_id
+        self._feature_values = feature_values
+        self._feature_columns = feature_columns
+        self._metadata = None
+
+    @property
+    def features(self) -> Dict[str, float]:
+        """Features del modelo como dict {columna: valor}."""
+        return dict(zip(self._feature_columns, self._feature_values.tolist()))
+
+    @property
+    def feature_columns(self) -> tuple:
+        """Nombres de las features del modelo, en el orden del vector."""
+        return tuple(self._feature_columns)
+
+    def feature_vector(self, columns: Sequence[str]) -> 'np.ndarray':
+        """
+        Features en el orden de `columns` (NaN para las que el modelo no
+        calcula), sin construir el dict de `features`.
+        """
+        import numpy as np
+
+        if tuple(columns) == tuple(self._feature_columns):
+            return np.asarray(self._feature_values, dtype=np.float64)
+        index = {name: position for position, name in enumerate(self._feature_columns)}
+        return np.array([
+            self._feature_values[index[name]] if name in index else np.nan
+            for name in columns
+        ], dtype=np.float64)
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadatos de la predicción (se construyen una sola vez)."""
+        if self._metadata is None:
+            self._metadata = {
+                'heart_rate': self.heart_rate,
+                'anomaly_score': self.anomaly_score,
+                'high_stress_risk': self.high_stress_risk,
+                'hr_variability': self.hr_variability,
+                'hr_elevated_sustained': self.hr_elevated_sustained,
+                'hr_rapid_changes': self.hr_rapid_changes,
+                'user_id': self.user_id,
+                'features': self.features,
+            }
+        return self._metadata
+
+
+class AlertTemplate:
+    """
+    Texto de un tipo de alerta con los umbrales ya resueltos.
+
+    `AlertGenerator` crea una por (tipo, severidad) y la reutiliza en todas
+    las alertas de ese tipo; solo queda por sustituir los valores de la
+    lectura (`AlertPayload.params`) al renderizar.
+    """
+
+    __slots__ = ('template_id', 'severity', 'message_format', 'action_required')
+
+    def __init__(self, template_id: str, severity: str,
+                 message_format: str, action_required: str):
+        self.template_id = template_id
+        self.severity = severity
+        self.message_format = message_format
+        self.action_required = action_required
+
+    def render(self, params: Mapping[str, Any]) -> str:
+        return self.message_format.format_map(params)
+
+    def __repr__(self) -> str:
+        return f"AlertTemplate({self.template_id!r}, {self.severity!r})"
+
+
+class AlertPayload(_LazyRecord):
+    """
+    Payload de alerta generado por `AlertGenerator.generate_alert()`.
+
+    Referencia la `PredictionResult` de origen en lugar de copiar sus
+    valores; los datos biométricos y el bloque `metadata` se leen de ella
+    bajo demanda. El mensaje tampoco se formatea al crear la alerta: se
+    guarda la plantilla (`template_id`) y se renderiza con `params` la
+    primera vez que se lee `message`.
+
+    `metadata` no incluye las features del modelo; se piden con
+    `ml_features` o `to_dict(include_features=True)`.
+    """
+
+    __slots__ = (
+        'user_id', 'alert_type', 'severity', 'template', 'prediction',
+        'suppressed_count', '_timestamp', '_message',
+    )
+
+    _keys = (
+        'user_id', 'timestamp', 'alert_type', 'severity', 'message',
+        'action_required', 'heart_rate', 'stress_score', 'stress_level',
+        'requires_immediate_action', 'is_anomaly', 'alert_probability',
+        'suppressed_count', 'metadata',
+    )
+
+    def __init__(self,
+                 prediction: PredictionResult,
+                 user_id: int,
+                 alert_type: str,
+                 severity: str,
+                 template: AlertTemplate,
+                 timestamp: Optional[str] = None,
+                 suppressed_count: int = 0):
+        self.prediction = prediction
+        # Alertas iguales suprimidas por cooldown desde la anterior emitida
+        self.suppressed_count = suppressed_count
+        self.user_id = user_id
+        self.alert_type = alert_type
+        self.severity = severity
+        self.template = template
+        self._message = None
+        # Si no se recibe timestamp se guarda el datetime y se formatea al leerlo
+        self._timestamp = timestamp or datetime.now()
+
+    @property
+    def template_id(self) -> str:
+        return self.template.template_id
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        """Valores de la lectura que usa la plantilla del mensaje."""
+        prediction = self.prediction
+        return {
+            'hr': prediction.heart_rate,
+            'stress_score': prediction.stress_score,
+            'stress_level': prediction.stress_level,
+            'alert_probability': prediction.alert_probability,
+            'rapid_changes': prediction.hr_rapid_changes,
+        }
+
+    @property
+    def message(self) -> str:
+        if self._message is None:
+            self._message = self.template.render(self.params)
+        return self._message
+
+    @property
+    def action_required(self) -> str:
+        return self.template.action_required
+
+    @property
+    def timestamp(self) -> str:
+        if isinstance(self._timestamp, datetime):
+            self._timestamp = self._timestamp.isoformat()
+        return self._timestamp
+
+    @property
+    def heart_rate(self) -> float:
+        return float(self.prediction.heart_rate)
+
+    @property
+    def stress_score(self) -> float:
+        return float(self.prediction.stress_score)
+
+    @property
+    def stress_level(self) -> str:
+        return self.prediction.stress_level
+
+    @property
+    def requires_immediate_action(self) -> bool:
+        return self.severity in ('CRITICAL', 'HIGH')
+
+    @property
+    def is_anomaly(self) -> bool:
+        return bool(self.prediction.is_anomaly)
+
+    @property
+    def alert_probability(self) -> float:
+        return float(self.prediction.alert_probability)
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        prediction = self.prediction
+        return {
+            'hr_zone': prediction.hr_zone,
+            'hr_variability': prediction.hr_variability,
+            'hr_elevated_sustained': prediction.hr_elevated_sustained,
+            'hr_rapid_changes': prediction.hr_rapid_changes,
+            'anomaly_score': prediction.anomaly_score,
+        }
+
+    @property
+    def ml_features(self) -> Dict[str, float]:
+        """Features del modelo que originó la alerta."""
+        return self.prediction.features
+
+    def to_dict(self, include_features: bool = False) -> Dict[str, Any]:
+        """
+        Materializa la alerta como diccionario plano (para JSON/DB).
+
+        Con include_features=True agrega `metadata['ml_features']`.
+        """
+        data = super().to_dict()
+        if include_features:
+            data['metadata']['ml_features'] = self.ml_features
+        return data
@@ -24,9 +24,14 @@ Uso desde Django:
         Alert.objects.create(**result['alert'])
 """
 
+import logging
+import threading
+import time
 from typing import Dict, Any, Optional, List
-from ml_predictor import HealthMonitorML
-from alert_generator import AlertGenerator
+
+from service_stats import ServiceStats, WINDOWS
+
+logger = logging.getLogger(__name__)
 
 
 class MLHealthMonitoringService:
@@ -35,6 +40,10 @@ class MLHealthMonitoringService:
     
     Singleton que combina predicción ML y generación de alertas
     en una interfaz simple para consumo del backend Django.
+    
+    Importar este módulo es barato: numpy y los modelos se cargan la
+    primera vez que se usa `predictor`/`alert_generator` (o al llamar
+    a `warm_up()`), no al importar.
     """
     
     _instance = None
@@ -51,28 +60,66 @@ class MLHealthMonitoringService:
         if self._initialized:
             return
         
-        print("\n" + "=" * 70)
-        print("INICIALIZANDO ML HEALTH MONITORING SERVICE")
-        print("=" * 70)
+        # Componentes ML (carga diferida, ver _load_components)
+        self._predictor = None
+        self._alert_generator = None
+        self._components_lock = threading.Lock()
+        # (cooldown_seconds, max_tracked) del generador; ver configure_alert_cooldown
+        self._cooldown_config = (0, 100000)
         
-        # Inicializar componentes ML
-        self.predictor = HealthMonitorML()
-        self.alert_generator = AlertGenerator()
+        # Evaluación en sombra de un modelo candidato (ver enable_shadow)
+        self._shadow = None
         
-        # Estado
+        # Estado (contadores por hilo, sin locks al registrar)
         self._initialized = True
-        self._stats = {
-            'total_predictions': 0,
-            'total_alerts_generated': 0,
-            'critical_alerts': 0,
-            'high_alerts': 0,
-            'medium_alerts': 0,
-            'low_alerts': 0
-        }
+        self._stats = ServiceStats()
+    
+    @property
+    def predictor(self):
+        """HealthMonitorML (se carga en el primer acceso)"""
+        if self._predictor is None:
+            self._load_components()
+        return self._predictor
+    
+    @property
+    def alert_generator(self):
+        """AlertGenerator (se carga en el primer acceso)"""
+        if self._alert_generator is None:
+            self._load_components()
+        return self._alert_generator
+    
+    def _load_components(self):
+        """Importa e instancia predictor y generador una sola vez"""
+        with self._components_lock:
+            if self._predictor is not None:
+                return
+            
+            from ml_predictor import HealthMonitorML
+            from alert_generator import AlertGenerator
+            
+            self._alert_generator = AlertGenerator(*self._cooldown_config)
+            self._predictor = HealthMonitorML()
+            logger.info("ML Health Monitoring Service listo (backend: %s)",
+                        self._predictor.backend)
+    
+    def warm_up(self):
+        """
+        Carga los modelos por adelantado.
         
-        print("=" * 70)
-        print("ML HEALTH MONITORING SERVICE LISTO")
-        print("=" * 70 + "\n")
+        Útil en hooks de arranque de workers para que la primera petición
+        no pague la carga de modelos.
+        """
+        self._load_components()
+        return self
+    
+    @staticmethod
+    def validate_reading(heart_rate: float, user_id: int):
+        """Valida los tipos de una lectura; lanza ValueError si no son válidos"""
+        if not isinstance(heart_rate, (int, float)) or heart_rate <= 0:
+            raise ValueError(f"heart_rate debe ser un número positivo, recibido: {heart_rate}")
+        
+        if not isinstance(user_id, int) or user_id <= 0:
+            raise ValueError(f"user_id debe ser un entero positivo, recibido: {user_id}")
     
     def analyze_biometric_data(self, 
                                heart_rate: float,
@@ -92,8 +139,8 @@ class MLHealthMonitoringService:
         
         Returns:
             Dict con:
-                - 'prediction': Resultado completo de predicción ML
-                - 'alert': Payload de alerta (o None si no requiere)
+                - 'prediction': PredictionResult completo de predicción ML
+                - 'alert': AlertPayload de alerta (o None si no requiere)
                 - 'should_notify': Boolean indicando si notificar supervisores
         
         Example:
@@ -120,27 +167,25 @@ class MLHealthMonitoringService:
             ...         notify_supervisors(alert_obj)
         """
         # Validar inputs
-        if not isinstance(heart_rate, (int, float)) or heart_rate <= 0:
-            raise ValueError(f"heart_rate debe ser un número positivo, recibido: {heart_rate}")
-        
-        if not isinstance(user_id, int) or user_id <= 0:
-            raise ValueError(f"user_id debe ser un entero positivo, recibido: {user_id}")
+        self.validate_reading(heart_rate, user_id)
         
         # 1. Predicción ML
+        shadow = self._shadow
+        started = time.perf_counter() if shadow is not None else 0.0
         prediction = self.predictor.predict(
             heart_rate=heart_rate,
             recent_hrs=recent_hrs,
             user_id=user_id
         )
-        
-        # Actualizar estadísticas
-        self._stats['total_predictions'] += 1
+        if shadow is not None:
+            shadow.offer(heart_rate, recent_hrs, prediction,
+                         time.perf_counter() - started)
         
         # 2. Generar alerta si es necesario
         alert = None
         should_notify = False
         
-        if prediction['requires_alert']:
+        if prediction.requires_alert:
             alert = self.alert_generator.generate_alert(
                 prediction_result=prediction,
                 user_id=user_id,
@@ -148,25 +193,23 @@ class MLHealthMonitoringService:
             )
             
             if alert:
-                self._stats['total_alerts_generated'] += 1
-                
-                # Actualizar estadísticas por severidad
-                severity = alert['severity']
-                if severity == 'CRITICAL':
-                    self._stats['critical_alerts'] += 1
-                    should_notify = True  # Siempre notificar críticos
-                elif severity == 'HIGH':
-                    self._stats['high_alerts'] += 1
-                    should_notify = True  # Siempre notificar altos
-                elif severity == 'MEDIUM':
-                    self._stats['medium_alerts'] += 1
-                    should_notify = False  # No notificar medios (solo guardar)
-                elif severity == 'LOW':
-                    self._stats['low_alerts'] += 1
-                    should_notify = False
+                # Siempre notificar críticos y altos; medios y bajos solo se guardan
+                should_notify = alert.severity in ('CRITICAL', 'HIGH')
+        
+        # Actualizar estadísticas
+        self._stats.record_prediction(
+            alert_severity=alert.severity if alert else None,
+            notified=should_notify
+        )
         
         # 3. Construir respuesta
-        result = {
+        return self.build_result(prediction, alert, should_notify, timestamp)
+    
+    @staticmethod
+    def build_result(prediction, alert, should_notify: bool,
+                     timestamp: Optional[str] = None) -> Dict[str, Any]:
+        """Arma el dict de respuesta de `analyze_biometric_data()`"""
+        return {
             'prediction': prediction,
             'alert': alert,
             'should_notify': should_notify,
@@ -176,8 +219,6 @@ class MLHealthMonitoringService:
                 'service': 'MLHealthMonitoringService'
             }
         }
-        
-        return result
     
     def batch_analyze(self, 
                      data_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -247,6 +288,182 @@ class MLHealthMonitoringService:
         
         return results
     
+    def analyze_columns(self,
+                        user_ids,
+                        heart_rates,
+                        windows=None,
+                        timestamps=None,
+                        lengths=None,
+                        with_predictions: bool = False,
+                        with_alerts: bool = True) -> Dict[str, Any]:
+        """
+        Analiza un lote en formato columnar (struct of arrays).
+    
+        Para trabajos masivos: en lugar de un dict por lectura recibe
+        arrays NumPy y devuelve arrays, y solo construye AlertPayload para
+        las filas que generan alerta.
+    
+        Args:
+            user_ids: Array (n,) de IDs de usuario
+            heart_rates: Array (n,) de HR actuales (bpm)
+            windows: Array opcional (n, w) con el historial reciente de cada
+                     fila en orden cronológico (el último valor válido es el
+                     más reciente), alineado a la izquierda y con padding
+            timestamps: Secuencia opcional (n,) de timestamps (str, datetime
+                        o datetime64) para las alertas; el cooldown admite
+                        las filas en ese orden y con ese tiempo
+            lengths: Array opcional (n,) con el número de valores válidos de
+                     cada fila de `windows` (por defecto, todas las columnas)
+            with_predictions: Si True, construye además el PredictionResult
+                              de cada fila (vista por fila del lote)
+            with_alerts: Si False, solo puntúa: no clasifica alertas ni
+                         toca el cooldown (reprocesos de lecturas pasadas)
+    
+        Returns:
+            Dict con arrays de tamaño n:
+                - 'valid': False para filas con user_id o HR inválidos
+                - 'stress_score', 'alert_probability' (float64)
+                - 'severity_code' (int8, índice en SEVERITY_LEVELS; -1 si inválida)
+                - 'is_anomaly', 'requires_alert', 'should_notify' (bool)
+                - 'alert_type_code' (int8, índice en ALERT_TYPES; 0 = sin alerta)
+                - 'suppressed' (bool): alertas descartadas por el cooldown
+            y además:
+                - 'alert_rows': índices de las filas con alerta
+                - 'alerts': lista de AlertPayload alineada con 'alert_rows'
+                - 'predictions': solo con with_predictions=True, lista (n,)
+                  de PredictionResult (None en filas inválidas)
+    
+        Example:
+            >>> from ml_results import SEVERITY_LEVELS
+            >>> result = ml_service.analyze_columns(
+            ...     user_ids=np.array([1, 2]),
+            ...     heart_rates=np.array([75.0, 185.0]),
+            ...     windows=np.array([[72.0, 74.0, 0.0], [160.0, 175.0, 182.0]]),
+            ...     lengths=np.array([2, 3])
+            ... )
+            >>> SEVERITY_LEVELS[result['severity_code'][1]]
+            'CRITICAL'
+        """
+        import numpy as np
+        from ml_results import ALERT_TYPES, SEVERITY_CODES, SEVERITY_LEVELS
+    
+        user_ids = np.asarray(user_ids).reshape(-1)
+        n = user_ids.shape[0]
+        if np.asarray(heart_rates).size != n:
+            raise ValueError("user_ids y heart_rates deben tener el mismo tamaño")
+        if timestamps is not None and len(timestamps) != n:
+            raise ValueError("timestamps debe tener un valor por fila")
+    
+        # 1. Predicción ML vectorizada
+        shadow = self._shadow
+        started = time.perf_counter() if shadow is not None else 0.0
+        columns = self.predictor.predict_columns(heart_rates, windows, lengths)
+    
+        valid = columns['valid'] & (user_ids > 0)
+        if shadow is not None:
+            shadow.offer_columns(heart_rates, windows, lengths, columns, valid,
+                                 time.perf_counter() - started)
+        requires_alert = columns['requires_alert'] & valid
+    
+        # 2. Alertas: solo se materializan las filas que las requieren
+        alert_rows = []
+        alerts = []
+        predictions = None
+    
+        if with_predictions:
+            predictions = [
+                self.predictor.prediction_from_columns(
+                    columns, row, user_id=int(user_ids[row])
+                ) if valid[row] else None
+                for row in range(n)
+            ]
+    
+        # Clasificación vectorizada; los mensajes solo se generan para las
+        # filas que terminan en alerta
+        if with_alerts:
+            alert_type_code, alert_severity_code = self.alert_generator.classify_batch(
+                columns, requires_alert
+            )
+            should_notify = alert_severity_code >= SEVERITY_CODES['HIGH']
+        else:
+            alert_type_code = np.zeros(n, dtype=np.int8)
+            should_notify = np.zeros(n, dtype=bool)
+        suppressed = np.zeros(n, dtype=bool)
+        alert_generator = self.alert_generator
+    
+        # Cooldown: las filas se admiten en orden de timestamp (el de la
+        # lectura, no el reloj), como lecturas sucesivas
+        rows = np.flatnonzero(alert_type_code)
+        seconds = _timestamps_seconds(timestamps, rows)
+        if seconds is not None:
+            order = np.argsort(seconds, kind='stable')
+            rows, seconds = rows[order], seconds[order]
+        admitted = {}
+        for position, row in enumerate(rows.tolist()):
+            now = None
+            if seconds is not None and not np.isnan(seconds[position]):
+                now = float(seconds[position])
+            suppressed_count = alert_generator.admit(
+                int(user_ids[row]), ALERT_TYPES[alert_type_code[row]],
+                SEVERITY_LEVELS[alert_severity_code[row]], now
+            )
+            if suppressed_count is None:
+                suppressed[row] = True
+                alert_type_code[row] = 0
+                should_notify[row] = False
+            else:
+                admitted[row] = suppressed_count
+    
+        for row in sorted(admitted):
+            user_id = int(user_ids[row])
+            alert_type = ALERT_TYPES[alert_type_code[row]]
+            severity = SEVERITY_LEVELS[alert_severity_code[row]]
+    
+            if predictions is not None:
+                prediction = predictions[row]
+            else:
+                prediction = self.predictor.prediction_from_columns(
+                    columns, row, user_id=user_id
+                )
+            alerts.append(alert_generator.build_alert(
+                prediction_result=prediction,
+                user_id=user_id,
+                alert_type=alert_type,
+                severity=severity,
+                timestamp=_row_timestamp(timestamps, row),
+                suppressed_count=admitted[row]
+            ))
+            alert_rows.append(row)
+    
+        # Actualizar estadísticas
+        self._stats.record_batch(
+            predictions=int(valid.sum()),
+            alert_severities=[alert.severity for alert in alerts],
+            notifications=int(should_notify.sum())
+        )
+    
+        severity_code = columns['severity_code']
+        if not valid.all():
+            severity_code = np.where(valid, severity_code, -1).astype(np.int8)
+    
+        result = {
+            'valid': valid,
+            'stress_score': columns['stress_score'],
+            'severity_code': severity_code,
+            'alert_probability': columns['alert_probability'],
+            'is_anomaly': columns['is_anomaly'] & valid,
+            'requires_alert': requires_alert,
+            'alert_type_code': alert_type_code,
+            'should_notify': should_notify,
+            'suppressed': suppressed,
+            'alert_rows': np.asarray(alert_rows, dtype=np.intp),
+            'alerts': alerts
+        }
+        if predictions is not None:
+            result['predictions'] = predictions
+    
+        return result
+    
     def get_statistics(self) -> Dict[str, Any]:
         """
         Retorna estadísticas del servicio ML.
@@ -254,47 +471,93 @@ class MLHealthMonitoringService:
         Útil para monitoreo y debugging.
         
         Returns:
-            Dict con estadísticas de uso del servicio
+            Dict con estadísticas de uso del servicio; 'windows' trae los
+            conteos y tasas de los últimos 1, 5 y 15 minutos
         """
-        total_alerts = self._stats['total_alerts_generated']
-        
-        stats = {
-            'total_predictions': self._stats['total_predictions'],
-            'total_alerts_generated': total_alerts,
-            'alerts_by_severity': {
-                'CRITICAL': self._stats['critical_alerts'],
-                'HIGH': self._stats['high_alerts'],
-                'MEDIUM': self._stats['medium_alerts'],
-                'LOW': self._stats['low_alerts']
-            },
-            'alert_rate': (
-                (total_alerts / self._stats['total_predictions'] * 100) 
-                if self._stats['total_predictions'] > 0 else 0
-            ),
-            'critical_rate': (
-                (self._stats['critical_alerts'] / total_alerts * 100)
-                if total_alerts > 0 else 0
-            ),
+        totals = self._stats.totals()
+        windows = self._stats.windows()
+        
+        stats = _summarize_counts(totals)
+        stats['total_notifications'] = totals['notifications']
+        stats['windows'] = {}
+        for label, seconds in WINDOWS:
+            counts = windows[label]
+            window_stats = _summarize_counts(counts)
+            window_stats['notifications'] = counts['notifications']
+            window_stats['predictions_per_minute'] = (
+                counts['total_predictions'] / (seconds / 60)
+            )
+            window_stats['alerts_per_minute'] = (
+                counts['total_alerts_generated'] / (seconds / 60)
+            )
+            stats['windows'][label] = window_stats
+        
+        cooldown = self._alert_generator.cooldown if self._alert_generator else None
+        if cooldown is not None:
+            stats['alert_cooldown'] = cooldown.stats()
+    
+        stats.update({
             'service_status': 'operational' if self._initialized else 'not_initialized',
             'ml_models_loaded': {
-                'predictor': bool(self.predictor),
-                'alert_generator': bool(self.alert_generator)
+                'predictor': self._predictor is not None,
+                'alert_generator': self._alert_generator is not None
             }
-        }
+        })
         
         return stats
     
     def reset_statistics(self):
-        """Reinicia las estadísticas del servicio"""
-        self._stats = {
-            'total_predictions': 0,
-            'total_alerts_generated': 0,
-            'critical_alerts': 0,
-            'high_alerts': 0,
-            'medium_alerts': 0,
-            'low_alerts': 0
-        }
-        print("Estadísticas reiniciadas")
+        """Reinicia las estadísticas del servicio (totales y ventanas)"""
+        self._stats.reset()
+        logger.info("Estadísticas reiniciadas")
+    
+    def enable_shadow(self, candidate, sample_rate: float = 1.0,
+                      max_queue: int = 10000, batch_size: int = 256,
+                      duty_cycle: float = 0.1):
+        """
+        Activa la evaluación en sombra de un modelo candidato.
+        
+        Una muestra de las lecturas se evalúa también con el candidato en
+        un hilo aparte; la respuesta sigue siendo siempre la de producción
+        y nunca espera al candidato.
+        
+        Args:
+            candidate: Directorio con los modelos candidatos o un objeto con
+                       `predict_columns()` (p. ej. HealthMonitorML)
+            sample_rate: Fracción de lecturas a evaluar (0-1)
+            max_queue: Muestras pendientes como máximo (descarta las más viejas)
+            batch_size: Lecturas por lote evaluado por el candidato
+            duty_cycle: Fracción máxima del tiempo que el hilo de sombra
+                        pasa evaluando (limita su competencia por el GIL)
+        """
+        from ml_shadow import ShadowEvaluator, load_candidate
+        
+        evaluator = ShadowEvaluator(
+            load_candidate(candidate),
+            sample_rate=sample_rate,
+            max_queue=max_queue,
+            batch_size=batch_size,
+            duty_cycle=duty_cycle
+        )
+        previous, self._shadow = self._shadow, evaluator
+        if previous is not None:
+            previous.stop()
+        logger.info("Evaluación en sombra activada (sample_rate=%s)", sample_rate)
+        return evaluator
+    
+    def disable_shadow(self) -> Optional[Dict[str, Any]]:
+        """Desactiva la evaluación en sombra y devuelve su reporte final"""
+        shadow, self._shadow = self._shadow, None
+        if shadow is None:
+            return None
+        shadow.stop()
+        logger.info("Evaluación en sombra desactivada")
+        return shadow.report()
+    
+    def get_shadow_report(self) -> Optional[Dict[str, Any]]:
+        """Comparación producción vs. candidato (None si no hay sombra activa)"""
+        shadow = self._shadow
+        return shadow.report() if shadow is not None else None
     
     def get_model_info(self) -> Dict[str, Any]:
         """
@@ -319,7 +582,93 @@ class MLHealthMonitoringService:
             new_thresholds: Dict con nuevos valores
         """
         self.alert_generator.update_thresholds(new_thresholds)
-        print(f"Umbrales de alertas actualizados")
+    
+    def revoke_alerts(self, alerts):
+        """
+        Deshace el cooldown de alertas emitidas que no se llegaron a
+        guardar (p. ej. la transacción que las creaba se revirtió), para que
+        al reintentar las lecturas no se supriman.
+    
+        Args:
+            alerts: AlertPayload de `analyze_biometric_data` o
+                    `analyze_columns`
+        """
+        alert_generator = self._alert_generator
+        if alert_generator is None:
+            return
+        for alert in alerts:
+            alert_generator.revoke(alert)
+    
+    def configure_alert_cooldown(self, cooldown_seconds: float,
+                                 max_tracked: int = 100000):
+        """
+        Suprime alertas repetidas del mismo tipo para el mismo oficial
+        durante `cooldown_seconds` (0 desactiva la supresión).
+    
+        Las alertas suprimidas no se cuentan como generadas ni se notifican;
+        la siguiente emitida lleva cuántas se suprimieron
+        (`alert.suppressed_count`). No carga los modelos: si aún no se
+        cargaron, la configuración se aplica al cargarlos.
+        """
+        with self._components_lock:
+            self._cooldown_config = (cooldown_seconds, max_tracked)
+            alert_generator = self._alert_generator
+        if alert_generator is not None:
+            alert_generator.configure_cooldown(cooldown_seconds, max_tracked)
+
+
+def _summarize_counts(counts: Dict[str, int]) -> Dict[str, Any]:
+    """Totales, alertas por severidad y tasas a partir de los contadores"""
+    predictions = counts['total_predictions']
+    total_alerts = counts['total_alerts_generated']
+    
+    return {
+        'total_predictions': predictions,
+        'total_alerts_generated': total_alerts,
+        'alerts_by_severity': {
+            'CRITICAL': counts['critical_alerts'],
+            'HIGH': counts['high_alerts'],
+            'MEDIUM': counts['medium_alerts'],
+            'LOW': counts['low_alerts']
+        },
+        'alert_rate': (
+            (total_alerts / predictions * 100)
+            if predictions > 0 else 0
+        ),
+        'critical_rate': (
+            (counts['critical_alerts'] / total_alerts * 100)
+            if total_alerts > 0 else 0
+        )
+    }
+
+
+def _timestamps_seconds(timestamps, rows):
+    """
+    Segundos epoch de las filas `rows` de `analyze_columns` (NaN donde no
+    se pueden interpretar), o None si no hay timestamps.
+    """
+    import numpy as np
+    from alert_cooldown import timestamp_seconds
+
+    if timestamps is None or len(rows) == 0:
+        return None
+    values = np.asarray(timestamps)
+    if values.dtype.kind == 'M':
+        values = values[rows].astype('datetime64[us]')
+        return np.where(np.isnat(values), np.nan, values.astype(np.int64) / 1e6)
+    seconds = [timestamp_seconds(timestamps[row]) for row in rows.tolist()]
+    return np.array([np.nan if value is None else value for value in seconds])
+
+
+def _row_timestamp(timestamps, row: int):
+    """Timestamp de una fila de `analyze_columns` (None si no hay)"""
+    if timestamps is None:
+        return None
+    timestamp = timestamps[row]
+    # datetime64 -> datetime (AlertPayload lo formatea con isoformat())
+    if hasattr(timestamp, 'dtype') and timestamp.dtype.kind == 'M':
+        return timestamp.astype('datetime64[us]').item()
+    return timestamp
 
 
 # Singleton global para uso en Django
@@ -0,0 +1,362 @@
+"""
+Shadow Model Evaluation for Artemis Health Monitoring System
+============================================================
+
+Evalúa un modelo candidato con tráfico real sin afectar al modelo de
+producción.
+
+El camino principal solo hace `deque.append()` de una muestra de las
+lecturas, bajo un lock que no comparte con el evaluador (cola acotada: si
+se llena se descarta la más vieja). Un hilo en
+segundo plano vacía la cola por lotes, evalúa el candidato con
+`predict_columns()` y acumula acuerdo, matrices de confusión y latencias
+contra lo que respondió producción. Si el candidato es lento o falla, solo
+se pierden muestras; la petición nunca espera.
+
+Uso:
+    from ml_service import ml_service
+
+    ml_service.enable_shadow('/ruta/modelos_candidatos', sample_rate=0.2)
+    ...
+    report = ml_service.get_shadow_report()
+    ml_service.disable_shadow()
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from ml_results import SEVERITY_CODES, SEVERITY_LEVELS
+
+logger = logging.getLogger(__name__)
+
+# Últimas latencias guardadas para calcular percentiles
+LATENCY_SAMPLES = 2048
+
+
+class _LatencyStats:
+    """Conteo, media, máximo y percentiles (sobre las últimas muestras)"""
+
+    __slots__ = ('count', 'total', 'max', 'recent')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=LATENCY_SAMPLES)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.recent.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        """Resumen en milisegundos"""
+        if not self.count:
+            return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+        ordered = sorted(self.recent)
+        return {
+            'count': self.count,
+            'mean': self.total / self.count * 1000,
+            'p50': ordered[len(ordered) // 2] * 1000,
+            'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+            'max': self.max * 1000,
+        }
+
+
+class ShadowEvaluator:
+    """
+    Carril de evaluación en sombra para un modelo candidato.
+
+    `offer()` y `offer_columns()` se llaman desde el camino principal y no
+    toman locks ni esperan; todo el cálculo ocurre en el hilo del evaluador.
+    """
+
+    def __init__(self,
+                 candidate,
+                 sample_rate: float = 1.0,
+                 max_queue: int = 10000,
+                 batch_size: int = 256,
+                 duty_cycle: float = 0.1,
+                 poll_interval: float = 0.05):
+        """
+        Args:
+            candidate: Objeto con `predict_columns()` (p. ej. HealthMonitorML
+                       cargado desde otro directorio)
+            sample_rate: Fracción de lecturas que se evalúan (0-1)
+            max_queue: Tamaño máximo de la cola; al llenarse se descartan
+                       las muestras más viejas
+            batch_size: Lecturas por lote evaluado
+            duty_cycle: Fracción máxima del tiempo que el hilo pasa evaluando;
+                        tras cada lote descansa lo necesario para no
+                        competir por el GIL con las peticiones (si no
+                        alcanza, la cola descarta muestras)
+            poll_interval: Segundos entre revisiones de la cola vacía
+        """
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"sample_rate debe estar entre 0 y 1, recibido: {sample_rate}")
+        if max_queue < 1 or batch_size < 1:
+            raise ValueError("max_queue y batch_size deben ser al menos 1")
+        if not 0.0 < duty_cycle <= 1.0:
+            raise ValueError(f"duty_cycle debe estar entre 0 (excluido) y 1, recibido: {duty_cycle}")
+
+        self.candidate = candidate
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.duty_cycle = duty_cycle
+        self.poll_interval = poll_interval
+
+        self._queue = deque(maxlen=max_queue)
+        # Contadores de la cola; lock propio para que el camino principal
+        # no espere al evaluador (que toma `_stats_lock` por lote)
+        self._queue_lock = threading.Lock()
+        self._sampled = 0
+        self._dropped = 0
+
+        # Estadísticas: solo las escribe el hilo del evaluador
+        self._stats_lock = threading.Lock()
+        self._scored = 0
+        self._errors = 0
+        self._alert_confusion = [[0, 0], [0, 0]]     # [producción][candidato]
+        self._severity_confusion = [[0] * len(SEVERITY_LEVELS)
+                                    for _ in SEVERITY_LEVELS]
+        self._stress_abs_diff_total = 0.0
+        self._stress_abs_diff_max = 0.0
+        self._production_latency = _LatencyStats()
+        self._candidate_latency = _LatencyStats()
+        self._queue_delay = _LatencyStats()
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name='artemis-ml-shadow', daemon=True
+        )
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Camino principal (no bloquea)
+    # ------------------------------------------------------------------
+
+    def _enqueue(self, item: tuple):
+        with self._queue_lock:
+            self._sampled += 1
+            if len(self._queue) == self._queue.maxlen:
+                self._dropped += 1
+            self._queue.append(item)
+
+    def offer(self, heart_rate: float, recent_hrs, prediction,
+              production_latency: Optional[float] = None):
+        """
+        Ofrece una lectura ya evaluada por producción.
+
+        Args:
+            heart_rate: HR de la lectura
+            recent_hrs: Historial pasado a producción (o None)
+            prediction: PredictionResult de producción
+            production_latency: Segundos que tardó la predicción de producción
+        """
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        window = tuple(recent_hrs[-10:]) if recent_hrs else ()
+        self._enqueue((
+            float(heart_rate), window, prediction.requires_alert,
+            SEVERITY_CODES[prediction.severity], prediction.stress_score,
+            production_latency, time.perf_counter()
+        ))
+
+    def offer_columns(self, heart_rates, windows, lengths, columns: Dict[str, Any],
+                      valid, production_latency: Optional[float] = None):
+        """
+        Ofrece las filas válidas de un lote de `analyze_columns()`.
+
+        `production_latency` es la del lote completo; se reparte por fila.
+        """
+        import numpy as np
+
+        heart_rates = np.asarray(heart_rates, dtype=np.float64).reshape(-1)
+        n = heart_rates.shape[0]
+
+        rows = np.flatnonzero(valid)
+        if self.sample_rate < 1.0:
+            rows = rows[np.random.random(rows.shape[0]) < self.sample_rate]
+        if rows.size == 0:
+            return
+
+        if windows is not None:
+            windows = np.asarray(windows, dtype=np.float64)
+            if lengths is None:
+                lengths = np.full(n, windows.shape[1])
+        per_row = production_latency / n if production_latency is not None else None
+        enqueued_at = time.perf_counter()
+
+        for row in rows.tolist():
+            window = ()
+            if windows is not None and lengths[row]:
+                window = tuple(windows[row, :lengths[row]][-10:].tolist())
+            self._enqueue((
+                float(heart_rates[row]), window,
+                bool(columns['requires_alert'][row]),
+                int(columns['severity_code'][row]),
+                float(columns['stress_score'][row]),
+                per_row, enqueued_at
+            ))
+
+    # ------------------------------------------------------------------
+    # Hilo del evaluador
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        rest_factor = 1.0 / self.duty_cycle - 1.0
+        while not self._stop.is_set():
+            if not self._queue:
+                self._stop.wait(self.poll_interval)
+                continue
+            started = time.perf_counter()
+            self._score_batch(self._drain())
+            if rest_factor:
+                self._stop.wait((time.perf_counter() - started) * rest_factor)
+
+        # Evaluar lo que quedó antes de terminar
+        while self._queue:
+            self._score_batch(self._drain())
+
+    def _drain(self) -> list:
+        batch = []
+        popleft = self._queue.popleft
+        try:
+            while len(batch) < self.batch_size:
+                batch.append(popleft())
+        except IndexError:
+            pass
+        return batch
+
+    def _score_batch(self, batch: list):
+        if not batch:
+            return
+        import numpy as np
+
+        n = len(batch)
+        started = time.perf_counter()
+        heart_rates = np.array([item[0] for item in batch], dtype=np.float64)
+        lengths = np.array([len(item[1]) for item in batch], dtype=np.intp)
+        windows = np.zeros((n, max(int(lengths.max()), 1)), dtype=np.float64)
+        for row, item in enumerate(batch):
+            windows[row, :lengths[row]] = item[1]
+
+        try:
+            columns = self.candidate.predict_columns(heart_rates, windows, lengths)
+        except Exception:
+            # Registrar solo el primer fallo; los demás quedan en `errors`
+            if not self._errors:
+                logger.exception("El modelo candidato falló evaluando %d lecturas", n)
+            with self._stats_lock:
+                self._errors += n
+            return
+
+        elapsed = time.perf_counter() - started
+        requires_alert = columns['requires_alert'].tolist()
+        severity_code = columns['severity_code'].tolist()
+        stress_score = columns['stress_score'].tolist()
+
+        with self._stats_lock:
+            for row, item in enumerate(batch):
+                _, _, prod_alert, prod_severity, prod_stress, prod_latency, enqueued_at = item
+                cand_severity = severity_code[row]
+                if cand_severity < 0:
+                    self._errors += 1
+                    continue
+
+                self._scored += 1
+                self._alert_confusion[int(prod_alert)][int(requires_alert[row])] += 1
+                self._severity_confusion[prod_severity][cand_severity] += 1
+
+                diff = abs(stress_score[row] - prod_stress)
+                self._stress_abs_diff_total += diff
+                if diff > self._stress_abs_diff_max:
+                    self._stress_abs_diff_max = diff
+
+                if prod_latency is not None:
+                    self._production_latency.add(prod_latency)
+                self._candidate_latency.add(elapsed / n)
+                self._queue_delay.add(started - enqueued_at)
+
+    # ------------------------------------------------------------------
+    # Control y reporte
+    # ------------------------------------------------------------------
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Detiene el hilo (evalúa antes lo que quede en la cola)"""
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Comparación acumulada producción vs. candidato.
+
+        Returns:
+            Dict con contadores de la cola (muestras tomadas y descartadas
+            por cola llena), acuerdo en requires_alert y
+            severidad, matrices de confusión, diferencia de stress_score y
+            latencias (ms) de producción, candidato y espera en cola
+        """
+        with self._stats_lock:
+            scored = self._scored
+            (neither, candidate_only), (production_only, both) = self._alert_confusion
+            severity_matches = sum(
+                self._severity_confusion[i][i] for i in range(len(SEVERITY_LEVELS))
+            )
+            report = {
+                'running': self.running,
+                'sample_rate': self.sample_rate,
+                'queue_size': len(self._queue),
+                'queue_capacity': self._queue.maxlen,
+                'scored': scored,
+                'errors': self._errors,
+                'agreement': {
+                    'requires_alert': (both + neither) / scored if scored else None,
+                    'severity': severity_matches / scored if scored else None,
+                },
+                'requires_alert_confusion': {
+                    'both': both,
+                    'production_only': production_only,
+                    'candidate_only': candidate_only,
+                    'neither': neither,
+                },
+                'severity_confusion': {
+                    production: dict(zip(SEVERITY_LEVELS, counts))
+                    for production, counts in zip(SEVERITY_LEVELS, self._severity_confusion)
+                },
+                'stress_score_abs_diff': {
+                    'mean': self._stress_abs_diff_total / scored if scored else 0.0,
+                    'max': self._stress_abs_diff_max,
+                },
+                'latency_ms': {
+                    'production': self._production_latency.summary(),
+                    'candidate': self._candidate_latency.summary(),
+                    'queue_delay': self._queue_delay.summary(),
+                },
+            }
+        with self._queue_lock:
+            report['sampled'] = self._sampled
+            report['dropped'] = self._dropped
+
+        return report
+
+
+def load_candidate(candidate: Union[str, Path, Any]):
+    """Acepta un predictor ya creado o un directorio con modelos candidatos"""
+    if isinstance(candidate, (str, Path)):
+        from ml_predictor import HealthMonitorML
+        return HealthMonitorML(model_dir=candidate)
+    if not hasattr(candidate, 'predict_columns'):
+        raise TypeError("El candidato debe tener predict_columns() o ser un directorio de modelos")
+    return candidate
@@ -0,0 +1,256 @@
+"""
+Service Statistics for Artemis Health Monitoring System
+=======================================================
+
+Contadores del servicio ML seguros entre hilos y sin locks en el camino
+caliente.
+
+Cada hilo escribe solo en su propio "shard" (totales + un ring buffer de
+cubetas por segundo); las lecturas suman todos los shards. Como nadie más
+escribe en un shard, registrar una lectura no toma ningún lock y no se
+pierden incrementos aunque varios hilos atiendan requests a la vez.
+
+Las cubetas por segundo cubren los últimos 15 minutos y permiten tasas
+móviles de 1, 5 y 15 minutos (predicciones, alertas por severidad y
+notificaciones) sin costo adicional por lectura registrada.
+
+Los shards de hilos que terminaron se pliegan en un shard "retirado" la
+próxima vez que se registra un hilo nuevo, así que la memoria no crece con
+servidores que crean un hilo por request.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Índice de cada contador dentro de un shard
+COUNTERS = (
+    'total_predictions',
+    'total_alerts_generated',
+    'critical_alerts',
+    'high_alerts',
+    'medium_alerts',
+    'low_alerts',
+    'notifications',
+)
+_PREDICTIONS, _ALERTS, _NOTIFICATIONS = 0, 1, 6
+_SEVERITY_INDEX = {'CRITICAL': 2, 'HIGH': 3, 'MEDIUM': 4, 'LOW': 5}
+_N = len(COUNTERS)
+
+# Ventanas móviles (etiqueta, segundos)
+WINDOWS = (('1m', 60), ('5m', 300), ('15m', 900))
+HORIZON_SECONDS = 900
+
+
+class _Shard:
+    """
+    Contadores de un hilo.
+
+    `counts` es un ring buffer plano de HORIZON_SECONDS cubetas de _N
+    contadores; `stamps[slot]` dice a qué segundo pertenece cada cubeta.
+    """
+
+    __slots__ = ('thread', 'totals', 'stamps', 'counts')
+
+    def __init__(self, thread: Optional[threading.Thread] = None):
+        self.thread = thread
+        self.totals = [0] * _N
+        self.stamps = [-1] * HORIZON_SECONDS
+        self.counts = [0] * (HORIZON_SECONDS * _N)
+
+    def bucket(self, second: int) -> int:
+        """Offset en `counts` de la cubeta del segundo dado (la recicla si es vieja)"""
+        slot = second % HORIZON_SECONDS
+        base = slot * _N
+        if self.stamps[slot] != second:
+            # Poner a cero antes de cambiar el stamp: un lector concurrente
+            # puede ver momentáneamente de menos, nunca contar dos veces
+            self.counts[base:base + _N] = [0] * _N
+            self.stamps[slot] = second
+        return base
+
+    def merged_with(self, other: '_Shard') -> '_Shard':
+        """Nuevo shard con la suma de ambos (para plegar hilos terminados)"""
+        merged = _Shard()
+        merged.totals = [a + b for a, b in zip(self.totals, other.totals)]
+        merged.stamps = list(self.stamps)
+        merged.counts = list(self.counts)
+        for slot, stamp in enumerate(other.stamps):
+            if stamp < 0:
+                continue
+            base = slot * _N
+            if merged.stamps[slot] == stamp:
+                for k in range(_N):
+                    merged.counts[base + k] += other.counts[base + k]
+            elif merged.stamps[slot] < stamp:
+                # La cubeta más vieja ya salió del horizonte
+                merged.stamps[slot] = stamp
+                merged.counts[base:base + _N] = other.counts[base:base + _N]
+        return merged
+
+
+class ServiceStats:
+    """
+    Estadísticas del servicio ML: totales y tasas móviles.
+
+    Escrituras (`record_prediction`, `record_batch`) sin locks; lecturas
+    (`totals`, `windows`) suman los shards de todos los hilos. Las lecturas
+    son consistentes a nivel de cada contador, no como foto atómica de
+    todos ellos.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            clock: Fuente de tiempo en segundos (inyectable para tests)
+        """
+        self._clock = clock
+        self._local = threading.local()
+        self._register_lock = threading.Lock()
+        # (shard retirado, shards vivos): se reemplaza entero para que los
+        # lectores nunca vean un hilo plegado y a la vez todavía en la lista
+        self._state: Tuple[_Shard, Tuple[_Shard, ...]] = (_Shard(), ())
+        self._baseline = (0,) * _N
+        self._window_floor = -1
+
+    # ------------------------------------------------------------------
+    # Escritura (camino caliente)
+    # ------------------------------------------------------------------
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            return self._register()
+
+    def _register(self) -> _Shard:
+        """Crea el shard del hilo actual y pliega los de hilos terminados"""
+        shard = _Shard(threading.current_thread())
+        with self._register_lock:
+            retired, shards = self._state
+            alive = []
+            for other in shards:
+                if other.thread.is_alive():
+                    alive.append(other)
+                else:
+                    retired = retired.merged_with(other)
+            alive.append(shard)
+            self._state = (retired, tuple(alive))
+        self._local.shard = shard
+        return shard
+
+    def record_prediction(self, alert_severity: Optional[str] = None,
+                          notified: bool = False):
+        """
+        Registra una predicción y, si la hubo, su alerta.
+
+        Args:
+            alert_severity: Severidad de la alerta generada (None si no hubo)
+            notified: Si la alerta se notificó a supervisores
+        """
+        shard = self._shard()
+        base = shard.bucket(int(self._clock()))
+        totals, counts = shard.totals, shard.counts
+
+        totals[_PREDICTIONS] += 1
+        counts[base + _PREDICTIONS] += 1
+
+        if alert_severity is not None:
+            totals[_ALERTS] += 1
+            counts[base + _ALERTS] += 1
+            index = _SEVERITY_INDEX.get(alert_severity)
+            if index is not None:
+                totals[index] += 1
+                counts[base + index] += 1
+            if notified:
+                totals[_NOTIFICATIONS] += 1
+                counts[base + _NOTIFICATIONS] += 1
+
+    def record_batch(self, predictions: int,
+                     alert_severities: Iterable[str] = (),
+                     notifications: int = 0):
+        """
+        Registra un lote completo con una sola actualización por contador.
+
+        Args:
+            predictions: Número de predicciones válidas del lote
+            alert_severities: Severidad de cada alerta generada
+            notifications: Número de alertas notificadas
+        """
+        increments = [0] * _N
+        increments[_PREDICTIONS] = predictions
+        increments[_NOTIFICATIONS] = notifications
+        for severity in alert_severities:
+            increments[_ALERTS] += 1
+            index = _SEVERITY_INDEX.get(severity)
+            if index is not None:
+                increments[index] += 1
+
+        shard = self._shard()
+        base = shard.bucket(int(self._clock()))
+        totals, counts = shard.totals, shard.counts
+        for k, amount in enumerate(increments):
+            if amount:
+                totals[k] += amount
+                counts[base + k] += amount
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def totals(self) -> Dict[str, int]:
+        """Totales desde el inicio (o desde el último `reset()`)"""
+        merged = self._merged_totals()
+        return {
+            name: merged[k] - self._baseline[k]
+            for k, name in enumerate(COUNTERS)
+        }
+
+    def windows(self) -> Dict[str, Dict[str, int]]:
+        """
+        Conteos de los últimos 1, 5 y 15 minutos.
+
+        Returns:
+            {'1m': {'total_predictions': ..., ...}, '5m': {...}, '15m': {...}}
+        """
+        now = int(self._clock())
+        floor = self._window_floor
+        sums = {label: [0] * _N for label, _ in WINDOWS}
+        limits = [(sums[label], now - seconds) for label, seconds in WINDOWS]
+
+        retired, shards = self._state
+        for shard in (retired,) + shards:
+            counts = shard.counts
+            for slot, stamp in enumerate(shard.stamps):
+                if stamp <= floor or stamp > now:
+                    continue
+                base = slot * _N
+                bucket = counts[base:base + _N]
+                for window_sums, oldest in limits:
+                    if stamp > oldest:
+                        for k in range(_N):
+                            window_sums[k] += bucket[k]
+
+        return {
+            label: dict(zip(COUNTERS, sums[label]))
+            for label, _ in WINDOWS
+        }
+
+    def reset(self):
+        """
+        Reinicia totales y ventanas.
+
+        No borra los shards (otros hilos podrían estar escribiendo): guarda
+        los totales actuales como línea base y descarta las cubetas hasta
+        el segundo actual inclusive.
+        """
+        self._baseline = tuple(self._merged_totals())
+        self._window_floor = int(self._clock())
+
+    def _merged_totals(self) -> list:
+        retired, shards = self._state
+        merged = list(retired.totals)
+        for shard in shards:
+            for k, value in enumerate(shard.totals):
+                merged[k] += value
+        return merged
@@ -0,0 +1,920 @@
+"""
+Tests del paquete ML de Artemis
+===============================
+
+Comprueban que los caminos optimizados (resultados con __slots__,
+predicción vectorizada, lotes columnar, clasificación por tabla, fachada
+async, sombra y estadísticas por hilo) devuelven lo mismo que la versión
+original lectura por lectura.
+
+Ejecutar desde la carpeta ML:
+    python -m unittest test_ml_service -v
+"""
+
+import asyncio
+import importlib.util
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+ML_DIR = Path(__file__).resolve().parent
+if str(ML_DIR) not in sys.path:
+    sys.path.insert(0, str(ML_DIR))
+
+from compiled_models import COMPILED_FILENAME, SOURCE_FILES, stale_sources  # noqa: E402
+from ml_predictor import HealthMonitorML  # noqa: E402
+from ml_results import PredictionResult  # noqa: E402
+
+HAS_SKLEARN = importlib.util.find_spec('sklearn') is not None
+
+_predictor = None
+
+
+def get_predictor() -> HealthMonitorML:
+    """Predictor compartido por los tests (cargar modelos una sola vez)"""
+    global _predictor
+    if _predictor is None:
+        _predictor = HealthMonitorML()
+    return _predictor
+
+
+def random_readings(n: int, seed: int = 0, max_history: int = 12):
+    """
+    Lecturas aleatorias con historiales de largo variable.
+
+    Returns:
+        tuple (heart_rates, histories): HR actuales y listas de historial
+        en orden cronológico (algunas vacías)
+    """
+    rng = np.random.default_rng(seed)
+    heart_rates = rng.uniform(30, 220, n).round(1)
+    histories = []
+    for hr in heart_rates:
+        length = int(rng.integers(0, max_history + 1))
+        # Paseo alrededor del HR actual con saltos ocasionales de más de 20 bpm
+        steps = rng.normal(0, 6, length) + rng.choice([0, 0, 0, -25, 25], length)
+        histories.append(np.clip(hr + np.cumsum(steps), 25, 250).round(1).tolist())
+    return heart_rates.tolist(), histories
+
+
+def baseline_predict(predictor: HealthMonitorML, heart_rate: float, recent_hrs=None):
+    """
+    Referencia: la predicción original lectura por lectura (antes de
+    `predict_columns`), con los modelos ya cargados en `predictor`.
+    """
+    # _calculate_features: relleno a la izquierda con el HR actual
+    hrs = list(recent_hrs) if recent_hrs else [heart_rate] * 10
+    if len(hrs) < 10:
+        hrs = [heart_rate] * (10 - len(hrs)) + hrs
+    hr_array = np.array(hrs[-10:])
+    hr_mean_5 = np.mean(hr_array[-5:])
+    hr_std_5 = np.std(hr_array[-5:])
+    hr_median = np.median(hr_array)
+    hr_variability = hr_std_5 / hr_mean_5 if hr_mean_5 > 0 else 0
+    rapid = min(sum(1 for i in range(9) if abs(hr_array[i + 1] - hr_array[i]) > 20), 5)
+    stress = (np.clip((heart_rate - 40) / 160, 0, 1) * 0.40
+              + (1 - np.clip(hr_variability * 10, 0, 1)) * 0.35
+              + rapid / 5.0 * 0.25) * 100
+    features = {
+        'heart_rate': heart_rate,
+        'hr_rolling_mean_5': hr_mean_5,
+        'hr_rolling_std_5': hr_std_5,
+        'hr_rolling_mean_10': np.mean(hr_array),
+        'hr_diff_abs': abs(hr_array[-1] - hr_array[-2]),
+        'hr_ratio_to_median': heart_rate / hr_median if hr_median > 0 else 1.0,
+        'hr_variability': hr_variability,
+        'hr_rapid_changes': rapid,
+        'stress_score': stress,
+    }
+    X = np.array([[features[c] for c in predictor.feature_columns]], dtype=np.float64)
+
+    # _calculate_stress_score: sin relleno; con menos de 5 valores, solo el HR actual
+    hrs = list(recent_hrs) if recent_hrs is not None and len(recent_hrs) >= 5 \
+        else [heart_rate] * 10
+    hr_array = np.array(hrs[-10:])
+    mean_5 = np.mean(hr_array[-5:])
+    variability = np.std(hr_array[-5:]) / mean_5 if mean_5 > 0 else 0
+    sudden = sum(1 for i in range(len(hr_array) - 1)
+                 if abs(hr_array[i + 1] - hr_array[i]) > 20)
+    stress_score = float(np.clip((np.clip((heart_rate - 60) / 40, 0, 2.5) * 0.40
+                                  + (1 - np.clip(variability * 10, 0, 1)) * 0.35
+                                  + sudden / 5.0 * 0.25) * 100, 0, 100))
+
+    X_scaled = predictor.scaler.transform(X)
+    anomaly_score = predictor.isolation_forest.decision_function(X_scaled)[0]
+    X_rf = predictor.scaler_rf.transform(X)
+    alert_probability = predictor.random_forest.predict_proba(X_rf)[0][1]
+
+    t = predictor.hr_thresholds
+    if heart_rate < t['critical_low'] or heart_rate > t['critical_high']:
+        severity = 'CRITICAL'
+    elif (alert_probability > 0.8 or stress_score > 85
+          or heart_rate < t['warning_low'] or heart_rate > t['warning_high']):
+        severity = 'HIGH'
+    elif alert_probability > 0.5 or stress_score > 50:
+        severity = 'MEDIUM'
+    else:
+        severity = 'LOW'
+
+    return {
+        'requires_alert': bool(predictor.random_forest.predict(X_rf)[0] == 1),
+        'stress_score': stress_score,
+        'severity': severity,
+        'alert_probability': float(alert_probability),
+        'is_anomaly': bool(predictor.isolation_forest.predict(X_scaled)[0] == -1),
+        'anomaly_score': float(anomaly_score),
+        'hr_variability': float(variability),
+        'hr_elevated_sustained': int(heart_rate > 100 and mean_5 > 100),
+        'hr_rapid_changes': sudden,
+        'features': X[0],
+    }
+
+
+def to_windows(histories):
+    """Historiales -> (windows, lengths) alineados a la izquierda"""
+    lengths = np.array([len(history) for history in histories], dtype=np.intp)
+    windows = np.zeros((len(histories), max(int(lengths.max()), 1)))
+    for row, history in enumerate(histories):
+        windows[row, :len(history)] = history
+    return windows, lengths
+
+
+class PredictionResultTest(unittest.TestCase):
+    """Registros con __slots__ y metadata perezosa (mismas claves que el dict original)"""
+
+    def setUp(self):
+        self.result = get_predictor().predict(
+            heart_rate=130, recent_hrs=[120, 125, 128, 130, 132, 128], user_id=7
+        )
+
+    def test_mapping_has_original_keys(self):
+        self.assertEqual(list(self.result), [
+            'requires_alert', 'stress_score', 'stress_level', 'severity',
+            'alert_probability', 'is_anomaly', 'hr_zone', 'metadata',
+        ])
+        self.assertEqual(dict(self.result), self.result.to_dict())
+        self.assertEqual(self.result['severity'], self.result.severity)
+        with self.assertRaises(KeyError):
+            self.result['features']
+
+    def test_metadata_is_built_once(self):
+        metadata = self.result['metadata']
+        self.assertIs(self.result['metadata'], metadata)
+        self.assertEqual(metadata['user_id'], 7)
+        self.assertEqual(metadata['heart_rate'], 130.0)
+        self.assertEqual(list(metadata['features']),
+                         list(get_predictor().feature_columns))
+
+    def test_feature_vector_reorders_and_fills(self):
+        columns = list(reversed(self.result.feature_columns)) + ['missing']
+        vector = self.result.feature_vector(columns)
+        features = self.result.features
+        np.testing.assert_array_equal(vector[:-1], [features[c] for c in columns[:-1]])
+        self.assertTrue(np.isnan(vector[-1]))
+
+    def test_slots_only(self):
+        self.assertFalse(hasattr(self.result, '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.result.extra = 1
+
+    def test_alert_payload_reads_prediction(self):
+        from alert_generator import AlertGenerator
+
+        prediction = get_predictor().predict(heart_rate=190, user_id=3)
+        alert = AlertGenerator().generate_alert(prediction, user_id=3)
+
+        self.assertIsInstance(prediction, PredictionResult)
+        self.assertEqual(alert['alert_type'], 'HR_CRITICAL_HIGH')
+        self.assertEqual(alert['heart_rate'], 190.0)
+        self.assertIs(alert.prediction, prediction)
+        self.assertIsInstance(alert['timestamp'], str)
+
+        data = alert.to_dict()
+        self.assertEqual(list(data), list(alert))
+        self.assertNotIn('ml_features', data['metadata'])
+        self.assertEqual(alert.to_dict(include_features=True)['metadata']['ml_features'],
+                         prediction.features)
+
+
+@unittest.skipUnless(HAS_SKLEARN, 'requiere sklearn')
+class CompiledModelsTest(unittest.TestCase):
+    """El .npz compilado equivale a sklearn y se descarta si los .pkl cambiaron"""
+
+    def setUp(self):
+        self.model_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.model_dir)
+        for name in SOURCE_FILES + ('model_config.pkl', COMPILED_FILENAME):
+            shutil.copy2(ML_DIR / name, self.model_dir / name)
+
+    def test_fresh_compiled_models_are_used(self):
+        self.assertEqual(stale_sources(self.model_dir / COMPILED_FILENAME), [])
+        self.assertEqual(HealthMonitorML(model_dir=self.model_dir).backend, 'compiled')
+
+    def test_stale_compiled_models_fall_back_to_sklearn(self):
+        # Bytes después del STOP de pickle: el modelo carga igual, la huella cambia
+        with open(self.model_dir / 'model_random_forest.pkl', 'ab') as f:
+            f.write(b'\n')
+
+        self.assertEqual(stale_sources(self.model_dir / COMPILED_FILENAME),
+                         ['model_random_forest.pkl'])
+        with self.assertLogs('ml_predictor', 'WARNING') as logs:
+            predictor = HealthMonitorML(model_dir=self.model_dir)
+        self.assertEqual(predictor.backend, 'sklearn')
+        self.assertIn('model_random_forest.pkl', logs.output[0])
+
+    def test_missing_source_is_not_stale(self):
+        (self.model_dir / 'model_scaler.pkl').unlink()
+        self.assertEqual(stale_sources(self.model_dir / COMPILED_FILENAME), [])
+
+    def test_compiled_matches_sklearn(self):
+        heart_rates, histories = random_readings(2000, seed=1)
+        windows, lengths = to_windows(histories)
+        compiled = get_predictor().predict_columns(heart_rates, windows, lengths)
+        sklearn = HealthMonitorML(use_compiled=False).predict_columns(
+            heart_rates, windows, lengths
+        )
+        for key in ('requires_alert', 'severity_code', 'is_anomaly'):
+            np.testing.assert_array_equal(compiled[key], sklearn[key], err_msg=key)
+        for key in ('alert_probability', 'anomaly_score'):
+            np.testing.assert_allclose(compiled[key], sklearn[key], rtol=0, atol=1e-12,
+                                       err_msg=key)
+
+
+
+class PredictColumnsTest(unittest.TestCase):
+    """predict_columns / analyze_columns equivalen a la versión lectura por lectura"""
+
+    @classmethod
+    def setUpClass(cls):
+        from ml_service import ml_service
+
+        cls.predictor = get_predictor()
+        cls.service = ml_service
+        cls.heart_rates, cls.histories = random_readings(400, seed=2)
+
+    def setUp(self):
+        self.service.configure_alert_cooldown(0)
+
+    def assert_matches_baseline(self, columns, row, expected):
+        from ml_results import SEVERITY_LEVELS
+
+        self.assertEqual(bool(columns['requires_alert'][row]), expected['requires_alert'])
+        self.assertEqual(bool(columns['is_anomaly'][row]), expected['is_anomaly'])
+        self.assertEqual(SEVERITY_LEVELS[columns['severity_code'][row]], expected['severity'])
+        self.assertEqual(int(columns['hr_rapid_changes'][row]), expected['hr_rapid_changes'])
+        self.assertEqual(int(columns['hr_elevated_sustained'][row]),
+                         expected['hr_elevated_sustained'])
+        for key in ('stress_score', 'alert_probability', 'anomaly_score', 'hr_variability'):
+            self.assertAlmostEqual(float(columns[key][row]), expected[key], places=9, msg=key)
+        np.testing.assert_allclose(columns['features'][row], expected['features'],
+                                   rtol=1e-12, atol=1e-12)
+
+    def test_predict_columns_matches_baseline(self):
+        windows, lengths = to_windows(self.histories)
+        columns = self.predictor.predict_columns(self.heart_rates, windows, lengths)
+        self.assertTrue(columns['valid'].all())
+        for row, (hr, history) in enumerate(zip(self.heart_rates, self.histories)):
+            with self.subTest(row=row, history=len(history)):
+                self.assert_matches_baseline(
+                    columns, row, baseline_predict(self.predictor, hr, history)
+                )
+
+    def test_predict_matches_baseline(self):
+        for hr, history in list(zip(self.heart_rates, self.histories))[:100]:
+            result = self.predictor.predict(hr, history or None)
+            expected = baseline_predict(self.predictor, hr, history)
+            self.assertEqual(result.severity, expected['severity'])
+            self.assertEqual(result.requires_alert, expected['requires_alert'])
+            self.assertAlmostEqual(result.stress_score, expected['stress_score'], places=9)
+
+    def test_predict_columns_without_history(self):
+        columns = self.predictor.predict_columns(self.heart_rates)
+        for row, hr in enumerate(self.heart_rates[:50]):
+            self.assert_matches_baseline(columns, row, baseline_predict(self.predictor, hr))
+
+    def test_out_of_range_rows_are_invalid(self):
+        columns = self.predictor.predict_columns([10.0, 75.0, 350.0])
+        np.testing.assert_array_equal(columns['valid'], [False, True, False])
+        np.testing.assert_array_equal(columns['severity_code'][[0, 2]], [-1, -1])
+        self.assertTrue(np.isnan(columns['alert_probability'][0]))
+
+    def test_analyze_columns_matches_analyze_biometric_data(self):
+        n = len(self.heart_rates)
+        user_ids = np.arange(1, n + 1)
+        windows, lengths = to_windows(self.histories)
+        batch = self.service.analyze_columns(
+            user_ids, self.heart_rates, windows, lengths=lengths, with_predictions=True
+        )
+
+        self.assertTrue(batch['alerts'])
+        alerts = dict(zip(batch['alert_rows'].tolist(), batch['alerts']))
+        for row in range(n):
+            single = self.service.analyze_biometric_data(
+                heart_rate=self.heart_rates[row], user_id=int(user_ids[row]),
+                recent_hrs=self.histories[row] or None
+            )
+            prediction = batch['predictions'][row]
+            self.assertEqual(prediction.to_dict(), single['prediction'].to_dict())
+            self.assertEqual(bool(batch['should_notify'][row]), single['should_notify'])
+            alert = alerts.get(row)
+            if single['alert'] is None:
+                self.assertIsNone(alert)
+            else:
+                self.assertEqual(
+                    (alert.alert_type, alert.severity, alert.message),
+                    (single['alert'].alert_type, single['alert'].severity,
+                     single['alert'].message)
+                )
+
+    def test_analyze_columns_invalid_rows(self):
+        result = self.service.analyze_columns(
+            np.array([1, 0, 3]), np.array([75.0, 75.0, 10.0]), with_predictions=True
+        )
+        np.testing.assert_array_equal(result['valid'], [True, False, False])
+        np.testing.assert_array_equal(result['severity_code'][1:], [-1, -1])
+        self.assertIsNone(result['predictions'][1])
+        self.assertEqual(result['alerts'], [])
+
+
+
+class AsyncServiceTest(unittest.TestCase):
+    """La fachada async devuelve lo mismo que el servicio síncrono"""
+
+    def setUp(self):
+        from ml_service import ml_service
+
+        self.service = ml_service
+        self.service.configure_alert_cooldown(0)
+
+    def run_async(self, coalesce, readings, **options):
+        from ml_async import AsyncMLHealthMonitoringService
+
+        facade = AsyncMLHealthMonitoringService(self.service, coalesce=coalesce, **options)
+        self.addCleanup(facade.shutdown)
+
+        async def main():
+            return await asyncio.gather(*(
+                facade.analyze_biometric_data(heart_rate=hr, user_id=user_id,
+                                              recent_hrs=history)
+                for user_id, hr, history in readings
+            ), return_exceptions=True)
+
+        return asyncio.run(main())
+
+    def readings(self, n=60):
+        heart_rates, histories = random_readings(n, seed=3)
+        return [(row + 1, hr, history or None)
+                for row, (hr, history) in enumerate(zip(heart_rates, histories))]
+
+    def assert_same_result(self, result, expected):
+        self.assertEqual(result['prediction'].to_dict(), expected['prediction'].to_dict())
+        self.assertEqual(result['should_notify'], expected['should_notify'])
+        if expected['alert'] is None:
+            self.assertIsNone(result['alert'])
+        else:
+            self.assertEqual(result['alert'].to_dict(include_features=True) | {'timestamp': None},
+                             expected['alert'].to_dict(include_features=True) | {'timestamp': None})
+
+    def test_results_match_sync(self):
+        readings = self.readings()
+        expected = [self.service.analyze_biometric_data(hr, user_id, history)
+                    for user_id, hr, history in readings]
+        for coalesce in (False, True):
+            with self.subTest(coalesce=coalesce):
+                results = self.run_async(coalesce, readings, max_batch_size=16)
+                for result, single in zip(results, expected):
+                    self.assert_same_result(result, single)
+
+    def test_coalesced_invalid_reading_fails_alone(self):
+        results = self.run_async(True, [(1, 75.0, None), (0, 75.0, None), (2, 10.0, None)])
+        self.assertEqual(results[0]['prediction'].severity, 'LOW')
+        self.assertIsInstance(results[1], ValueError)
+        self.assertIsInstance(results[2], ValueError)
+
+    def test_max_concurrency(self):
+        from ml_async import AsyncMLHealthMonitoringService
+
+        class SlowService:
+            running = peak = 0
+            lock = threading.Lock()
+
+            def analyze_columns(self, *args, **kwargs):
+                with self.lock:
+                    SlowService.running += 1
+                    SlowService.peak = max(SlowService.peak, SlowService.running)
+                time.sleep(0.02)
+                with self.lock:
+                    SlowService.running -= 1
+                return {}
+
+        facade = AsyncMLHealthMonitoringService(SlowService(), max_concurrency=2)
+        self.addCleanup(facade.shutdown)
+
+        async def main():
+            await asyncio.gather(*(facade.analyze_columns([1], [75.0]) for _ in range(8)))
+
+        asyncio.run(main())
+        self.assertEqual(SlowService.peak, 2)
+
+
+
+class FakeClock:
+    """Reloj manual para ServiceStats y AlertCooldown"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ServiceStatsTest(unittest.TestCase):
+    """Totales y ventanas de 1/5/15 minutos con shards por hilo"""
+
+    def setUp(self):
+        from service_stats import ServiceStats
+
+        self.clock = FakeClock()
+        self.stats = ServiceStats(clock=self.clock)
+
+    def window_counts(self, counter='total_predictions'):
+        windows = self.stats.windows()
+        return tuple(windows[label][counter] for label in ('1m', '5m', '15m'))
+
+    def test_windows_roll_over(self):
+        self.stats.record_prediction('CRITICAL', notified=True)
+        self.clock.now += 30
+        self.stats.record_prediction()
+        self.assertEqual(self.window_counts(), (2, 2, 2))
+        self.assertEqual(self.window_counts('critical_alerts'), (1, 1, 1))
+
+        self.clock.now += 40       # la primera ya tiene 70 s
+        self.assertEqual(self.window_counts(), (1, 2, 2))
+        self.clock.now += 240      # 310 s la primera, 280 s la segunda
+        self.assertEqual(self.window_counts(), (0, 1, 2))
+        self.clock.now += 620
+        self.assertEqual(self.window_counts(), (0, 0, 0))
+
+        totals = self.stats.totals()
+        self.assertEqual(totals['total_predictions'], 2)
+        self.assertEqual(totals['notifications'], 1)
+
+    def test_recycled_bucket_starts_from_zero(self):
+        self.stats.record_batch(5, ['HIGH', 'LOW'], notifications=1)
+        # Mismo slot del ring buffer, 15 minutos después
+        self.clock.now += 900
+        self.stats.record_prediction()
+        self.assertEqual(self.window_counts(), (1, 1, 1))
+        self.assertEqual(self.window_counts('total_alerts_generated'), (0, 0, 0))
+        self.assertEqual(self.stats.totals()['total_predictions'], 6)
+
+    def test_reset(self):
+        self.stats.record_batch(3, ['MEDIUM'])
+        self.stats.reset()
+        self.assertEqual(self.window_counts(), (0, 0, 0))
+        self.assertEqual(self.stats.totals()['total_predictions'], 0)
+        self.clock.now += 1
+        self.stats.record_prediction('MEDIUM')
+        self.assertEqual(self.stats.totals()['medium_alerts'], 1)
+        self.assertEqual(self.window_counts(), (1, 1, 1))
+
+    def test_threads_are_counted_and_folded(self):
+        def work():
+            for _ in range(1000):
+                self.stats.record_prediction('LOW')
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.stats.totals()['total_predictions'], 4000)
+
+        # Un hilo nuevo pliega los terminados en el shard retirado
+        worker = threading.Thread(target=self.stats.record_prediction)
+        worker.start()
+        worker.join()
+        retired, alive = self.stats._state
+        self.assertEqual(len(alive), 1)
+        self.assertEqual(retired.totals[0], 4000)
+        self.assertEqual(self.stats.totals()['low_alerts'], 4000)
+        self.assertEqual(self.window_counts(), (4001, 4001, 4001))
+
+
+
+class ShadowEvaluatorTest(unittest.TestCase):
+    """La sombra compara sin bloquear y descarta muestras si se atrasa"""
+
+    def evaluator(self, candidate, **options):
+        from ml_shadow import ShadowEvaluator
+
+        options.setdefault('duty_cycle', 1.0)
+        options.setdefault('poll_interval', 0.005)
+        evaluator = ShadowEvaluator(candidate, **options)
+        self.addCleanup(evaluator.stop)
+        return evaluator
+
+    def offer_batch(self, evaluator, n=300):
+        predictor = get_predictor()
+        heart_rates, histories = random_readings(n, seed=4)
+        windows, lengths = to_windows(histories)
+        columns = predictor.predict_columns(heart_rates, windows, lengths)
+        evaluator.offer_columns(heart_rates, windows, lengths, columns,
+                                columns['valid'], production_latency=0.01)
+        return n
+
+    def test_same_model_agrees(self):
+        evaluator = self.evaluator(get_predictor())
+        n = self.offer_batch(evaluator)
+        evaluator.offer(130.0, [120, 125, 128, 130, 132],
+                        get_predictor().predict(130.0, [120, 125, 128, 130, 132]))
+        evaluator.stop()
+
+        report = evaluator.report()
+        self.assertFalse(report['running'])
+        self.assertEqual((report['sampled'], report['scored'], report['errors']),
+                         (n + 1, n + 1, 0))
+        self.assertEqual(report['agreement'], {'requires_alert': 1.0, 'severity': 1.0})
+        self.assertEqual(report['stress_score_abs_diff']['max'], 0.0)
+        self.assertEqual(report['requires_alert_confusion']['candidate_only'], 0)
+
+    def test_failing_candidate_counts_errors(self):
+        class Broken:
+            def predict_columns(self, *args):
+                raise RuntimeError('candidato roto')
+
+        evaluator = self.evaluator(Broken())
+        n = self.offer_batch(evaluator, 20)
+        with self.assertLogs('ml_shadow', 'ERROR'):
+            evaluator.stop()
+        report = evaluator.report()
+        self.assertEqual((report['scored'], report['errors']), (0, n))
+
+    def test_full_queue_drops_oldest(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        class Blocked:
+            def predict_columns(self, heart_rates, windows, lengths):
+                started.set()
+                release.wait(5)
+                return get_predictor().predict_columns(heart_rates, windows, lengths)
+
+        evaluator = self.evaluator(Blocked(), max_queue=5, batch_size=1)
+        evaluator.offer(75.0, None, get_predictor().predict(75.0))
+        self.assertTrue(started.wait(5))
+
+        # El hilo está ocupado: la cola acotada descarta las más viejas
+        for _ in range(8):
+            evaluator.offer(75.0, None, get_predictor().predict(75.0))
+        report = evaluator.report()
+        self.assertEqual((report['sampled'], report['dropped'], report['queue_size']), (9, 3, 5))
+
+        release.set()
+        evaluator.stop()
+        report = evaluator.report()
+        self.assertEqual(report['scored'], 6)
+        # Leer el reporte no cambia los contadores
+        self.assertEqual((report['sampled'], report['dropped']), (9, 3))
+
+    def test_sample_rate_zero_skips_everything(self):
+        evaluator = self.evaluator(get_predictor(), sample_rate=0.0)
+        self.offer_batch(evaluator, 50)
+        evaluator.stop()
+        self.assertEqual(evaluator.report()['sampled'], 0)
+
+
+
+def baseline_classify(t, hr, stress_score, is_anomaly, alert_probability,
+                      hr_elevated_sustained, hr_rapid_changes):
+    """Referencia: la cadena de if original de `_classify_alert`"""
+    if hr < t['hr_critical_low']:
+        return 'HR_CRITICAL_LOW', 'CRITICAL'
+    if hr > t['hr_critical_high']:
+        return 'HR_CRITICAL_HIGH', 'CRITICAL'
+    if hr == 0:
+        return 'HR_ZERO', 'CRITICAL'
+    if stress_score >= t['stress_critical']:
+        return 'STRESS_CRITICAL', 'HIGH'
+    if stress_score >= t['stress_high']:
+        return 'STRESS_HIGH_RISK', 'HIGH'
+    if hr > t['hr_warning_high']:
+        return 'HR_ABNORMALLY_HIGH', 'HIGH'
+    if hr < t['hr_warning_low']:
+        return 'HR_ABNORMALLY_LOW', 'HIGH'
+    if stress_score >= t['stress_medium']:
+        return 'STRESS_ELEVATED', 'MEDIUM'
+    if hr_elevated_sustained == 1:
+        return 'HR_SUSTAINED_ELEVATED', 'MEDIUM'
+    if hr_rapid_changes >= 3:
+        return 'HR_RAPID_FLUCTUATION', 'MEDIUM'
+    if is_anomaly and alert_probability > t['anomaly_threshold']:
+        return 'ANOMALY_DETECTED', 'MEDIUM'
+    if alert_probability > 0.7:
+        return 'ML_PREDICTION_ALERT', 'MEDIUM'
+    return None, None
+
+
+class ClassifyBatchTest(unittest.TestCase):
+    """classify_batch y _classify_alert dan el (tipo, severidad) de la cadena de if original"""
+
+    def setUp(self):
+        from alert_generator import AlertGenerator
+
+        self.generator = AlertGenerator()
+
+    def random_columns(self, n, seed):
+        rng = np.random.default_rng(seed)
+        t = self.generator.thresholds
+        # Valores continuos y exactamente en los umbrales (comparaciones >= / >)
+        edges_hr = [0.0, t['hr_critical_low'], t['hr_critical_high'],
+                    t['hr_warning_low'], t['hr_warning_high']]
+        edges_stress = [t['stress_critical'], t['stress_high'], t['stress_medium']]
+        return {
+            'heart_rate': np.where(rng.random(n) < 0.2, rng.choice(edges_hr, n),
+                                   rng.uniform(20, 220, n)),
+            'stress_score': np.where(rng.random(n) < 0.2, rng.choice(edges_stress, n),
+                                     rng.uniform(0, 100, n)),
+            'alert_probability': np.where(rng.random(n) < 0.1,
+                                          rng.choice([0.7, t['anomaly_threshold']], n),
+                                          rng.random(n)),
+            'is_anomaly': rng.random(n) < 0.3,
+            'hr_elevated_sustained': rng.integers(0, 2, n).astype(np.int8),
+            'hr_rapid_changes': rng.integers(0, 7, n),
+            'requires_alert': rng.random(n) < 0.7,
+        }
+
+    def assert_matches_scalar(self, columns):
+        from ml_results import ALERT_TYPES, SEVERITY_LEVELS
+
+        type_code, severity_code = self.generator.classify_batch(columns)
+        self.assertEqual((type_code.dtype, severity_code.dtype), (np.int8, np.int8))
+        for row in range(len(type_code)):
+            values = dict(
+                hr=columns['heart_rate'][row],
+                stress_score=columns['stress_score'][row],
+                is_anomaly=columns['is_anomaly'][row],
+                alert_probability=columns['alert_probability'][row],
+                hr_elevated_sustained=columns['hr_elevated_sustained'][row],
+                hr_rapid_changes=columns['hr_rapid_changes'][row],
+            )
+            expected = baseline_classify(self.generator.thresholds, **values)
+            self.assertEqual(self.generator._classify_alert(**values), expected,
+                             msg=f'fila {row}')
+
+            if not columns['requires_alert'][row]:
+                expected = (None, None)
+            got = (ALERT_TYPES[type_code[row]],
+                   SEVERITY_LEVELS[severity_code[row]] if severity_code[row] >= 0 else None)
+            self.assertEqual(got, expected, msg=f'fila {row}')
+
+    def test_matches_scalar_classification(self):
+        self.assert_matches_scalar(self.random_columns(5000, seed=5))
+
+    def test_matches_after_threshold_update(self):
+        self.generator.update_thresholds({'hr_warning_high': 120, 'stress_high': 60})
+        self.assert_matches_scalar(self.random_columns(2000, seed=6))
+
+    def test_explicit_mask(self):
+        columns = self.random_columns(100, seed=7)
+        mask = np.zeros(100, dtype=bool)
+        mask[::10] = True
+        type_code, severity_code = self.generator.classify_batch(columns, mask)
+        self.assertFalse(type_code[~mask].any())
+        self.assertTrue((severity_code[~mask] == -1).all())
+
+
+
+class AlertMessageTest(unittest.TestCase):
+    """Mensajes renderizados al leerlos, con el mismo texto que el formateo original"""
+
+    def setUp(self):
+        from alert_generator import AlertGenerator
+
+        self.generator = AlertGenerator()
+
+    def alert(self, heart_rate, recent_hrs=None):
+        prediction = get_predictor().predict(heart_rate, recent_hrs)
+        alert_type, severity = self.generator._classify_alert(
+            hr=prediction.heart_rate, stress_score=prediction.stress_score,
+            is_anomaly=prediction.is_anomaly,
+            alert_probability=prediction.alert_probability,
+            hr_elevated_sustained=prediction.hr_elevated_sustained,
+            hr_rapid_changes=prediction.hr_rapid_changes
+        )
+        if alert_type is None:
+            return prediction, None
+        return prediction, self.generator.build_alert(
+            prediction, 1, alert_type, severity
+        )
+
+    def threshold_alert(self, heart_rate):
+        # Con HR de 150+ el estrés satura y gana STRESS_CRITICAL; armar la alerta a mano
+        return self.generator.build_alert(
+            get_predictor().predict(heart_rate), 1, 'HR_ABNORMALLY_HIGH', 'HIGH'
+        )
+
+    def test_message_is_rendered_on_read(self):
+        alert = self.threshold_alert(160.0)
+        self.assertEqual(alert.alert_type, 'HR_ABNORMALLY_HIGH')
+        self.assertIsNone(alert._message)
+        self.assertEqual(
+            alert.message,
+            'FRECUENCIA CARDÍACA ANORMALMENTE ALTA: 160 bpm. '
+            'Por encima del umbral de advertencia (150 bpm).'
+        )
+        self.assertEqual(alert['message'], alert.message)
+
+    def test_message_matches_eager_format(self):
+        from alert_generator import ALERT_MESSAGES
+
+        heart_rates, histories = random_readings(200, seed=8)
+        seen = set()
+        for hr, history in zip(heart_rates, histories):
+            prediction, alert = self.alert(hr, history or None)
+            if alert is None:
+                continue
+            seen.add(alert.alert_type)
+            message_format, action_required = ALERT_MESSAGES[alert.alert_type]
+            expected = message_format.format(
+                hr=hr, stress_score=prediction.stress_score,
+                stress_level=prediction.stress_level,
+                alert_probability=prediction.alert_probability,
+                rapid_changes=prediction.hr_rapid_changes,
+                **self.generator.thresholds
+            )
+            self.assertEqual(alert.message, expected)
+            self.assertEqual(alert.action_required, action_required)
+        self.assertGreater(len(seen), 3)
+
+    def test_templates_are_shared_and_reset_by_threshold_update(self):
+        first = self.threshold_alert(160.0)
+        second = self.threshold_alert(165.0)
+        self.assertIs(first.template, second.template)
+
+        self.generator.update_thresholds({'hr_warning_high': 155})
+        third = self.threshold_alert(160.0)
+        self.assertIn('(155 bpm)', third.message)
+        # Las alertas ya emitidas conservan el umbral con el que se generaron
+        self.assertIn('(150 bpm)', first.message)
+
+
+
+class AlertCooldownTest(unittest.TestCase):
+    """Supresión por (oficial, tipo) con el tiempo de las lecturas"""
+
+    def setUp(self):
+        from alert_cooldown import AlertCooldown
+
+        self.clock = FakeClock()
+        self.cooldown = AlertCooldown(60, clock=self.clock)
+
+    def admit(self, at, severity=2, user_id=1, alert_type='HR_ABNORMALLY_HIGH'):
+        return self.cooldown.admit(user_id, alert_type, severity, now=at)
+
+    def test_repeats_are_suppressed_and_counted(self):
+        self.assertEqual(self.admit(0), 0)
+        self.assertIsNone(self.admit(10))
+        self.assertIsNone(self.admit(59))
+        # Otro oficial u otro tipo no comparten cooldown
+        self.assertEqual(self.admit(10, user_id=2), 0)
+        self.assertEqual(self.admit(10, alert_type='STRESS_CRITICAL'), 0)
+        # La primera tras el cooldown lleva la cuenta de las suprimidas
+        self.assertEqual(self.admit(60), 2)
+        self.assertIsNone(self.admit(61))
+        self.assertEqual(self.cooldown.stats()['suppressed_total'], 3)
+
+    def test_escalation_bypasses_cooldown(self):
+        self.assertEqual(self.admit(0, severity=2), 0)
+        self.assertIsNone(self.admit(5, severity=1))
+        self.assertEqual(self.admit(10, severity=3), 1)
+        # El nuevo cooldown corre desde la escalada y con su severidad
+        self.assertIsNone(self.admit(20, severity=3))
+        self.assertEqual(self.admit(70, severity=2), 1)
+
+    def test_entries_expire_after_two_cooldowns(self):
+        self.assertEqual(self.admit(0), 0)
+        self.assertIsNone(self.admit(30))
+        # Episodio terminado: la cuenta de suprimidas se descarta
+        self.assertEqual(self.admit(120), 0)
+        self.assertEqual(self.cooldown.stats()['tracked'], 1)
+
+    def test_late_reading_does_not_replace_newer_emission(self):
+        self.assertEqual(self.admit(1000), 0)
+        self.assertIsNone(self.admit(970))
+        self.assertEqual(self.admit(900), 0)
+        # El estado sigue siendo el de la emisión en 1000
+        self.assertIsNone(self.admit(1050))
+        self.assertEqual(self.admit(1060), 2)
+
+    def test_revoke_restores_previous_emission(self):
+        self.assertEqual(self.admit(0), 0)
+        self.assertIsNone(self.admit(30))
+        self.assertEqual(self.admit(60), 1)
+        # La alerta de 60 no se guardó: la lectura reintentada se emite
+        # con la misma cuenta de suprimidas
+        self.assertTrue(self.cooldown.revoke(1, 'HR_ABNORMALLY_HIGH', 60))
+        self.assertEqual(self.admit(60), 1)
+        # Solo se deshace la última emisión de la clave
+        self.assertFalse(self.cooldown.revoke(1, 'HR_ABNORMALLY_HIGH', 0))
+        self.assertTrue(self.cooldown.revoke(1, 'HR_ABNORMALLY_HIGH', 60))
+        self.assertTrue(self.cooldown.revoke(1, 'HR_ABNORMALLY_HIGH', 0))
+        self.assertEqual(self.cooldown.stats()['tracked'], 0)
+
+    def test_clock_when_no_timestamp(self):
+        self.assertEqual(self.cooldown.admit(1, 'HR_ZERO', 3), 0)
+        self.clock.now += 30
+        self.assertIsNone(self.cooldown.admit(1, 'HR_ZERO', 3))
+        self.assertIsNone(self.admit(self.clock.now + 20, severity=3, alert_type='HR_ZERO'))
+
+    def test_max_tracked(self):
+        from alert_cooldown import AlertCooldown
+
+        cooldown = AlertCooldown(60, max_tracked=2, clock=self.clock)
+        for user_id in (1, 2, 3):
+            cooldown.admit(user_id, 'HR_ZERO', 3, now=user_id)
+        self.assertEqual(cooldown.stats()['tracked'], 2)
+        # La clave más vieja se descartó: vuelve a emitirse
+        self.assertEqual(cooldown.admit(1, 'HR_ZERO', 3, now=10), 0)
+
+    def test_timestamp_seconds(self):
+        from datetime import datetime, timezone
+        from alert_cooldown import timestamp_seconds
+
+        moment = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+        expected = moment.timestamp()
+        self.assertEqual(timestamp_seconds(moment), expected)
+        self.assertEqual(timestamp_seconds(moment.isoformat()), expected)
+        self.assertEqual(timestamp_seconds(np.datetime64('2026-01-01T12:00:00')), expected)
+        self.assertEqual(timestamp_seconds(expected), expected)
+        self.assertIsNone(timestamp_seconds('ayer'))
+        self.assertIsNone(timestamp_seconds(None))
+
+
+class ServiceCooldownTest(unittest.TestCase):
+    """El servicio aplica el cooldown con el timestamp de cada lectura"""
+
+    START = np.datetime64('2026-01-01T08:00:00')
+
+    def setUp(self):
+        from ml_service import ml_service
+
+        self.service = ml_service
+        self.service.configure_alert_cooldown(60)
+        self.addCleanup(self.service.configure_alert_cooldown, 0)
+
+    def stamps(self, *offsets):
+        return [str(self.START + np.timedelta64(offset, 's')) + '+00:00' for offset in offsets]
+
+    def test_backlog_uses_reading_time(self):
+        # Dos minutos de un episodio, una lectura cada 10 s, procesados de golpe
+        offsets = list(range(0, 130, 10))
+        emitted = [
+            self.service.analyze_biometric_data(190, 1, timestamp=stamp)['alert']
+            for stamp in self.stamps(*offsets)
+        ]
+        self.assertEqual([offset for offset, alert in zip(offsets, emitted) if alert],
+                         [0, 60, 120])
+        self.assertEqual([alert.suppressed_count for alert in emitted if alert], [0, 5, 5])
+
+    def test_columns_are_admitted_in_timestamp_order(self):
+        result = self.service.analyze_columns(
+            np.array([7, 7, 7, 8]), np.array([190.0, 190.0, 190.0, 190.0]),
+            timestamps=self.stamps(30, 0, 90, 30)
+        )
+        np.testing.assert_array_equal(result['alert_rows'], [1, 2, 3])
+        np.testing.assert_array_equal(result['suppressed'], [True, False, False, False])
+        self.assertEqual([alert.suppressed_count for alert in result['alerts']], [0, 1, 0])
+        self.assertEqual(result['alerts'][0].timestamp, self.stamps(0)[0])
+
+    def test_revoked_alerts_are_emitted_again(self):
+        stamps = self.stamps(0, 10)
+        result = self.service.analyze_columns(
+            np.array([10, 10]), np.array([190.0, 190.0]), timestamps=stamps
+        )
+        self.assertEqual(len(result['alerts']), 1)
+        # La transacción que guardaba el lote se revirtió: el reintento
+        # produce las mismas alertas
+        self.service.revoke_alerts(result['alerts'])
+        retry = self.service.analyze_columns(
+            np.array([10, 10]), np.array([190.0, 190.0]), timestamps=stamps
+        )
+        np.testing.assert_array_equal(retry['alert_rows'], result['alert_rows'])
+
+    def test_columns_with_datetime64(self):
+        timestamps = self.START + np.array([50, 0, 10], dtype='timedelta64[s]')
+        result = self.service.analyze_columns(
+            np.array([9, 9, 9]), np.array([190.0, 190.0, 190.0]), timestamps=timestamps
+        )
+        np.testing.assert_array_equal(result['alert_rows'], [1])
+        self.assertEqual(int(result['suppressed'].sum()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,279 @@
+"""
+Incident aggregation for alert storms.
+
+When a whole unit goes into a high-stress operation, every officer produces
+the same alert at about the same time. `IncidentAggregator` sits after the
+ML alert generator and groups alerts of the same type for officers under
+the same supervisor into one `Incident`:
+
+- An incident stays open while its alerts keep arriving within
+  `window_seconds` of the previous one (sliding window, in memory).
+- The first alert opens the incident; later ones join it. Only opening and
+  escalation (a member with a higher level) are meant to notify, so
+  notification fan-out scales with incidents instead of readings.
+- Member alerts are created with `incident_id` already set. `record()`
+  adds them to the incident row (`alert_count`, `last_alert_at`, `level`)
+  with one UPDATE per incident in the caller's transaction, so the counts
+  commit or roll back together with the alerts.
+
+State is per process and guarded by a lock that is never held across a
+query. On a window miss the aggregator looks for a matching open incident
+in the database before creating one, so workers join each other's
+incidents (two workers opening the same incident at the very same moment
+may still create one each).
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from apps.users.models import SupervisorAssignment
+from .models import Incident
+
+LEVEL_RANK = {'Low': 0, 'Medium': 1, 'High': 2, 'Critical': 3}
+
+
+@dataclass
+class IncidentAssignment:
+    """Incident an alert belongs to and whether supervisors must be notified."""
+    incident_id: int
+    opened: bool = False
+    escalated: bool = False
+    level: Optional[str] = None
+    alert_at: Optional[datetime] = None
+
+    @property
+    def notify(self):
+        return self.opened or self.escalated
+
+
+class _OpenIncident:
+    """In-memory state of an open incident."""
+
+    __slots__ = ('incident_id', 'level', 'last_seen')
+
+    def __init__(self, incident_id, level, now):
+        self.incident_id = incident_id
+        self.level = level
+        self.last_seen = now
+
+
+class IncidentAggregator:
+    """Groups alerts by (supervisor, alert type) in a sliding time window."""
+
+    def __init__(self, window_seconds=300, supervisor_cache_seconds=300,
+                 clock=time.monotonic):
+        self.window_seconds = window_seconds
+        self.supervisor_cache_seconds = supervisor_cache_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._open: Dict[Tuple[int, int], _OpenIncident] = {}
+        # Keys whose incident is being looked up or created
+        self._opening: Dict[Tuple[int, int], threading.Lock] = {}
+        self._supervisors: Dict[int, Tuple[Optional[int], float]] = {}
+
+    def supervisor_for(self, officer_id):
+        """Active supervisor of an officer (cached), or None."""
+        now = self._clock()
+        cached = self._supervisors.get(officer_id)
+        if cached is not None and now - cached[1] < self.supervisor_cache_seconds:
+            return cached[0]
+
+        supervisor_id = (
+            SupervisorAssignment.objects
+            .filter(officer_id=officer_id, end_date__isnull=True)
+            .order_by('-start_date')
+            .values_list('supervisor_id', flat=True)
+            .first()
+        )
+        self._supervisors[officer_id] = (supervisor_id, now)
+        return supervisor_id
+
+    def prefetch_supervisors(self, officer_ids):
+        """Load the supervisors of many officers with a single query."""
+        now = self._clock()
+        missing = [
+            officer_id for officer_id in set(officer_ids)
+            if officer_id not in self._supervisors
+            or now - self._supervisors[officer_id][1] >= self.supervisor_cache_seconds
+        ]
+        if not missing:
+            return
+        found = dict(
+            SupervisorAssignment.objects
+            .filter(officer_id__in=missing, end_date__isnull=True)
+            .order_by('officer_id', '-start_date')
+            .distinct('officer_id')
+            .values_list('officer_id', 'supervisor_id')
+        )
+        for officer_id in missing:
+            self._supervisors[officer_id] = (found.get(officer_id), now)
+
+    def assign(self, officer_id, alert_type_id, level, alert_at=None):
+        """
+        Find or open the incident for a new alert.
+
+        Args:
+            officer_id: Officer that raised the alert
+            alert_type_id: AlertType id
+            level: Alert level ('Low' ... 'Critical')
+            alert_at: When the alert happened (defaults to now)
+
+        Returns:
+            IncidentAssignment, or None when the officer has no active
+            supervisor (the alert then stands on its own). Member
+            assignments must be passed to `record()` in the transaction
+            that creates their alerts.
+        """
+        supervisor_id = self.supervisor_for(officer_id)
+        if supervisor_id is None:
+            return None
+
+        key = (supervisor_id, alert_type_id)
+        alert_at = alert_at or timezone.now()
+
+        with self._lock:
+            self._expire(self._clock())
+            state = self._open.get(key)
+            if state is None:
+                opening = self._opening.setdefault(key, threading.Lock())
+
+        if state is None:
+            # Window miss: query or create the incident holding only this
+            # key's lock, so alerts for other incidents are not blocked
+            with opening:
+                with self._lock:
+                    state = self._open.get(key)
+                if state is None:
+                    state, opened = self._open_incident(key, level, alert_at, self._clock())
+                    with self._lock:
+                        self._open[key] = state
+                        self._opening.pop(key, None)
+                    if opened:
+                        return IncidentAssignment(state.incident_id, opened=True)
+                    # Otherwise another worker opened it: join as a member
+
+        with self._lock:
+            state.last_seen = self._clock()
+            # state.level only changes once record() commits
+            escalated = LEVEL_RANK.get(level, 0) > LEVEL_RANK.get(state.level, 0)
+            return IncidentAssignment(state.incident_id, escalated=escalated,
+                                      level=level, alert_at=alert_at)
+
+    def record(self, assignments: Iterable[Optional[IncidentAssignment]]) -> Set[int]:
+        """
+        Add member alerts to their incidents, one UPDATE per incident.
+
+        Must run in the transaction that creates the alerts: the UPDATE
+        locks the incident row until commit, and a rollback undoes the
+        counts with the alerts. Escalated levels reach the in-memory state
+        on commit, so a rolled back escalation is notified again.
+
+        Returns:
+            Ids of incidents that no longer exist (their alerts must be
+            created standalone)
+        """
+        members = {}
+        for assignment in assignments:
+            # None: no supervisor; opened: created with alert_count=1
+            if assignment is None or assignment.opened:
+                continue
+            count, last_alert_at, level = members.get(
+                assignment.incident_id, (0, assignment.alert_at, None)
+            )
+            if assignment.escalated and (
+                    level is None or LEVEL_RANK[assignment.level] > LEVEL_RANK[level]):
+                level = assignment.level
+            members[assignment.incident_id] = (
+                count + 1, max(last_alert_at, assignment.alert_at), level
+            )
+
+        missing = set()
+        escalated = {}
+        now = timezone.now()
+        for incident_id, (count, last_alert_at, level) in members.items():
+            changes = {
+                'alert_count': F('alert_count') + count,
+                # Other workers may have recorded later alerts
+                'last_alert_at': Greatest('last_alert_at', Value(last_alert_at)),
+                'updated_at': now,
+            }
+            if level is not None:
+                changes['level'] = level
+            if not Incident.objects.filter(pk=incident_id).update(**changes):
+                missing.add(incident_id)
+            elif level is not None:
+                escalated[incident_id] = level
+        for incident_id in missing:
+            self.discard(incident_id)
+        if escalated:
+            transaction.on_commit(lambda: self._escalate(escalated))
+        return missing
+
+    def _escalate(self, levels):
+        """Raise the in-memory level of open incidents ({incident_id: level})."""
+        with self._lock:
+            for state in self._open.values():
+                level = levels.get(state.incident_id)
+                if level is not None and LEVEL_RANK[level] > LEVEL_RANK.get(state.level, 0):
+                    state.level = level
+
+    def discard(self, incident_id):
+        """Forget an incident that no longer exists (deleted or rolled back)."""
+        with self._lock:
+            for key, state in list(self._open.items()):
+                if state.incident_id == incident_id:
+                    del self._open[key]
+
+    def reset(self):
+        """Drop all in-memory state."""
+        with self._lock:
+            self._open.clear()
+            self._opening.clear()
+            self._supervisors.clear()
+
+    def _open_incident(self, key, level, alert_at, now):
+        supervisor_id, type_id = key
+        window_start = alert_at - timedelta(seconds=self.window_seconds)
+        incident = (
+            Incident.objects
+            .filter(supervisor_id=supervisor_id, type_id=type_id,
+                    status='Pending', last_alert_at__gte=window_start)
+            .order_by('-last_alert_at')
+            .only('id', 'level', 'last_alert_at')
+            .first()
+        )
+        if incident is not None:
+            return _OpenIncident(incident.pk, incident.level, now), False
+
+        incident = Incident.objects.create(
+            supervisor_id=supervisor_id,
+            type_id=type_id,
+            level=level,
+            alert_count=1,
+            started_at=alert_at,
+            last_alert_at=alert_at,
+        )
+        return _OpenIncident(incident.pk, level, now), True
+
+    def _expire(self, now):
+        """Close incidents whose window has passed."""
+        expired = [
+            key for key, state in self._open.items()
+            if now - state.last_seen >= self.window_seconds
+        ]
+        for key in expired:
+            del self._open[key]
+
+
+incident_aggregator = IncidentAggregator(
+    window_seconds=settings.ALERT_INCIDENT_WINDOW_SECONDS
+)
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0001_initial'),
+        ('users', '0002_add_officer_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Incident',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('level', models.CharField(choices=[('Low', 'Low'), ('Medium', 'Medium'), ('High', 'High'), ('Critical', 'Critical')], db_index=True, max_length=20)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Acknowledged', 'Acknowledged'), ('Resolved', 'Resolved'), ('Dismissed', 'Dismissed')], db_index=True, default='Pending', max_length=20)),
+                ('alert_count', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(db_index=True)),
+                ('last_alert_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('supervisor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incidents', to='users.user')),
+                ('type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incidents', to='alerts.alerttype')),
+            ],
+            options={
+                'db_table': 'incidents',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='incident',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alerts', to='alerts.incident'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['supervisor', 'type', 'last_alert_at'], name='incidents_supervi_848d23_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['status', 'started_at'], name='incidents_status_1e8d0d_idx'),
+        ),
+    ]
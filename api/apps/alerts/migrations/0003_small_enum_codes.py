@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:19
+
+import core.fields
+from core.fields import convert_to_codes
+from django.db import migrations
+
+# Choice columns stored as smallint codes (see core.fields.SmallEnumField)
+LEVEL = core.fields.SmallEnumField(choices=[('Low', 'Low'), ('Medium', 'Medium'), ('High', 'High'), ('Critical', 'Critical')], db_index=True)
+STATUS = core.fields.SmallEnumField(choices=[('Pending', 'Pending'), ('Acknowledged', 'Acknowledged'), ('Resolved', 'Resolved'), ('Dismissed', 'Dismissed')], db_index=True, default='Pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0002_incident_alert_incident_and_more'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[convert_to_codes('alerts.Alert', 'level', LEVEL.labels)],
+            state_operations=[migrations.AlterField(model_name='alert', name='level', field=LEVEL)],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[convert_to_codes('alerts.Alert', 'status', STATUS.labels)],
+            state_operations=[migrations.AlterField(model_name='alert', name='status', field=STATUS)],
+        ),
+    ]
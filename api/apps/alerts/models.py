@@ -1,5 +1,7 @@
 from django.db import models
 
+from core.fields import SmallEnumField
+
 ALERT_LEVEL_CHOICES = [
     ('Low', 'Low'),
     ('Medium', 'Medium'),
@@ -37,12 +39,41 @@ class AlertType(models.Model):
         return self.name
 
 
+class Incident(models.Model):
+    """
+    Group of simultaneous alerts of the same type for officers under the
+    same supervisor (see apps.alerts.incidents).
+    """
+    id = models.AutoField(primary_key=True)
+    supervisor = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='incidents')
+    type = models.ForeignKey(AlertType, on_delete=models.CASCADE, related_name='incidents')
+    level = SmallEnumField(choices=ALERT_LEVEL_CHOICES, db_index=True)
+    status = SmallEnumField(choices=ALERT_STATUS_CHOICES, default='Pending', db_index=True)
+    alert_count = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(db_index=True)
+    last_alert_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'alerts'
+        db_table = 'incidents'
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['supervisor', 'type', 'last_alert_at']),
+            models.Index(fields=['status', 'started_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.type.name} x{self.alert_count} - {self.level} ({self.status})"
+
+
 class Alert(models.Model):
     id = models.AutoField(primary_key=True)
     user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='alerts')
     type = models.ForeignKey(AlertType, on_delete=models.CASCADE, related_name='alerts')
-    level = models.CharField(max_length=20, choices=ALERT_LEVEL_CHOICES, db_index=True)
-    status = models.CharField(max_length=20, choices=ALERT_STATUS_CHOICES, default='Pending', db_index=True)
+    level = SmallEnumField(choices=ALERT_LEVEL_CHOICES, db_index=True)
+    status = SmallEnumField(choices=ALERT_STATUS_CHOICES, default='Pending', db_index=True)
     description = models.TextField(blank=True)
     location = models.CharField(max_length=100, blank=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -55,6 +86,13 @@ class Alert(models.Model):
         related_name='acknowledged_alerts'
     )
     resolution_notes = models.TextField(blank=True)
+    incident = models.ForeignKey(
+        Incident,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='alerts'
+    )
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import AlertType, Alert, ALERT_LEVEL_CHOICES, ALERT_STATUS_CHOICES
+from .models import AlertType, Alert, Incident, ALERT_LEVEL_CHOICES, ALERT_STATUS_CHOICES
 from apps.users.serializers import UserSummarySerializer
 
 
@@ -31,7 +31,7 @@ class AlertSerializer(serializers.ModelSerializer):
             'id', 'user', 'user_summary', 'type', 'alert_type_name',
             'level', 'status', 'description', 'location', 'created_at',
             'acknowledged_at', 'acknowledged_by', 'acknowledged_by_summary',
-            'resolution_notes', 'updated_at'
+            'resolution_notes', 'incident', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
 
@@ -60,3 +60,26 @@ class AlertDetailSerializer(AlertSerializer):
 
     class Meta(AlertSerializer.Meta):
         fields = AlertSerializer.Meta.fields + ['type_details']
+
+
+class IncidentSerializer(serializers.ModelSerializer):
+    alert_type_name = serializers.CharField(source='type.name', read_only=True)
+    supervisor_summary = UserSummarySerializer(source='supervisor', read_only=True)
+
+    class Meta:
+        model = Incident
+        fields = [
+            'id', 'supervisor', 'supervisor_summary', 'type', 'alert_type_name',
+            'level', 'status', 'alert_count', 'started_at', 'last_alert_at',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'supervisor', 'type', 'level', 'alert_count', 'started_at',
+            'last_alert_at', 'created_at', 'updated_at'
+        ]
+
+    def validate_status(self, value):
+        valid_statuses = dict(ALERT_STATUS_CHOICES)
+        if value not in valid_statuses:
+            raise serializers.ValidationError(f"Invalid status. Choose from: {list(valid_statuses.keys())}")
+        return value
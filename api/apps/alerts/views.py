@@ -1,6 +1,8 @@
+from django.utils import timezone
+
 from core.views import BaseViewSet
-from .models import AlertType, Alert
-from .serializers import AlertTypeSerializer, AlertSerializer
+from .models import AlertType, Alert, Incident
+from .serializers import AlertTypeSerializer, AlertSerializer, IncidentSerializer
 from apps.events import EventLogger  # ← NUEVO: Para registrar eventos
 
 
@@ -40,4 +42,17 @@ class AlertViewSet(BaseViewSet):
             ip_address=request.META.get('REMOTE_ADDR')
         )
         
-        return response
\ No newline at end of file
+        return response
+
+
+class IncidentViewSet(BaseViewSet):
+    queryset = Incident.objects.select_related('type', 'supervisor')
+    serializer_class = IncidentSerializer
+    http_method_names = ['get', 'patch', 'put', 'head', 'options']
+
+    def perform_update(self, serializer):
+        """Cambiar el estado de un incidente lo aplica a todas sus alertas"""
+        previous_status = serializer.instance.status
+        incident = serializer.save()
+        if incident.status != previous_status:
+            incident.alerts.update(status=incident.status, updated_at=timezone.now())
@@ -5,3 +5,6 @@ class BiometricsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.biometrics'
     label = 'biometrics'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,407 @@
+"""
+Archive of raw readings in compressed columnar segment files.
+
+Months older than BIOMETRICS_ARCHIVE_AFTER_MONTHS leave the database:
+`archive_month` writes one segment per officer with that month's `bpm`
+and `ml_predictions` rows, indexes it in `ArchiveSegment`, and only then
+detaches and drops the month's partitions (see partitions.py). The
+rollups keep covering archived months, and the readings stay auditable:
+`archived_readings` and `archived_predictions` decode the segments of a
+time range back into (unsaved) model instances, and `GET /biometrics/`
+serves archived ranges through them.
+
+Segment layout (BIOMETRICS_ARCHIVE_DIR/<YYYY-MM>/<user_id>.seg):
+
+    SEGMENT_MAGIC, header length (uint32 LE), header (JSON), column blobs
+
+The header lists, per table, the row count and each column with its codec
+and the length of its zlib-compressed blob. Rows are in timestamp order and
+every codec is lossless:
+
+- int / datetime (microseconds): delta from the previous row
+- float: scaled to integers and delta-encoded when that is exact (BPM
+  values with a few decimals), otherwise the XOR of consecutive IEEE bit
+  patterns
+- bool: bit-packed
+- label: dictionary of the distinct strings in the header, uint16 codes
+- bytes: the lengths (-1 for null) as an int column, then the payloads
+- json: the column as one JSON array (also any other column holding
+  nulls)
+
+Numeric columns are byte-shuffled (all first bytes, then all second bytes
+and so on) before compression, which groups the zero bytes of small
+deltas.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import zlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import models, transaction
+
+from core.fields import SmallEnumField
+
+from .models import BPM, ArchiveSegment, MLPrediction
+from .partitions import detach_partitions, month_start, next_month
+
+SEGMENT_MAGIC = b'ARTSEG\x01'
+HEADER_LENGTH = struct.Struct('<I')
+COMPRESSION_LEVEL = 9
+
+# Scales tried to store floats as exact integers
+FLOAT_SCALES = (1, 10, 100, 1000)
+
+# Archived tables: (key in the segment, model)
+ARCHIVED = (('bpm', BPM), ('ml_predictions', MLPrediction))
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = datetime.resolution
+
+
+class SegmentError(Exception):
+    """A segment file is missing, corrupt or does not match its index row."""
+
+
+def _columns(model):
+    """Archived fields of `model` (the officer is the segment's)."""
+    return [field for field in model._meta.concrete_fields if field.attname != 'user_id']
+
+
+def _codec(field):
+    if isinstance(field, SmallEnumField):
+        # Labels, as in segments written before the codes
+        return 'label'
+    if isinstance(field, models.DateTimeField):
+        return 'datetime'
+    if isinstance(field, models.BooleanField):
+        return 'bool'
+    if isinstance(field, models.FloatField):
+        return 'float'
+    if isinstance(field, (models.AutoField, models.IntegerField, models.ForeignKey)):
+        return 'int'
+    if isinstance(field, (models.CharField, models.TextField)):
+        return 'label'
+    if isinstance(field, models.BinaryField):
+        return 'bytes'
+    return 'json'
+
+
+def _shuffle(array):
+    return array.view('uint8').reshape(-1, array.itemsize).T.tobytes()
+
+
+def _unshuffle(data, dtype, rows):
+    import numpy as np
+
+    itemsize = np.dtype(dtype).itemsize
+    return np.frombuffer(data, dtype=np.uint8).reshape(itemsize, rows).T.copy().view(dtype).ravel()
+
+
+def _delta(array):
+    import numpy as np
+
+    return _shuffle(np.diff(array, prepend=np.int64(0)))
+
+
+def _undelta(data, rows):
+    import numpy as np
+
+    return np.cumsum(_unshuffle(data, np.int64, rows))
+
+
+def _encode_column(codec, values):
+    """Blob and header entries of one column."""
+    import numpy as np
+
+    if codec == 'bytes':
+        values = [None if value is None else bytes(value) for value in values]
+        lengths = np.array([-1 if value is None else len(value) for value in values], dtype=np.int64)
+        payload = b''.join(value for value in values if value is not None)
+        return _delta(lengths) + payload, {'codec': 'bytes'}
+    if codec != 'json' and any(value is None for value in values):
+        codec = 'json'
+
+    if codec == 'int':
+        return _delta(np.array(values, dtype=np.int64)), {'codec': 'int'}
+    if codec == 'datetime':
+        micros = [(value - EPOCH) // MICROSECOND for value in values]
+        return _delta(np.array(micros, dtype=np.int64)), {'codec': 'datetime'}
+    if codec == 'float':
+        array = np.array(values, dtype=np.float64)
+        for scale in FLOAT_SCALES:
+            scaled = np.round(array * scale)
+            if np.all(np.abs(scaled) < 2 ** 53) and np.array_equal(scaled / scale, array):
+                return _delta(scaled.astype(np.int64)), {'codec': 'float', 'scale': scale}
+        bits = array.view(np.uint64)
+        return _shuffle(bits ^ np.concatenate(([np.uint64(0)], bits[:-1]))), {'codec': 'float', 'scale': None}
+    if codec == 'bool':
+        return np.packbits(np.array(values, dtype=bool)).tobytes(), {'codec': 'bool'}
+    if codec == 'label':
+        labels = sorted(set(values))
+        index = {label: code for code, label in enumerate(labels)}
+        codes = np.array([index[value] for value in values], dtype=np.uint16)
+        return _shuffle(codes), {'codec': 'label', 'labels': labels}
+    return json.dumps(values, separators=(',', ':')).encode(), {'codec': 'json'}
+
+
+def _decode_column(entry, data, rows):
+    import numpy as np
+
+    codec = entry['codec']
+    if codec == 'int':
+        return _undelta(data, rows).tolist()
+    if codec == 'datetime':
+        micros = _undelta(data, rows)
+        return [
+            value.replace(tzinfo=dt_timezone.utc)
+            for value in micros.astype('datetime64[us]').astype(object)
+        ]
+    if codec == 'float':
+        if entry['scale'] is not None:
+            return (_undelta(data, rows) / entry['scale']).tolist()
+        return np.bitwise_xor.accumulate(_unshuffle(data, np.uint64, rows)).view(np.float64).tolist()
+    if codec == 'bool':
+        return np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=rows).astype(bool).tolist()
+    if codec == 'label':
+        labels = entry['labels']
+        return [labels[code] for code in _unshuffle(data, np.uint16, rows).tolist()]
+    if codec == 'bytes':
+        offset = rows * 8
+        values = []
+        for length in _undelta(data[:offset], rows).tolist():
+            if length < 0:
+                values.append(None)
+            else:
+                values.append(data[offset:offset + length])
+                offset += length
+        return values
+    return json.loads(data)
+
+
+def encode_segment(user_id, month, tables):
+    """
+    Bytes of a segment.
+
+    Args:
+        user_id: Officer of the segment
+        month: Month start
+        tables: {key: (model, rows)} with rows as tuples in the order of
+            the model's archived columns
+    """
+    header = {'user_id': user_id, 'month': month.isoformat(), 'tables': {}}
+    blobs = []
+    for key, (model, rows) in tables.items():
+        columns = []
+        for field, values in zip(_columns(model), zip(*rows) if rows else [()] * len(_columns(model))):
+            blob, entry = _encode_column(_codec(field), list(values))
+            blob = zlib.compress(blob, COMPRESSION_LEVEL)
+            columns.append({'name': field.attname, 'length': len(blob), **entry})
+            blobs.append(blob)
+        header['tables'][key] = {'rows': len(rows), 'columns': columns}
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+    return b''.join([SEGMENT_MAGIC, HEADER_LENGTH.pack(len(header_bytes)), header_bytes, *blobs])
+
+
+def decode_segment(data, keys=None):
+    """
+    Columns of a segment.
+
+    Returns:
+        (header, {key: {column name: list of values}}) for the tables in
+        `keys` (all when None)
+    """
+    if not data.startswith(SEGMENT_MAGIC):
+        raise SegmentError('Not an archive segment.')
+    offset = len(SEGMENT_MAGIC)
+    header_length, = HEADER_LENGTH.unpack_from(data, offset)
+    offset += HEADER_LENGTH.size
+    header = json.loads(data[offset:offset + header_length])
+    offset += header_length
+
+    tables = {}
+    for key, table in header['tables'].items():
+        wanted = keys is None or key in keys
+        columns = {}
+        for entry in table['columns']:
+            if wanted:
+                blob = zlib.decompress(data[offset:offset + entry['length']])
+                columns[entry['name']] = _decode_column(entry, blob, table['rows'])
+            offset += entry['length']
+        if wanted:
+            tables[key] = columns
+    return header, tables
+
+
+def _segment_path(user_id, month):
+    return os.path.join(f"{month:%Y-%m}", f"{user_id}.seg")
+
+
+def _write_file(path, data):
+    """Write `data` to `path` atomically (temporary file, fsync, rename)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as output:
+        output.write(data)
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(temporary, path)
+
+
+def read_segment(segment, keys=None):
+    """Decoded tables of an `ArchiveSegment` (checksum verified)."""
+    path = os.path.join(settings.BIOMETRICS_ARCHIVE_DIR, segment.path)
+    try:
+        with open(path, 'rb') as stream:
+            data = stream.read()
+    except OSError as e:
+        raise SegmentError(f"{segment.path}: {e}")
+    if hashlib.sha256(data).hexdigest() != segment.sha256:
+        raise SegmentError(f"{segment.path}: checksum mismatch.")
+    return decode_segment(data, keys)[1]
+
+
+def _segment_table(segment, key, model):
+    """
+    Columns of one table of a segment; fields added to the model after the
+    segment was written get their default.
+    """
+    columns = read_segment(segment, [key])[key]
+    rows = len(columns['created_at'])
+    for field in _columns(model):
+        if field.attname not in columns:
+            columns[field.attname] = [field.get_default()] * rows
+    return columns
+
+
+def _month_rows(model, user_id, month):
+    return list(
+        model.objects.filter(user_id=user_id, created_at__gte=month, created_at__lt=next_month(month))
+        .order_by('created_at', 'pk')
+        .values_list(*(field.attname for field in _columns(model)))
+        .iterator(chunk_size=10000)
+    )
+
+
+def archive_user_month(user_id, month):
+    """
+    Write the segment of one officer and month from the stored rows
+    (merged with an existing segment of that month) and index it.
+
+    Returns:
+        The `ArchiveSegment`
+    """
+    existing = ArchiveSegment.objects.filter(user_id=user_id, month=month).first()
+    tables = {}
+    for key, model in ARCHIVED:
+        names = [field.attname for field in _columns(model)]
+        rows = _month_rows(model, user_id, month)
+        if existing is not None:
+            # Rows imported into a month that was already archived
+            archived = _segment_table(existing, key, model)
+            stored = {row[0] for row in rows}
+            rows.extend(
+                row for row in zip(*(archived[name] for name in names))
+                if row[0] not in stored
+            )
+            created_at = names.index('created_at')
+            rows.sort(key=lambda row: (row[created_at], row[0]))
+        tables[key] = (model, rows)
+
+    data = encode_segment(user_id, month, tables)
+    path = _segment_path(user_id, month)
+    _write_file(os.path.join(settings.BIOMETRICS_ARCHIVE_DIR, path), data)
+
+    created_at = [field.attname for field in _columns(BPM)].index('created_at')
+    timestamps = [row[created_at] for row in tables['bpm'][1]]
+    segment, _ = ArchiveSegment.objects.update_or_create(
+        user_id=user_id,
+        month=month,
+        defaults={
+            'path': path,
+            'readings': len(timestamps),
+            'predictions': len(tables['ml_predictions'][1]),
+            'first_at': min(timestamps, default=month),
+            'last_at': max(timestamps, default=month),
+            'size_bytes': len(data),
+            'sha256': hashlib.sha256(data).hexdigest(),
+        }
+    )
+    return segment
+
+
+def archive_month(month, drop=True):
+    """
+    Archive every officer's rows of `month`, then detach (and drop) its
+    partitions. Segments are written and indexed before anything is
+    removed, so an interrupted run is simply repeated.
+
+    Returns:
+        Dict with the 'segments' written, 'readings', 'predictions',
+        'bytes' and the 'detached' partitions
+    """
+    month = month_start(month)
+    user_ids = set()
+    for _, model in ARCHIVED:
+        user_ids.update(
+            model.objects.filter(created_at__gte=month, created_at__lt=next_month(month))
+            .values_list('user_id', flat=True).distinct()
+        )
+
+    result = {'segments': 0, 'readings': 0, 'predictions': 0, 'bytes': 0, 'detached': []}
+    for user_id in sorted(user_ids):
+        with transaction.atomic():
+            segment = archive_user_month(user_id, month)
+        result['segments'] += 1
+        result['readings'] += segment.readings
+        result['predictions'] += segment.predictions
+        result['bytes'] += segment.size_bytes
+
+    if drop:
+        result['detached'] = detach_partitions(next_month(month), drop=True, months=[month])
+    return result
+
+
+def _segments(since, until, user_ids=None):
+    segments = ArchiveSegment.objects.filter(
+        month__gte=month_start(since), month__lt=until, first_at__lt=until, last_at__gte=since
+    )
+    if user_ids is not None:
+        segments = segments.filter(user_id__in=user_ids)
+    return segments.order_by('month', 'user_id')
+
+
+def _iter_archived(key, model, since, until, user_ids):
+    """Archived rows of `model`, decoding one segment at a time."""
+    attnames = [field.attname for field in model._meta.concrete_fields]
+    for segment in _segments(since, until, user_ids):
+        columns = _segment_table(segment, key, model)
+        columns['user_id'] = [segment.user_id] * len(columns['created_at'])
+        # Positional values in field order (much faster than keywords)
+        for values in zip(*(columns[name] for name in attnames)):
+            instance = model.from_db(None, attnames, values)
+            if since <= instance.created_at < until:
+                yield instance
+
+
+def _archived(key, model, since, until, user_ids):
+    return list(_iter_archived(key, model, since, until, user_ids))
+
+
+def archived_readings(since, until, user_ids=None):
+    """Archived `BPM` rows (unsaved instances) in [since, until), by timestamp per officer."""
+    return _archived('bpm', BPM, since, until, user_ids)
+
+
+def iter_archived_readings(since, until, user_ids=None):
+    """`archived_readings` as a generator: one decoded segment in memory at a time."""
+    return _iter_archived('bpm', BPM, since, until, user_ids)
+
+
+def archived_predictions(since, until, user_ids=None):
+    """Archived `MLPrediction` rows (unsaved instances) in [since, until)."""
+    return _archived('ml_predictions', MLPrediction, since, until, user_ids)
@@ -0,0 +1,154 @@
+"""
+Async variant of the BPM ingest endpoint.
+
+POST /biometrics/async/ takes the same body and returns the same response
+as POST /biometrics/, but runs as a native async view:
+
+- Database access goes through the async ORM (`aingest_reading`)
+- ML inference runs in the `ml_async` thread pool; readings that arrive
+  together are scored in one vectorized batch (ML_ASYNC_COALESCE)
+- Events are written asynchronously
+- Authentication and throttling are those of POST /biometrics/ (the DRF
+  classes, sharing its rate counters)
+
+Served from `config.asgi` (gunicorn with uvicorn workers), a reading that
+waits on the database or the model does not hold a worker, so one worker
+keeps thousands of device connections open. Under WSGI the view still
+works, but each request then runs its own event loop.
+
+Under ASGI Django gives every request its own thread and therefore its own
+database connection. At most BIOMETRICS_ASYNC_DB_CONCURRENCY readings per
+worker use the database at a time (each closes its connection before the
+next one starts); the others wait on the event loop without a connection.
+"""
+
+import asyncio
+import json
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import APIException, Throttled, ValidationError
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from apps.users.models import User
+from .ingest import aingest_reading
+from .serializers import BPMSerializer
+from .views import ML_AVAILABLE, enqueue_reading, ml_analysis
+
+if ML_AVAILABLE:
+    from ml_async import AsyncMLHealthMonitoringService
+
+    async_ml_service = AsyncMLHealthMonitoringService(
+        coalesce=settings.ML_ASYNC_COALESCE,
+        batch_window_ms=settings.ML_ASYNC_BATCH_WINDOW_MS
+    )
+else:
+    async_ml_service = None
+
+# Database slots per event loop (asyncio primitives are bound to a loop)
+_db_slots = weakref.WeakKeyDictionary()
+
+
+def _db_slot():
+    loop = asyncio.get_running_loop()
+    slot = _db_slots.get(loop)
+    if slot is None:
+        slot = _db_slots[loop] = asyncio.Semaphore(settings.BIOMETRICS_ASYNC_DB_CONCURRENCY)
+    return slot
+
+
+def _close_connection():
+    # The request's connection is not reused by other requests: free it
+    # for the next slot holder (unless inside a transaction, as in tests)
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+def _check_throttles(request):
+    """
+    Apply the DRF authentication and throttles of POST /biometrics/
+    (DEFAULT_THROTTLE_CLASSES), sharing its rate counters.
+
+    Raises:
+        APIException: Authentication failed or the request is throttled
+    """
+    request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    view = APIView()
+    durations = [
+        throttle.wait()
+        for throttle in (throttle_class() for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES)
+        if not throttle.allow_request(request, view)
+    ]
+    if durations:
+        durations = [duration for duration in durations if duration is not None]
+        raise Throttled(max(durations, default=None))
+
+
+def _error_response(exc):
+    response = JsonResponse({'detail': str(exc.detail)}, status=exc.status_code)
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = '%d' % exc.wait
+    return response
+
+
+@transaction.non_atomic_requests
+@csrf_exempt
+@require_POST
+async def bpm_create_async(request):
+    """Create BPM record and run ML analysis (async)."""
+    try:
+        await sync_to_async(_check_throttles)(request)
+    except APIException as e:
+        return _error_response(e)
+
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'detail': 'JSON parse error.'}, status=400)
+
+    serializer = BPMSerializer(data=payload, context={'request': request})
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+
+    value = serializer.validated_data['value']
+    try:
+        user_id = serializer.resolve_user_id(serializer.validated_data)
+
+        async with _db_slot():
+            try:
+                if settings.BIOMETRICS_WRITE_BEHIND:
+                    data = await sync_to_async(enqueue_reading)(user_id, value)
+                    return JsonResponse(
+                        {'success': True, 'data': data, 'message': 'Accepted for processing'},
+                        status=202
+                    )
+
+                result = await aingest_reading(
+                    user_id,
+                    value,
+                    ml_service=async_ml_service,
+                    ip_address=request.META.get('REMOTE_ADDR')
+                )
+            finally:
+                await sync_to_async(_close_connection)()
+    except ValidationError as e:
+        return JsonResponse(e.detail, status=400)
+    except User.DoesNotExist:
+        return JsonResponse({'user_id': ['User with given id does not exist.']}, status=400)
+
+    return JsonResponse(
+        {
+            'success': True,
+            'data': BPMSerializer(result['bpm']).data,
+            'message': 'Created successfully',
+            'ml_analysis': ml_analysis(result)
+        },
+        status=201
+    )
@@ -0,0 +1,821 @@
+"""
+BPM ingestion pipelines.
+
+`ingest_reading` handles the single-reading endpoint (the hottest one) with
+a fixed query budget. A reading that raises no alert costs three
+statements:
+
+1. The user and their previous readings, in one SELECT (skipped when the
+   officer's recent readings are in shared memory, see recent.py)
+2. The BPM insert (which also updates the rollups, see rollups.py) and
+   its capture event, in one statement (`_create_bpm`)
+3. The MLPrediction insert
+
+Alerts add the alert type lookup, incident bookkeeping, the Alert insert
+(in one transaction) and the alert event.
+
+`ingest_bulk` handles batches of readings that watches buffered offline,
+with a query count that does not grow with the number of readings:
+
+1. Validate every reading (client timestamps within `timestamp_bounds`)
+   and check all user ids with one query
+2. Load the last stored readings of every user in the batch (one query)
+3. Score all readings with one batched ML call; each reading's history is
+   built from the stored readings plus the earlier readings of the batch,
+   exactly as if they had been posted one at a time
+4. In one transaction, bulk-create the BPM, Alert, MLPrediction and Event
+   rows (plus the alert type lookup, one query per incident opened and
+   one UPDATE per incident that gained members)
+"""
+
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, OuterRef, Q, Window
+from django.db.models.functions import RowNumber
+from django.db.models.sql import InsertQuery
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.alerts.incidents import incident_aggregator
+from apps.alerts.models import Alert, AlertType
+from apps.events import EventLogger
+from apps.users.models import User
+from .models import BPM, FEATURE_COLUMNS, FEATURE_DTYPE, MLPrediction
+from .partitions import add_months, aensure_partitions, ensure_partitions, month_start
+from .recent import RecentReadings
+
+# Readings sent to the ML service as history (current one included)
+HISTORY_SIZE = 10
+
+# Only readings this recent count as history; the bound keeps history
+# lookups on the partitions of the last weeks
+HISTORY_LOOKBACK = timedelta(days=7)
+
+# Previous readings of each officer, shared by the workers of the host
+recent_readings = RecentReadings(capacity=HISTORY_SIZE - 1)
+
+# ML severity -> Alert.level
+SEVERITY_TO_LEVEL = {
+    'CRITICAL': 'Critical',
+    'HIGH': 'High',
+    'MEDIUM': 'Medium',
+    'LOW': 'Low'
+}
+
+def alert_type_ids(names, severities):
+    """
+    Ids of the ML alert types, creating the missing ones.
+
+    Args:
+        names: Alert type names
+        severities: ML severity of each name (used as default level on creation)
+
+    Returns:
+        Dict {name: id}
+    """
+    wanted = dict(zip(names, severities))
+    if not wanted:
+        return {}
+    ids = dict(AlertType.objects.filter(name__in=list(wanted)).values_list('name', 'id'))
+    missing = [name for name in wanted if name not in ids]
+    if missing:
+        AlertType.objects.bulk_create(
+            [
+                AlertType(
+                    name=name,
+                    default_level=SEVERITY_TO_LEVEL.get(wanted[name], 'Medium'),
+                    description=f"ML-generated alert: {name}",
+                    is_active=True
+                )
+                for name in missing
+            ],
+            ignore_conflicts=True
+        )
+        ids.update(AlertType.objects.filter(name__in=missing).values_list('name', 'id'))
+    return ids
+
+
+def alert_event(alert_data, incident, user, ip_address=None):
+    """
+    Unsaved event for a new alert, or None when it joins an open incident
+    (only the incident opening/escalation notifies).
+    """
+    description = f"ML detected {alert_data.severity} alert: {alert_data.message[:100]}"
+    if alert_data.suppressed_count:
+        description += f" ({alert_data.suppressed_count} repeated alerts suppressed)"
+
+    if incident is None:
+        title, category = f"ML Alert: {alert_data.alert_type}", EventLogger.ALERT_TRIGGERED
+    elif incident.opened:
+        title, category = f"Incident Opened: {alert_data.alert_type}", EventLogger.INCIDENT_OPENED
+    elif incident.escalated:
+        title, category = f"Incident Escalated: {alert_data.alert_type}", EventLogger.INCIDENT_ESCALATED
+    else:
+        return None
+
+    return EventLogger.build_event(
+        user=user,
+        title=title,
+        category=category,
+        description=description,
+        ip_address=ip_address
+    )
+
+
+def prediction_fields(prediction):
+    """
+    MLPrediction column values of a PredictionResult: the scores, the
+    metadata in typed columns and the model features packed as float32 in
+    FEATURE_COLUMNS order (see MLPrediction and
+    BIOMETRICS_PREDICTION_STORAGE).
+    """
+    extra = [name for name in prediction.feature_columns if name not in FEATURE_COLUMNS]
+    if settings.BIOMETRICS_PREDICTION_STORAGE == 'json':
+        metadata = prediction.metadata
+    elif extra:
+        features = prediction.features
+        metadata = {'features': {name: features[name] for name in extra}}
+    else:
+        metadata = {}
+    return {
+        'stress_score': prediction.stress_score,
+        'stress_level': prediction.stress_level,
+        'severity': prediction.severity,
+        'requires_alert': prediction.requires_alert,
+        'alert_probability': prediction.alert_probability,
+        'is_anomaly': prediction.is_anomaly,
+        'hr_zone': prediction.hr_zone,
+        'anomaly_score': prediction.anomaly_score,
+        'hr_variability': prediction.hr_variability,
+        'hr_rapid_changes': prediction.hr_rapid_changes,
+        'high_stress_risk': prediction.high_stress_risk,
+        'hr_elevated_sustained': prediction.hr_elevated_sustained,
+        'features': prediction.feature_vector(FEATURE_COLUMNS).astype(FEATURE_DTYPE).tobytes(),
+        'ml_metadata': metadata,
+    }
+
+
+def _prediction(user_id, bpm, prediction, alert_id=None):
+    return MLPrediction(
+        user_id=user_id,
+        bpm_record_id=bpm.pk,
+        alert_id=alert_id,
+        created_at=bpm.created_at,
+        **prediction_fields(prediction)
+    )
+
+
+@transaction.atomic
+def _store_alert(user_id, bpm, ml_result, ip_address):
+    """
+    Alert and prediction of one reading, in one transaction.
+
+    Returns:
+        (alert, incident, event): the unsaved alert event is None when the
+        alert joins an open incident
+    """
+    alert_data = ml_result['alert']
+    type_id = alert_type_ids([alert_data.alert_type], [alert_data.severity])[alert_data.alert_type]
+    level = SEVERITY_TO_LEVEL.get(alert_data.severity, 'Medium')
+
+    # Group with simultaneous alerts of the same supervisor
+    incident = incident_aggregator.assign(user_id, type_id, level, bpm.created_at)
+    try:
+        # Count the member in the incident row, which stays locked until
+        # commit (foreign keys are only checked at commit, so the Alert
+        # insert would not catch a deleted incident)
+        if incident is not None and incident_aggregator.record([incident]):
+            # The incident was deleted meanwhile: keep the alert standalone
+            incident = None
+        alert = Alert.objects.create(
+            user_id=user_id,
+            type_id=type_id,
+            level=level,
+            status='Pending',
+            description=alert_data.message,
+            location='',  # Could be populated from GPS data if available
+            incident_id=incident.incident_id if incident else None
+        )
+        _prediction(user_id, bpm, ml_result['prediction'], alert.pk).save()
+    except Exception:
+        # The incident row changes are rolled back with the alert
+        if incident is not None:
+            incident_aggregator.discard(incident.incident_id)
+        raise
+    # Alert event once per incident, not per member alert
+    return alert, incident, alert_event(alert_data, incident, user_id, ip_address)
+
+
+def _previous_values(user_id, created_at):
+    """
+    User check and history in one query: the values and timestamps of the
+    user's last readings before `created_at`, newest first, or no row when
+    the user does not exist.
+    """
+    previous = BPM.objects.filter(
+        user_id=OuterRef('pk'),
+        created_at__gte=created_at - HISTORY_LOOKBACK,
+        created_at__lt=created_at
+    ).order_by('-created_at')
+    return (
+        User.objects.filter(pk=user_id)
+        .annotate(
+            recent=ArraySubquery(previous.values('value')[:HISTORY_SIZE - 1]),
+            recent_at=ArraySubquery(previous.values('created_at')[:HISTORY_SIZE - 1])
+        )
+        .values_list('recent', 'recent_at')
+    )
+
+
+def _history(user_id, row):
+    """(previous values, seed for `recent_readings`) of a `_previous_values` row."""
+    if row is None:
+        raise User.DoesNotExist(f"User {user_id} does not exist.")
+    values, timestamps = row
+    return values, list(zip(timestamps, values))
+
+
+def _insert_sql(obj, returning=False):
+    """(sql, params) of the INSERT that saving the unsaved `obj` would run."""
+    meta = obj._meta
+    fields = [field for field in meta.local_concrete_fields if not field.generated]
+    if obj.pk is None:
+        fields = [field for field in fields if field is not meta.auto_field]
+    query = InsertQuery(type(obj))
+    query.insert_values(fields, [obj])
+    compiler = query.get_compiler(connection=connection)
+    if returning:
+        compiler.returning_fields = [meta.pk]
+    (sql, params), = compiler.as_sql()
+    return sql, params
+
+
+def _create_bpm(user_id, value, created_at, events):
+    """BPM insert, with the unsaved `events` inserted by the same statement."""
+    bpm = BPM(user_id=user_id, value=value, created_at=created_at)
+    sql, params = _insert_sql(bpm, returning=True)
+    statements = [f"new_bpm AS ({sql})"]
+    params = list(params)
+    for index, event in enumerate(events):
+        sql, event_params = _insert_sql(event)
+        statements.append(f"event_{index} AS ({sql})")
+        params.extend(event_params)
+    with connection.cursor() as cursor:
+        cursor.execute(f"WITH {', '.join(statements)} SELECT id FROM new_bpm", params)
+        bpm.pk, = cursor.fetchone()
+    bpm._state.adding = False
+    bpm._state.db = connection.alias
+    return bpm
+
+
+def _acreate_bpm(user_id, value, created_at, events, cached):
+    """
+    `_create_bpm` of the async endpoint (run in a worker thread). It runs
+    in autocommit, so the deferred user foreign key is checked by the
+    insert itself.
+    """
+    try:
+        return _create_bpm(user_id, value, created_at, events)
+    except IntegrityError:
+        if not cached:
+            raise
+        # History came from shared memory: the user was deleted meanwhile
+        recent_readings.invalidate([user_id])
+        raise User.DoesNotExist(f"User {user_id} does not exist.")
+
+
+def _reading_result(bpm, ml_result, alert=None, incident=None):
+    return {
+        'bpm': bpm,
+        'prediction': ml_result['prediction'] if ml_result else None,
+        'alert': alert,
+        'incident': incident,
+        'should_notify': bool(
+            alert and ml_result['should_notify'] and (incident is None or incident.notify)
+        ),
+    }
+
+
+def _capture_event(user_id, value, ml_result, ip_address):
+    description = f"BPM reading: {value} bpm"
+    if ml_result:
+        description += f" - ML: Stress {ml_result['prediction'].stress_score:.1f}/100"
+    return EventLogger.build_event(
+        user=user_id,
+        title="BPM Record Created",
+        category=EventLogger.BIOMETRIC_CAPTURE_SUCCESS,
+        description=description,
+        ip_address=ip_address
+    )
+
+
+def _ml_error_event(user_id, error, ip_address):
+    # Log error but don't fail the request
+    print(f"⚠️ ML analysis error: {error}")
+    return EventLogger.build_event(
+        user=user_id,
+        title="ML Analysis Error",
+        category=EventLogger.SYSTEM_ERROR,
+        description=f"Error during ML analysis: {str(error)}",
+        ip_address=ip_address
+    )
+
+
+def ingest_reading(user_id, value, ml_service=None, ip_address=None):
+    """
+    Store and score one reading.
+
+    Args:
+        user_id: Officer id
+        value: Heart rate (bpm)
+        ml_service: ML service (None when it is not available)
+        ip_address: Client address for the events
+
+    Returns:
+        Dict with 'bpm', 'prediction' (PredictionResult or None), 'alert',
+        'incident' and 'should_notify'
+
+    Raises:
+        User.DoesNotExist: Unknown user id
+    """
+    created_at = timezone.now()
+    ensure_partitions([created_at])
+    # The new reading is the newest one
+    seed = None
+    previous = recent_readings.get(user_id, created_at, HISTORY_LOOKBACK)
+    if previous is None:
+        previous, seed = _history(user_id, _previous_values(user_id, created_at).first())
+
+    ml_result = None
+    error = None
+    if ml_service is not None:
+        try:
+            ml_result = ml_service.analyze_biometric_data(
+                heart_rate=value,
+                user_id=user_id,
+                recent_hrs=[value] + previous,
+                timestamp=created_at.isoformat()
+            )
+        except Exception as e:
+            error = e
+
+    events = [_capture_event(user_id, value, ml_result, ip_address)]
+    if error is not None:
+        events.append(_ml_error_event(user_id, error, ip_address))
+    # Deleted officers leave the shared history (signals.py): a cache hit
+    # is an existing user
+    bpm = _create_bpm(user_id, value, created_at, events)
+    transaction.on_commit(lambda: recent_readings.push(user_id, created_at, value, seed))
+    result = _reading_result(bpm, ml_result)
+
+    events = []
+    error = None
+    if ml_result is not None:
+        try:
+            if ml_result['alert']:
+                alert, incident, event = _store_alert(user_id, bpm, ml_result, ip_address)
+                result = _reading_result(bpm, ml_result, alert, incident)
+                if event is not None:
+                    events.append(event)
+            else:
+                _prediction(user_id, bpm, ml_result['prediction']).save()
+        except Exception as e:
+            error = e
+            if ml_result['alert']:
+                # Rolled back: the alert must not suppress the next one
+                ml_service.revoke_alerts([ml_result['alert']])
+
+    if error is not None:
+        events.append(_ml_error_event(user_id, error, ip_address))
+    if events:
+        EventLogger.log_events(events)
+    return result
+
+
+async def aingest_reading(user_id, value, ml_service=None, ip_address=None):
+    """
+    Async variant of `ingest_reading` for the ASGI endpoint.
+
+    Same statements through the async ORM (the BPM insert in a worker
+    thread). `ml_service` is an
+    `AsyncMLHealthMonitoringService`, so inference runs in its thread
+    pool. Alerts need a transaction and the incident aggregator, so they
+    are stored by the sync code in a worker thread.
+    """
+    created_at = timezone.now()
+    await aensure_partitions([created_at])
+    seed = None
+    previous = recent_readings.get(user_id, created_at, HISTORY_LOOKBACK)
+    if previous is None:
+        previous, seed = _history(user_id, await _previous_values(user_id, created_at).afirst())
+
+    ml_result = None
+    error = None
+    if ml_service is not None:
+        try:
+            ml_result = await ml_service.analyze_biometric_data(
+                heart_rate=value,
+                user_id=user_id,
+                recent_hrs=[value] + previous,
+                timestamp=created_at.isoformat()
+            )
+        except Exception as e:
+            error = e
+
+    events = [_capture_event(user_id, value, ml_result, ip_address)]
+    if error is not None:
+        events.append(_ml_error_event(user_id, error, ip_address))
+    bpm = await sync_to_async(_acreate_bpm)(user_id, value, created_at, events, cached=seed is None)
+    # Autocommit: already stored
+    recent_readings.push(user_id, created_at, value, seed)
+    result = _reading_result(bpm, ml_result)
+
+    events = []
+    error = None
+    if ml_result is not None:
+        try:
+            if ml_result['alert']:
+                alert, incident, event = await sync_to_async(_store_alert)(user_id, bpm, ml_result, ip_address)
+                result = _reading_result(bpm, ml_result, alert, incident)
+                if event is not None:
+                    events.append(event)
+            else:
+                await _prediction(user_id, bpm, ml_result['prediction']).asave()
+        except Exception as e:
+            error = e
+            if ml_result['alert']:
+                # Rolled back: the alert must not suppress the next one
+                ml_service.revoke_alerts([ml_result['alert']])
+
+    if error is not None:
+        events.append(_ml_error_event(user_id, error, ip_address))
+    if events:
+        await EventLogger.alog_events(events)
+    return result
+
+
+# (title, description) of the per-officer event of a batch, by category:
+# buffered uploads are imports, write-behind flushes are live captures
+BATCH_EVENTS = {
+    EventLogger.DATA_IMPORTED: ("BPM Records Imported", "{count} BPM readings imported in bulk"),
+    EventLogger.BIOMETRIC_CAPTURE_SUCCESS: ("BPM Records Created", "{count} BPM readings captured"),
+}
+
+
+class BulkValidationError(Exception):
+    """The request as a whole is not acceptable (not a list, too large)."""
+
+
+def _parse_timestamp(raw, now):
+    if raw in (None, ''):
+        return now
+    if isinstance(raw, (int, float)) and not isinstance(raw, bool):
+        return datetime.fromtimestamp(raw, tz=dt_timezone.utc)
+    if isinstance(raw, str):
+        parsed = parse_datetime(raw)
+        if parsed is not None:
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed, dt_timezone.utc)
+            return parsed
+    raise ValueError("timestamp must be ISO 8601 or epoch seconds.")
+
+
+def timestamp_bounds(now=None):
+    """
+    (oldest, newest) client timestamps accepted for a batch.
+
+    Readings older than `BIOMETRICS_MAX_READING_AGE_DAYS`, or in months
+    already detached by retention or archiving, would create (or recreate)
+    partitions; readings from the future are clock errors.
+    """
+    now = now or timezone.now()
+    oldest = now - timedelta(days=settings.BIOMETRICS_MAX_READING_AGE_DAYS)
+    for keep in (settings.BIOMETRICS_RETENTION_MONTHS, settings.BIOMETRICS_ARCHIVE_AFTER_MONTHS):
+        if keep:
+            oldest = max(oldest, add_months(month_start(now), 1 - keep))
+    return oldest, now + timedelta(seconds=settings.BIOMETRICS_MAX_CLOCK_SKEW_SECONDS)
+
+
+def timestamp_error(timestamp, bounds):
+    """Rejection message for a timestamp outside `bounds`, or None."""
+    oldest, newest = bounds
+    if timestamp < oldest:
+        return f"timestamp is before {oldest.isoformat()}."
+    if timestamp > newest:
+        return "timestamp is in the future."
+    return None
+
+
+def validate_readings(items, bounded=True):
+    """
+    Validate a batch of `{user_id, value, timestamp}` readings.
+
+    `bounded=False` skips the `timestamp_bounds` check, for readings whose
+    timestamp the server set when it accepted them (the write-behind log).
+
+    Returns:
+        (readings, rejected): readings as (index, user_id, value, timestamp)
+        tuples and rejected ones as {'index': i, 'errors': {...}}
+    """
+    max_readings = settings.BIOMETRICS_BULK_MAX_READINGS
+    if not isinstance(items, list):
+        raise BulkValidationError("Expected a list of readings.")
+    if not items:
+        raise BulkValidationError("No readings given.")
+    if len(items) > max_readings:
+        raise BulkValidationError(f"At most {max_readings} readings per request.")
+
+    now = timezone.now()
+    bounds = timestamp_bounds(now) if bounded else None
+    parsed = []
+    rejected = []
+    for index, item in enumerate(items):
+        errors = {}
+        if not isinstance(item, dict):
+            rejected.append({'index': index, 'errors': {'non_field_errors': 'Expected an object.'}})
+            continue
+
+        user_id = item.get('user_id')
+        try:
+            user_id = int(user_id)
+            if user_id <= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors['user_id'] = 'user_id must be a positive integer.'
+
+        value = item.get('value')
+        try:
+            value = float(value)
+            if not math.isfinite(value):
+                raise ValueError
+        except (TypeError, ValueError):
+            errors['value'] = 'Value must be numeric.'
+
+        try:
+            timestamp = _parse_timestamp(item.get('timestamp'), now)
+        except (ValueError, OverflowError, OSError) as e:
+            errors['timestamp'] = str(e)
+        else:
+            error = bounds and timestamp_error(timestamp, bounds)
+            if error:
+                errors['timestamp'] = error
+
+        if errors:
+            rejected.append({'index': index, 'errors': errors})
+        else:
+            parsed.append((index, user_id, value, timestamp))
+
+    # One query for every user id in the batch
+    existing = set(
+        User.objects.filter(pk__in={reading[1] for reading in parsed}).values_list('id', flat=True)
+    )
+    readings = []
+    for reading in parsed:
+        if reading[1] in existing:
+            readings.append(reading)
+        else:
+            rejected.append({'index': reading[0], 'errors': {'user_id': 'User with given id does not exist.'}})
+
+    rejected.sort(key=lambda entry: entry['index'])
+    return readings, rejected
+
+
+def stored_history(readings):
+    """
+    Last stored values of each user before their first reading in the batch.
+
+    Returns:
+        Dict {user_id: [values newest first]}
+    """
+    first_seen = {}
+    for _, user_id, _, timestamp in readings:
+        if user_id not in first_seen or timestamp < first_seen[user_id]:
+            first_seen[user_id] = timestamp
+
+    condition = Q()
+    for user_id, timestamp in first_seen.items():
+        condition |= Q(user_id=user_id, created_at__gte=timestamp - HISTORY_LOOKBACK, created_at__lt=timestamp)
+
+    rows = (
+        BPM.objects.filter(condition)
+        .annotate(position=Window(
+            RowNumber(),
+            partition_by=[F('user_id')],
+            order_by=[F('created_at').desc(), F('id').desc()]
+        ))
+        .filter(position__lt=HISTORY_SIZE)
+        .order_by('user_id', 'position')
+        .values_list('user_id', 'value')
+    )
+    history = {}
+    for user_id, value in rows:
+        history.setdefault(user_id, []).append(value)
+    return history
+
+
+def window_columns(rows):
+    """
+    `windows` and `lengths` arrays for `analyze_columns` from per-row
+    histories (lists of at most HISTORY_SIZE values).
+    """
+    import numpy as np
+
+    windows = np.zeros((len(rows), HISTORY_SIZE), dtype=np.float64)
+    lengths = np.empty(len(rows), dtype=np.intp)
+    for row, window in enumerate(rows):
+        windows[row, :len(window)] = window
+        lengths[row] = len(window)
+    return windows, lengths
+
+
+def score_readings(ml_service, readings, history):
+    """
+    Score a batch with one `analyze_columns` call.
+
+    `readings` must be sorted by (user, timestamp). Each row gets the same
+    history `BPMViewSet.create` would send: the current value followed by
+    the previous ones, newest first, at most HISTORY_SIZE values.
+    """
+    import numpy as np
+
+    rows = []
+    recent = {}
+    for _, user_id, value, _ in readings:
+        previous = recent.get(user_id)
+        if previous is None:
+            previous = history.get(user_id, [])
+        window = ([value] + previous)[:HISTORY_SIZE]
+        recent[user_id] = window
+        rows.append(window)
+    windows, lengths = window_columns(rows)
+
+    return ml_service.analyze_columns(
+        user_ids=np.array([reading[1] for reading in readings], dtype=np.int64),
+        heart_rates=np.array([reading[2] for reading in readings], dtype=np.float64),
+        windows=windows,
+        timestamps=[reading[3].isoformat() for reading in readings],
+        lengths=lengths,
+        with_predictions=True
+    )
+
+
+def ingest_bulk(items, ml_service=None, ip_address=None, category=EventLogger.DATA_IMPORTED, bounded=True):
+    """
+    Store and score a batch of readings.
+
+    Args:
+        items: List of {'user_id', 'value', 'timestamp'} dicts
+        ml_service: ML service (None when it is not available)
+        ip_address: Client address for the events
+        category: Category of the per-officer events (see BATCH_EVENTS)
+        bounded: Check client timestamps (see `validate_readings`)
+
+    Returns:
+        Response payload with accepted/rejected counts and ML summary
+
+    Raises:
+        BulkValidationError: The batch as a whole is invalid
+    """
+    readings, rejected = validate_readings(items, bounded=bounded)
+    return store_readings(readings, rejected, ml_service=ml_service, ip_address=ip_address, category=category)
+
+
+def store_readings(readings, rejected, ml_service=None, ip_address=None, category=EventLogger.DATA_IMPORTED):
+    """
+    Store and score validated readings (steps 2 to 4 of `ingest_bulk`).
+
+    Args:
+        readings: (index, user_id, value, timestamp) tuples of existing users
+        rejected: Rejected readings to report, as from `validate_readings`
+        ml_service: ML service (None when it is not available)
+        ip_address: Client address for the events
+        category: Category of the per-officer events (see BATCH_EVENTS)
+
+    Returns:
+        Response payload with accepted/rejected counts and ML summary
+    """
+    if not readings:
+        return {'accepted': 0, 'rejected': rejected, 'ids': [], 'ml_analysis': None}
+
+    # Per-user chronological order (ties keep request order)
+    readings.sort(key=lambda reading: (reading[1], reading[3], reading[0]))
+
+    ensure_partitions({reading[3] for reading in readings})
+    result = None
+    if ml_service is not None:
+        history = stored_history(readings)
+        result = score_readings(ml_service, readings, history)
+
+    assigned = set()
+    try:
+        with transaction.atomic():
+            bpms = BPM.objects.bulk_create([
+                BPM(user_id=user_id, value=value, created_at=timestamp)
+                for _, user_id, value, timestamp in readings
+            ])
+            events = []
+            alerts_by_row = {}
+            notify = 0
+
+            if result is not None:
+                alert_rows = result['alert_rows'].tolist()
+                alerts_data = result['alerts']
+                type_ids = alert_type_ids(
+                    [alert.alert_type for alert in alerts_data],
+                    [alert.severity for alert in alerts_data]
+                )
+                incident_aggregator.prefetch_supervisors(readings[row][1] for row in alert_rows)
+
+                incidents = []
+                for row, alert_data in zip(alert_rows, alerts_data):
+                    incident = incident_aggregator.assign(
+                        readings[row][1], type_ids[alert_data.alert_type],
+                        SEVERITY_TO_LEVEL.get(alert_data.severity, 'Medium'), readings[row][3]
+                    )
+                    if incident is not None:
+                        assigned.add(incident.incident_id)
+                    incidents.append(incident)
+                # Member counts, one UPDATE per incident
+                missing = incident_aggregator.record(incidents)
+
+                new_alerts = []
+                for row, alert_data, incident in zip(alert_rows, alerts_data, incidents):
+                    if incident is not None and incident.incident_id in missing:
+                        # Deleted meanwhile: keep the alert standalone
+                        incident = None
+                    user_id = readings[row][1]
+                    new_alerts.append(Alert(
+                        user_id=user_id,
+                        type_id=type_ids[alert_data.alert_type],
+                        level=SEVERITY_TO_LEVEL.get(alert_data.severity, 'Medium'),
+                        status='Pending',
+                        description=alert_data.message,
+                        location='',
+                        incident_id=incident.incident_id if incident else None
+                    ))
+                    event = alert_event(alert_data, incident, user_id, ip_address)
+                    if event is not None:
+                        events.append(event)
+                    if result['should_notify'][row] and (incident is None or incident.notify):
+                        notify += 1
+
+                for row, alert in zip(alert_rows, Alert.objects.bulk_create(new_alerts)):
+                    alerts_by_row[row] = alert.pk
+
+                predictions = result['predictions']
+                MLPrediction.objects.bulk_create([
+                    _prediction(bpm.user_id, bpm, prediction, alerts_by_row.get(row))
+                    for row, (bpm, prediction) in enumerate(zip(bpms, predictions))
+                    if prediction is not None
+                ])
+
+            # One event per officer instead of one per reading
+            per_user = {}
+            for _, user_id, _, _ in readings:
+                per_user[user_id] = per_user.get(user_id, 0) + 1
+            title, description = BATCH_EVENTS[category]
+            events.extend(
+                EventLogger.build_event(
+                    user=user_id,
+                    title=title,
+                    category=category,
+                    description=description.format(count=count),
+                    ip_address=ip_address
+                )
+                for user_id, count in per_user.items()
+            )
+            EventLogger.log_events(events)
+            # Readings out of order for the shared history
+            transaction.on_commit(lambda: recent_readings.invalidate(per_user))
+    except Exception:
+        # Incidents opened or counted in the rolled back transaction
+        for incident_id in assigned:
+            incident_aggregator.discard(incident_id)
+        # Alerts admitted by the cooldown but not stored: a retry of the
+        # batch must raise them again
+        if result is not None:
+            ml_service.revoke_alerts(result['alerts'])
+        raise
+
+    ml_analysis = None
+    if result is not None:
+        ml_analysis = {
+            'scored': int(result['valid'].sum()),
+            'alerts_created': len(alerts_by_row),
+            'suppressed_alerts': int(result['suppressed'].sum()),
+            'should_notify': notify,
+        }
+
+    # Ids in request order
+    order = sorted(range(len(readings)), key=lambda row: readings[row][0])
+    return {
+        'accepted': len(readings),
+        'rejected': rejected,
+        'ids': [bpms[row].pk for row in order],
+        'ml_analysis': ml_analysis,
+    }
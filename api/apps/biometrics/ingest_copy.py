@@ -0,0 +1,362 @@
+"""
+Historical import of device backlogs through PostgreSQL COPY.
+
+A device that syncs days of stored readings sends them as one CSV or NDJSON
+file (`POST /biometrics/import/`, `manage.py import_bpm`). Instead of
+building a row per reading in Python, `import_readings`:
+
+1. Creates an UNLOGGED staging table for the import (no WAL, dropped at
+   the end) and streams the file into it with `COPY FROM STDIN` as raw text
+2. Validates, dedups and merges the staged rows into `bpm` with one
+   INSERT ... SELECT: invalid values and unknown officers are rejected,
+   readings repeated in the file or already stored (same officer and
+   timestamp) are skipped
+3. Logs one Data_Imported event per officer
+
+The months of the file get their partitions on demand (see partitions.py).
+Scoring is a separate pass (`score_imported`) over the id and time range
+the merge returned: batches of stored readings, each with its history loaded in the
+same query, scored with one `analyze_columns` call per batch. Past readings
+only get their MLPrediction (with `requires_alert`); no alerts are raised
+for them and the live alert cooldown is left untouched.
+
+Formats (UTF-8):
+
+- CSV with the header `user_id,value,timestamp`
+- NDJSON: one `{"user_id", "value", "timestamp"}` object per line
+
+`timestamp` is ISO 8601 (UTC when naive) or epoch seconds, and defaults to
+the import time when empty, as in `POST /biometrics/bulk/`.
+"""
+
+import csv
+import io
+import json
+import uuid
+
+import psycopg2
+from django.conf import settings
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from apps.events import EventLogger
+from apps.users.models import User
+from .ingest import (
+    HISTORY_LOOKBACK, HISTORY_SIZE, BulkValidationError, prediction_fields, recent_readings, window_columns
+)
+from .models import BPM, MLPrediction
+from .partitions import ensure_partitions
+
+FORMATS = ('csv', 'ndjson')
+
+# Rejected row numbers reported back
+REJECTED_SAMPLE_SIZE = 100
+
+# Memory for the merge sorts (per import transaction)
+IMPORT_WORK_MEM = '64MB'
+
+# Chunk size of the COPY stream
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# ISO 8601 dates (PostgreSQL also takes words such as 'now' as timestamps)
+ISO_DATE_RE = r'^\s*\d{4}-\d{2}-\d{2}'
+
+# SQLSTATE of a row that fits no partition
+CHECK_VIOLATION = '23514'
+
+# Epoch seconds accepted as timestamps (to_timestamp() fails far beyond)
+MAX_EPOCH_SECONDS = 1e11
+
+# One object per line: CSV with delimiter and quote characters that do not
+# appear in JSON text, so each line arrives untouched in one column
+NDJSON_COPY_OPTIONS = "FORMAT csv, DELIMITER E'\\x02', QUOTE E'\\x01', ENCODING 'UTF8'"
+CSV_COPY_OPTIONS = "FORMAT csv, HEADER MATCH, ENCODING 'UTF8'"
+
+CHECKED_SQL = """
+WITH source AS ({source}),
+parsed AS (
+    SELECT
+        line,
+        CASE WHEN pg_input_is_valid(user_id, 'int4') THEN user_id::int4 END AS user_id,
+        CASE WHEN pg_input_is_valid(value, 'float8') THEN value::float8 END AS value,
+        CASE
+            WHEN taken_at IS NULL OR btrim(taken_at) = '' THEN statement_timestamp()
+            WHEN pg_input_is_valid(taken_at, 'float8') THEN
+                CASE WHEN abs(taken_at::float8) < %(max_epoch)s THEN to_timestamp(taken_at::float8) END
+            WHEN taken_at ~ %(iso_date)s AND pg_input_is_valid(taken_at, 'timestamptz')
+                THEN taken_at::timestamptz
+        END AS created_at
+    FROM source
+),
+checked AS (
+    SELECT
+        parsed.*,
+        -- abs() < Infinity also rules out NaN (greater than any number)
+        coalesce(
+            users.id IS NOT NULL AND abs(parsed.value) < 'Infinity' AND parsed.created_at IS NOT NULL,
+            false
+        ) AS ok
+    FROM parsed
+    LEFT JOIN {users} users ON users.id = parsed.user_id AND parsed.user_id > 0
+)
+"""
+
+# Months of the valid readings (their partitions must exist before the merge)
+MONTHS_SQL = CHECKED_SQL + """
+SELECT DISTINCT date_trunc('month', created_at, 'UTC') FROM checked WHERE ok
+"""
+
+MERGE_SQL = CHECKED_SQL + """,
+readings AS (
+    -- The first occurrence of a repeated reading wins
+    SELECT DISTINCT ON (user_id, created_at) user_id, value, created_at
+    FROM checked
+    WHERE ok
+    ORDER BY user_id, created_at, line
+),
+bounds AS (
+    SELECT min(created_at) AS first_at, max(created_at) AS last_at FROM readings
+),
+inserted AS (
+    INSERT INTO {bpm} (user_id, value, created_at, updated_at)
+    SELECT readings.user_id, readings.value, readings.created_at, statement_timestamp()
+    FROM readings
+    WHERE NOT EXISTS (
+        SELECT 1 FROM {bpm} stored
+        WHERE stored.user_id = readings.user_id AND stored.created_at = readings.created_at
+            -- Only the partitions of the file's time range are searched
+            AND stored.created_at BETWEEN (SELECT first_at FROM bounds) AND (SELECT last_at FROM bounds)
+    )
+    ORDER BY readings.user_id, readings.created_at
+    RETURNING id, user_id, created_at
+),
+per_user AS (
+    SELECT user_id, count(*) AS readings FROM inserted GROUP BY user_id
+)
+SELECT
+    (SELECT count(*) FROM checked),
+    (SELECT count(*) FROM checked WHERE ok),
+    (SELECT count(*) FROM inserted),
+    (SELECT min(id) FROM inserted),
+    (SELECT max(id) FROM inserted),
+    (SELECT min(created_at) FROM inserted),
+    (SELECT max(created_at) FROM inserted),
+    (SELECT array_agg(line) FROM (
+        SELECT line FROM checked WHERE NOT ok ORDER BY line LIMIT %(sample)s
+    ) rejected),
+    (SELECT array_agg(user_id) FROM per_user),
+    (SELECT array_agg(readings) FROM per_user)
+"""
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def import_readings(stream, fmt='csv', ip_address=None):
+    """
+    COPY a CSV/NDJSON file of readings into `bpm`.
+
+    Args:
+        stream: Binary file-like object with the readings
+        fmt: 'csv' or 'ndjson'
+        ip_address: Client address for the events
+
+    Returns:
+        Dict with 'received', 'imported', 'duplicates' and 'rejected'
+        counts, 'rejected_rows' (1-based data rows, first
+        REJECTED_SAMPLE_SIZE), the imported id range 'first_id' and
+        'last_id' and time range 'first_at' and 'last_at' (None when
+        nothing was imported)
+
+    Raises:
+        BulkValidationError: Unknown format or malformed file
+    """
+    if fmt not in FORMATS:
+        raise BulkValidationError(f"Unsupported format {fmt!r} (expected one of: {', '.join(FORMATS)}).")
+
+    staging = _quote(f"bpm_import_{uuid.uuid4().hex}")
+    if fmt == 'csv':
+        # Named as the header columns (HEADER MATCH checks them)
+        columns = 'user_id text, value text, "timestamp" text'
+        copy_sql = f"COPY {staging} (user_id, value, \"timestamp\") FROM STDIN WITH ({CSV_COPY_OPTIONS})"
+        source = f'SELECT line, user_id, value, "timestamp" AS taken_at FROM {staging}'
+    else:
+        columns = 'doc text'
+        copy_sql = f"COPY {staging} (doc) FROM STDIN WITH ({NDJSON_COPY_OPTIONS})"
+        # Each line is parsed once; blank lines are skipped and anything
+        # that is not a JSON object is rejected
+        source = (
+            f'SELECT line, fields.user_id, fields.value, fields."timestamp" AS taken_at FROM {staging}, '
+            "jsonb_to_record(CASE WHEN pg_input_is_valid(doc, 'jsonb') AND jsonb_typeof(doc::jsonb) = 'object' "
+            "THEN doc::jsonb ELSE '{}' END) AS fields(user_id text, value text, \"timestamp\" text) "
+            "WHERE btrim(doc, E' \\t\\r') <> ''"
+        )
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE UNLOGGED TABLE {staging} "
+            f"(line bigint GENERATED ALWAYS AS IDENTITY, {columns})"
+        )
+        # Sort the file for the dedup in memory
+        cursor.execute(f"SET LOCAL work_mem = '{IMPORT_WORK_MEM}'")
+        try:
+            with transaction.atomic():
+                cursor.copy_expert(copy_sql, stream, COPY_BUFFER_SIZE)
+        except psycopg2.DataError as e:
+            raise BulkValidationError(f"Malformed {fmt} file: {e.pgerror or e}".strip())
+
+        tables = {'source': source, 'users': _quote(User._meta.db_table), 'bpm': _quote(BPM._meta.db_table)}
+        params = {
+            'iso_date': ISO_DATE_RE,
+            'max_epoch': MAX_EPOCH_SECONDS,
+            'sample': REJECTED_SAMPLE_SIZE,
+        }
+        try:
+            with transaction.atomic():
+                cursor.execute(MERGE_SQL.format(**tables), params)
+        except IntegrityError as e:
+            # A month without partition (backlogs older than the partitions):
+            # create the file's months and merge again
+            if getattr(e.__cause__, 'pgcode', None) != CHECK_VIOLATION:
+                raise
+            cursor.execute(MONTHS_SQL.format(**tables), params)
+            ensure_partitions([month for month, in cursor.fetchall()])
+            cursor.execute(MERGE_SQL.format(**tables), params)
+        (received, valid, imported, first_id, last_id, first_at, last_at,
+         rejected_rows, user_ids, counts) = cursor.fetchone()
+        cursor.execute(f"DROP TABLE {staging}")
+        transaction.on_commit(lambda: recent_readings.invalidate(user_ids or []))
+
+        # One import event per officer
+        EventLogger.log_events([
+            EventLogger.build_event(
+                user=user_id,
+                title="BPM Records Imported",
+                category=EventLogger.DATA_IMPORTED,
+                description=f"{count} historical BPM readings imported",
+                ip_address=ip_address
+            )
+            for user_id, count in zip(user_ids or [], counts or [])
+        ])
+
+    return {
+        'received': received,
+        'imported': imported,
+        'duplicates': valid - imported,
+        'rejected': received - valid,
+        'rejected_rows': rejected_rows or [],
+        'first_id': first_id,
+        'last_id': last_id,
+        'first_at': first_at,
+        'last_at': last_at,
+    }
+
+
+PREDICTION_COLUMNS = (
+    'user_id', 'bpm_record_id', 'stress_score', 'stress_level', 'severity', 'requires_alert',
+    'alert_probability', 'is_anomaly', 'hr_zone', 'anomaly_score', 'hr_variability', 'hr_rapid_changes',
+    'high_stress_risk', 'hr_elevated_sustained', 'features', 'ml_metadata', 'created_at'
+)
+
+# Written as their smallint codes
+ENUM_COLUMNS = ('stress_level', 'severity', 'hr_zone')
+
+
+def _copy_predictions(rows, predictions):
+    """
+    COPY the MLPrediction rows of a scored batch, stamped with the time of
+    their reading (same partition month); returns how many.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for (pk, user_id, _, created_at, _), prediction in zip(rows, predictions):
+        if prediction is None:
+            continue
+        fields = prediction_fields(prediction)
+        for name in ENUM_COLUMNS:
+            fields[name] = MLPrediction._meta.get_field(name).get_prep_value(fields[name])
+        fields['features'] = '\\x' + fields['features'].hex()
+        fields['ml_metadata'] = json.dumps(fields['ml_metadata'])
+        writer.writerow((user_id, pk, *(fields[name] for name in PREDICTION_COLUMNS[2:-1]), created_at.isoformat()))
+        count += 1
+    buffer.seek(0)
+
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {_quote(MLPrediction._meta.db_table)} ({', '.join(PREDICTION_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer,
+            COPY_BUFFER_SIZE
+        )
+    return count
+
+
+def score_imported(first_id, last_id, ml_service, batch_size=None, since=None, until=None):
+    """
+    Score the stored readings with ids in [first_id, last_id] that have no
+    prediction yet, in batches (one query, one ML call and one COPY of the
+    predictions each, committed separately outside a request transaction).
+
+    Each reading is scored with its real history: the officer's previous
+    stored readings by timestamp (within HISTORY_LOOKBACK), whether
+    imported or not.
+
+    `since` and `until` (the 'first_at'/'last_at' of the import) bound the
+    readings' timestamps, so only the partitions of the import are scanned.
+
+    Returns:
+        Dict with 'scored' readings and how many 'requires_alert'
+    """
+    import numpy as np
+
+    batch_size = batch_size or settings.BIOMETRICS_IMPORT_SCORE_BATCH_SIZE
+    readings = BPM.objects.filter(pk__gte=first_id, pk__lte=last_id)
+    if since is not None:
+        readings = readings.filter(created_at__gte=since)
+    if until is not None:
+        readings = readings.filter(created_at__lte=until)
+    pending = (
+        readings
+        .exclude(Exists(MLPrediction.objects.filter(
+            bpm_record_id=OuterRef('pk'), created_at=OuterRef('created_at')
+        )))
+        .annotate(previous=ArraySubquery(
+            BPM.objects.filter(
+                user_id=OuterRef('user_id'),
+                created_at__gte=OuterRef('created_at') - HISTORY_LOOKBACK,
+                created_at__lt=OuterRef('created_at')
+            )
+            .order_by('-created_at')
+            .values('value')[:HISTORY_SIZE - 1]
+        ))
+        .order_by('pk')
+        .values_list('pk', 'user_id', 'value', 'created_at', 'previous')
+    )
+
+    scored = 0
+    requires_alert = 0
+    after = first_id - 1
+    while True:
+        rows = list(pending.filter(pk__gt=after)[:batch_size])
+        if not rows:
+            break
+        after = rows[-1][0]
+
+        windows, lengths = window_columns([[value] + previous for _, _, value, _, previous in rows])
+        result = ml_service.analyze_columns(
+            user_ids=np.array([row[1] for row in rows], dtype=np.int64),
+            heart_rates=np.array([row[2] for row in rows], dtype=np.float64),
+            windows=windows,
+            lengths=lengths,
+            with_predictions=True,
+            with_alerts=False
+        )
+        with transaction.atomic():
+            scored += _copy_predictions(rows, result['predictions'])
+        requires_alert += int(result['requires_alert'].sum())
+
+    return {'scored': scored, 'requires_alert': requires_alert}
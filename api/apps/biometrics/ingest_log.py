@@ -0,0 +1,391 @@
+"""
+Write-behind ingestion log.
+
+With `BIOMETRICS_WRITE_BEHIND` enabled, `BPMViewSet.create` only validates
+a reading, appends it to a local append-only log and answers 202 with the
+reading's sequence id. A background flusher drains the log in batches
+through `ingest_bulk` (bulk inserts, one ML call, bulk alerts), so the
+request latency no longer depends on the database or the ML service.
+
+Log layout (`BIOMETRICS_WRITE_BEHIND_DIR`, shared by the workers of a host):
+
+- Segment files `<start>.log` with one JSON reading per line. `<start>` is
+  the log position of the segment's first byte and a reading's sequence id
+  is the position of its line, so ids are unique and increasing across
+  worker processes without a shared counter.
+- `append.lock`: appends are serialized with flock, so the log order is
+  the arrival order. Timestamps are taken inside the lock and increase
+  with it, which keeps readings of the same officer in order.
+- `flush.lock`: only the worker holding it runs the flusher.
+- `log.id`: identity of the log, used as the checkpoint name.
+- `failed.jsonl`: readings the flusher could not store, with the reason
+  (the checkpoint moves past them).
+
+The drained position is stored in the database (`IngestCheckpoint`) in the
+same transaction as the rows built from it. After a crash the flusher
+resumes from there and replays exactly the readings that were not stored.
+Segments that end before the checkpoint are deleted. Server processes start
+the flusher when they load (`start_write_behind`, from config.wsgi and
+config.asgi), so a restart replays the log before any new reading arrives.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections, transaction
+from django.utils import timezone
+
+from apps.events import EventLogger
+from apps.users.models import User
+from .ingest import ingest_bulk
+from .models import IngestCheckpoint
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = '.log'
+# Readings the flusher could not store (one JSON object per line)
+FAILED_FILE = 'failed.jsonl'
+
+
+class IngestLog:
+    """Append-only segmented log of raw readings."""
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, fsync=True):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._lock_fd = None
+        self._segment = None  # (start, fd) of the segment appended to last
+        self._log_id = None
+
+    @property
+    def log_id(self):
+        """Identity of the log directory (created on first use)."""
+        if self._log_id is None:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, 'log.id')
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            except FileExistsError:
+                pass
+            else:
+                with os.fdopen(fd, 'w') as f:
+                    f.write(uuid.uuid4().hex)
+            with open(path) as f:
+                self._log_id = f.read().strip()
+        return self._log_id
+
+    def segments(self):
+        """Start positions of the segments, oldest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            int(name[:-len(SEGMENT_SUFFIX)])
+            for name in names if name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def _path(self, start):
+        return os.path.join(self.directory, f'{start:020d}{SEGMENT_SUFFIX}')
+
+    def append(self, user_id, value):
+        """
+        Append one reading.
+
+        Returns:
+            (sequence, timestamp) of the stored reading
+        """
+        with self._lock:
+            if self._lock_fd is None:
+                self.log_id  # Creates the directory
+                self._lock_fd = os.open(
+                    os.path.join(self.directory, 'append.lock'), os.O_RDWR | os.O_CREAT, 0o644
+                )
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                start, fd = self._active_segment()
+                size = os.fstat(fd).st_size
+                if size and os.pread(fd, 1, size - 1) != b'\n':
+                    # Torn write of a crashed worker: end that line
+                    os.write(fd, b'\n')
+                    size += 1
+
+                timestamp = timezone.now()
+                line = json.dumps(
+                    {'user_id': user_id, 'value': value, 'timestamp': timestamp.isoformat()},
+                    separators=(',', ':')
+                ).encode() + b'\n'
+                os.write(fd, line)
+                if self.fsync:
+                    os.fdatasync(fd)
+                return start + size, timestamp
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _active_segment(self):
+        """Segment to append to, rolling over full ones (append lock held)."""
+        if self._segment is not None:
+            start, fd = self._segment
+            # Only full segments are rolled, so a non-full one is the newest
+            if os.fstat(fd).st_size < self.segment_bytes:
+                return self._segment
+            os.close(fd)
+            self._segment = None
+
+        starts = self.segments()
+        start = starts[-1] if starts else 0
+        fd = os.open(self._path(start), os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        size = os.fstat(fd).st_size
+        if size >= self.segment_bytes:
+            os.close(fd)
+            start += size
+            fd = os.open(self._path(start), os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        self._segment = (start, fd)
+        return self._segment
+
+    def read(self, position, limit):
+        """
+        Complete readings stored from `position` on.
+
+        Args:
+            position: Log position to start from (a line boundary)
+            limit: Maximum number of readings
+
+        Returns:
+            (items, position): the readings (dicts with their 'sequence')
+            and the position right after the last line consumed
+        """
+        items = []
+        starts = self.segments()
+        for index, start in enumerate(starts):
+            path = self._path(start)
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                continue
+            with f:
+                size = os.fstat(f.fileno()).st_size
+                if start + size <= position:
+                    continue
+                offset = max(position - start, 0)
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        if index == len(starts) - 1:
+                            # Being written: stop before it
+                            return items, position
+                        # Torn write left behind in a rolled segment
+                        break
+                    line_position = start + offset
+                    offset += len(line)
+                    position = start + offset
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        logger.warning("Skipping corrupt ingest log entry at %d", line_position)
+                        continue
+                    item['sequence'] = line_position
+                    items.append(item)
+                    if len(items) >= limit:
+                        return items, position
+                position = max(position, start + offset)
+        return items, position
+
+    def set_aside(self, item, errors):
+        """Record a reading that could not be stored in `failed.jsonl`."""
+        logger.warning("Ingest log reading set aside: %s (%s)", item, errors)
+        line = json.dumps({'reading': item, 'errors': errors}, default=str, separators=(',', ':'))
+        with open(os.path.join(self.directory, FAILED_FILE), 'a') as f:
+            f.write(line + '\n')
+
+    def truncate(self, position):
+        """Delete the segments that end at or before `position` (never the newest)."""
+        starts = self.segments()
+        for start, next_start in zip(starts, starts[1:]):
+            if next_start > position:
+                break
+            try:
+                os.remove(self._path(start))
+            except FileNotFoundError:
+                pass
+
+
+class IngestLogFlusher:
+    """Drains an `IngestLog` into the database from a background thread."""
+
+    def __init__(self, log, batch_size=1000, interval=0.5):
+        self.log = log
+        self.batch_size = batch_size
+        self.interval = interval
+        self.ml_service = None
+        self._lock = threading.Lock()
+        self._leader_fd = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, ml_service=None):
+        """Start the flusher thread of this process (no-op if running)."""
+        if self._running():
+            return
+        with self._lock:
+            if self._running():
+                return
+            self.ml_service = ml_service
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='ingest-log-flusher', daemon=True
+            )
+            self._thread.start()
+
+    def _running(self):
+        # A thread object copied by fork is not alive in the child
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout=None):
+        """Stop the flusher thread after its current batch."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+
+    def _is_leader(self):
+        """Whether this process flushes the log (one process per host)."""
+        if self._leader_fd is None:
+            self.log.log_id  # Creates the directory
+            fd = os.open(os.path.join(self.log.directory, 'flush.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            self._leader_fd = fd
+        return True
+
+    def _run(self):
+        # The first pass replays what a previous process left behind
+        while not self._stop.is_set():
+            try:
+                if self._is_leader():
+                    while not self._stop.is_set() and self.drain_once():
+                        pass
+            except Exception:
+                logger.exception("Ingest log flush failed; retrying")
+            finally:
+                close_old_connections()
+            self._stop.wait(self.interval)
+
+    def _ingest(self, items):
+        """Store readings; returns the rejected ones as (reading, errors)."""
+        result = ingest_bulk(
+            items,
+            ml_service=self.ml_service,
+            # Readings posted one at a time: captures, not an import
+            category=EventLogger.BIOMETRIC_CAPTURE_SUCCESS,
+            # Timestamped by the server when appended (already answered
+            # with 202): however long the log held them, they are stored
+            bounded=False
+        )
+        return [(items[entry['index']], entry['errors']) for entry in result['rejected']]
+
+    def _store(self, items):
+        """
+        Store a batch. When it fails, each reading is stored on its own so
+        one bad reading does not stall the log behind it.
+
+        Connection errors are raised: the batch is retried as a whole.
+
+        Returns:
+            (reading, errors) of the readings that could not be stored
+        """
+        try:
+            with transaction.atomic():
+                return self._ingest(items)
+        except (OperationalError, InterfaceError):
+            raise
+        except Exception:
+            logger.exception("Ingest log batch failed, storing its readings one at a time")
+
+        failed = []
+        for item in items:
+            try:
+                with transaction.atomic():
+                    failed.extend(self._ingest([item]))
+            except (OperationalError, InterfaceError):
+                raise
+            except Exception as e:
+                failed.append((item, repr(e)))
+        return failed
+
+    def drain_once(self):
+        """
+        Store the next batch of the log. Readings that cannot be stored are
+        set aside (`failed.jsonl`) and the checkpoint moves past them.
+
+        Returns:
+            True if the checkpoint moved (there may be more to drain)
+        """
+        batch_size = min(self.batch_size, settings.BIOMETRICS_BULK_MAX_READINGS)
+        with transaction.atomic():
+            checkpoint, _ = (
+                IngestCheckpoint.objects.select_for_update()
+                .get_or_create(name=self.log.log_id)
+            )
+            items, position = self.log.read(checkpoint.position, batch_size)
+            if position == checkpoint.position:
+                return False
+
+            failed = self._store(items) if items else []
+
+            checkpoint.position = position
+            checkpoint.save(update_fields=['position', 'updated_at'])
+
+        for item, errors in failed:
+            self.log.set_aside(item, errors)
+
+        self.log.truncate(position)
+        return True
+
+
+# Users known to exist (write-behind requests skip the database), with the
+# time they were checked: deletes in other processes only reach this one
+# through the expiry, deletes in this one through `forget_user`
+KNOWN_USER_SECONDS = 60
+_known_users = {}
+
+
+def known_user(user_id):
+    """Whether a user exists, querying at most every KNOWN_USER_SECONDS."""
+    now = time.monotonic()
+    checked_at = _known_users.get(user_id)
+    if checked_at is None or now - checked_at >= KNOWN_USER_SECONDS:
+        if not User.objects.filter(pk=user_id).exists():
+            _known_users.pop(user_id, None)
+            return False
+        _known_users[user_id] = now
+    return True
+
+
+def forget_user(user_id):
+    """Drop a deleted user from the `known_user` cache."""
+    _known_users.pop(user_id, None)
+
+
+ingest_log = IngestLog(
+    settings.BIOMETRICS_WRITE_BEHIND_DIR,
+    segment_bytes=settings.BIOMETRICS_WRITE_BEHIND_SEGMENT_BYTES,
+    fsync=settings.BIOMETRICS_WRITE_BEHIND_FSYNC
+)
+ingest_log_flusher = IngestLogFlusher(
+    ingest_log,
+    batch_size=settings.BIOMETRICS_WRITE_BEHIND_BATCH_SIZE,
+    interval=settings.BIOMETRICS_WRITE_BEHIND_INTERVAL
+)
@@ -0,0 +1,55 @@
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.biometrics.archive import archive_month
+from apps.biometrics.partitions import add_months, attached_months, month_start
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the months of raw BPM readings and ML predictions older than the "
+        "archive age into compressed per-officer segment files, then drop their partitions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int,
+                            help='Months kept in the database, the current one included '
+                                 '(default: BIOMETRICS_ARCHIVE_AFTER_MONTHS)')
+        parser.add_argument('--month', metavar='YYYY-MM', help='Archive only this month')
+        parser.add_argument('--keep-partitions', action='store_true',
+                            help='Write the segments but leave the partitions attached')
+
+    def handle(self, *args, **options):
+        current = month_start(timezone.now())
+
+        if options['month']:
+            try:
+                months = [datetime.strptime(options['month'], '%Y-%m').replace(tzinfo=dt_timezone.utc)]
+            except ValueError:
+                raise CommandError('--month expects YYYY-MM.')
+        else:
+            keep = options['keep']
+            if keep is None:
+                keep = settings.BIOMETRICS_ARCHIVE_AFTER_MONTHS
+            if keep <= 0:
+                raise CommandError('Archiving is disabled (BIOMETRICS_ARCHIVE_AFTER_MONTHS is 0); pass --keep.')
+            before = add_months(current, 1 - keep)
+            months = [month for month in attached_months() if month < before]
+        if any(month >= current for month in months):
+            raise CommandError('Refusing to archive the current month.')
+
+        for month in sorted(months):
+            started = time.perf_counter()
+            result = archive_month(month, drop=not options['keep_partitions'])
+            self.stdout.write(
+                f"{month:%Y-%m}: {result['readings']} readings and {result['predictions']} predictions "
+                f"in {result['segments']} segments ({result['bytes'] / 1024:,.0f} KiB, "
+                f"{time.perf_counter() - started:.1f} s)"
+            )
+            for name in result['detached']:
+                self.stdout.write(f"  dropped {name}")
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,88 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.biometrics.ingest import BulkValidationError
+from apps.biometrics.ingest_copy import FORMATS, import_readings, score_imported
+
+EXTENSIONS = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Import BPM backlogs from CSV (header user_id,value,timestamp) or NDJSON files "
+        "through PostgreSQL COPY, then score the imported readings in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help="Files to import ('-' reads stdin)")
+        parser.add_argument('--format', choices=FORMATS,
+                            help='File format (default: from the extension; required for stdin)')
+        parser.add_argument('--no-score', action='store_true', help='Skip the ML scoring pass')
+        parser.add_argument('--batch-size', type=int,
+                            help='Readings per ML call (default: BIOMETRICS_IMPORT_SCORE_BATCH_SIZE)')
+        parser.add_argument('--score-range', nargs=2, type=int, metavar=('FIRST_ID', 'LAST_ID'),
+                            help='Only score the unscored readings with ids in this range')
+
+    def handle(self, *args, **options):
+        from apps.biometrics.views import ML_AVAILABLE, ml_service
+
+        if not options['files'] and not options['score_range']:
+            raise CommandError('Give files to import or --score-range.')
+        score = ML_AVAILABLE and not options['no_score']
+        if not ML_AVAILABLE and not options['no_score']:
+            self.stderr.write(self.style.WARNING('ML service not available: readings are not scored.'))
+
+        ranges = []
+        if options['score_range']:
+            ranges.append((*options['score_range'], None, None))
+
+        for path in options['files']:
+            fmt = options['format'] or self._format(path)
+            started = time.perf_counter()
+            try:
+                if path == '-':
+                    result = import_readings(sys.stdin.buffer, fmt)
+                else:
+                    with open(path, 'rb') as stream:
+                        result = import_readings(stream, fmt)
+            except (BulkValidationError, OSError) as e:
+                raise CommandError(f"{path}: {e}")
+            elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f"{path}: {result['imported']} imported, {result['duplicates']} duplicates, "
+                f"{result['rejected']} rejected of {result['received']} "
+                f"({result['received'] / max(elapsed, 1e-9):,.0f} rows/s)"
+            )
+            if result['rejected_rows']:
+                self.stdout.write(f"  rejected rows: {', '.join(map(str, result['rejected_rows']))}")
+            if result['imported']:
+                ranges.append((result['first_id'], result['last_id'], result['first_at'], result['last_at']))
+
+        if not score:
+            for first_id, last_id, _, _ in ranges:
+                self.stdout.write(f"Not scored: ids {first_id}-{last_id}")
+            return
+
+        for first_id, last_id, since, until in ranges:
+            started = time.perf_counter()
+            result = score_imported(
+                first_id, last_id, ml_service, batch_size=options['batch_size'], since=since, until=until
+            )
+            self.stdout.write(
+                f"ids {first_id}-{last_id}: {result['scored']} scored, "
+                f"{result['requires_alert']} require alert ({time.perf_counter() - started:.1f} s)"
+            )
+        self.stdout.write(self.style.SUCCESS('Done'))
+
+    def _format(self, path):
+        for extension, fmt in EXTENSIONS.items():
+            if path.lower().endswith(extension):
+                return fmt
+        raise CommandError(f"{path}: cannot tell the format, use --format.")
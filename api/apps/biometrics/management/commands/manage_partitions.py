@@ -0,0 +1,57 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.biometrics.partitions import (
+    add_months, create_partitions, detach_partitions, month_start, months_between
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the monthly partitions of bpm and ml_predictions ahead of time and "
+        "detach (optionally drop) the partitions older than the retention period. Run it daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int,
+                            help='Months to create after the current one (default: BIOMETRICS_PARTITION_MONTHS_AHEAD)')
+        parser.add_argument('--retention', type=int,
+                            help='Months to keep, the current one included; older partitions are detached '
+                                 '(default: BIOMETRICS_RETENTION_MONTHS, 0 keeps everything)')
+        parser.add_argument('--detach-before', metavar='YYYY-MM',
+                            help='Detach the partitions of the months before this one')
+        parser.add_argument('--drop', action='store_true',
+                            help='Drop the detached partitions instead of leaving them as standalone tables')
+
+    def handle(self, *args, **options):
+        current = month_start(timezone.now())
+
+        ahead = options['ahead']
+        if ahead is None:
+            ahead = settings.BIOMETRICS_PARTITION_MONTHS_AHEAD
+        created = create_partitions(months_between(current, add_months(current, ahead)))
+        for month in created:
+            self.stdout.write(f"Created partitions for {month:%Y-%m}")
+
+        before = None
+        if options['detach_before']:
+            try:
+                before = datetime.strptime(options['detach_before'], '%Y-%m').replace(tzinfo=dt_timezone.utc)
+            except ValueError:
+                raise CommandError('--detach-before expects YYYY-MM.')
+        else:
+            retention = options['retention']
+            if retention is None:
+                retention = settings.BIOMETRICS_RETENTION_MONTHS
+            if retention > 0:
+                before = add_months(current, 1 - retention)
+
+        if before is not None:
+            if before > current:
+                raise CommandError('Refusing to detach the current month.')
+            for name in detach_partitions(before, drop=options['drop']):
+                self.stdout.write(f"{'Dropped' if options['drop'] else 'Detached'} {name}")
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,60 @@
+import time
+from datetime import timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils.dateparse import parse_datetime
+
+from apps.biometrics.models import BPM
+from apps.biometrics.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the per-minute and per-hour BPM rollups from the stored readings "
+        "(backfills, partitions attached by hand), one transaction per chunk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Start (ISO 8601; default: oldest stored reading)')
+        parser.add_argument('--until', help='End, exclusive (ISO 8601; default: newest stored reading)')
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only this officer (repeatable)')
+        parser.add_argument('--chunk-days', type=int, default=1, help='Days per transaction (default: 1)')
+
+    def handle(self, *args, **options):
+        bounds = BPM.objects.aggregate(oldest=Min('created_at'), newest=Max('created_at'))
+        since = self._timestamp(options['since'], '--since') or bounds['oldest']
+        until = self._timestamp(options['until'], '--until') or (
+            bounds['newest'] and bounds['newest'] + timedelta(microseconds=1)
+        )
+        if since is None or until is None:
+            self.stdout.write('No readings to roll up.')
+            return
+
+        chunk = timedelta(days=options['chunk_days'])
+        written = 0
+        started = time.perf_counter()
+        start = since
+        while start < until:
+            end = min(start + chunk, until)
+            counts = rebuild(start, end, user_ids=options['user_ids'])
+            written += sum(counts.values())
+            self.stdout.write(f"{start:%Y-%m-%d %H:%M} - {end:%Y-%m-%d %H:%M}: {counts}")
+            start = end
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {written} rollup rows in {time.perf_counter() - started:.1f} s"
+        ))
+
+    def _timestamp(self, raw, name):
+        if raw is None:
+            return None
+        try:
+            value = parse_datetime(raw)
+        except ValueError:
+            value = None
+        if value is None:
+            raise CommandError(f"{name} expects an ISO 8601 timestamp.")
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=dt_timezone.utc)
+        return value
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biometrics', '0003_mlprediction'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bpm',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biometrics', '0005_ingestcheckpoint'),
+        ('users', '0002_add_officer_fields'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bpm',
+            name='id',
+            field=models.BigAutoField(primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='bpm',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='bpms', to='users.user'),
+        ),
+        migrations.AlterField(
+            model_name='mlprediction',
+            name='bpm_record',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='ml_predictions', to='biometrics.bpm'),
+        ),
+        migrations.AlterField(
+            model_name='mlprediction',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='mlprediction',
+            name='id',
+            field=models.BigAutoField(primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='mlprediction',
+            name='is_anomaly',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='mlprediction',
+            name='requires_alert',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='mlprediction',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='ml_predictions', to='users.user'),
+        ),
+    ]
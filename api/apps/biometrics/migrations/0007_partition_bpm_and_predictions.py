@@ -0,0 +1,149 @@
+"""
+Rebuild `bpm` and `ml_predictions` as tables range-partitioned by month
+on created_at (see apps/biometrics/partitions.py).
+
+Each table is renamed aside, recreated as a partitioned table with the
+partitions covering its data plus BIOMETRICS_PARTITION_MONTHS_AHEAD months,
+filled with INSERT ... SELECT and dropped. Indexes and foreign keys are
+recreated with their original definitions; the primary key becomes
+(id, created_at) and ids come from a bigint sequence (PostgreSQL 16 has no
+identity columns on partitioned tables). Predictions take the timestamp
+of their reading, so both tables split along the same months.
+
+The data is copied, so on a large database run it in a maintenance window.
+Reversing it copies the attached partitions back into plain tables the same
+way (detached or archived months are left out).
+"""
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+from apps.biometrics.partitions import add_months, month_start, months_between, partition_ddl
+
+
+def _partition_table(schema_editor, cursor, table, months, select_sql):
+    quote = schema_editor.quote_name
+    aside = f"{table}_unpartitioned"
+
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() "
+        "AND tablename = %s AND indexname <> %s",
+        [table, f"{table}_pkey"]
+    )
+    indexes = [definition for definition, in cursor.fetchall()]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table]
+    )
+    foreign_keys = cursor.fetchall()
+
+    cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(aside)}")
+    cursor.execute(
+        f"CREATE TABLE {quote(table)} (LIKE {quote(aside)} INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    for month in months:
+        cursor.execute(partition_ddl(table, month))
+
+    cursor.execute(f"INSERT INTO {quote(table)} {select_sql.format(source=quote(aside))}")
+    cursor.execute(f"SELECT max(id) FROM {quote(aside)}")
+    max_id, = cursor.fetchone()
+    cursor.execute(f"DROP TABLE {quote(aside)}")
+
+    cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + '_pkey')} PRIMARY KEY (id, created_at)")
+    for definition in indexes:
+        cursor.execute(definition)
+    for name, definition in foreign_keys:
+        cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}")
+
+    sequence = f"{table}_id_seq"
+    cursor.execute(f"CREATE SEQUENCE {quote(sequence)} AS bigint OWNED BY {quote(table)}.id")
+    if max_id is not None:
+        cursor.execute("SELECT setval(%s, %s)", [sequence, max_id])
+    cursor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+
+
+def partition_tables(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT min(created_at) FROM bpm")
+        oldest, = cursor.fetchone()
+        now = timezone.now()
+        last = add_months(month_start(now), settings.BIOMETRICS_PARTITION_MONTHS_AHEAD)
+        months = months_between(min(oldest or now, now), last)
+
+        cursor.execute(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = 'ml_predictions' ORDER BY ordinal_position"
+        )
+        prediction_columns = [name for name, in cursor.fetchall()]
+
+        _partition_table(schema_editor, cursor, 'bpm', months, "SELECT * FROM {source}")
+        # Predictions move to the month of their reading
+        _partition_table(
+            schema_editor,
+            cursor,
+            'ml_predictions',
+            months,
+            "SELECT " + ", ".join(
+                'bpm.created_at' if name == 'created_at' else f'prediction."{name}"'
+                for name in prediction_columns
+            ) + " FROM {source} prediction JOIN bpm ON bpm.id = prediction.bpm_record_id"
+        )
+
+
+def _merge_table(schema_editor, cursor, table):
+    quote = schema_editor.quote_name
+    aside = f"{table}_partitioned"
+
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() "
+        "AND tablename = %s AND indexname <> %s",
+        [table, f"{table}_pkey"]
+    )
+    # Indexes of a partitioned table are defined ON ONLY the parent
+    indexes = [definition.replace(' ON ONLY ', ' ON ', 1) for definition, in cursor.fetchall()]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table]
+    )
+    foreign_keys = cursor.fetchall()
+
+    cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(aside)}")
+    cursor.execute(f"CREATE TABLE {quote(table)} (LIKE {quote(aside)} INCLUDING DEFAULTS)")
+    # The id sequence belongs to the partitioned table and goes with it
+    cursor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN id DROP DEFAULT")
+    cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(aside)}")
+    cursor.execute(f"SELECT max(id) FROM {quote(aside)}")
+    max_id, = cursor.fetchone()
+    cursor.execute(f"DROP TABLE {quote(aside)}")
+
+    cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + '_pkey')} PRIMARY KEY (id)")
+    for definition in indexes:
+        cursor.execute(definition)
+    for name, definition in foreign_keys:
+        cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}")
+
+    cursor.execute(
+        f"ALTER TABLE {quote(table)} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY "
+        f"(START WITH {(max_id or 0) + 1})"
+    )
+
+
+def merge_tables(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        _merge_table(schema_editor, cursor, 'ml_predictions')
+        _merge_table(schema_editor, cursor, 'bpm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biometrics', '0006_bigint_ids_and_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, merge_tables, elidable=False),
+    ]
@@ -0,0 +1,140 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# (date_trunc unit, rollup table) of each resolution
+RESOLUTIONS = (('minute', 'bpm_rollup_minute'), ('hour', 'bpm_rollup_hour'))
+
+# Every INSERT statement on bpm adds its readings to the buckets (one
+# upsert per resolution); UPDATE and DELETE statements recompute the
+# buckets of the rows they changed from the remaining readings
+CREATE_TRIGGERS = """
+CREATE FUNCTION bpm_rollup_accumulate() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    resolution text[];
+BEGIN
+    FOREACH resolution SLICE 1 IN ARRAY ARRAY[['minute', 'bpm_rollup_minute'], ['hour', 'bpm_rollup_hour']] LOOP
+        EXECUTE format(
+            'INSERT INTO %1$I AS rollup (user_id, bucket, count, min_value, max_value, sum_value, sum_squares) '
+            'SELECT user_id, date_trunc(%2$L, created_at, ''UTC''), count(*), min(value), max(value), '
+            'sum(value), sum(value * value) FROM new_rows GROUP BY 1, 2 ORDER BY 1, 2 '
+            'ON CONFLICT (user_id, bucket) DO UPDATE SET '
+            'count = rollup.count + EXCLUDED.count, '
+            'min_value = least(rollup.min_value, EXCLUDED.min_value), '
+            'max_value = greatest(rollup.max_value, EXCLUDED.max_value), '
+            'sum_value = rollup.sum_value + EXCLUDED.sum_value, '
+            'sum_squares = rollup.sum_squares + EXCLUDED.sum_squares',
+            resolution[2], resolution[1]
+        );
+    END LOOP;
+    RETURN NULL;
+END
+$$;
+
+CREATE FUNCTION bpm_rollup_recompute() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    resolution text[];
+    changed text;
+    affected text;
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        changed := 'SELECT user_id, created_at FROM old_rows UNION ALL SELECT user_id, created_at FROM new_rows';
+    ELSE
+        changed := 'SELECT user_id, created_at FROM old_rows';
+    END IF;
+    FOREACH resolution SLICE 1 IN ARRAY ARRAY[['minute', 'bpm_rollup_minute'], ['hour', 'bpm_rollup_hour']] LOOP
+        affected := format(
+            'SELECT DISTINCT user_id, date_trunc(%1$L, created_at, ''UTC'') AS bucket FROM (%2$s) changed',
+            resolution[1], changed
+        );
+        EXECUTE format(
+            'DELETE FROM %1$I rollup USING (%2$s) affected '
+            'WHERE rollup.user_id = affected.user_id AND rollup.bucket = affected.bucket',
+            resolution[2], affected
+        );
+        EXECUTE format(
+            'INSERT INTO %1$I (user_id, bucket, count, min_value, max_value, sum_value, sum_squares) '
+            'SELECT affected.user_id, affected.bucket, count(*), min(bpm.value), max(bpm.value), '
+            'sum(bpm.value), sum(bpm.value * bpm.value) FROM (%2$s) affected '
+            'JOIN bpm ON bpm.user_id = affected.user_id AND bpm.created_at >= affected.bucket '
+            'AND bpm.created_at < affected.bucket + %3$L::interval GROUP BY 1, 2',
+            resolution[2], affected, '1 ' || resolution[1]
+        );
+    END LOOP;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER bpm_rollup_insert AFTER INSERT ON bpm
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bpm_rollup_accumulate();
+CREATE TRIGGER bpm_rollup_update AFTER UPDATE ON bpm
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bpm_rollup_recompute();
+CREATE TRIGGER bpm_rollup_delete AFTER DELETE ON bpm
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION bpm_rollup_recompute();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER bpm_rollup_insert ON bpm;
+DROP TRIGGER bpm_rollup_update ON bpm;
+DROP TRIGGER bpm_rollup_delete ON bpm;
+DROP FUNCTION bpm_rollup_accumulate();
+DROP FUNCTION bpm_rollup_recompute();
+"""
+
+
+def backfill_rollups(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for unit, table in RESOLUTIONS:
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, bucket, count, min_value, max_value, sum_value, sum_squares) "
+                f"SELECT user_id, date_trunc('{unit}', created_at, 'UTC'), count(*), min(value), max(value), "
+                "sum(value), sum(value * value) FROM bpm GROUP BY 1, 2"
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biometrics', '0007_partition_bpm_and_predictions'),
+        ('users', '0002_add_officer_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BPMHourRollup',
+            fields=[
+                ('pk', models.CompositePrimaryKey('user', 'bucket', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('bucket', models.DateTimeField()),
+                ('count', models.IntegerField()),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('sum_value', models.FloatField()),
+                ('sum_squares', models.FloatField()),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.user')),
+            ],
+            options={
+                'db_table': 'bpm_rollup_hour',
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='BPMMinuteRollup',
+            fields=[
+                ('pk', models.CompositePrimaryKey('user', 'bucket', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('bucket', models.DateTimeField()),
+                ('count', models.IntegerField()),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('sum_value', models.FloatField()),
+                ('sum_squares', models.FloatField()),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.user')),
+            ],
+            options={
+                'db_table': 'bpm_rollup_minute',
+                'abstract': False,
+            },
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
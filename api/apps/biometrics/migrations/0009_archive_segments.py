@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biometrics', '0008_bpm_rollups'),
+        ('users', '0002_add_officer_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveSegment',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('month', models.DateTimeField(help_text='Start of the month (UTC)')),
+                ('path', models.CharField(max_length=255)),
+                ('readings', models.IntegerField()),
+                ('predictions', models.IntegerField()),
+                ('first_at', models.DateTimeField()),
+                ('last_at', models.DateTimeField()),
+                ('size_bytes', models.BigIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.user')),
+            ],
+            options={
+                'db_table': 'archive_segments',
+                'indexes': [models.Index(fields=['month'], name='archive_seg_month_b2a20e_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'month'), name='archive_segment_user_month')],
+            },
+        ),
+    ]
@@ -0,0 +1,115 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:12
+
+import struct
+
+from django.conf import settings
+from django.db import migrations, models
+
+# MLPrediction.FEATURE_COLUMNS when this migration was written
+FEATURE_COLUMNS = (
+    'heart_rate', 'hr_rolling_mean_5', 'hr_rolling_std_5', 'hr_rolling_mean_10', 'hr_diff_abs',
+    'hr_ratio_to_median', 'hr_variability', 'hr_rapid_changes', 'stress_score',
+)
+
+# Predictions stored with the whole metadata dict: fill the typed columns
+# and pack the features (float4send is big-endian; NaN for a missing
+# feature). In compact storage ml_metadata keeps only the features that
+# have no column.
+FILL_COLUMNS = """
+UPDATE ml_predictions SET
+    anomaly_score = (ml_metadata ->> 'anomaly_score')::float8,
+    hr_variability = (ml_metadata ->> 'hr_variability')::float8,
+    hr_rapid_changes = round((ml_metadata ->> 'hr_rapid_changes')::float8)::smallint,
+    high_stress_risk = round((ml_metadata ->> 'high_stress_risk')::float8)::smallint,
+    hr_elevated_sustained = round((ml_metadata ->> 'hr_elevated_sustained')::float8)::smallint,
+    features = {features}{metadata}
+WHERE features IS NULL AND ml_metadata ? 'heart_rate'
+"""
+
+FEATURES_SQL = " || ".join(
+    f"float4send(coalesce((ml_metadata -> 'features' ->> '{name}')::float4, "
+    + ("(ml_metadata ->> 'heart_rate')::float4, " if name == 'heart_rate' else "")
+    + "'NaN'))"
+    for name in FEATURE_COLUMNS
+)
+
+COMPACT_METADATA_SQL = """,
+    ml_metadata = CASE
+        WHEN coalesce(ml_metadata -> 'features', '{}') - %(features)s::text[] = '{}' THEN '{}'::jsonb
+        ELSE jsonb_build_object('features', (ml_metadata -> 'features') - %(features)s::text[])
+    END"""
+
+
+def fill_columns(apps, schema_editor):
+    compact = settings.BIOMETRICS_PREDICTION_STORAGE != 'json'
+    sql = FILL_COLUMNS.format(features=FEATURES_SQL, metadata=COMPACT_METADATA_SQL if compact else '')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(sql, {'features': list(FEATURE_COLUMNS)})
+
+
+def restore_metadata(apps, schema_editor):
+    """Rebuild the whole metadata dict of compact predictions."""
+    MLPrediction = apps.get_model('biometrics', 'MLPrediction')
+    compact = MLPrediction.objects.exclude(features=None).exclude(ml_metadata__has_key='heart_rate')
+    batch = []
+    for prediction in compact.iterator(chunk_size=10000):
+        packed = struct.unpack(f'>{len(FEATURE_COLUMNS)}f', bytes(prediction.features))
+        features = {name: float(f'{value:.7g}') for name, value in zip(FEATURE_COLUMNS, packed) if value == value}
+        features.update(prediction.ml_metadata.get('features', {}))
+        prediction.ml_metadata = {
+            'heart_rate': features.get('heart_rate'),
+            'anomaly_score': prediction.anomaly_score,
+            'high_stress_risk': prediction.high_stress_risk,
+            'hr_variability': prediction.hr_variability,
+            'hr_elevated_sustained': prediction.hr_elevated_sustained,
+            'hr_rapid_changes': prediction.hr_rapid_changes,
+            'user_id': prediction.user_id,
+            'features': features,
+        }
+        batch.append(prediction)
+        if len(batch) == 10000:
+            MLPrediction.objects.bulk_update(batch, ['ml_metadata'])
+            batch = []
+    MLPrediction.objects.bulk_update(batch, ['ml_metadata'])
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biometrics', '0009_archive_segments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mlprediction',
+            name='anomaly_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mlprediction',
+            name='features',
+            field=models.BinaryField(blank=True, help_text='float32 (big-endian) in FEATURE_COLUMNS order', null=True),
+        ),
+        migrations.AddField(
+            model_name='mlprediction',
+            name='high_stress_risk',
+            field=models.SmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mlprediction',
+            name='hr_elevated_sustained',
+            field=models.SmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mlprediction',
+            name='hr_rapid_changes',
+            field=models.SmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mlprediction',
+            name='hr_variability',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_columns, restore_metadata, elidable=False),
+    ]
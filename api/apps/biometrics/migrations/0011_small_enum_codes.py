@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:19
+
+import core.fields
+from core.fields import convert_to_codes
+from django.db import migrations
+
+# Choice columns stored as smallint codes (see core.fields.SmallEnumField)
+HR_ZONE = core.fields.SmallEnumField(blank=True, choices=[('', 'Unknown'), ('Zone 1 (Muy Baja)', 'Zone 1 (Muy Baja)'), ('Zone 2 (Baja)', 'Zone 2 (Baja)'), ('Zone 3 (Moderada)', 'Zone 3 (Moderada)'), ('Zone 4 (Alta)', 'Zone 4 (Alta)'), ('Zone 5 (Muy Alta)', 'Zone 5 (Muy Alta)')], default='')
+SEVERITY = core.fields.SmallEnumField(choices=[('LOW', 'Low'), ('MEDIUM', 'Medium'), ('HIGH', 'High'), ('CRITICAL', 'Critical')])
+STRESS_LEVEL = core.fields.SmallEnumField(choices=[('Muy Bajo', 'Muy Bajo'), ('Bajo', 'Bajo'), ('Moderado', 'Moderado'), ('Alto', 'Alto'), ('Muy Alto', 'Muy Alto')])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biometrics', '0010_typed_prediction_metadata'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[convert_to_codes('biometrics.MLPrediction', 'hr_zone', HR_ZONE.labels)],
+            state_operations=[migrations.AlterField(model_name='mlprediction', name='hr_zone', field=HR_ZONE)],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[convert_to_codes('biometrics.MLPrediction', 'severity', SEVERITY.labels)],
+            state_operations=[migrations.AlterField(model_name='mlprediction', name='severity', field=SEVERITY)],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[convert_to_codes('biometrics.MLPrediction', 'stress_level', STRESS_LEVEL.labels)],
+            state_operations=[migrations.AlterField(model_name='mlprediction', name='stress_level', field=STRESS_LEVEL)],
+        ),
+    ]
@@ -1,19 +1,40 @@
+import math
+import struct
+from datetime import timedelta
+
 from django.db import models
+from django.utils import timezone
+
+from core.fields import SmallEnumField
+
+
+# Model features packed in MLPrediction.features (float32, big-endian like
+# PostgreSQL's float4send); features outside this list go to ml_metadata
+FEATURE_COLUMNS = (
+    'heart_rate', 'hr_rolling_mean_5', 'hr_rolling_std_5', 'hr_rolling_mean_10', 'hr_diff_abs',
+    'hr_ratio_to_median', 'hr_variability', 'hr_rapid_changes', 'stress_score',
+)
+FEATURE_DTYPE = '>f4'
 
 
 class BPM(models.Model):
     """Simple BPM sensor readings table.
 
     Fields:
-      - id: Auto primary key
+      - id: Auto primary key (64-bit)
       - user: ForeignKey to users.User
       - value: Float value of BPM
-      - created_at: Timestamp of BPM reading
+      - created_at: Timestamp of BPM reading (defaults to now; bulk
+        ingestion stores the time the device took the reading)
+
+    The table is range-partitioned by month on created_at (see
+    `partitions.py`); its database primary key is (id, created_at).
     """
-    id = models.AutoField(primary_key=True)
-    user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='bpms')
+    id = models.BigAutoField(primary_key=True)
+    # Lookups by user go through the (user, created_at) index
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='bpms', db_index=False)
     value = models.FloatField()
-    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -28,11 +49,82 @@ class BPM(models.Model):
         return f"BPM({self.user_id}) = {self.value}"
 
 
+class BPMRollup(models.Model):
+    """Aggregates of one officer's BPM readings in one time bucket.
+
+    Kept up to date by triggers on `bpm` (migration 0008): every INSERT
+    statement accumulates its readings into the buckets with one upsert per
+    resolution, and updates or deletes recompute the buckets they touch.
+    `rollups.py` rebuilds ranges and picks the resolution for queries.
+
+    Fields:
+      - user: ForeignKey to users.User
+      - bucket: Start of the bucket (UTC)
+      - count, min_value, max_value, sum_value, sum_squares: Aggregates of
+        the readings (mean and standard deviation derive from them)
+    """
+    pk = models.CompositePrimaryKey('user', 'bucket')
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='+', db_index=False)
+    bucket = models.DateTimeField()
+    count = models.IntegerField()
+    min_value = models.FloatField()
+    max_value = models.FloatField()
+    sum_value = models.FloatField()
+    sum_squares = models.FloatField()
+
+    # Bucket width and its date_trunc() unit
+    RESOLUTION = None
+    UNIT = None
+
+    class Meta:
+        abstract = True
+        app_label = 'biometrics'
+
+    @property
+    def mean(self):
+        return self.sum_value / self.count
+
+    @property
+    def std(self):
+        variance = self.sum_squares / self.count - self.mean ** 2
+        return max(variance, 0.0) ** 0.5
+
+    def __str__(self):
+        return f"{type(self).__name__}({self.user_id}, {self.bucket:%Y-%m-%d %H:%M}) = {self.count}"
+
+
+class BPMMinuteRollup(BPMRollup):
+    RESOLUTION = timedelta(minutes=1)
+    UNIT = 'minute'
+
+    class Meta(BPMRollup.Meta):
+        db_table = 'bpm_rollup_minute'
+
+
+class BPMHourRollup(BPMRollup):
+    RESOLUTION = timedelta(hours=1)
+    UNIT = 'hour'
+
+    class Meta(BPMRollup.Meta):
+        db_table = 'bpm_rollup_hour'
+
+
 class MLPrediction(models.Model):
     """ML predictions for biometric data analysis.
     
     Stores the results from the ML service analyzing BPM readings.
     Used to track stress levels, anomalies, and alert requirements.
+
+    The prediction metadata is stored in typed columns (anomaly_score,
+    hr_variability, ...) plus the model features packed in `features` as
+    float32 in FEATURE_COLUMNS order; `ml_metadata` only keeps what has no
+    column (features outside FEATURE_COLUMNS). `metadata` rebuilds the
+    dict the ML service returned. With BIOMETRICS_PREDICTION_STORAGE =
+    'json' the whole dict is also written to `ml_metadata`, as before.
+
+    Partitioned by month like `BPM`: created_at is the time of the scored
+    reading, so a prediction lives in the same month as its reading. The
+    database keeps no foreign key to the partitioned `bpm` table.
     """
     STRESS_LEVEL_CHOICES = [
         ('Muy Bajo', 'Muy Bajo'),
@@ -48,21 +140,40 @@ class MLPrediction(models.Model):
         ('HIGH', 'High'),
         ('CRITICAL', 'Critical'),
     ]
+
+    HR_ZONE_CHOICES = [
+        ('', 'Unknown'),
+        ('Zone 1 (Muy Baja)', 'Zone 1 (Muy Baja)'),
+        ('Zone 2 (Baja)', 'Zone 2 (Baja)'),
+        ('Zone 3 (Moderada)', 'Zone 3 (Moderada)'),
+        ('Zone 4 (Alta)', 'Zone 4 (Alta)'),
+        ('Zone 5 (Muy Alta)', 'Zone 5 (Muy Alta)'),
+    ]
     
-    id = models.AutoField(primary_key=True)
-    user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='ml_predictions')
-    bpm_record = models.ForeignKey(BPM, on_delete=models.CASCADE, related_name='ml_predictions')
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        'users.User', on_delete=models.CASCADE, related_name='ml_predictions', db_index=False
+    )
+    bpm_record = models.ForeignKey(
+        BPM, on_delete=models.CASCADE, related_name='ml_predictions', db_constraint=False
+    )
     
     # ML prediction results
     stress_score = models.FloatField(help_text='Stress score from 0-100')
-    stress_level = models.CharField(max_length=20, choices=STRESS_LEVEL_CHOICES)
-    severity = models.CharField(max_length=20, choices=SEVERITY_CHOICES)
-    requires_alert = models.BooleanField(default=False, db_index=True)
+    stress_level = SmallEnumField(choices=STRESS_LEVEL_CHOICES)
+    severity = SmallEnumField(choices=SEVERITY_CHOICES)
+    requires_alert = models.BooleanField(default=False)
     alert_probability = models.FloatField(help_text='Probability of requiring alert (0.0-1.0)')
-    is_anomaly = models.BooleanField(default=False, db_index=True)
+    is_anomaly = models.BooleanField(default=False)
     
     # Additional ML metadata
-    hr_zone = models.CharField(max_length=50, blank=True)
+    hr_zone = SmallEnumField(choices=HR_ZONE_CHOICES, default='', blank=True)
+    anomaly_score = models.FloatField(null=True, blank=True)
+    hr_variability = models.FloatField(null=True, blank=True)
+    hr_rapid_changes = models.SmallIntegerField(null=True, blank=True)
+    high_stress_risk = models.SmallIntegerField(null=True, blank=True)
+    hr_elevated_sustained = models.SmallIntegerField(null=True, blank=True)
+    features = models.BinaryField(null=True, blank=True, help_text='float32 (big-endian) in FEATURE_COLUMNS order')
     ml_metadata = models.JSONField(default=dict, blank=True)
     
     # Alert association (if created)
@@ -74,7 +185,7 @@ class MLPrediction(models.Model):
         related_name='ml_predictions'
     )
     
-    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
     
     class Meta:
         app_label = 'biometrics'
@@ -89,3 +200,87 @@ class MLPrediction(models.Model):
     
     def __str__(self):
         return f"MLPrediction({self.user_id}) - Stress: {self.stress_score:.1f}/100 - {self.stress_level}"
+
+    @property
+    def feature_values(self):
+        """Model features as {name: value} (packed ones and extras)."""
+        values = {}
+        if self.features is not None:
+            packed = struct.unpack(f'>{len(FEATURE_COLUMNS)}f', bytes(self.features))
+            # Shown at float32 precision (85.8, not 85.80000305175781)
+            values.update(
+                (name, float(f'{value:.7g}')) for name, value in zip(FEATURE_COLUMNS, packed) if not math.isnan(value)
+            )
+        values.update(self.ml_metadata.get('features', {}))
+        return values
+
+    @property
+    def metadata(self):
+        """Prediction metadata as returned by the ML service."""
+        if 'heart_rate' in self.ml_metadata:
+            # Stored whole (BIOMETRICS_PREDICTION_STORAGE = 'json')
+            return self.ml_metadata
+        features = self.feature_values
+        return {
+            **{key: value for key, value in self.ml_metadata.items() if key != 'features'},
+            'heart_rate': features.get('heart_rate'),
+            'anomaly_score': self.anomaly_score,
+            'high_stress_risk': self.high_stress_risk,
+            'hr_variability': self.hr_variability,
+            'hr_elevated_sustained': self.hr_elevated_sustained,
+            'hr_rapid_changes': self.hr_rapid_changes,
+            'user_id': self.user_id,
+            'features': features,
+        }
+
+
+class IngestCheckpoint(models.Model):
+    """Position up to which a write-behind ingest log is stored.
+
+    Updated in the same transaction as the rows built from the log, so a
+    restarted flusher resumes exactly where the last commit left off.
+    """
+    id = models.AutoField(primary_key=True)
+    name = models.CharField(max_length=64, unique=True, help_text='Ingest log id')
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'biometrics'
+        db_table = 'ingest_checkpoints'
+
+    def __str__(self):
+        return f"IngestCheckpoint({self.name}) = {self.position}"
+
+
+class ArchiveSegment(models.Model):
+    """Index of the archived months of raw readings.
+
+    One compressed columnar segment file per officer and month holds the
+    `bpm` and `ml_predictions` rows that `archive.py` moved out of the
+    database; `path` is relative to BIOMETRICS_ARCHIVE_DIR.
+    """
+    id = models.AutoField(primary_key=True)
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='+', db_index=False)
+    month = models.DateTimeField(help_text='Start of the month (UTC)')
+    path = models.CharField(max_length=255)
+    readings = models.IntegerField()
+    predictions = models.IntegerField()
+    first_at = models.DateTimeField()
+    last_at = models.DateTimeField()
+    size_bytes = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'biometrics'
+        db_table = 'archive_segments'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='archive_segment_user_month'),
+        ]
+        indexes = [
+            models.Index(fields=['month']),
+        ]
+
+    def __str__(self):
+        return f"ArchiveSegment({self.user_id}, {self.month:%Y-%m}) = {self.readings}"
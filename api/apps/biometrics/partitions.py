@@ -0,0 +1,198 @@
+"""
+Monthly range partitions of `bpm` and `ml_predictions`.
+
+Both tables are declared `PARTITION BY RANGE (created_at)` (migration
+0007) with one partition per calendar month (UTC), named
+`<table>_p<YYYYMM>`. A prediction is stored with the time of its reading,
+so month M of both tables holds the same readings.
+
+- Partitions are created ahead of time by `manage.py manage_partitions`
+  (run it daily; it creates BIOMETRICS_PARTITION_MONTHS_AHEAD months), and
+  on demand by the write paths for readings that carry their own
+  timestamp (`ensure_partitions`).
+- Queries on these tables bound `created_at`, so the planner only visits
+  the partitions of that range.
+- Old data is removed a month at a time with `detach_partitions`: the
+  partitions become standalone tables that can be archived and dropped,
+  instead of a DELETE over the whole table.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+
+PARTITIONED_TABLES = ('bpm', 'ml_predictions')
+
+# Serializes partition creation across processes
+PARTITION_LOCK_KEY = 0x62706D70  # 'bpmp'
+
+# Months whose partitions are known to exist (committed)
+_known_months = set()
+# Months created by this process whose transaction has not committed yet
+_created_months = set()
+
+
+def month_start(value):
+    """First instant (UTC) of the month of `value`."""
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def next_month(month):
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+
+def add_months(month, count):
+    """Month start `count` months after (or before, when negative) `month`."""
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def months_between(start, end):
+    """Month starts from the month of `start` to the month of `end`, inclusive."""
+    month, last = month_start(start), month_start(end)
+    months = []
+    while month <= last:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def partition_ddl(table, month):
+    """CREATE TABLE statement of one monthly partition."""
+    quote = connection.ops.quote_name
+    return (
+        f"CREATE TABLE IF NOT EXISTS {quote(partition_name(table, month))} PARTITION OF {quote(table)} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+    )
+
+
+def existing_partitions(table):
+    """
+    Attached partitions of `table`.
+
+    Returns:
+        Dict {name: detach_pending}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname, inherits.inhdetachpending FROM pg_inherits inherits "
+            "JOIN pg_class child ON child.oid = inherits.inhrelid "
+            "WHERE inherits.inhparent = %s::regclass",
+            [table]
+        )
+        return dict(cursor.fetchall())
+
+
+def attached_months(table='bpm'):
+    """Sorted months with an attached partition of `table`."""
+    months = (_partition_month(table, name) for name in existing_partitions(table))
+    return sorted(month for month in months if month is not None)
+
+
+def _missing_months(months):
+    names = {partition_name(table, month): month for table in PARTITIONED_TABLES for month in months}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits inherits "
+            "JOIN pg_class child ON child.oid = inherits.inhrelid "
+            "WHERE inherits.inhparent = ANY(%s::regclass[]) AND child.relname = ANY(%s)",
+            [list(PARTITIONED_TABLES), list(names)]
+        )
+        found = {name for name, in cursor.fetchall()}
+    return {month for name, month in names.items() if name not in found}
+
+
+def create_partitions(months):
+    """
+    Create the partitions of both tables for `months` (month starts)
+    that do not exist yet.
+
+    Returns:
+        Sorted list of the months that were created
+    """
+    missing = _missing_months(months)
+    if not missing:
+        return []
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [PARTITION_LOCK_KEY])
+        missing = _missing_months(missing)
+        for month in sorted(missing):
+            for table in PARTITIONED_TABLES:
+                cursor.execute(partition_ddl(table, month))
+    return sorted(missing)
+
+
+def ensure_partitions(timestamps):
+    """
+    Make sure the months of `timestamps` have partitions before inserting.
+
+    Free once a month is known to exist; otherwise one catalog query (plus
+    the DDL when the month is new).
+    """
+    months = {month_start(timestamp) for timestamp in timestamps} - _known_months
+    if not months:
+        return
+    created = set(create_partitions(months))
+    # Created in the current transaction: only known once it commits
+    _known_months.update(months - created - _created_months)
+    if created:
+        _created_months.update(created)
+
+        def committed():
+            _known_months.update(created)
+            _created_months.difference_update(created)
+        transaction.on_commit(committed)
+
+
+async def aensure_partitions(timestamps):
+    """Async variant of `ensure_partitions` (no thread hop for known months)."""
+    if {month_start(timestamp) for timestamp in timestamps} - _known_months:
+        await sync_to_async(ensure_partitions)(timestamps)
+
+
+def detach_partitions(before, drop=False, months=None):
+    """
+    Detach the partitions of both tables for the months that end at or
+    before `before` (a month start), or only for `months` when given.
+
+    Runs `DETACH PARTITION ... CONCURRENTLY`, which cannot run inside a
+    transaction and does not block reads and writes on the parent (an
+    interrupted detach is finalized on the next run).
+
+    Returns:
+        Names of the detached (or dropped) tables
+    """
+    quote = connection.ops.quote_name
+    detached = []
+    with connection.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            for name, pending in sorted(existing_partitions(table).items()):
+                month = _partition_month(table, name)
+                if month is None or next_month(month) > before or (months is not None and month not in months):
+                    continue
+                if pending:
+                    cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)} FINALIZE")
+                else:
+                    cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)} CONCURRENTLY")
+                if drop:
+                    cursor.execute(f"DROP TABLE {quote(name)}")
+                _known_months.discard(month)
+                detached.append(name)
+    return detached
+
+
+def _partition_month(table, name):
+    """Month of a partition named by `partition_name` (None for other tables)."""
+    prefix = f"{table}_p"
+    suffix = name[len(prefix):]
+    if not name.startswith(prefix) or len(suffix) != 6 or not suffix.isdigit():
+        return None
+    return datetime(int(suffix[:4]), int(suffix[4:]), 1, tzinfo=dt_timezone.utc)
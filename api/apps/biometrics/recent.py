@@ -0,0 +1,231 @@
+"""
+Each officer's last readings in shared memory, shared by the workers of a
+host.
+
+The single-reading endpoints need the officer's previous readings as ML
+history, and they are the readings the previous request of that officer
+has just stored. `RecentReadings` keeps them in a
+`multiprocessing.shared_memory` table that every worker (sync or ASGI)
+maps, so a hit answers without a database read:
+
+- One fixed slot per officer (`user_id % slots`) holds the officer id,
+  the table generation and the `capacity` newest readings (timestamps and
+  values). A slot owned by another officer, or written before `clear()`
+  bumped the generation, is a miss; callers then read the database and
+  seed the slot.
+- Readers take no lock: a seqlock counter per slot is odd while a writer
+  is inside, and a read is retried when the counter moved.
+- Writers of a slot are serialized with a `lockf` byte-range lock (across
+  processes) and a thread lock (within one).
+- Only the single-reading path pushes readings, after its transaction
+  commits. Any other write (bulk batches, write-behind flushes, COPY
+  imports, deletes) invalidates the officers it touches, so a slot always
+  holds an officer's newest readings or nothing.
+
+The segment outlives the workers (it is not unlinked on exit) and is named
+after the database. Readings older than the ML history lookback are
+skipped on read, so even a stale table (a restored database, for
+instance) can only be wrong for that long; `clear()` drops it at once.
+"""
+
+import os
+import struct
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+
+try:
+    import fcntl
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # Not POSIX: every lookup is a miss
+    fcntl = None
+
+MAGIC = b'ARTRCNT1'
+# magic, slots, capacity, generation
+TABLE_HEADER = struct.Struct('<8sIIQ')
+# seqlock counter, reading count, user id, generation
+SLOT_HEADER = struct.Struct('<IIqQ')
+
+# Read attempts while writers keep changing a slot
+READ_RETRIES = 16
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _micros(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+class RecentReadings:
+    """Shared-memory table of the newest readings of each officer."""
+
+    def __init__(self, capacity, slots=None, name=None):
+        self.capacity = capacity
+        self._slots = slots
+        self._name = name
+        self._readings = struct.Struct(f'<{capacity}q{capacity}d')
+        self._slot_size = SLOT_HEADER.size + self._readings.size
+        self._memory = None
+        self._lock_fd = None
+        self._pid = None
+        self._attached = None
+        self._thread_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return fcntl is not None and settings.BIOMETRICS_RECENT_READINGS
+
+    @property
+    def name(self):
+        return self._name or settings.BIOMETRICS_RECENT_READINGS_NAME or (
+            f"artemis_recent_{settings.DATABASES['default']['NAME']}"
+        )
+
+    def _attach(self):
+        """Map the table (creating it on first use on the host)."""
+        if self._memory is not None and self._pid == os.getpid() and self._attached == self.name:
+            return self._memory
+        slots = self._slots or settings.BIOMETRICS_RECENT_READINGS_SLOTS
+        size = TABLE_HEADER.size + slots * self._slot_size
+        try:
+            memory = shared_memory.SharedMemory(self.name, create=True, size=size)
+            TABLE_HEADER.pack_into(memory.buf, 0, MAGIC, slots, self.capacity, 1)
+        except FileExistsError:
+            memory = shared_memory.SharedMemory(self.name)
+            magic, existing, capacity, _ = TABLE_HEADER.unpack_from(memory.buf, 0)
+            if magic != MAGIC or existing != slots or capacity != self.capacity:
+                memory.close()
+                raise RuntimeError(f"Shared memory {self.name!r} has another layout.")
+        # Shared by every worker of the host: not unlinked when this one exits
+        resource_tracker.unregister(memory._name, 'shared_memory')
+
+        self._lock_fd = os.open(
+            os.path.join(tempfile.gettempdir(), f"{self.name}.lock"), os.O_RDWR | os.O_CREAT, 0o600
+        )
+        self._memory, self._pid, self._attached, self._slot_count = memory, os.getpid(), self.name, slots
+        return memory
+
+    def unlink(self):
+        """Remove the table from the host (workers still mapping it keep their copy)."""
+        memory = self._attach()
+        self._memory = None
+        memory.close()
+        # Tracked again so that unlink() can untrack it
+        resource_tracker.register(memory._name, 'shared_memory')
+        memory.unlink()
+        os.close(self._lock_fd)
+        os.unlink(os.path.join(tempfile.gettempdir(), f"{self._attached}.lock"))
+
+    def _offset(self, user_id):
+        return TABLE_HEADER.size + (user_id % self._slot_count) * self._slot_size
+
+    def _generation(self, buffer):
+        return TABLE_HEADER.unpack_from(buffer, 0)[3]
+
+    def _read(self, buffer, offset):
+        """Consistent (count, user_id, generation, times, values) of a slot, or None."""
+        for _ in range(READ_RETRIES):
+            sequence, count, user_id, generation = SLOT_HEADER.unpack_from(buffer, offset)
+            if sequence & 1:
+                continue
+            readings = self._readings.unpack_from(buffer, offset + SLOT_HEADER.size)
+            if SLOT_HEADER.unpack_from(buffer, offset)[0] == sequence:
+                return count, user_id, generation, readings[:self.capacity], readings[self.capacity:]
+        return None
+
+    def get(self, user_id, before, lookback):
+        """
+        Values of the officer's readings in [before - lookback, before),
+        newest first, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        buffer = self._attach().buf
+        slot = self._read(buffer, self._offset(user_id))
+        if slot is None:
+            return None
+        count, owner, generation, times, values = slot
+        if owner != user_id or generation != self._generation(buffer):
+            return None
+        since, until = _micros(before - lookback), _micros(before)
+        return [value for time, value in zip(times[:count], values[:count]) if since <= time < until]
+
+    def _write(self, user_id, update):
+        """Run `update(current readings or None)` and store what it returns, under the slot lock."""
+        buffer = self._attach().buf
+        offset = self._offset(user_id)
+        slot_index = (offset - TABLE_HEADER.size) // self._slot_size
+        with self._thread_lock:
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_EX, 1, slot_index)
+            try:
+                sequence, count, owner, generation = SLOT_HEADER.unpack_from(buffer, offset)
+                current = None
+                if owner == user_id and generation == self._generation(buffer):
+                    readings = self._readings.unpack_from(buffer, offset + SLOT_HEADER.size)
+                    current = list(zip(readings[:count], readings[self.capacity:self.capacity + count]))
+                readings = update(current)
+                if readings is current:
+                    return
+
+                # Odd while writing (also after a writer died mid-write)
+                sequence |= 1
+                SLOT_HEADER.pack_into(buffer, offset, sequence, 0, 0, 0)
+                if readings is None:
+                    owner, generation, readings = 0, 0, []
+                else:
+                    owner, generation = user_id, self._generation(buffer)
+                padding = [0] * (self.capacity - len(readings))
+                self._readings.pack_into(
+                    buffer, offset + SLOT_HEADER.size,
+                    *[time for time, _ in readings], *padding,
+                    *[value for _, value in readings], *padding
+                )
+                SLOT_HEADER.pack_into(buffer, offset, (sequence + 1) & 0xFFFFFFFF, len(readings), owner, generation)
+            finally:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, slot_index)
+
+    def push(self, user_id, created_at, value, seed=None):
+        """
+        Add a stored reading.
+
+        Args:
+            seed: The officer's previous readings as (timestamp, value)
+                pairs, newest first, when they were read from the
+                database; the slot is only (re)filled from a seed, so a
+                slot invalidated meanwhile stays empty
+        """
+        if not self.enabled:
+            return
+        reading = (_micros(created_at), value)
+
+        def update(current):
+            if current is None:
+                if seed is None:
+                    return None
+                current = [(_micros(moment), previous) for moment, previous in seed]
+            readings = sorted([reading, *current], reverse=True)
+            return readings[:self.capacity]
+        self._write(user_id, update)
+
+    def invalidate(self, user_ids):
+        """Forget the readings of `user_ids` (written by another path)."""
+        if not self.enabled:
+            return
+        for user_id in set(user_ids):
+            self._write(user_id, lambda current: None if current is not None else current)
+
+    def clear(self):
+        """Forget every officer's readings (bumps the table generation)."""
+        if not self.enabled:
+            return
+        buffer = self._attach().buf
+        with self._thread_lock:
+            # Whole-table lock: every slot's byte range
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_EX, 0, 0)
+            try:
+                magic, slots, capacity, generation = TABLE_HEADER.unpack_from(buffer, 0)
+                TABLE_HEADER.pack_into(buffer, 0, magic, slots, capacity, generation + 1)
+            finally:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 0, 0)
@@ -0,0 +1,192 @@
+"""
+Per-minute and per-hour BPM rollups.
+
+`bpm_rollup_minute` and `bpm_rollup_hour` (`BPMMinuteRollup`,
+`BPMHourRollup`) hold count, min, max, sum and sum of squares of each
+officer's readings per bucket. Triggers on `bpm` (migration 0008) keep them
+current on every write path: each INSERT statement (single reading, bulk
+batch, write-behind flush, COPY import) upserts its readings into both
+resolutions at once, and updates or deletes recompute the buckets they
+touched.
+
+- `series` answers chart queries from the coarsest rollup that can
+  represent the requested step: a week at one-minute steps reads about
+  10k minute rows per officer, a month at hourly steps 720 hour rows,
+  instead of every raw reading.
+- `reading_count` counts readings for the statistics endpoints.
+- `rebuild` recomputes a time range from the raw readings (backfills,
+  partitions attached by hand; see `manage.py rebuild_rollups`). Rollups
+  outlive the raw partitions detached by retention, so only rebuild
+  ranges whose readings are still stored.
+"""
+
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from .models import BPMHourRollup, BPMMinuteRollup
+
+# Finest first
+ROLLUPS = (BPMMinuteRollup, BPMHourRollup)
+
+# Chart steps offered (multiples of the minute resolution)
+SERIES_STEPS = (
+    timedelta(minutes=1),
+    timedelta(minutes=5),
+    timedelta(minutes=15),
+    timedelta(hours=1),
+    timedelta(hours=6),
+    timedelta(days=1),
+)
+
+# date_bin() origin of the steps (buckets align to midnight UTC)
+STEP_ORIGIN = '2000-01-01T00:00:00+00:00'
+
+SERIES_SQL = """
+SELECT
+    date_bin(%(step)s, bucket, %(origin)s) AS step_start,
+    sum(count),
+    min(min_value),
+    max(max_value),
+    sum(sum_value),
+    sum(sum_squares)
+FROM {table}
+WHERE user_id = ANY(%(user_ids)s) AND bucket >= %(since)s AND bucket < %(until)s
+GROUP BY step_start
+ORDER BY step_start
+"""
+
+
+def _floor(value, resolution):
+    """Start of the `resolution` bucket (a minute or an hour) holding `value`."""
+    value = value.astimezone(dt_timezone.utc)
+    return value - (value - value.replace(minute=0, second=0, microsecond=0)) % resolution
+
+
+def _ceil(value, resolution):
+    start = _floor(value, resolution)
+    return start if start == value else start + resolution
+
+
+def pick_step(since, until):
+    """Finest step that keeps [since, until) within BIOMETRICS_SERIES_MAX_POINTS buckets."""
+    span = until - since
+    for step in SERIES_STEPS:
+        if span / step <= settings.BIOMETRICS_SERIES_MAX_POINTS:
+            return step
+    return SERIES_STEPS[-1]
+
+
+def rollup_for(step):
+    """Coarsest rollup whose buckets tile `step`."""
+    for rollup in reversed(ROLLUPS):
+        if step % rollup.RESOLUTION == timedelta(0):
+            return rollup
+    raise ValueError(f"Step {step} is not a multiple of {ROLLUPS[0].RESOLUTION}.")
+
+
+def series(user_ids, since, until, step=None):
+    """
+    Aggregated readings of `user_ids` in [since, until) per `step`.
+
+    Args:
+        user_ids: Officer ids (their readings are aggregated together)
+        since, until: Range (rounded out to whole rollup buckets)
+        step: Bucket width (timedelta, a multiple of one minute); chosen
+            with `pick_step` when omitted
+
+    Returns:
+        Dict with 'step' (seconds), 'resolution' (rollup table read) and
+        parallel lists 'buckets' (step starts), 'count', 'min', 'max',
+        'mean' and 'std'. Steps without readings are left out.
+    """
+    step = step or pick_step(since, until)
+    rollup = rollup_for(step)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            SERIES_SQL.format(table=connection.ops.quote_name(rollup._meta.db_table)),
+            {
+                'step': step,
+                'origin': STEP_ORIGIN,
+                'user_ids': list(user_ids),
+                'since': _floor(since, rollup.RESOLUTION),
+                'until': _ceil(until, rollup.RESOLUTION),
+            }
+        )
+        rows = cursor.fetchall()
+
+    result = {
+        'step': int(step.total_seconds()),
+        'resolution': rollup._meta.db_table,
+        'buckets': [],
+        'count': [],
+        'min': [],
+        'max': [],
+        'mean': [],
+        'std': [],
+    }
+    for bucket, count, low, high, total, squares in rows:
+        mean = total / count
+        result['buckets'].append(bucket)
+        result['count'].append(count)
+        result['min'].append(low)
+        result['max'].append(high)
+        result['mean'].append(mean)
+        result['std'].append(max(squares / count - mean * mean, 0.0) ** 0.5)
+    return result
+
+
+def reading_count(user_ids=None, since=None):
+    """
+    Number of readings (of `user_ids`, or everyone) since `since`, to the
+    minute: whole hours from the hour rollup, the partial first hour from
+    the minute rollup.
+    """
+    def total(rollup, **bounds):
+        rows = rollup.objects.filter(**bounds)
+        if user_ids is not None:
+            rows = rows.filter(user_id__in=user_ids)
+        return rows.aggregate(total=Sum('count'))['total'] or 0
+
+    if since is None:
+        return total(BPMHourRollup)
+    first_hour = _ceil(since, BPMHourRollup.RESOLUTION)
+    return (
+        total(BPMMinuteRollup, bucket__gte=_ceil(since, BPMMinuteRollup.RESOLUTION), bucket__lt=first_hour)
+        + total(BPMHourRollup, bucket__gte=first_hour)
+    )
+
+
+def rebuild(since, until, user_ids=None):
+    """
+    Recompute the rollups of [since, until) (widened to whole hours) from
+    the readings in `bpm`, in one transaction.
+
+    Returns:
+        Dict {rollup table: rows written}
+    """
+    since = _floor(since, BPMHourRollup.RESOLUTION)
+    until = _ceil(until, BPMHourRollup.RESOLUTION)
+    user_filter = ' AND user_id = ANY(%(user_ids)s)' if user_ids is not None else ''
+    params = {'since': since, 'until': until, 'user_ids': list(user_ids or [])}
+
+    written = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        for rollup in ROLLUPS:
+            table = connection.ops.quote_name(rollup._meta.db_table)
+            cursor.execute(
+                f"DELETE FROM {table} WHERE bucket >= %(since)s AND bucket < %(until)s{user_filter}",
+                params
+            )
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, bucket, count, min_value, max_value, sum_value, sum_squares) "
+                f"SELECT user_id, date_trunc('{rollup.UNIT}', created_at, 'UTC'), count(*), min(value), max(value), "
+                "sum(value), sum(value * value) FROM bpm "
+                f"WHERE created_at >= %(since)s AND created_at < %(until)s{user_filter} GROUP BY 1, 2",
+                params
+            )
+            written[rollup._meta.db_table] = cursor.rowcount
+    return written
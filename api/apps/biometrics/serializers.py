@@ -19,7 +19,8 @@ class BPMSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Value must be numeric.")
         return val
 
-    def create(self, validated_data):
+    def resolve_user_id(self, validated_data):
+        """User id from the body, the X-User-ID header or the query string."""
         user_id = validated_data.pop('user_id', None)
         if user_id is None:
             request = self.context.get('request') if self.context else None
@@ -33,8 +34,12 @@ class BPMSerializer(serializers.ModelSerializer):
 
         if user_id is None:
             raise serializers.ValidationError({'user_id': 'user_id is required.'})
+        return int(user_id)
+
+    def create(self, validated_data):
+        user_id = self.resolve_user_id(validated_data)
         try:
-            user = UserModel.objects.get(pk=int(user_id))
+            user = UserModel.objects.get(pk=user_id)
         except UserModel.DoesNotExist:
             raise serializers.ValidationError({'user_id': 'User with given id does not exist.'})
 
@@ -52,6 +57,7 @@ class MLPredictionSerializer(serializers.ModelSerializer):
     user_id = serializers.IntegerField(source='user.id', read_only=True)
     bpm_value = serializers.FloatField(source='bpm_record.value', read_only=True)
     alert_id = serializers.IntegerField(source='alert.id', read_only=True, allow_null=True)
+    ml_metadata = serializers.JSONField(source='metadata', read_only=True)
     
     class Meta:
         model = MLPrediction
@@ -0,0 +1,24 @@
+"""
+Signal handlers of the biometrics app.
+
+Deleted officers leave the shared recent readings (recent.py) and the
+known users of the write-behind log: a cached history would let the
+single-reading path skip the user check and insert a reading whose
+deferred foreign key only fails at commit, and a known user would keep
+getting readings accepted that the flusher can only drop.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from apps.users.models import User
+from .ingest import recent_readings
+from .ingest_log import forget_user
+
+
+@receiver(post_delete, sender=User, dispatch_uid='biometrics_forget_deleted_user')
+def forget_deleted_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: recent_readings.invalidate([user_id]))
+    transaction.on_commit(lambda: forget_user(user_id))
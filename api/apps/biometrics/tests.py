@@ -0,0 +1,1029 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import struct
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.throttling import AnonRateThrottle
+
+from apps.alerts.incidents import IncidentAggregator, incident_aggregator
+from apps.alerts.models import Alert, AlertType, Incident
+from apps.alerts.serializers import AlertSerializer
+from apps.events.models import Event
+from apps.users.models import SupervisorAssignment, User
+from .ingest import BulkValidationError, ingest_bulk, recent_readings
+from .ingest_binary import BINARY_CONTENT_TYPE, decode_readings, encode_readings
+from .ingest_copy import import_readings, score_imported
+from .ingest_log import IngestLog, IngestLogFlusher, known_user
+from .archive import archive_month, archived_predictions, decode_segment, encode_segment
+from .models import FEATURE_COLUMNS, ArchiveSegment, BPM, BPMHourRollup, BPMMinuteRollup, IngestCheckpoint, MLPrediction
+from .recent import RecentReadings
+from .partitions import detach_partitions, ensure_partitions, existing_partitions
+from .rollups import rebuild, reading_count, series
+from .serializers import MLPredictionSerializer
+from .views import ML_AVAILABLE, ml_service, start_write_behind
+
+# Statements allowed for a reading that raises no alert: user + history
+# SELECT, BPM + capture Event INSERT, MLPrediction INSERT
+READING_QUERY_BUDGET = 3
+
+
+class BPMIngestTest(TestCase):
+    def setUp(self):
+        incident_aggregator.reset()
+        if ML_AVAILABLE:
+            ml_service.configure_alert_cooldown(0)
+        self.user = User.objects.create(
+            name='Test Officer',
+            email='test.officer@example.com',
+            password_hash='noop',
+            status='Active',
+        )
+        self.client = APIClient()
+
+    def post(self, value):
+        return self.client.post('/biometrics/', {'user_id': self.user.id, 'value': value}, format='json')
+
+    def test_reading_without_alert_within_query_budget(self):
+        for value in [72, 75, 78]:
+            self.post(value)
+
+        with self.assertNumQueries(READING_QUERY_BUDGET):
+            resp = self.post(76)
+
+        self.assertEqual(resp.status_code, 201)
+        data = resp.json()
+        self.assertEqual(data['data']['user_id'], self.user.id)
+        self.assertEqual(data['data']['value'], 76.0)
+        self.assertIsNone(data['ml_analysis']['alert_created'])
+        self.assertEqual(BPM.objects.filter(user=self.user).count(), 4)
+        if ML_AVAILABLE:
+            self.assertEqual(MLPrediction.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(Event.objects.filter(category='Biometric_Capture_Success', user=self.user).count(), 4)
+        self.assertEqual(Event.objects.count(), 4)
+
+    def test_alert_reading_links_prediction(self):
+        if not ML_AVAILABLE:
+            self.skipTest('ML service not available')
+        resp = self.post(190)
+
+        self.assertEqual(resp.status_code, 201)
+        alert_id = resp.json()['ml_analysis']['alert_created']
+        self.assertIsNotNone(alert_id)
+        self.assertEqual(Alert.objects.get(pk=alert_id).user_id, self.user.id)
+        self.assertEqual(MLPrediction.objects.get(bpm_record_id=resp.json()['data']['id']).alert_id, alert_id)
+        self.assertEqual(Event.objects.filter(category='Alert_Triggered').count(), 1)
+        self.assertEqual(Event.objects.filter(category='Biometric_Capture_Success').count(), 1)
+
+    def test_async_endpoint_matches_sync(self):
+        other = User.objects.create(
+            name='Async Officer',
+            email='async.officer@example.com',
+            password_hash='noop',
+            status='Active',
+        )
+        for value in [72, 75, 76, 95, 150, 176]:
+            sync_resp = self.post(value)
+            if value == 76:
+                with self.assertNumQueries(READING_QUERY_BUDGET):
+                    async_resp = self.client.post('/biometrics/async/', {'user_id': other.id, 'value': value}, format='json')
+            else:
+                async_resp = self.client.post('/biometrics/async/', {'user_id': other.id, 'value': value}, format='json')
+
+            self.assertEqual(async_resp.status_code, 201)
+            self.assertEqual(
+                async_resp.json()['ml_analysis']['prediction'],
+                sync_resp.json()['ml_analysis']['prediction']
+            )
+            self.assertEqual(
+                async_resp.json()['ml_analysis']['alert_created'] is None,
+                sync_resp.json()['ml_analysis']['alert_created'] is None
+            )
+
+        resp = self.client.post('/biometrics/async/', {'user_id': other.id + 1000, 'value': 80}, format='json')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_async_endpoint_throttled_with_sync(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        with mock.patch.object(AnonRateThrottle, 'THROTTLE_RATES', {'anon': '2/hour'}):
+            self.assertEqual(self.post(72).status_code, 201)
+            resp = self.client.post('/biometrics/async/', {'user_id': self.user.id, 'value': 74}, format='json')
+            self.assertEqual(resp.status_code, 201)
+            # The endpoints share the anonymous rate
+            for path in ('/biometrics/async/', '/biometrics/'):
+                resp = self.client.post(path, {'user_id': self.user.id, 'value': 76}, format='json')
+                self.assertEqual(resp.status_code, 429)
+            self.assertIn('Retry-After', resp)
+        self.assertEqual(BPM.objects.count(), 2)
+
+    def test_prediction_metadata_stored_in_columns(self):
+        if not ML_AVAILABLE:
+            self.skipTest('ML service not available')
+        for value in [72, 75]:
+            self.post(value)
+        resp = self.post(150)
+
+        prediction = MLPrediction.objects.get(bpm_record_id=resp.json()['data']['id'])
+        expected = ml_service.predictor.predict(150, recent_hrs=[150, 75, 72], user_id=self.user.id).metadata
+        self.assertEqual(prediction.ml_metadata, {})
+        self.assertEqual(len(prediction.features), 4 * len(FEATURE_COLUMNS))
+
+        metadata = prediction.metadata
+        self.assertEqual(set(metadata), set(expected))
+        for key in ('anomaly_score', 'high_stress_risk', 'hr_variability', 'hr_elevated_sustained', 'hr_rapid_changes', 'user_id'):
+            self.assertEqual(metadata[key], expected[key])
+        self.assertEqual(set(metadata['features']), set(expected['features']))
+        for name, value in expected['features'].items():
+            self.assertAlmostEqual(metadata['features'][name], value, places=4)
+        self.assertEqual(MLPredictionSerializer(prediction).data['ml_metadata'], metadata)
+
+        with override_settings(BIOMETRICS_PREDICTION_STORAGE='json'):
+            resp = self.post(150)
+        prediction = MLPrediction.objects.get(bpm_record_id=resp.json()['data']['id'])
+        self.assertEqual(prediction.ml_metadata['features'], prediction.metadata['features'])
+        self.assertEqual(prediction.anomaly_score, prediction.ml_metadata['anomaly_score'])
+
+    def test_unknown_user_rejected(self):
+        resp = self.client.post('/biometrics/', {'user_id': self.user.id + 1000, 'value': 80}, format='json')
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(BPM.objects.exists())
+
+
+class BulkIngestTest(TestCase):
+    def setUp(self):
+        incident_aggregator.reset()
+        if ML_AVAILABLE:
+            ml_service.configure_alert_cooldown(0)
+        self.user = User.objects.create(
+            name='Test Officer',
+            email='test.officer@example.com',
+            password_hash='noop',
+            status='Active',
+        )
+        self.client = APIClient()
+
+    def post(self, items):
+        return self.client.post('/biometrics/bulk/', items, format='json')
+
+    def test_invalid_readings_rejected_by_index(self):
+        now = timezone.now()
+        items = [
+            {'user_id': self.user.id, 'value': 72, 'timestamp': (now - timedelta(hours=1)).isoformat()},
+            {'user_id': self.user.id, 'value': 'x'},
+            {'user_id': self.user.id + 1000, 'value': 80},
+            {'user_id': self.user.id, 'value': 74, 'timestamp': '2019-03-04T10:00:00Z'},
+            {'user_id': self.user.id, 'value': 75, 'timestamp': (now + timedelta(hours=1)).isoformat()},
+            {'user_id': self.user.id, 'value': 76, 'timestamp': 'yesterday'},
+            {'user_id': self.user.id, 'value': 78, 'timestamp': int(now.timestamp()) - 60},
+        ]
+        resp = self.post(items)
+
+        self.assertEqual(resp.status_code, 201)
+        data = resp.json()['data']
+        self.assertEqual(data['accepted'], 2)
+        self.assertEqual([entry['index'] for entry in data['rejected']], [1, 2, 3, 4, 5])
+        self.assertEqual(set(data['rejected'][1]['errors']), {'user_id'})
+        for entry in data['rejected'][2:]:
+            self.assertEqual(set(entry['errors']), {'timestamp'})
+        self.assertEqual(sorted(BPM.objects.values_list('value', flat=True)), [72.0, 78.0])
+
+    def test_timestamps_before_retention_rejected(self):
+        month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        items = [{'user_id': self.user.id, 'value': 72, 'timestamp': (month - timedelta(seconds=1)).isoformat()}]
+        with override_settings(BIOMETRICS_RETENTION_MONTHS=1):
+            resp = self.post(items)
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(set(resp.json()['errors'][0]['errors']), {'timestamp'})
+        self.assertFalse(BPM.objects.exists())
+
+    def test_batch_limits(self):
+        with override_settings(BIOMETRICS_BULK_MAX_READINGS=2):
+            resp = self.post([{'user_id': self.user.id, 'value': 72}] * 3)
+        self.assertEqual(resp.status_code, 400)
+        for items in ([], {'user_id': self.user.id, 'value': 72}, [{'user_id': self.user.id + 1000, 'value': 72}]):
+            self.assertEqual(self.post(items).status_code, 400)
+        self.assertFalse(BPM.objects.exists())
+
+    def test_rolled_back_batch_alerts_raised_on_retry(self):
+        if not ML_AVAILABLE:
+            self.skipTest('ML service not available')
+        ml_service.configure_alert_cooldown(300)
+        self.addCleanup(ml_service.configure_alert_cooldown, 0)
+        now = timezone.now()
+        items = [
+            {'user_id': self.user.id, 'value': value, 'timestamp': (now - timedelta(seconds=10 * i)).isoformat()}
+            for i, value in enumerate([170, 175, 180])
+        ]
+        with mock.patch('apps.biometrics.ingest.EventLogger.log_events', side_effect=RuntimeError):
+            self.assertEqual(self.post(items).status_code, 500)
+        self.assertFalse(BPM.objects.exists())
+
+        resp = self.post(items)
+        self.assertEqual(resp.status_code, 201)
+        self.assertGreater(resp.json()['data']['ml_analysis']['alerts_created'], 0)
+        self.assertTrue(Alert.objects.filter(user=self.user).exists())
+
+    def test_rolled_back_reading_alert_raised_again(self):
+        if not ML_AVAILABLE:
+            self.skipTest('ML service not available')
+        ml_service.configure_alert_cooldown(300)
+        self.addCleanup(ml_service.configure_alert_cooldown, 0)
+        with mock.patch('apps.biometrics.ingest.Alert.objects.create', side_effect=RuntimeError):
+            resp = self.client.post('/biometrics/', {'user_id': self.user.id, 'value': 180}, format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertFalse(Alert.objects.exists())
+
+        resp = self.client.post('/biometrics/', {'user_id': self.user.id, 'value': 180}, format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertTrue(Alert.objects.filter(user=self.user).exists())
+
+    def test_batch_matches_single_readings(self):
+        other = User.objects.create(
+            name='Bulk Officer',
+            email='bulk.officer@example.com',
+            password_hash='noop',
+            status='Active',
+        )
+        values = [72, 80, 95, 120, 150, 165, 172, 180, 130, 100, 88, 140, 190, 60, 75]
+        for value in values:
+            self.assertEqual(self.client.post('/biometrics/', {'user_id': self.user.id, 'value': value}, format='json').status_code, 201)
+        start = timezone.now() - timedelta(hours=1)
+        resp = self.post([
+            {'user_id': other.id, 'value': value, 'timestamp': (start + timedelta(seconds=i)).isoformat()}
+            for i, value in enumerate(values)
+        ])
+
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json()['data']['accepted'], len(values))
+        for user in (self.user, other):
+            self.assertEqual(list(BPM.objects.filter(user=user).order_by('created_at').values_list('value', flat=True)), values)
+        if not ML_AVAILABLE:
+            return
+
+        def predictions(user):
+            return list(
+                MLPrediction.objects.filter(user=user).order_by('bpm_record__created_at')
+                .values_list('stress_score', 'severity', 'alert__type__name')
+            )
+
+        self.assertEqual(predictions(self.user), predictions(other))
+        self.assertEqual(Alert.objects.filter(user=self.user).count(), Alert.objects.filter(user=other).count())
+        self.assertEqual(resp.json()['data']['ml_analysis']['alerts_created'], Alert.objects.filter(user=other).count())
+
+
+class IncidentTest(TestCase):
+    def setUp(self):
+        incident_aggregator.reset()
+        if ML_AVAILABLE:
+            ml_service.configure_alert_cooldown(0)
+        self.supervisor = User.objects.create(
+            name='Supervisor', email='supervisor@example.com', password_hash='noop', status='Active'
+        )
+        self.officers = [
+            User.objects.create(
+                name=f'Officer {i}', email=f'officer{i}@example.com', password_hash='noop', status='Active'
+            )
+            for i in range(3)
+        ]
+        for officer in self.officers:
+            SupervisorAssignment.objects.create(supervisor=self.supervisor, officer=officer)
+        self.alert_type = AlertType.objects.create(name='TEST_ALERT', default_level='Medium')
+        self.now = 1000.0
+        self.aggregator = IncidentAggregator(window_seconds=300, clock=lambda: self.now)
+        self.client = APIClient()
+
+    def assign(self, officer, level, alert_at):
+        return self.aggregator.assign(officer.id, self.alert_type.id, level, alert_at)
+
+    def test_single_readings_grouped_into_one_incident(self):
+        if not ML_AVAILABLE:
+            self.skipTest('ML service not available')
+        for value in [150, 170]:
+            for officer in self.officers:
+                resp = self.client.post('/biometrics/', {'user_id': officer.id, 'value': value}, format='json')
+                self.assertEqual(resp.status_code, 201)
+
+        alerts = Alert.objects.filter(user__in=self.officers)
+        incident = Incident.objects.get()
+        self.assertEqual(incident.alert_count, alerts.count())
+        self.assertEqual(alerts.filter(incident=incident).count(), alerts.count())
+        alerted = MLPrediction.objects.filter(alert__isnull=False).values('bpm_record_id')
+        self.assertEqual(incident.last_alert_at, BPM.objects.filter(id__in=alerted).latest('created_at').created_at)
+        # One event for the whole incident, not one per member alert
+        self.assertEqual(Event.objects.filter(category='Incident_Opened').count(), 1)
+        self.assertFalse(Event.objects.filter(category='Alert_Triggered').exists())
+
+    def test_bulk_readings_grouped_into_one_incident(self):
+        if not ML_AVAILABLE:
+            self.skipTest('ML service not available')
+        items = [{'user_id': officer.id, 'value': value} for value in [150, 170, 180] for officer in self.officers]
+        resp = self.client.post('/biometrics/bulk/', items, format='json')
+
+        self.assertEqual(resp.status_code, 201)
+        created = resp.json()['data']['ml_analysis']['alerts_created']
+        self.assertGreater(created, 1)
+        incident = Incident.objects.get()
+        self.assertEqual(incident.alert_count, created)
+        self.assertEqual(Alert.objects.filter(incident=incident).count(), created)
+        self.assertEqual(Event.objects.filter(category='Incident_Opened').count(), 1)
+
+    def test_member_counted_in_incident_row(self):
+        start = timezone.now()
+        opened = self.assign(self.officers[0], 'Medium', start)
+        self.assertTrue(opened.opened)
+
+        members = [self.assign(officer, 'Medium', start + timedelta(seconds=10 * i))
+                   for i, officer in enumerate(self.officers, 1)]
+        self.assertFalse(any(member.notify for member in members))
+        self.assertEqual(self.aggregator.record(members), set())
+
+        incident = Incident.objects.get(pk=opened.incident_id)
+        self.assertEqual(incident.alert_count, 1 + len(members))
+        self.assertEqual(incident.last_alert_at, start + timedelta(seconds=30))
+        self.assertEqual(incident.level, 'Medium')
+
+    def test_escalation_updates_level(self):
+        start = timezone.now()
+        opened = self.assign(self.officers[0], 'Medium', start)
+        member = self.assign(self.officers[1], 'Critical', start)
+        self.assertTrue(member.escalated)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.aggregator.record([member])
+
+        self.assertEqual(Incident.objects.get(pk=opened.incident_id).level, 'Critical')
+        # Stored as SmallEnumField codes, like the alerts
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT level, status FROM incidents WHERE id = %s", [opened.incident_id])
+            self.assertEqual(cursor.fetchone(), (3, 0))
+        # Same level again is no longer an escalation
+        self.assertFalse(self.assign(self.officers[2], 'Critical', start).escalated)
+
+    def test_rolled_back_members_not_counted(self):
+        start = timezone.now()
+        opened = self.assign(self.officers[0], 'Medium', start)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.aggregator.record([self.assign(self.officers[1], 'High', start)])
+            raise RuntimeError
+
+        incident = Incident.objects.get(pk=opened.incident_id)
+        self.assertEqual((incident.alert_count, incident.level), (1, 'Medium'))
+        # The rolled back escalation is still an escalation
+        self.assertTrue(self.assign(self.officers[2], 'High', start).escalated)
+
+    def test_deleted_incident_reported_missing(self):
+        start = timezone.now()
+        opened = self.assign(self.officers[0], 'Medium', start)
+        member = self.assign(self.officers[1], 'Medium', start)
+        Incident.objects.filter(pk=opened.incident_id).delete()
+
+        self.assertEqual(self.aggregator.record([member]), {opened.incident_id})
+        self.assertTrue(self.assign(self.officers[2], 'Medium', start).opened)
+
+    def test_window_miss_queries_outside_lock(self):
+        start = timezone.now()
+        opened = self.assign(self.officers[0], 'Medium', start)
+        other_type = AlertType.objects.create(name='OTHER_ALERT', default_level='Medium')
+        real_open = self.aggregator._open_incident
+
+        def open_incident(*args):
+            # Another incident can be joined while this one is being queried
+            self.assertFalse(self.aggregator._lock.locked())
+            joined = self.assign(self.officers[1], 'Medium', start)
+            self.assertEqual(joined.incident_id, opened.incident_id)
+            return real_open(*args)
+
+        with mock.patch.object(self.aggregator, '_open_incident', side_effect=open_incident):
+            self.assertTrue(self.aggregator.assign(self.officers[2].id, other_type.id, 'Medium', start).opened)
+
+    def test_new_incident_after_window(self):
+        start = timezone.now()
+        first = self.assign(self.officers[0], 'Medium', start)
+        self.now += 299
+        self.assertEqual(self.assign(self.officers[1], 'Medium', start).incident_id, first.incident_id)
+
+        self.now += 300
+        later = self.assign(self.officers[1], 'Medium', start + timedelta(seconds=600))
+        self.assertTrue(later.opened)
+        self.assertNotEqual(later.incident_id, first.incident_id)
+
+
+class RecentReadingsTest(TestCase):
+    def setUp(self):
+        name = f"artemis_recent_test_{os.getpid()}"
+        settings_override = override_settings(BIOMETRICS_RECENT_READINGS=True, BIOMETRICS_RECENT_READINGS_NAME=name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(recent_readings.unlink)
+        self.user = User.objects.create(
+            name='Test Officer',
+            email='test.officer@example.com',
+            password_hash='noop',
+            status='Active',
+        )
+        self.client = APIClient()
+
+    def post(self, value):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/biometrics/', {'user_id': self.user.id, 'value': value}, format='json')
+
+    def test_slots_keep_the_newest_readings_per_officer(self):
+        table = RecentReadings(capacity=3, slots=4, name=f"artemis_recent_unit_{os.getpid()}")
+        self.addCleanup(table.unlink)
+        now = datetime(2024, 5, 1, 8, 0, tzinfo=dt_timezone.utc)
+        lookback = timedelta(minutes=10)
+
+        self.assertIsNone(table.get(1, now, lookback))
+        table.push(1, now - timedelta(minutes=2), 70.0)
+        self.assertIsNone(table.get(1, now, lookback), 'only a seed fills an empty slot')
+        table.push(1, now - timedelta(minutes=2), 70.0, seed=[])
+        for minutes, value in [(1, 72.0), (3, 68.0), (20, 60.0)]:
+            table.push(1, now - timedelta(minutes=minutes), value)
+        self.assertEqual(table.get(1, now, lookback), [72.0, 70.0, 68.0])
+        self.assertEqual(table.get(1, now - timedelta(minutes=1), lookback), [70.0, 68.0])
+
+        # Officer 5 shares the slot of officer 1
+        table.push(5, now, 90.0, seed=[(now - timedelta(minutes=1), 88.0)])
+        self.assertEqual(table.get(5, now + timedelta(seconds=1), lookback), [90.0, 88.0])
+        self.assertIsNone(table.get(1, now, lookback))
+
+        table.clear()
+        self.assertIsNone(table.get(5, now + timedelta(seconds=1), lookback))
+
+    def test_history_read_from_shared_memory(self):
+        for value in [72, 75, 78]:
+            self.post(value)
+
+        with self.assertNumQueries(READING_QUERY_BUDGET - 1):
+            resp = self.post(76)
+        self.assertEqual(resp.status_code, 201)
+        if ML_AVAILABLE:
+            expected = ml_service.predictor.predict(76, recent_hrs=[76, 78, 75, 72], user_id=self.user.id)
+            prediction = MLPrediction.objects.get(bpm_record_id=resp.json()['data']['id'])
+            self.assertAlmostEqual(prediction.stress_score, expected.stress_score)
+
+        # A bulk batch invalidates the officer's history
+        with self.captureOnCommitCallbacks(execute=True):
+            APIClient().post('/biometrics/bulk/', [{'user_id': self.user.id, 'value': 80}], format='json')
+        with self.assertNumQueries(READING_QUERY_BUDGET):
+            self.post(77)
+        with self.assertNumQueries(READING_QUERY_BUDGET - 1):
+            self.post(78)
+
+        # Unknown officers are still rejected
+        resp = self.client.post('/biometrics/', {'user_id': self.user.id + 1000, 'value': 80}, format='json')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_deleted_officer_leaves_shared_memory(self):
+        for value in [72, 75]:
+            self.post(value)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).delete()
+
+        resp = self.post(76)
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(BPM.objects.exists())
+
+
+class BinaryUploadTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(
+            name='Test Officer',
+            email='test.officer@example.com',
+            password_hash='noop',
+            status='Active',
+        )
+        self.start = int((timezone.now() - timedelta(hours=1)).timestamp() * 1000)
+
+    def post(self, data, **extra):
+        return APIClient().post('/biometrics/bulk/', data, content_type=BINARY_CONTENT_TYPE, **extra)
+
+    def test_batch_round_trip(self):
+        timestamps = [self.start + 1000 * i - (i % 3) * 7 for i in range(200)]
+        values = [72.5 + ((i * 37) % 41) / 10 - (40 if i == 150 else 0) for i in range(200)]
+        data = encode_readings(self.user.id, timestamps, values)
+        user_id, decoded_timestamps, decoded_values = decode_readings(data)
+
+        self.assertEqual(user_id, self.user.id)
+        self.assertEqual(decoded_timestamps.tolist(), timestamps)
+        self.assertEqual(decoded_values.tolist(), [round(value, 1) for value in values])
+        self.assertLess(len(data), 4 * len(values))
+
+    def test_gzipped_batch_is_stored_and_scored(self):
+        values = [72, 75, 76, 95, 150, 176, 80]
+        timestamps = [self.start + 5000 * i for i in range(len(values))]
+        resp = self.post(gzip.compress(encode_readings(self.user.id, timestamps, values)), HTTP_CONTENT_ENCODING='gzip')
+
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json()['data']['accepted'], len(values))
+        stored = BPM.objects.filter(user=self.user).order_by('created_at')
+        self.assertEqual([bpm.value for bpm in stored], values)
+        self.assertEqual([int(bpm.created_at.timestamp() * 1000) for bpm in stored], timestamps)
+        if ML_AVAILABLE:
+            self.assertEqual(MLPrediction.objects.filter(user=self.user).count(), len(values))
+
+    def test_timestamps_out_of_bounds_rejected_by_index(self):
+        old = int(datetime(2019, 3, 4, 10, 0, tzinfo=dt_timezone.utc).timestamp() * 1000)
+        future = int((timezone.now() + timedelta(hours=1)).timestamp() * 1000)
+        resp = self.post(encode_readings(self.user.id, [self.start, old, future, self.start + 1000], [70, 71, 72, 73]))
+
+        self.assertEqual(resp.status_code, 201)
+        data = resp.json()['data']
+        self.assertEqual(data['accepted'], 2)
+        self.assertEqual([(entry['index'], set(entry['errors'])) for entry in data['rejected']],
+                         [(1, {'timestamp'}), (2, {'timestamp'})])
+        self.assertEqual(list(BPM.objects.order_by('created_at').values_list('value', flat=True)), [70.0, 73.0])
+
+        self.assertEqual(self.post(encode_readings(self.user.id, [old], [70])).status_code, 400)
+
+    def test_malformed_batches_rejected(self):
+        data = encode_readings(self.user.id, [self.start, self.start + 1000], [70, 71])
+        for body in (data[:-1], b'JSON' + data[4:], encode_readings(self.user.id + 1000, [self.start], [70])):
+            self.assertEqual(self.post(body).status_code, 400)
+        self.assertEqual(self.post(data, HTTP_CONTENT_ENCODING='br').status_code, 400)
+        self.assertFalse(BPM.objects.exists())
+
+
+class SmallEnumFieldTest(TestCase):
+    def test_choices_stored_as_codes_and_read_as_labels(self):
+        user = User.objects.create(
+            name='Test Officer',
+            email='test.officer@example.com',
+            password_hash='noop',
+            status='Active',
+        )
+        alert_type = AlertType.objects.create(name='STRESS_CRITICAL', default_level='High')
+        Alert.objects.create(user=user, type=alert_type, level='High')
+        Alert.objects.create(user=user, type=alert_type, level='Low', status='Resolved')
+        Event.objects.create(user=user, title='Import', category='Data_Imported')
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT level, status FROM alerts ORDER BY id")
+            self.assertEqual(cursor.fetchall(), [(2, 0), (0, 2)])
+            cursor.execute("SELECT category FROM events")
+            self.assertEqual(cursor.fetchone(), (Event._meta.get_field('category').codes['Data_Imported'],))
+
+        self.assertEqual(Alert.objects.get(level='High').status, 'Pending')
+        self.assertEqual(Alert.objects.filter(status__in=['Resolved', 'Dismissed']).count(), 1)
+        self.assertEqual(list(Alert.objects.order_by('level').values_list('level', flat=True)), ['Low', 'High'])
+        self.assertEqual(Event.objects.values('category').get(), {'category': 'Data_Imported'})
+        self.assertEqual(AlertSerializer(Alert.objects.get(level='Low')).data['status'], 'Resolved')
+        with self.assertRaises(ValidationError):
+            Alert(user=user, type=alert_type, level='Severe').full_clean()
+
+
+class IngestLogTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.user = User.objects.create(
+            name='Test Officer',
+            email='test.officer@example.com',
+            password_hash='noop',
+            status='Active',
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def flusher(self, log):
+        return IngestLogFlusher(log, batch_size=2)
+
+    def test_replays_log_after_restart(self):
+        log = IngestLog(self.directory, segment_bytes=150, fsync=False)
+        sequences = [log.append(self.user.id, value)[0] for value in [70.0, 72.0, 74.0, 76.0, 78.0]]
+        self.assertEqual(sequences, sorted(set(sequences)))
+
+        # A new process on the same directory drains what was left
+        flusher = self.flusher(IngestLog(self.directory, segment_bytes=150, fsync=False))
+        drained = 0
+        while flusher.drain_once():
+            drained += 1
+
+        self.assertEqual(drained, 3)
+        values = list(BPM.objects.filter(user=self.user).order_by('created_at').values_list('value', flat=True))
+        self.assertEqual(values, [70.0, 72.0, 74.0, 76.0, 78.0])
+        checkpoint = IngestCheckpoint.objects.get(name=log.log_id)
+        self.assertGreater(checkpoint.position, sequences[-1])
+        # Fully drained segments are deleted, the newest one is kept
+        self.assertEqual(len(log.segments()), 1)
+        self.assertFalse(flusher.drain_once())
+        # Logged as live captures, not as imports
+        self.assertEqual(set(Event.objects.values_list('category', flat=True)), {'Biometric_Capture_Success'})
+
+    @override_settings(BIOMETRICS_MAX_READING_AGE_DAYS=1)
+    def test_replays_entries_older_than_max_age(self):
+        log = IngestLog(self.directory, fsync=False)
+        # Accepted (202) before an outage longer than the max reading age
+        with mock.patch('apps.biometrics.ingest_log.timezone.now', return_value=timezone.now() - timedelta(days=2)):
+            log.append(self.user.id, 70.0)
+
+        self.assertTrue(self.flusher(log).drain_once())
+        self.assertEqual(list(BPM.objects.values_list('value', flat=True)), [70.0])
+
+    def test_sets_aside_failing_reading(self):
+        log = IngestLog(self.directory, fsync=False)
+        for value in [70.0, 72.0, 74.0]:
+            log.append(self.user.id, value)
+        log.append(self.user.id + 1000, 76.0)
+
+        def failing_ingest_bulk(items, **kwargs):
+            if any(item['value'] == 72.0 for item in items):
+                raise ValueError("bad reading")
+            return ingest_bulk(items, **kwargs)
+
+        with mock.patch('apps.biometrics.ingest_log.ingest_bulk', side_effect=failing_ingest_bulk):
+            flusher = IngestLogFlusher(log)
+            self.assertTrue(flusher.drain_once())
+            # The log is not stalled behind the failing reading
+            self.assertFalse(flusher.drain_once())
+
+        self.assertEqual(sorted(BPM.objects.values_list('value', flat=True)), [70.0, 74.0])
+        with open(os.path.join(self.directory, 'failed.jsonl')) as f:
+            failed = [json.loads(line) for line in f]
+        self.assertEqual([entry['reading']['value'] for entry in failed], [72.0, 76.0])
+        self.assertIn('bad reading', failed[0]['errors'])
+        self.assertIn('user_id', failed[1]['errors'])
+        # Not taken for a segment
+        self.assertEqual(len(log.segments()), 1)
+
+    def test_skips_torn_write(self):
+        log = IngestLog(self.directory, fsync=False)
+        log.append(self.user.id, 70.0)
+        with open(os.path.join(self.directory, f'{0:020d}.log'), 'ab') as f:
+            f.write(b'{"user_id":')
+        log.append(self.user.id, 72.0)
+
+        self.assertTrue(self.flusher(log).drain_once())
+        self.assertEqual(sorted(BPM.objects.values_list('value', flat=True)), [70.0, 72.0])
+
+    def test_write_behind_request_returns_sequence(self):
+        log = IngestLog(self.directory, fsync=False)
+        with override_settings(BIOMETRICS_WRITE_BEHIND=True), \
+                mock.patch('apps.biometrics.views.ingest_log', log), \
+                mock.patch('apps.biometrics.views.ingest_log_flusher') as flusher:
+            resp = APIClient().post('/biometrics/', {'user_id': self.user.id, 'value': 80}, format='json')
+
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.json()['data']['sequence'], 0)
+        flusher.start.assert_called_once()
+        self.assertFalse(BPM.objects.exists())
+        self.assertEqual(log.read(0, 10)[0][0]['value'], 80.0)
+
+    def test_deleted_user_no_longer_accepted(self):
+        self.assertTrue(known_user(self.user.id))
+        with self.assertNumQueries(0):
+            self.assertTrue(known_user(self.user.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).delete()
+        self.assertFalse(known_user(self.user.id))
+
+    def test_server_startup_starts_flusher(self):
+        with mock.patch('apps.biometrics.views.ingest_log_flusher') as flusher:
+            start_write_behind()
+            flusher.start.assert_not_called()
+            with override_settings(BIOMETRICS_WRITE_BEHIND=True):
+                start_write_behind()
+        flusher.start.assert_called_once()
+
+
+class CopyImportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(
+            name='Test Officer',
+            email='test.officer@example.com',
+            password_hash='noop',
+            status='Active',
+        )
+
+    def test_csv_import_validates_and_dedups(self):
+        stored_at = datetime(2024, 5, 1, 8, 0, tzinfo=dt_timezone.utc)
+        ensure_partitions([stored_at])
+        BPM.objects.create(user=self.user, value=70, created_at=stored_at)
+        rows = [
+            'user_id,value,timestamp',
+            f'{self.user.id},70,2024-05-01T08:00:00Z',       # already stored
+            f'{self.user.id},72.5,2024-05-01T08:00:05Z',
+            f'{self.user.id},73,1714550410',                 # epoch seconds
+            f'{self.user.id},99,2024-05-01T08:00:05+00:00',  # repeated in the file
+            f'{self.user.id + 1000},80,2024-05-01T08:00:20Z',
+            f'{self.user.id},NaN,2024-05-01T08:00:25Z',
+            f'{self.user.id},80,yesterday',
+            'abc,80,',
+        ]
+        result = import_readings(io.BytesIO('\n'.join(rows).encode()), 'csv')
+
+        self.assertEqual(result['received'], 8)
+        self.assertEqual(result['imported'], 2)
+        self.assertEqual(result['duplicates'], 2)
+        self.assertEqual(result['rejected'], 4)
+        self.assertEqual(result['rejected_rows'], [5, 6, 7, 8])
+        values = list(BPM.objects.filter(user=self.user).order_by('created_at').values_list('value', flat=True))
+        self.assertEqual(values, [70.0, 72.5, 73.0])
+        self.assertEqual(Event.objects.get(category='Data_Imported').user_id, self.user.id)
+
+    def test_ndjson_import(self):
+        lines = [
+            json.dumps({'user_id': self.user.id, 'value': 75, 'timestamp': '2024-05-01T08:00:00Z'}),
+            '',
+            'not json',
+            json.dumps([self.user.id, 75]),
+            json.dumps({'user_id': self.user.id, 'value': '76', 'timestamp': 1714550405}),
+        ]
+        result = import_readings(io.BytesIO('\n'.join(lines).encode()), 'ndjson')
+
+        self.assertEqual((result['imported'], result['rejected']), (2, 2))
+        self.assertEqual(result['rejected_rows'], [3, 4])
+        self.assertEqual(result['last_id'] - result['first_id'], 1)
+
+    def test_malformed_file_rejected(self):
+        with self.assertRaises(BulkValidationError):
+            import_readings(io.BytesIO(b'user,bpm\n1,80\n'), 'csv')
+        self.assertFalse(BPM.objects.exists())
+
+    def test_scoring_pass_matches_single_path(self):
+        if not ML_AVAILABLE:
+            self.skipTest('ML service not available')
+        values = [72, 75, 76, 95, 150, 176, 80]
+        start = datetime(2024, 5, 1, 8, 0, tzinfo=dt_timezone.utc)
+        body = 'user_id,value,timestamp\n' + '\n'.join(
+            f'{self.user.id},{value},{(start + timedelta(seconds=5 * i)).isoformat()}'
+            for i, value in enumerate(values)
+        )
+        resp = APIClient().post('/biometrics/import/', body.encode(), content_type='text/csv')
+
+        self.assertEqual(resp.status_code, 201)
+        data = resp.json()['data']
+        self.assertEqual(data['imported'], len(values))
+        self.assertEqual(data['ml_analysis']['scored'], len(values))
+        # Past readings are scored but raise no alerts
+        self.assertFalse(Alert.objects.exists())
+
+        history = []
+        for bpm in BPM.objects.filter(user=self.user).order_by('created_at'):
+            history.insert(0, bpm.value)
+            expected = ml_service.predictor.predict(bpm.value, recent_hrs=history[:10], user_id=self.user.id)
+            prediction = MLPrediction.objects.get(bpm_record=bpm)
+            self.assertEqual(prediction.created_at, bpm.created_at)
+            self.assertAlmostEqual(prediction.stress_score, expected.stress_score)
+            self.assertEqual(prediction.severity, expected.severity)
+
+        # Nothing left to score
+        self.assertEqual(score_imported(data['first_id'], data['last_id'], ml_service)['scored'], 0)
+
+    def test_unsupported_content_type(self):
+        resp = APIClient().post('/biometrics/import/', b'<readings/>', content_type='application/xml')
+        self.assertEqual(resp.status_code, 415)
+
+    def test_endpoint_outside_request_transaction(self):
+        view = resolve('/biometrics/import/').func
+        self.assertIn('default', getattr(view, '_non_atomic_requests', set()))
+
+
+class RollupTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(
+            name='Test Officer',
+            email='test.officer@example.com',
+            password_hash='noop',
+            status='Active',
+        )
+        self.start = datetime(2024, 5, 1, 8, 0, tzinfo=dt_timezone.utc)
+        ensure_partitions([self.start])
+
+    def store(self, *readings):
+        BPM.objects.bulk_create([
+            BPM(user=self.user, value=value, created_at=self.start + timedelta(seconds=seconds))
+            for seconds, value in readings
+        ])
+
+    def rollup_rows(self, model):
+        return list(model.objects.order_by('bucket').values_list('bucket', 'count', 'min_value', 'max_value', 'sum_value'))
+
+    def test_inserts_accumulate_and_deletes_recompute(self):
+        self.store((0, 70), (30, 80), (90, 100))
+        self.store((45, 60))
+        minute = self.start + timedelta(minutes=1)
+        self.assertEqual(self.rollup_rows(BPMMinuteRollup), [
+            (self.start, 3, 60.0, 80.0, 210.0),
+            (minute, 1, 100.0, 100.0, 100.0),
+        ])
+        self.assertEqual(self.rollup_rows(BPMHourRollup), [(self.start, 4, 60.0, 100.0, 310.0)])
+
+        BPM.objects.filter(value=60).delete()
+        BPM.objects.filter(value=100).update(value=90)
+        self.assertEqual(self.rollup_rows(BPMMinuteRollup), [
+            (self.start, 2, 70.0, 80.0, 150.0),
+            (minute, 1, 90.0, 90.0, 90.0),
+        ])
+        self.assertEqual(self.rollup_rows(BPMHourRollup), [(self.start, 3, 70.0, 90.0, 240.0)])
+
+        before = self.rollup_rows(BPMMinuteRollup)
+        BPMMinuteRollup.objects.all().delete()
+        rebuild(self.start, self.start + timedelta(hours=1))
+        self.assertEqual(self.rollup_rows(BPMMinuteRollup), before)
+
+    def test_series_picks_the_coarsest_rollup(self):
+        self.store(*((minute * 60, 60 + minute) for minute in range(120)))
+        until = self.start + timedelta(hours=2)
+
+        week = series([self.user.id], self.start, until)
+        self.assertEqual((week['resolution'], week['step']), ('bpm_rollup_minute', 60))
+        self.assertEqual(len(week['buckets']), 120)
+
+        hourly = series([self.user.id], self.start, until, step=timedelta(hours=1))
+        self.assertEqual(hourly['resolution'], 'bpm_rollup_hour')
+        self.assertEqual(hourly['count'], [60, 60])
+        self.assertEqual((hourly['min'], hourly['max']), ([60.0, 120.0], [119.0, 179.0]))
+        self.assertAlmostEqual(hourly['mean'][0], 89.5)
+
+        with override_settings(BIOMETRICS_SERIES_MAX_POINTS=10):
+            self.assertEqual(series([self.user.id], self.start, until)['step'], 15 * 60)
+        self.assertEqual(reading_count(since=self.start + timedelta(minutes=30)), 90)
+
+    def test_series_endpoint_returns_parallel_arrays(self):
+        self.store(*((minute * 60, 60 + minute) for minute in range(120)))
+        client = APIClient()
+        window = {'user': self.user.id, 'from': '2024-05-01T08:00:00Z', 'to': '2024-05-01T10:00:00Z'}
+
+        with self.assertNumQueries(1):
+            resp = client.get('/biometrics/series/', {**window, 'bucket': '1h'})
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()['data']
+        self.assertEqual((data['user_ids'], data['step'], data['resolution']), ([self.user.id], 3600, 'bpm_rollup_hour'))
+        start = int(self.start.timestamp())
+        self.assertEqual(data['buckets'], [start, start + 3600])
+        self.assertEqual(data['count'], [60, 60])
+        self.assertEqual((data['min'], data['max'], data['mean']), ([60.0, 120.0], [119.0, 179.0], [89.5, 149.5]))
+
+        data = client.get('/biometrics/series/', {**window, 'bucket': '5m'}).json()['data']
+        self.assertEqual((data['resolution'], len(data['buckets'])), ('bpm_rollup_minute', 24))
+        self.assertEqual(data['count'][:2], [5, 5])
+
+        self.assertEqual(client.get('/biometrics/series/', {**window, 'user': ''}).status_code, 400)
+        self.assertEqual(client.get('/biometrics/series/', {**window, 'bucket': '2m'}).status_code, 400)
+        self.assertEqual(client.get('/biometrics/series/', {**window, 'from': window['to']}).status_code, 400)
+        with override_settings(BIOMETRICS_SERIES_MAX_POINTS=10):
+            self.assertEqual(client.get('/biometrics/series/', {**window, 'bucket': '1m'}).status_code, 400)
+
+
+class StreamingExportTest(TransactionTestCase):
+    # Not a TestCase: the export must run after the request's transaction
+    def setUp(self):
+        self.user, self.other = [
+            User.objects.create(name=name, email=f'{name}@example.com', password_hash='noop', status='Active')
+            for name in ('officer', 'other')
+        ]
+        self.start = datetime(2024, 5, 1, 8, 0, tzinfo=dt_timezone.utc)
+        ensure_partitions([self.start])
+        BPM.objects.bulk_create([
+            BPM(user=user, value=60 + i, created_at=self.start + timedelta(seconds=i))
+            for i in range(25) for user in (self.user, self.other)
+        ])
+        self.window = {'since': '2024-05-01T00:00:00Z', 'until': '2024-05-02T00:00:00Z', 'user': self.user.id}
+
+    def test_ndjson_and_csv_stream_the_window(self):
+        client = APIClient()
+        with override_settings(EXPORT_CHUNK_SIZE=10):
+            resp = client.get('/biometrics/', {**self.window, 'format': 'ndjson', 'stream': '1'})
+            self.assertEqual(resp['Content-Type'], 'application/x-ndjson; charset=utf-8')
+            self.assertTrue(resp.streaming)
+            chunks = list(resp.streaming_content)
+        self.assertEqual(len(chunks), 3)
+        rows = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(rows[0], {
+            'id': rows[0]['id'], 'user_id': self.user.id, 'value': 84.0, 'created_at': '2024-05-01T08:00:24Z'
+        })
+
+        resp = client.get('/biometrics/', {**self.window, 'format': 'csv', 'stream': 'true'})
+        self.assertEqual(resp['Content-Disposition'], 'attachment; filename="bpm.csv"')
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,user_id,value,created_at')
+        self.assertEqual(lines[-1].split(',')[1:], [str(self.user.id), '60.0', '2024-05-01T08:00:00Z'])
+        self.assertEqual(len(lines), 26)
+
+    def test_other_list_endpoints_and_rendered_formats(self):
+        Event.objects.create(user=self.user, title='Login', category='Login')
+        resp = APIClient().get('/events/', {'format': 'ndjson', 'stream': '1'})
+        row = json.loads(b''.join(resp.streaming_content))
+        self.assertEqual((row['user_id'], row['title'], row['category']), (self.user.id, 'Login', 'Login'))
+
+        # Without stream=1 the serialized page is rendered in the format
+        resp = APIClient().get('/biometrics/', {**self.window, 'format': 'csv'})
+        self.assertFalse(resp.streaming)
+        self.assertEqual(resp.content.decode().splitlines()[0], 'id,user_id,value')
+        self.assertEqual(APIClient().get('/biometrics/', {'format': 'xml'}).status_code, 404)
+
+
+class PartitionTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create(
+            name='Test Officer',
+            email='test.officer@example.com',
+            password_hash='noop',
+            status='Active',
+        )
+
+    def test_import_creates_month_and_retention_detaches_it(self):
+        body = f'user_id,value,timestamp\n{self.user.id},70,2019-03-04T10:00:00Z\n{self.user.id},72,2019-03-04T10:00:05Z\n'
+        result = import_readings(io.BytesIO(body.encode()), 'csv')
+
+        self.assertEqual(result['imported'], 2)
+        self.assertIn('bpm_p201903', existing_partitions('bpm'))
+        self.assertIn('ml_predictions_p201903', existing_partitions('ml_predictions'))
+
+        client = APIClient()
+        self.assertEqual(client.get('/biometrics/').json()['data'], [])
+        resp = client.get('/biometrics/', {'since': '2019-03-01T00:00:00Z', 'until': '2019-04-01T00:00:00Z'})
+        self.assertEqual([row['value'] for row in resp.json()['data']], [72.0, 70.0])
+        self.assertEqual(client.get('/biometrics/', {'since': 'last week'}).status_code, 400)
+
+        # A bounded listing only reads the partitions of its range
+        plan = BPM.objects.filter(
+            created_at__gte=datetime(2019, 3, 1, tzinfo=dt_timezone.utc),
+            created_at__lt=datetime(2019, 4, 1, tzinfo=dt_timezone.utc)
+        ).explain()
+        self.assertIn('bpm_p201903', plan)
+        self.assertNotIn(f"bpm_p{datetime.now(dt_timezone.utc):%Y%m}", plan)
+
+        detached = detach_partitions(datetime(2019, 4, 1, tzinfo=dt_timezone.utc), drop=True)
+        self.assertEqual(sorted(detached), ['bpm_p201903', 'ml_predictions_p201903'])
+        self.assertFalse(BPM.objects.exists())
+
+
+class ArchiveTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create(
+            name='Test Officer',
+            email='test.officer@example.com',
+            password_hash='noop',
+            status='Active',
+        )
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.month = datetime(2019, 2, 1, tzinfo=dt_timezone.utc)
+        ensure_partitions([self.month])
+        # Partitions outlive TransactionTestCase flushes
+        self.addCleanup(detach_partitions, datetime(2019, 3, 1, tzinfo=dt_timezone.utc), drop=True, months=[self.month])
+
+    def test_segment_round_trip_is_exact(self):
+        rows = [
+            (1, 72.5, self.month),
+            (2, 0.1 + 0.2, self.month + timedelta(seconds=1, microseconds=7)),
+            (40, -3.0, self.month + timedelta(days=3)),
+        ]
+        data = encode_segment(self.user.id, self.month, {'bpm': (BPM, [(*row, row[2]) for row in rows])})
+        header, tables = decode_segment(data)
+
+        self.assertEqual(header['tables']['bpm']['rows'], 3)
+        columns = tables['bpm']
+        self.assertEqual(list(zip(columns['id'], columns['value'], columns['created_at'])), rows)
+
+    def test_archived_month_leaves_the_database_and_stays_readable(self):
+        readings = BPM.objects.bulk_create([
+            BPM(user=self.user, value=60 + i * 0.5, created_at=self.month + timedelta(seconds=5 * i))
+            for i in range(50)
+        ])
+        MLPrediction.objects.bulk_create([
+            MLPrediction(
+                user=self.user, bpm_record=bpm, stress_score=40.0 + i, stress_level='Moderado', severity='LOW',
+                requires_alert=i % 7 == 0, alert_probability=i / 50, hr_zone='Zone 1 (Muy Baja)',
+                features=struct.pack(f'>{len(FEATURE_COLUMNS)}f', bpm.value, *range(1, len(FEATURE_COLUMNS))) if i % 3 else None,
+                ml_metadata={'heart_rate': bpm.value}, created_at=bpm.created_at
+            )
+            for i, bpm in enumerate(readings)
+        ])
+        expected = list(MLPrediction.objects.order_by('created_at').values_list('id', 'stress_score', 'features', 'ml_metadata'))
+        expected = [(pk, score, features and bytes(features), metadata) for pk, score, features, metadata in expected]
+
+        with override_settings(BIOMETRICS_ARCHIVE_DIR=self.directory):
+            result = archive_month(self.month)
+
+            self.assertEqual((result['segments'], result['readings'], result['predictions']), (1, 50, 50))
+            self.assertEqual(sorted(result['detached']), ['bpm_p201902', 'ml_predictions_p201902'])
+            self.assertFalse(BPM.objects.exists())
+            self.assertEqual(ArchiveSegment.objects.get().readings, 50)
+
+            resp = APIClient().get('/biometrics/', {'since': '2019-02-01T00:00:00Z', 'until': '2019-02-01T00:01:00Z'})
+            self.assertEqual([row['value'] for row in resp.json()['data']], [60 + i * 0.5 for i in range(11, -1, -1)])
+            resp = APIClient().get('/biometrics/', {
+                'since': '2019-02-01T00:00:00Z', 'until': '2019-02-01T00:01:00Z', 'format': 'ndjson', 'stream': '1'
+            })
+            rows = [json.loads(line) for line in b''.join(resp.streaming_content).splitlines()]
+            self.assertEqual([row['value'] for row in rows], [60 + i * 0.5 for i in range(12)])
+
+            predictions = archived_predictions(self.month, datetime(2019, 3, 1, tzinfo=dt_timezone.utc))
+            self.assertEqual([(p.id, p.stress_score, p.features, p.ml_metadata) for p in predictions], expected)
@@ -1,10 +1,20 @@
+from django.db import transaction
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .async_views import bpm_create_async
 from .views import BPMViewSet
 
 router = DefaultRouter()
 router.register(r'', BPMViewSet, basename='bpm')
 
+# Backlog imports commit the merge and each scoring batch on their own
+# instead of holding one request transaction (ATOMIC_REQUESTS)
+bpm_import = transaction.non_atomic_requests(
+    BPMViewSet.as_view({'post': 'import_backlog'}, basename='bpm', detail=False)
+)
+
 urlpatterns = [
+    path('async/', bpm_create_async, name='bpm-create-async'),
+    path('import/', bpm_import, name='bpm-import'),
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
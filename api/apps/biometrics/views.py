@@ -1,6 +1,13 @@
 import sys
 import os
+from datetime import timedelta, timezone as dt_timezone
+
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status as http_status
 
@@ -8,7 +15,13 @@ from core.views import BaseViewSet
 from .models import BPM, MLPrediction
 from .serializers import BPMSerializer, MLPredictionSerializer
 from apps.events import EventLogger
-from apps.alerts.models import Alert, AlertType
+from apps.users.models import User
+from .ingest import BulkValidationError, ingest_bulk, ingest_reading, recent_readings
+from .archive import archived_readings, iter_archived_readings
+from .ingest_binary import BINARY_CONTENT_TYPE, ingest_binary, read_body
+from .ingest_copy import import_readings, score_imported
+from .ingest_log import ingest_log, ingest_log_flusher, known_user
+from .rollups import series as rollup_series
 
 # Importar el servicio ML
 ML_PATH = os.path.join(settings.BASE_DIR, '..', 'ML')
@@ -17,172 +30,347 @@ if ML_PATH not in sys.path:
 
 try:
     from ml_service import ml_service
+    ml_service.configure_alert_cooldown(settings.ML_ALERT_COOLDOWN_SECONDS)
     ML_AVAILABLE = True
 except ImportError as e:
     ML_AVAILABLE = False
     print(f"⚠️ WARNING: ML service not available: {e}")
 
 
+# Content-Type -> format of POST /biometrics/import/
+IMPORT_CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+
+
+def ml_analysis(result):
+    """`ml_analysis` block of the ingest responses."""
+    prediction = result['prediction']
+    alert_created = result['alert']
+    return {
+        'available': ML_AVAILABLE,
+        'prediction': {
+            'stress_score': prediction.stress_score,
+            'stress_level': prediction.stress_level,
+            'severity': prediction.severity,
+            'requires_alert': prediction.requires_alert,
+            'is_anomaly': prediction.is_anomaly,
+        } if prediction else None,
+        'alert_created': alert_created.id if alert_created else None,
+        'incident': alert_created.incident_id if alert_created else None,
+        'should_notify': result['should_notify']
+    }
+
+
+# ?bucket= of GET /biometrics/series/ -> step
+SERIES_BUCKETS = {
+    '1m': timedelta(minutes=1),
+    '5m': timedelta(minutes=5),
+    '15m': timedelta(minutes=15),
+    '1h': timedelta(hours=1),
+    '6h': timedelta(hours=6),
+    '1d': timedelta(days=1),
+}
+
+
+def query_window(request, names=('since', 'until')):
+    """
+    Time range [since, until) of a list request.
+    
+    `?since=` and `?until=` (or the parameters in `names`) take ISO 8601
+    timestamps (UTC when naive); `until` defaults to now and `since` to
+    BIOMETRICS_QUERY_WINDOW_DAYS before `until`, so a listing only reads
+    the partitions of that range.
+    """
+    bounds = {}
+    for name in names:
+        raw = request.query_params.get(name)
+        if raw is None:
+            continue
+        try:
+            value = parse_datetime(raw)
+        except ValueError:
+            value = None
+        if value is None:
+            raise serializers.ValidationError({name: 'Expected an ISO 8601 timestamp.'})
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value, dt_timezone.utc)
+        bounds[name] = value
+    
+    until = bounds.get(names[1]) or timezone.now()
+    since = bounds.get(names[0]) or until - timedelta(days=settings.BIOMETRICS_QUERY_WINDOW_DAYS)
+    return since, until
+
+
+def query_user_ids(request):
+    """Officer ids of `?user=` (repeated or comma-separated)."""
+    raw = [part for value in request.query_params.getlist('user') for part in value.split(',') if part.strip()]
+    if not raw:
+        raise serializers.ValidationError({'user': 'At least one officer id is required.'})
+    try:
+        return sorted({int(part) for part in raw})
+    except ValueError:
+        raise serializers.ValidationError({'user': 'Expected officer ids.'})
+
+
+def start_write_behind():
+    """
+    Start this process's ingest log flusher when write-behind is enabled
+    (called by the server entry points, see config.wsgi).
+    """
+    if settings.BIOMETRICS_WRITE_BEHIND:
+        ingest_log_flusher.start(ml_service if ML_AVAILABLE else None)
+
+
+def enqueue_reading(user_id, value):
+    """Append a reading to the write-behind log and describe it."""
+    if not known_user(user_id):
+        raise serializers.ValidationError({'user_id': 'User with given id does not exist.'})
+
+    # In case the server entry point did not start it
+    start_write_behind()
+    sequence, timestamp = ingest_log.append(user_id, value)
+    return {
+        'sequence': sequence,
+        'user_id': user_id,
+        'value': value,
+        'timestamp': timestamp
+    }
+
+
 class BPMViewSet(BaseViewSet):
     """ViewSet for simple BPM sensor readings with ML integration."""
     queryset = BPM.objects.all()
     serializer_class = BPMSerializer
+    export_fields = ('id', 'user_id', 'value', 'created_at')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            since, until = query_window(self.request)
+            queryset = queryset.filter(created_at__gte=since, created_at__lt=until)
+            if 'user' in self.request.query_params:
+                queryset = queryset.filter(user_id__in=query_user_ids(self.request))
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        Readings of the time window (of the officers in `?user=`, when
+        given), archived months included.
+        
+        A streaming export (`?format=ndjson|csv&stream=1`) sends the
+        stored readings, newest first, then the archived months.
+        """
+        since, until = query_window(request)
+        user_ids = query_user_ids(request) if 'user' in request.query_params else None
+        if self.wants_stream(request):
+            fields = self.get_export_fields()
+            archived = (
+                tuple(getattr(bpm, field) for field in fields)
+                for bpm in iter_archived_readings(since, until, user_ids)
+            )
+            return self.stream_export(self.get_queryset(), extra=archived)
+        
+        archived = archived_readings(since, until, user_ids)
+        if not archived:
+            return super().list(request, *args, **kwargs)
+        
+        readings = sorted([*self.get_queryset(), *archived], key=lambda bpm: bpm.created_at, reverse=True)
+        return Response({
+            'success': True,
+            'data': self.get_serializer(readings, many=True).data
+        })
 
     def create(self, request, *args, **kwargs):
         """
         Create BPM record and run ML analysis.
         
-        Flow:
-        1. Validate and save BPM
-        2. Get recent BPM history for user
+        Flow (see `ingest_reading`; 3 queries when no alert is raised):
+        1. Validate the reading
+        2. Load the user and their recent BPM history in one query
         3. Run ML analysis
-        4. Save ML prediction
-        5. Create alert if needed
-        6. Log event
-        7. Return response with ML results
-        """
-        # 1. Call superclass to validate and create the BPM instance
-        response = super().create(request, *args, **kwargs)
+        4. Save the BPM and its ML prediction
+        5. Create alert if needed (grouped into an incident per supervisor)
+        6. Return response with ML results
         
-        if response.status_code != http_status.HTTP_201_CREATED:
-            return response
+        With BIOMETRICS_WRITE_BEHIND the reading is only appended to the
+        ingest log (202 with its sequence id) and stored later in a batch.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_id = serializer.resolve_user_id(serializer.validated_data)
         
-        # Get created BPM instance (BaseViewSet wraps data in 'data' key)
-        bpm_data = response.data.get('data', {})
-        bpm_id = bpm_data.get('id')
-        bpm_instance = BPM.objects.get(pk=bpm_id)
-        user = bpm_instance.user
-        heart_rate = bpm_instance.value
+        if settings.BIOMETRICS_WRITE_BEHIND:
+            return Response(
+                {
+                    'success': True,
+                    'data': enqueue_reading(user_id, serializer.validated_data['value']),
+                    'message': 'Accepted for processing'
+                },
+                status=http_status.HTTP_202_ACCEPTED
+            )
         
-        # Determine user for logging
-        user_id = None
         try:
-            if isinstance(request.data, dict):
-                user_id = request.data.get('user_id')
-        except Exception:
-            user_id = None
-        
-        log_user = user_id if user_id is not None else request.user
-        
-        # 2. Get recent BPM history (last 10 readings)
-        recent_bpms = BPM.objects.filter(
-            user=user
-        ).order_by('-created_at')[:10].values_list('value', flat=True)
-        
-        recent_hrs = list(recent_bpms) if recent_bpms else None
-        
-        # 3. Run ML analysis (if available)
-        ml_result = None
-        alert_created = None
-        
-        if ML_AVAILABLE:
-            try:
-                ml_result = ml_service.analyze_biometric_data(
-                    heart_rate=heart_rate,
-                    user_id=user.id,
-                    recent_hrs=recent_hrs,
-                    timestamp=bpm_instance.created_at.isoformat()
+            result = ingest_reading(
+                user_id,
+                serializer.validated_data['value'],
+                ml_service=ml_service if ML_AVAILABLE else None,
+                ip_address=request.META.get('REMOTE_ADDR')
+            )
+        except User.DoesNotExist:
+            raise serializers.ValidationError({'user_id': 'User with given id does not exist.'})
+        
+        return Response(
+            {
+                'success': True,
+                'data': self.get_serializer(result['bpm']).data,
+                'message': 'Created successfully',
+                'ml_analysis': ml_analysis(result)
+            },
+            status=http_status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['get'], url_path='series')
+    def series(self, request):
+        """
+        Chart series of BPM per time bucket, aggregated in SQL from the
+        rollup tables (see `rollups.series`).
+        
+        Query: `user` (one or more officer ids, aggregated together),
+        `from` / `to` (ISO 8601, as `since` / `until` of the listing) and
+        `bucket` (1m, 5m, 15m, 1h, 6h or 1d; the finest step within
+        BIOMETRICS_SERIES_MAX_POINTS buckets when omitted).
+        
+        The buckets come back as parallel arrays: `buckets` (epoch
+        seconds of each bucket start), `count`, `min`, `max`, `mean` and
+        `std` (bpm, two decimals). Buckets without readings are left out.
+        """
+        user_ids = query_user_ids(request)
+        since, until = query_window(request, names=('from', 'to'))
+        if since >= until:
+            raise serializers.ValidationError({'from': "Must be before 'to'."})
+        
+        step = None
+        bucket = request.query_params.get('bucket')
+        if bucket is not None:
+            step = SERIES_BUCKETS.get(bucket)
+            if step is None:
+                raise serializers.ValidationError({'bucket': f"Expected one of {', '.join(SERIES_BUCKETS)}."})
+            if (until - since) / step > settings.BIOMETRICS_SERIES_MAX_POINTS:
+                raise serializers.ValidationError(
+                    {'bucket': f"At most {settings.BIOMETRICS_SERIES_MAX_POINTS} buckets per request."}
                 )
-                
-                # 4. Save ML prediction
-                prediction = ml_result['prediction']
-                ml_prediction = MLPrediction.objects.create(
-                    user=user,
-                    bpm_record=bpm_instance,
-                    stress_score=prediction['stress_score'],
-                    stress_level=prediction['stress_level'],
-                    severity=prediction['severity'],
-                    requires_alert=prediction['requires_alert'],
-                    alert_probability=prediction['alert_probability'],
-                    is_anomaly=prediction['is_anomaly'],
-                    hr_zone=prediction.get('hr_zone', ''),
-                    ml_metadata=prediction.get('metadata', {})
+        
+        data = rollup_series(user_ids, since, until, step=step)
+        data['buckets'] = [int(start.timestamp()) for start in data['buckets']]
+        for name in ('min', 'max', 'mean', 'std'):
+            data[name] = [round(value, 2) for value in data[name]]
+        return Response({
+            'success': True,
+            'data': {'user_ids': user_ids, 'from': since, 'to': until, **data}
+        })
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Store a batch of buffered readings and score them in one pass.
+        
+        Body: list of {"user_id", "value", "timestamp"} objects (timestamp
+        as ISO 8601 or epoch seconds; defaults to now). Invalid readings
+        are reported by index and the valid ones are still stored.
+        
+        Watches can send one officer's batch in the compact binary format
+        instead (`Content-Type: application/vnd.artemis.bpm`, optionally
+        gzipped; see `ingest_binary`).
+        """
+        try:
+            if request.content_type.split(';')[0].strip().lower() == BINARY_CONTENT_TYPE:
+                result = ingest_binary(
+                    read_body(request),
+                    ml_service=ml_service if ML_AVAILABLE else None,
+                    ip_address=request.META.get('REMOTE_ADDR')
                 )
-                
-                # 5. Create alert if needed
-                if ml_result['alert']:
-                    alert_data = ml_result['alert']
-                    
-                    # Get or create AlertType
-                    alert_type, _ = AlertType.objects.get_or_create(
-                        name=alert_data['alert_type'],
-                        defaults={
-                            'default_level': alert_data['severity'],
-                            'description': f"ML-generated alert: {alert_data['alert_type']}",
-                            'is_active': True
-                        }
-                    )
-                    
-                    # Map ML severity to Django Alert level
-                    severity_map = {
-                        'CRITICAL': 'Critical',
-                        'HIGH': 'High',
-                        'MEDIUM': 'Medium',
-                        'LOW': 'Low'
-                    }
-                    
-                    # Create alert
-                    alert_created = Alert.objects.create(
-                        user=user,
-                        type=alert_type,
-                        level=severity_map.get(alert_data['severity'], 'Medium'),
-                        status='Pending',
-                        description=alert_data['message'],
-                        location=''  # Could be populated from GPS data if available
-                    )
-                    
-                    # Link alert to prediction
-                    ml_prediction.alert = alert_created
-                    ml_prediction.save()
-                    
-                    # Log alert event
-                    EventLogger.log_event(
-                        user=log_user,
-                        title=f"ML Alert: {alert_data['alert_type']}",
-                        category="Alert_Triggered",
-                        description=f"ML detected {alert_data['severity']} alert: {alert_data['message'][:100]}",
-                        ip_address=request.META.get('REMOTE_ADDR')
-                    )
-                
-            except Exception as e:
-                # Log error but don't fail the request
-                print(f"⚠️ ML analysis error: {e}")
-                EventLogger.log_event(
-                    user=log_user,
-                    title="ML Analysis Error",
-                    category="System_Error",
-                    description=f"Error during ML analysis: {str(e)}",
+            else:
+                result = ingest_bulk(
+                    request.data,
+                    ml_service=ml_service if ML_AVAILABLE else None,
                     ip_address=request.META.get('REMOTE_ADDR')
                 )
+        except BulkValidationError as e:
+            return Response(
+                {'success': False, 'message': str(e)},
+                status=http_status.HTTP_400_BAD_REQUEST
+            )
         
-        # 6. Log BPM creation event
-        EventLogger.log_event(
-            user=log_user,
-            title="BPM Record Created",
-            category="Biometric_Capture_Success",
-            description=f"BPM reading: {heart_rate} bpm" + (
-                f" - ML: Stress {ml_result['prediction']['stress_score']:.1f}/100" 
-                if ml_result else ""
-            ),
-            ip_address=request.META.get('REMOTE_ADDR')
+        if not result['accepted']:
+            return Response(
+                {'success': False, 'message': 'No valid readings', 'errors': result['rejected']},
+                status=http_status.HTTP_400_BAD_REQUEST
+            )
+        
+        result['ml_analysis'] = dict(result['ml_analysis'] or {}, available=ML_AVAILABLE)
+        return Response(
+            {'success': True, 'data': result, 'message': f"{result['accepted']} readings created"},
+            status=http_status.HTTP_201_CREATED
         )
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_backlog(self, request):
+        """
+        Import a device backlog through PostgreSQL COPY (see `ingest_copy`).
+        
+        Body: the raw file, `Content-Type: text/csv` (header
+        user_id,value,timestamp) or `application/x-ndjson`. The readings
+        are merged into `bpm` in one statement and then scored in batches;
+        `?score=false` skips scoring (run `manage.py import_bpm
+        --score-range FIRST LAST` later).
+        
+        Routed outside the request transaction (see urls.py): the merge
+        and every scoring batch commit separately.
+        """
+        content_type = request.content_type.split(';')[0].strip().lower()
+        fmt = IMPORT_CONTENT_TYPES.get(content_type)
+        if fmt is None:
+            return Response(
+                {'success': False, 'message': f"Unsupported content type {content_type!r}"},
+                status=http_status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        if request.stream is None:
+            return Response(
+                {'success': False, 'message': 'No readings given.'},
+                status=http_status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            result = import_readings(request.stream, fmt, ip_address=request.META.get('REMOTE_ADDR'))
+        except BulkValidationError as e:
+            return Response(
+                {'success': False, 'message': str(e)},
+                status=http_status.HTTP_400_BAD_REQUEST
+            )
+        
+        result['ml_analysis'] = {'available': ML_AVAILABLE, 'scored': 0, 'requires_alert': 0}
+        score = request.query_params.get('score', 'true').lower() not in ('0', 'false', 'no')
+        if ML_AVAILABLE and score and result['imported']:
+            result['ml_analysis'].update(score_imported(
+                result['first_id'], result['last_id'], ml_service,
+                since=result['first_at'], until=result['last_at']
+            ))
         
-        # 7. Enrich response with ML data
-        response_data = response.data.copy()
-        response_data['ml_analysis'] = {
-            'available': ML_AVAILABLE,
-            'prediction': {
-                'stress_score': ml_result['prediction']['stress_score'],
-                'stress_level': ml_result['prediction']['stress_level'],
-                'severity': ml_result['prediction']['severity'],
-                'requires_alert': ml_result['prediction']['requires_alert'],
-                'is_anomaly': ml_result['prediction']['is_anomaly'],
-            } if ml_result else None,
-            'alert_created': alert_created.id if alert_created else None,
-            'should_notify': ml_result.get('should_notify', False) if ml_result else False
-        }
-        
-        return Response(response_data, status=http_status.HTTP_201_CREATED)
+        return Response(
+            {'success': True, 'data': result, 'message': f"{result['imported']} readings imported"},
+            status=http_status.HTTP_201_CREATED
+        )
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        transaction.on_commit(lambda: recent_readings.invalidate([serializer.instance.user_id]))
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        transaction.on_commit(lambda: recent_readings.invalidate([instance.user_id]))
 
     def destroy(self, request, *args, **kwargs):
         response = super().destroy(request, *args, **kwargs)
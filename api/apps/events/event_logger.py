@@ -41,6 +41,8 @@ class EventLogger:
     REPORT = 'Report'
     ALERT_TRIGGERED = 'Alert_Triggered'
     ALERT_RESOLVED = 'Alert_Resolved'
+    INCIDENT_OPENED = 'Incident_Opened'
+    INCIDENT_ESCALATED = 'Incident_Escalated'
     
     USER_CREATED = 'User_Created'
     USER_DELETED = 'User_Deleted'
@@ -106,6 +108,38 @@ class EventLogger:
         )
         return event
     
+    @staticmethod
+    def build_event(user, title, category, description='', ip_address=None, user_agent=None):
+        """
+        Build an unsaved event for `log_events`.
+        
+        Unlike `log_event`, a user id is used as-is (no lookup query).
+        """
+        if isinstance(user, UserModel):
+            user_id = user.pk
+        elif isinstance(user, int):
+            user_id = user
+        else:
+            user_id = None
+        return Event(
+            user_id=user_id,
+            title=title,
+            category=category,
+            description=description,
+            ip_address=ip_address,
+            user_agent=user_agent or ''
+        )
+    
+    @staticmethod
+    def log_events(events):
+        """Insert events built with `build_event` in a single query."""
+        return Event.objects.bulk_create(events)
+    
+    @staticmethod
+    async def alog_events(events):
+        """Async variant of `log_events`."""
+        return await Event.objects.abulk_create(events)
+    
     @staticmethod
     def log_biometric_success(user, biometric_type, description='', **kwargs):
         """Log successful biometric capture."""
@@ -1,5 +1,7 @@
 from django.db import models
 
+from core.fields import SmallEnumField
+
 
 class Event(models.Model):
     EVENT_CATEGORIES = [
@@ -33,6 +35,8 @@ class Event(models.Model):
         ('Report', 'Report'),
         ('Alert_Triggered', 'Alert Triggered'),
         ('Alert_Resolved', 'Alert Resolved'),
+        ('Incident_Opened', 'Incident Opened'),
+        ('Incident_Escalated', 'Incident Escalated'),
         
         ('User_Created', 'User Created'),
         ('User_Deleted', 'User Deleted'),
@@ -56,7 +60,7 @@ class Event(models.Model):
     user = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='events')
     title = models.CharField(max_length=100)
     description = models.TextField(blank=True)
-    category = models.CharField(max_length=50, choices=EVENT_CATEGORIES, default='Other', db_index=True)
+    category = SmallEnumField(choices=EVENT_CATEGORIES, default='Other', db_index=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.CharField(max_length=255, blank=True, null=True)
@@ -9,7 +9,7 @@ from .serializers import (
     CleanSupervisorAssignmentSerializer
 )
 from apps.alerts.models import Alert, AlertType
-from apps.biometrics.models import BPM
+from apps.biometrics.rollups import reading_count
 from apps.geolocation.models import GeoLocation
 from apps.events.models import Event
 from django.db.models import Count, Q
@@ -86,8 +86,9 @@ class UserViewSet(BaseViewSet):
         alerts_last_7_days = Alert.objects.filter(created_at__gte=last_7_days).count()
         alerts_by_level = Alert.objects.values('level').annotate(count=Count('id'))
         
-        total_biometric_records = BPM.objects.count()
-        biometric_last_7_days = BPM.objects.filter(created_at__gte=last_7_days).count()
+        # From the BPM rollups instead of counting raw readings
+        total_biometric_records = reading_count()
+        biometric_last_7_days = reading_count(since=last_7_days)
         
         total_locations = GeoLocation.objects.count()
         locations_last_7_days = GeoLocation.objects.filter(created_at__gte=last_7_days).count()
@@ -145,6 +146,8 @@ class SupervisorAssignmentViewSet(BaseViewSet):
     def list(self, request, *args, **kwargs):
         """Override list para usar serializer limpio y formato personalizado"""
         queryset = self.get_queryset()
+        if self.wants_stream(request):
+            return self.stream_export(queryset)
         serializer = self.get_serializer(queryset, many=True)
         return Response({
             'success': True,
@@ -223,8 +226,8 @@ class SupervisorViewSet(viewsets.ViewSet):
         critical_alerts = Alert.objects.filter(user_id__in=officer_ids, level='Critical').count()
         alerts_last_7_days = Alert.objects.filter(user_id__in=officer_ids, created_at__gte=last_7_days).count()
         
-        biometric_records = BPM.objects.filter(user_id__in=officer_ids).count()
-        biometric_last_7_days = BPM.objects.filter(user_id__in=officer_ids, created_at__gte=last_7_days).count()
+        biometric_records = reading_count(user_ids=officer_ids)
+        biometric_last_7_days = reading_count(user_ids=officer_ids, since=last_7_days)
         
         location_records = GeoLocation.objects.filter(user_id__in=officer_ids).count()
         location_last_7_days = GeoLocation.objects.filter(user_id__in=officer_ids, created_at__gte=last_7_days).count()
@@ -105,11 +105,15 @@ REST_FRAMEWORK = {
         'rest_framework.throttling.UserRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
-        'anon': '100/hour',
-        'user': '1000/hour'
+        'anon': config('THROTTLE_ANON_RATE', default='100/hour'),
+        'user': config('THROTTLE_USER_RATE', default='1000/hour')
     }
 }
 
+# Rows per server-side cursor fetch (and per body chunk) of the streaming
+# exports of the list endpoints (?format=ndjson|csv&stream=1)
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Artemis API',
     'DESCRIPTION': 'Sistema de monitoreo Artemis - API REST para gestión de usuarios, métricas biométricas, geolocalización, alertas y reportes',
@@ -146,6 +150,74 @@ SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'DENY'
 
+# ML: seconds during which a repeated alert of the same type for the same
+# officer is suppressed (0 disables suppression)
+ML_ALERT_COOLDOWN_SECONDS = config('ML_ALERT_COOLDOWN_SECONDS', default=300, cast=float)
+
+# Async ingest endpoint: concurrent readings are scored in one vectorized
+# batch, waiting at most this long for others to arrive
+ML_ASYNC_COALESCE = config('ML_ASYNC_COALESCE', default=True, cast=bool)
+ML_ASYNC_BATCH_WINDOW_MS = config('ML_ASYNC_BATCH_WINDOW_MS', default=2.0, cast=float)
+
+# Async ingest endpoint: readings using the database at the same time per
+# worker (under ASGI each one holds its own connection)
+BIOMETRICS_ASYNC_DB_CONCURRENCY = config('BIOMETRICS_ASYNC_DB_CONCURRENCY', default=20, cast=int)
+
+# Alerts of the same type for officers of the same supervisor arriving within
+# this many seconds of each other are grouped into one incident
+ALERT_INCIDENT_WINDOW_SECONDS = config('ALERT_INCIDENT_WINDOW_SECONDS', default=300, cast=float)
+
+# Maximum number of readings accepted by POST /biometrics/bulk/
+BIOMETRICS_BULK_MAX_READINGS = config('BIOMETRICS_BULK_MAX_READINGS', default=5000, cast=int)
+
+# Client timestamps of batched readings: at most this many days old (and
+# never before the months detached by retention or archiving) and this many
+# seconds ahead of the server clock
+BIOMETRICS_MAX_READING_AGE_DAYS = config('BIOMETRICS_MAX_READING_AGE_DAYS', default=30, cast=int)
+BIOMETRICS_MAX_CLOCK_SKEW_SECONDS = config('BIOMETRICS_MAX_CLOCK_SKEW_SECONDS', default=300, cast=int)
+
+# Write-behind ingestion: POST /biometrics/ appends readings to a local log
+# and answers 202; a background thread stores and scores them in batches
+BIOMETRICS_WRITE_BEHIND = config('BIOMETRICS_WRITE_BEHIND', default=False, cast=bool)
+BIOMETRICS_WRITE_BEHIND_DIR = config('BIOMETRICS_WRITE_BEHIND_DIR', default=os.path.join(BASE_DIR, 'ingest_log'))
+BIOMETRICS_WRITE_BEHIND_BATCH_SIZE = config('BIOMETRICS_WRITE_BEHIND_BATCH_SIZE', default=1000, cast=int)
+BIOMETRICS_WRITE_BEHIND_INTERVAL = config('BIOMETRICS_WRITE_BEHIND_INTERVAL', default=0.5, cast=float)
+BIOMETRICS_WRITE_BEHIND_SEGMENT_BYTES = config('BIOMETRICS_WRITE_BEHIND_SEGMENT_BYTES', default=64 * 1024 * 1024, cast=int)
+BIOMETRICS_WRITE_BEHIND_FSYNC = config('BIOMETRICS_WRITE_BEHIND_FSYNC', default=True, cast=bool)
+
+# Monthly partitions of bpm and ml_predictions: months created ahead by
+# `manage.py manage_partitions` (run daily) and months kept when it is given
+# --retention (0 keeps everything)
+BIOMETRICS_PARTITION_MONTHS_AHEAD = config('BIOMETRICS_PARTITION_MONTHS_AHEAD', default=3, cast=int)
+BIOMETRICS_RETENTION_MONTHS = config('BIOMETRICS_RETENTION_MONTHS', default=0, cast=int)
+
+# Archive of raw readings: months older than BIOMETRICS_ARCHIVE_AFTER_MONTHS
+# (current one included; 0 disables) are moved by `manage.py archive_bpm`
+# into compressed per-officer segment files under BIOMETRICS_ARCHIVE_DIR
+BIOMETRICS_ARCHIVE_AFTER_MONTHS = config('BIOMETRICS_ARCHIVE_AFTER_MONTHS', default=0, cast=int)
+BIOMETRICS_ARCHIVE_DIR = config('BIOMETRICS_ARCHIVE_DIR', default=os.path.join(BASE_DIR, 'archive'))
+
+# MLPrediction metadata storage: 'compact' keeps it in typed columns and
+# packed float32 features; 'json' also writes the whole dict to ml_metadata
+BIOMETRICS_PREDICTION_STORAGE = config('BIOMETRICS_PREDICTION_STORAGE', default='compact')
+
+# Each officer's last readings in shared memory for the single-reading
+# endpoints (apps/biometrics/recent.py); the name defaults to one per database
+BIOMETRICS_RECENT_READINGS = config('BIOMETRICS_RECENT_READINGS', default=True, cast=bool)
+BIOMETRICS_RECENT_READINGS_SLOTS = config('BIOMETRICS_RECENT_READINGS_SLOTS', default=65536, cast=int)
+BIOMETRICS_RECENT_READINGS_NAME = config('BIOMETRICS_RECENT_READINGS_NAME', default='')
+
+# GET /biometrics/ returns this many days of readings unless ?since= is given
+BIOMETRICS_QUERY_WINDOW_DAYS = config('BIOMETRICS_QUERY_WINDOW_DAYS', default=7, cast=int)
+
+# Most buckets per officer in a rollup series before a coarser step is
+# picked (a week of one-minute buckets)
+BIOMETRICS_SERIES_MAX_POINTS = config('BIOMETRICS_SERIES_MAX_POINTS', default=7 * 24 * 60, cast=int)
+
+# Historical imports (POST /biometrics/import/, manage.py import_bpm): readings
+# scored per ML call in the pass that follows the COPY merge
+BIOMETRICS_IMPORT_SCORE_BATCH_SIZE = config('BIOMETRICS_IMPORT_SCORE_BATCH_SIZE', default=5000, cast=int)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -19,15 +19,15 @@ PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.MD5PasswordHasher',
 ]
 
-class DisableMigrations:
-    def __contains__(self, item):
-        return True
+# Test databases are recreated with the same ids: no host-wide history
+# (tests that need it enable it with their own segment)
+BIOMETRICS_RECENT_READINGS = False
 
-    def __getitem__(self, item):
-        return None
+# Migrations run (no MIGRATION_MODULES override): bpm and ml_predictions are
+# only partitioned by the biometrics migrations
 
-
-MIGRATION_MODULES = DisableMigrations()
+# The throttle cache outlives each test: keep the whole run under the rates
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {'anon': '10000/hour', 'user': '10000/hour'}
 
 DEBUG = True
 LOGGING = {
@@ -27,7 +27,7 @@ def api_root(request):
         "message": "Artemis API",
         "endpoints": [
             "docs/", "schema/", "redoc/", "roles/", "users/", "biometrics/",
-            "geolocation/", "alerts/", "events/", "recommendations/", "reports/",
+            "geolocation/", "alerts/", "incidents/", "events/", "recommendations/", "reports/",
         ],
     })
 
@@ -47,6 +47,7 @@ urlpatterns = [
     path('geolocation/', include('apps.geolocation.urls')),
     path('alert-types/', include('apps.alerts.type_urls')),
     path('alerts/', include('apps.alerts.urls')),
+    path('incidents/', include('apps.alerts.incident_urls')),
     path('events/', include('apps.events.urls')),
     path('recommendations/', include('apps.recommendations.urls')),
     path('reports/', include('apps.reports.urls')),
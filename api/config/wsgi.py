@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Replay readings left in the write-behind log by a previous process
+from apps.biometrics.views import start_write_behind  # noqa: E402
+
+start_write_behind()
@@ -0,0 +1,105 @@
+from django.core import exceptions
+from django.db import migrations, models
+from django.utils.functional import cached_property
+
+
+class SmallEnumField(models.SmallIntegerField):
+    """
+    Choice field stored as a smallint code: the position of the value in
+    `choices`. Python code, lookups, serializers and forms keep using the
+    string values ('High', 'Alert_Triggered'); only the column holds the
+    code, which keeps the heap and the indexes on the field small.
+
+    Codes follow the order of `choices`, so new values must be appended
+    (reordering or removing one needs a data migration). Ordering by the
+    field sorts by that order. Existing varchar columns are converted with
+    `convert_to_codes`.
+    """
+    description = 'Choice stored as a small integer code'
+
+    def __init__(self, *args, choices, **kwargs):
+        super().__init__(*args, choices=choices, **kwargs)
+        self.labels = tuple(value for value, _ in choices)
+        self.codes = {value: code for code, value in enumerate(self.labels)}
+
+    @cached_property
+    def validators(self):
+        # The value is a label, not the integer the range validators expect
+        return [*self.default_validators, *self._validators]
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return self.labels[value]
+
+    def to_python(self, value):
+        if value is None or value in self.codes:
+            return value
+        if isinstance(value, int) and 0 <= value < len(self.labels):
+            return self.labels[value]
+        raise exceptions.ValidationError(
+            self.error_messages['invalid_choice'],
+            code='invalid_choice',
+            params={'value': value},
+        )
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, models.expressions.Expression):
+            return value
+        return self.codes[self.to_python(value)]
+
+
+def _cases(pairs):
+    return ' '.join(f"WHEN {source} THEN {target}" for source, target in pairs)
+
+
+def _literal(label):
+    return "'" + label.replace("'", "''") + "'"
+
+
+def convert_to_codes(model, name, labels):
+    """
+    Migration operation turning the varchar column of `name` on `model`
+    ('app_label.ModelName') into the codes of a SmallEnumField with the
+    values `labels`, in place (`ALTER COLUMN ... TYPE smallint USING`).
+
+    Use it as the database operation of a SeparateDatabaseAndState whose
+    state operation is the AlterField. A value outside `labels` becomes
+    NULL, so on a NOT NULL column the migration fails instead of losing
+    it. The `varchar_pattern_ops` index Django adds to indexed varchar
+    columns is dropped, and recreated when the migration is reversed.
+    """
+    app_label, model_name = model.split('.')
+
+    def forward(apps, schema_editor):
+        model = apps.get_model(app_label, model_name)
+        table, column = model._meta.db_table, model._meta.get_field(name).column
+        quote = schema_editor.quote_name
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() "
+                "AND tablename = %s AND indexdef LIKE %s",
+                [table, f'%({column} varchar_pattern_ops)']
+            )
+            for index, in cursor.fetchall():
+                cursor.execute(f"DROP INDEX {quote(index)}")
+            cases = _cases((_literal(label), code) for code, label in enumerate(labels))
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ALTER COLUMN {quote(column)} TYPE smallint "
+                f"USING CASE {quote(column)} {cases} END"
+            )
+
+    def backward(apps, schema_editor):
+        model = apps.get_model(app_label, model_name)
+        field = model._meta.get_field(name)
+        quote = schema_editor.quote_name
+        cases = _cases((code, _literal(label)) for code, label in enumerate(labels))
+        schema_editor.execute(
+            f"ALTER TABLE {quote(model._meta.db_table)} ALTER COLUMN {quote(field.column)} "
+            f"TYPE varchar({field.max_length}) USING CASE {quote(field.column)} {cases} END"
+        )
+        like_index = schema_editor._create_like_index_sql(model, field)
+        if like_index is not None:
+            schema_editor.execute(like_index)
+
+    return migrations.RunPython(forward, backward, elidable=False)
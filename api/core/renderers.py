@@ -0,0 +1,93 @@
+import csv
+import json
+
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class _Line:
+    """File-like object that hands back what csv.writer writes."""
+
+    def write(self, value):
+        return value
+
+
+def _rows(data):
+    """(fields, rows) of rendered list data: {'data': [...]}, a list or one object."""
+    if isinstance(data, dict) and isinstance(data.get('data'), list):
+        data = data['data']
+    elif not isinstance(data, list):
+        data = [data] if data is not None else []
+
+    fields = {}
+    for item in data:
+        fields.update(dict.fromkeys(item))
+    fields = list(fields)
+    return fields, (tuple(item.get(field) for field in fields) for item in data)
+
+
+class ExportRenderer(renderers.BaseRenderer):
+    """
+    Base of the export formats of the list endpoints.
+
+    `stream(fields, rows)` encodes value tuples in chunks of `chunk_size`
+    rows, for the streaming export of `BaseViewSet`; `render` encodes
+    serialized data the same way.
+    """
+    charset = 'utf-8'
+    encoder = JSONEncoder()
+
+    def header(self, fields):
+        return ''
+
+    def line(self, fields, row):
+        raise NotImplementedError
+
+    def stream(self, fields, rows, chunk_size=1000):
+        """Encoded chunks (bytes) of `rows` (tuples of the `fields` values)."""
+        lines = [self.header(fields)]
+        for row in rows:
+            lines.append(self.line(fields, row))
+            if len(lines) >= chunk_size:
+                yield ''.join(lines).encode(self.charset)
+                lines = []
+        if lines:
+            yield ''.join(lines).encode(self.charset)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''.join(self.stream(*_rows(data)))
+
+
+class NDJSONRenderer(ExportRenderer):
+    """One JSON object per line."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def line(self, fields, row):
+        return json.dumps(
+            dict(zip(fields, row)), cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')
+        ) + '\n'
+
+
+class CSVRenderer(ExportRenderer):
+    """Header row with the field names, then one row per object."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def __init__(self):
+        self.writer = csv.writer(_Line())
+
+    def cell(self, value):
+        if value is None:
+            return ''
+        if isinstance(value, (str, int, float)):
+            return value
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+        return self.encoder.default(value)
+
+    def header(self, fields):
+        return self.writer.writerow(fields)
+
+    def line(self, fields, row):
+        return self.writer.writerow([self.cell(value) for value in row])
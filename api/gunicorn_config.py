@@ -5,7 +5,8 @@ bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
 backlog = 2048
 
 workers = os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1)
-worker_class = 'sync'
+# 'uvicorn.workers.UvicornWorker' to serve config.asgi:application
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
 worker_connections = 1000
 timeout = 60
 keepalive = 2
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the BPM ingest endpoint under WSGI (sync) and ASGI (async).
+
+Drives the same load against:
+- wsgi: gunicorn sync workers serving `config.wsgi`, POST /biometrics/
+- asgi: gunicorn uvicorn workers serving `config.asgi`, POST /biometrics/async/
+
+For each concurrency level, that many keep-alive connections post readings
+back to back for `--duration` seconds (a connection the server closes is
+reopened, and the reconnect counts in the latency). It reports throughput,
+latency percentiles and failed requests per server and level.
+
+By default both servers are started here with the same number of workers
+(from `api/`, using `gunicorn_config.py`, with anonymous throttling lifted),
+against the database configured in the environment. Benchmark users
+(bench<N>@artemis.local) are created if missing. Use --wsgi-url/--asgi-url
+to target servers that are already running instead.
+
+    python scripts/bench_ingest_servers.py
+    python scripts/bench_ingest_servers.py --concurrency 100,1000,4000 --duration 20 --workers 4
+    python scripts/bench_ingest_servers.py --asgi-url http://10.0.0.5:8000/biometrics/async/ --servers asgi --json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import urlsplit
+
+API_DIR = Path(__file__).resolve().parent.parent / 'api'
+
+SERVERS = {
+    'wsgi': ('config.wsgi:application', 'sync', '/biometrics/'),
+    'asgi': ('config.asgi:application', 'uvicorn.workers.UvicornWorker', '/biometrics/async/'),
+}
+
+
+def ensure_users(settings_module, count):
+    """Ids of `count` benchmark users, creating the missing ones."""
+    sys.path.insert(0, str(API_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+    from apps.users.models import User
+
+    ids = []
+    for i in range(count):
+        user, _ = User.objects.get_or_create(
+            email=f'bench{i}@artemis.local',
+            defaults={'name': f'Bench {i}', 'password_hash': 'noop', 'status': 'Active'}
+        )
+        ids.append(user.pk)
+    return ids
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name, workers, settings_module):
+    """Start a gunicorn server; returns (process, url)."""
+    app, worker_class, path = SERVERS[name]
+    port = _free_port()
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE=settings_module,
+        GUNICORN_BIND=f'127.0.0.1:{port}',
+        GUNICORN_WORKERS=str(workers),
+        GUNICORN_WORKER_CLASS=worker_class,
+        GUNICORN_ACCESS_LOG='/dev/null',
+        GUNICORN_ERROR_LOG='-',
+        GUNICORN_LOG_LEVEL='warning',
+        THROTTLE_ANON_RATE='1000000000/s',
+    )
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py', app],
+        cwd=API_DIR, env=env
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f'{name} server exited with code {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            break
+        except OSError:
+            time.sleep(0.2)
+    else:
+        process.terminate()
+        sys.exit(f'{name} server did not start')
+    return process, f'http://127.0.0.1:{port}{path}'
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+class _Connection:
+    """Minimal HTTP/1.1 keep-alive client for JSON POSTs."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def post(self, path, body):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(
+            f'POST {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n'
+            f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n'.encode() + body
+        )
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('connection closed by server')
+        status = int(status_line.split()[1])
+        length = 0
+        keep_alive = True
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name = name.strip().lower()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'connection' and value.strip().lower() == 'close':
+                keep_alive = False
+        if length:
+            await self.reader.readexactly(length)
+        if not keep_alive:
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def _client(url, user_ids, deadline, timeout, seed, latencies, statuses):
+    parts = urlsplit(url)
+    connection = _Connection(parts.hostname, parts.port or 80)
+    rng = random.Random(seed)
+    while time.monotonic() < deadline:
+        body = json.dumps({
+            'user_id': rng.choice(user_ids),
+            'value': round(rng.gauss(85, 15), 1)
+        }).encode()
+        started = time.perf_counter()
+        try:
+            status = await asyncio.wait_for(connection.post(parts.path, body), timeout)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+            connection.close()
+            statuses[type(e).__name__] += 1
+            await asyncio.sleep(0.05)
+            continue
+        latencies.append(time.perf_counter() - started)
+        statuses[status] += 1
+    connection.close()
+
+
+def _percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_level(name, url, user_ids, concurrency, duration, timeout):
+    latencies = []
+    statuses = Counter()
+    started = time.monotonic()
+    deadline = started + duration
+    await asyncio.gather(*(
+        _client(url, user_ids, deadline, timeout, seed, latencies, statuses)
+        for seed in range(concurrency)
+    ))
+    elapsed = time.monotonic() - started
+
+    ordered = sorted(latencies)
+    ok = sum(count for status, count in statuses.items() if isinstance(status, int) and status < 300)
+    return {
+        'server': name,
+        'concurrency': concurrency,
+        'requests': ok,
+        'failed': sum(statuses.values()) - ok,
+        'throughput_rps': ok / elapsed,
+        'latency_ms': {
+            'mean': statistics.fmean(ordered) * 1000 if ordered else 0.0,
+            'p50': _percentile(ordered, 0.50) * 1000,
+            'p95': _percentile(ordered, 0.95) * 1000,
+            'p99': _percentile(ordered, 0.99) * 1000,
+            'max': ordered[-1] * 1000 if ordered else 0.0,
+        },
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+    }
+
+
+def print_report(report):
+    latency = report['latency_ms']
+    print(f"{report['server']:>5} c={report['concurrency']:<6} "
+          f"{report['throughput_rps']:9.1f} req/s  "
+          f"p50 {latency['p50']:8.1f} ms  p95 {latency['p95']:8.1f} ms  "
+          f"p99 {latency['p99']:8.1f} ms  failed {report['failed']:<6} {report['statuses']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servers', default='wsgi,asgi', help='Comma-separated: wsgi, asgi')
+    parser.add_argument('--concurrency', default='50,500,2000',
+                        help='Comma-separated numbers of concurrent connections')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per level')
+    parser.add_argument('--workers', type=int, default=2, help='Workers per spawned server')
+    parser.add_argument('--users', type=int, default=100, help='Benchmark users to post as')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout (s)')
+    parser.add_argument('--settings', default='config.settings.dev', help='Django settings module')
+    parser.add_argument('--wsgi-url', help='Use a running WSGI server (full endpoint URL)')
+    parser.add_argument('--asgi-url', help='Use a running ASGI server (full endpoint URL)')
+    parser.add_argument('--json', action='store_true', help='Print the reports as JSON')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.servers.split(',') if name.strip()]
+    for name in names:
+        if name not in SERVERS:
+            sys.exit(f'unknown server {name!r}')
+    levels = [int(level) for level in args.concurrency.split(',')]
+    user_ids = ensure_users(args.settings, args.users)
+
+    reports = []
+    for name in names:
+        url = getattr(args, f'{name}_url')
+        process = None
+        if url is None:
+            process, url = start_server(name, args.workers, args.settings)
+        try:
+            for concurrency in levels:
+                report = asyncio.run(run_level(name, url, user_ids, concurrency, args.duration, args.timeout))
+                reports.append(report)
+                if not args.json:
+                    print_report(report)
+        finally:
+            if process is not None:
+                stop_server(process)
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+
+
+if __name__ == '__main__':
+    main()
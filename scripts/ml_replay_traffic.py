@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Deterministic traffic replay for the ML service (`ML/ml_service.py`).
+
+Streams a CSV of heart-rate readings through `ml_service` and reports
+throughput, latency percentiles, alert counts by type and peak memory, so
+engine changes can be compared on identical input.
+
+Input: `ML/processed_health_data.csv` by default, or any export with a user
+column (`user_id`/`User_id`) and a heart-rate column (`heart_rate`,
+`heart_rate_bpm` or `value`). With a timestamp column (`timestamp` or
+`created_at`) readings are replayed in timestamp order; without one, each
+user's readings keep file order and users are interleaved round-robin (the
+i-th reading of every user before any (i+1)-th one). Either way the order is
+deterministic.
+
+Each reading is sent with the user's last 10 readings, newest first and
+including the current one, exactly as `BPMViewSet.create` does.
+
+Modes:
+- single: one `analyze_biometric_data()` call per reading
+- batch:  `analyze_columns()` over chunks of `--batch-size` readings; a
+          reading's latency includes the time it waits for its chunk
+
+    python scripts/ml_replay_traffic.py                       # both modes, max speed
+    python scripts/ml_replay_traffic.py --mode single --rate 500
+    python scripts/ml_replay_traffic.py --repeat 5 --batch-size 512 --json
+"""
+import argparse
+import csv
+import json
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import Counter, deque
+from pathlib import Path
+
+ML_DIR = Path(__file__).resolve().parent.parent / 'ML'
+DEFAULT_INPUT = ML_DIR / 'processed_health_data.csv'
+
+USER_COLUMNS = ('user_id', 'User_id', 'user')
+HR_COLUMNS = ('heart_rate', 'heart_rate_bpm', 'value', 'bpm')
+TIMESTAMP_COLUMNS = ('timestamp', 'created_at')
+
+HISTORY = 10
+
+
+def _pick_column(fieldnames, candidates, option, required=True):
+    if option:
+        if option not in fieldnames:
+            sys.exit(f'column {option!r} not found in input')
+        return option
+    for name in candidates:
+        if name in fieldnames:
+            return name
+    if required:
+        sys.exit(f'none of the columns {candidates} found in input; use the matching option')
+    return None
+
+
+def load_stream(path, user_column=None, hr_column=None, timestamp_column=None,
+                limit=None, repeat=1):
+    """
+    Read the CSV and return the replay stream.
+
+    Returns:
+        list of (user_id, heart_rate, recent_hrs, timestamp) tuples in
+        replay order; recent_hrs is newest-first and includes heart_rate
+    """
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        fields = reader.fieldnames or []
+        user_column = _pick_column(fields, USER_COLUMNS, user_column)
+        hr_column = _pick_column(fields, HR_COLUMNS, hr_column)
+        timestamp_column = _pick_column(fields, TIMESTAMP_COLUMNS, timestamp_column,
+                                        required=False)
+
+        readings = []
+        for position, row in enumerate(reader):
+            try:
+                user_id = int(float(row[user_column]))
+                heart_rate = float(row[hr_column])
+            except (TypeError, ValueError):
+                continue
+            timestamp = row[timestamp_column] if timestamp_column else None
+            readings.append((user_id, heart_rate, timestamp, position))
+
+    # Order per user (timestamp, then file position), then interleave users
+    per_user = {}
+    for reading in readings:
+        per_user.setdefault(reading[0], []).append(reading)
+    ordered = []
+    for user_order, user_readings in enumerate(per_user.values()):
+        user_readings.sort(key=lambda r: (r[2] or '', r[3]))
+        for tick, reading in enumerate(user_readings):
+            ordered.append((reading, tick, user_order))
+    if timestamp_column:
+        ordered.sort(key=lambda item: (item[0][2] or '', item[0][3]))
+    else:
+        ordered.sort(key=lambda item: (item[1], item[2]))
+    ordered = [item[0] for item in ordered]
+
+    stream = []
+    histories = {}
+    for _ in range(repeat):
+        for user_id, heart_rate, timestamp, _position in ordered:
+            history = histories.setdefault(user_id, deque(maxlen=HISTORY))
+            history.appendleft(heart_rate)
+            stream.append((user_id, heart_rate, list(history), timestamp))
+            if limit and len(stream) >= limit:
+                return stream
+    return stream
+
+
+def _percentiles(latencies):
+    if not latencies:
+        return {'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'max': 0.0, 'mean': 0.0}
+    ordered = sorted(latencies)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+
+    return {
+        'p50': pick(0.50),
+        'p90': pick(0.90),
+        'p99': pick(0.99),
+        'max': ordered[-1] * 1000,
+        'mean': statistics.fmean(ordered) * 1000,
+    }
+
+
+class _Pacer:
+    """Schedules arrivals at a fixed rate (rate <= 0: as fast as possible)"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.start = time.perf_counter()
+
+    def arrival(self, index):
+        """Wait until reading `index` is due and return its arrival time"""
+        if not self.interval:
+            return time.perf_counter()
+        due = self.start + index * self.interval
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        return due
+
+
+def replay_single(service, stream, rate):
+    latencies = []
+    alert_types = Counter()
+    notifications = errors = 0
+
+    pacer = _Pacer(rate)
+    started = time.perf_counter()
+    for index, (user_id, heart_rate, recent_hrs, timestamp) in enumerate(stream):
+        arrival = pacer.arrival(index)
+        try:
+            result = service.analyze_biometric_data(
+                heart_rate=heart_rate, user_id=user_id,
+                recent_hrs=recent_hrs, timestamp=timestamp
+            )
+        except ValueError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - arrival)
+        if result['alert']:
+            alert_types[result['alert'].alert_type] += 1
+        notifications += result['should_notify']
+    elapsed = time.perf_counter() - started
+
+    return latencies, alert_types, notifications, errors, elapsed
+
+
+def replay_batch(service, stream, rate, batch_size):
+    import numpy as np
+    from ml_results import ALERT_TYPES
+
+    latencies = []
+    alert_types = Counter()
+    notifications = errors = 0
+
+    pacer = _Pacer(rate)
+    started = time.perf_counter()
+    for first in range(0, len(stream), batch_size):
+        chunk = stream[first:first + batch_size]
+        arrivals = [pacer.arrival(first + offset) for offset in range(len(chunk))]
+
+        n = len(chunk)
+        windows = np.zeros((n, HISTORY), dtype=np.float64)
+        lengths = np.empty(n, dtype=np.intp)
+        for row, (_, _, recent_hrs, _) in enumerate(chunk):
+            windows[row, :len(recent_hrs)] = recent_hrs
+            lengths[row] = len(recent_hrs)
+
+        result = service.analyze_columns(
+            user_ids=np.array([item[0] for item in chunk], dtype=np.int64),
+            heart_rates=np.array([item[1] for item in chunk], dtype=np.float64),
+            windows=windows,
+            timestamps=[item[3] for item in chunk],
+            lengths=lengths
+        )
+        done = time.perf_counter()
+
+        valid = result['valid']
+        latencies.extend(done - arrival for arrival, ok in zip(arrivals, valid) if ok)
+        errors += int(n - valid.sum())
+        alert_types.update(ALERT_TYPES[code] for code in result['alert_type_code'] if code)
+        notifications += int(result['should_notify'].sum())
+    elapsed = time.perf_counter() - started
+
+    return latencies, alert_types, notifications, errors, elapsed
+
+
+def run_mode(service, stream, mode, rate, batch_size, trace_memory):
+    if trace_memory:
+        tracemalloc.start()
+    if mode == 'single':
+        latencies, alert_types, notifications, errors, elapsed = replay_single(
+            service, stream, rate)
+    else:
+        latencies, alert_types, notifications, errors, elapsed = replay_batch(
+            service, stream, rate, batch_size)
+    traced_peak = None
+    if trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+    processed = len(latencies)
+    return {
+        'mode': mode,
+        'readings': len(stream),
+        'processed': processed,
+        'errors': errors,
+        'seconds': elapsed,
+        'throughput_per_s': processed / elapsed if elapsed else 0.0,
+        'latency_ms': _percentiles(latencies),
+        'alerts': sum(alert_types.values()),
+        'alerts_by_type': dict(sorted(alert_types.items())),
+        'notifications': notifications,
+        'traced_peak_mb': traced_peak,
+        # ru_maxrss is KiB on Linux; process-wide peak so far
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def print_report(report):
+    print(f"\n[{report['mode']}] {report['processed']}/{report['readings']} readings "
+          f"in {report['seconds']:.2f} s -> {report['throughput_per_s']:.0f} readings/s")
+    latency = report['latency_ms']
+    print(f"  latency ms   p50 {latency['p50']:.3f}  p90 {latency['p90']:.3f}  "
+          f"p99 {latency['p99']:.3f}  max {latency['max']:.3f}")
+    print(f"  alerts       {report['alerts']} (notify {report['notifications']}, "
+          f"invalid readings {report['errors']})")
+    for alert_type, count in report['alerts_by_type'].items():
+        print(f"    {alert_type:<24} {count}")
+    memory = f"  peak RSS     {report['peak_rss_mb']:.1f} MB"
+    if report['traced_peak_mb'] is not None:
+        memory += f"  (traced Python/NumPy peak during replay {report['traced_peak_mb']:.1f} MB)"
+    print(memory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', type=Path, default=DEFAULT_INPUT, help='CSV to replay')
+    parser.add_argument('--user-column')
+    parser.add_argument('--hr-column')
+    parser.add_argument('--timestamp-column')
+    parser.add_argument('--mode', choices=('single', 'batch', 'both'), default='both')
+    parser.add_argument('--rate', type=float, default=0.0,
+                        help='Readings per second (0 = as fast as possible)')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--limit', type=int, help='Replay at most this many readings')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Replay the file this many times (histories carry over)')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Measure peak Python/NumPy allocations with tracemalloc (slower)')
+    parser.add_argument('--json', action='store_true', help='Print the reports as JSON')
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(ML_DIR))
+    from ml_service import ml_service
+
+    stream = load_stream(args.input, args.user_column, args.hr_column,
+                         args.timestamp_column, args.limit, args.repeat)
+    if not stream:
+        sys.exit('no readings to replay')
+
+    # Load the models before measuring
+    ml_service.warm_up()
+
+    modes = ('single', 'batch') if args.mode == 'both' else (args.mode,)
+    reports = [
+        run_mode(ml_service, stream, mode, args.rate, args.batch_size, args.trace_memory)
+        for mode in modes
+    ]
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        print(f'Replaying {len(stream)} readings from {args.input} '
+              f'({"max speed" if not args.rate else f"{args.rate:g} readings/s"})')
+        for report in reports:
+            print_report(report)
+
+    if len(reports) == 2 and reports[0]['alerts_by_type'] != reports[1]['alerts_by_type']:
+        print('\nWARNING: single and batch modes produced different alerts', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Import-time and cold-start budget check for the ML package (`ML/`).
+
+Each measurement runs in a fresh interpreter so nothing is cached:
+
+- import:     `import ml_service` (must not load numpy, sklearn or models)
+- cold start: import + first `analyze_biometric_data()` call
+              (loads numpy and the models, then scores one reading)
+
+The median of `--runs` runs is compared against the budgets. The script
+also fails if sklearn, scipy or pandas end up imported on the compiled-model
+path, since that is what makes cold starts slow.
+
+Exit code is 0 when every budget holds and 1 otherwise, so it can run in CI:
+
+    python scripts/ml_startup_budget.py
+    python scripts/ml_startup_budget.py --import-budget-ms 30 --runs 7
+    python scripts/ml_startup_budget.py --importtime   # show slowest imports
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ML_DIR = Path(__file__).resolve().parent.parent / 'ML'
+
+HEAVY_MODULES = ('numpy', 'pandas', 'sklearn', 'scipy')
+FORBIDDEN_ON_COMPILED_PATH = ('pandas', 'sklearn', 'scipy')
+
+_PROBE = r'''
+import json, sys, time
+sys.path.insert(0, {ml_dir!r})
+t0 = time.perf_counter()
+import ml_service
+t1 = time.perf_counter()
+loaded_after_import = [m for m in {heavy!r} if m in sys.modules]
+result = {{'import_ms': (t1 - t0) * 1000, 'loaded_after_import': loaded_after_import}}
+if {cold!r}:
+    ml_service.ml_service.analyze_biometric_data(heart_rate=120.0, user_id=1)
+    t2 = time.perf_counter()
+    result['cold_start_ms'] = (t2 - t0) * 1000
+    result['backend'] = ml_service.ml_service.predictor.backend
+    result['loaded_after_cold_start'] = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps(result))
+'''
+
+
+def run_probe(cold: bool) -> dict:
+    code = _PROBE.format(ml_dir=str(ML_DIR), heavy=HEAVY_MODULES, cold=cold)
+    out = subprocess.run(
+        [sys.executable, '-c', code],
+        capture_output=True, text=True, check=True, cwd=str(ML_DIR),
+        env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'},
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(limit: int = 15) -> list:
+    """Top cumulative entries from `python -X importtime` for the cold start."""
+    code = (
+        f"import sys; sys.path.insert(0, {str(ML_DIR)!r}); import ml_service; "
+        "ml_service.ml_service.analyze_biometric_data(heart_rate=120.0, user_id=1)"
+    )
+    out = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, check=True, cwd=str(ML_DIR),
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per measurement')
+    parser.add_argument('--import-budget-ms', type=float, default=50.0)
+    parser.add_argument('--cold-start-budget-ms', type=float, default=750.0)
+    parser.add_argument('--importtime', action='store_true', help='Print the slowest imports of the cold start')
+    args = parser.parse_args()
+
+    imports = [run_probe(cold=False) for _ in range(args.runs)]
+    colds = [run_probe(cold=True) for _ in range(args.runs)]
+
+    import_ms = statistics.median(r['import_ms'] for r in imports)
+    cold_ms = statistics.median(r['cold_start_ms'] for r in colds)
+    loaded_after_import = sorted({m for r in imports for m in r['loaded_after_import']})
+    loaded_after_cold = sorted({m for r in colds for m in r['loaded_after_cold_start']})
+    backend = colds[0]['backend']
+
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append(f'import {import_ms:.1f} ms > budget {args.import_budget_ms:.1f} ms')
+    if cold_ms > args.cold_start_budget_ms:
+        failures.append(f'cold start {cold_ms:.1f} ms > budget {args.cold_start_budget_ms:.1f} ms')
+    if loaded_after_import:
+        failures.append(f'`import ml_service` loaded heavy modules: {", ".join(loaded_after_import)}')
+    if backend == 'compiled':
+        forbidden = [m for m in loaded_after_cold if m in FORBIDDEN_ON_COMPILED_PATH]
+        if forbidden:
+            failures.append(f'compiled-model path imported: {", ".join(forbidden)}')
+
+    print(f'ML startup report ({args.runs} runs, median)')
+    print(f'  import ml_service : {import_ms:8.1f} ms  (budget {args.import_budget_ms:.0f} ms)')
+    print(f'  cold start        : {cold_ms:8.1f} ms  (budget {args.cold_start_budget_ms:.0f} ms)')
+    print(f'  model backend     : {backend}')
+    print(f'  heavy modules     : {", ".join(loaded_after_cold) or "none"}')
+
+    if args.importtime:
+        print('\nSlowest imports during cold start (cumulative us, self us, module):')
+        for cumulative, self_time, name in slowest_imports():
+            print(f'  {cumulative:>9} {self_time:>9}  {name}')
+
+    if failures:
+        print('\nFAILED:')
+        for failure in failures:
+            print(f'  - {failure}')
+        sys.exit(1)
+    print('\nOK: all budgets met')
+
+
+if __name__ == '__main__':
+    main()